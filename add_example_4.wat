@@ -1,69 +1,122 @@
 (module
-  (type $func_type_-258221296089122869 (func (param f64) (result i32)))
-  (type $func_type_0 (func (param f64) (result f64)))
-  (type $func_type_2010637364242144482 (func (param i32) (result f64)))
-  (type $func_type_2427529893760197770 (func (param f64) (result f64)))
-  (type $func_type_3567405016737577371 (func (param f64) (result f64)))
-  (type $func_type_3793797873057617614 (func (param f64)))
+  (type $func_type_f64_to_f64 (func (param f64) (result f64)))
+  (type $func_type_f64_to_i32 (func (param f64) (result i32)))
+  (type $func_type_f64_to_void (func (param f64)))
   (type $func_type_fallback_1 (func (param f64) (result f64)))
+  (type $func_type_i32_to_f64 (func (param i32) (result f64)))
   (import "env" "write_num" (func $write_num (param f64)))
   (import "env" "write_char" (func $write_char (param i32)))
   (import "env" "read_num" (func $read_num (result f64)))
   (import "env" "f64_to_string" (func $f64_to_string (param f64) (result i32)))
   (memory (export "memory") 1)
-  (data (i32.const 0) "Hello, \00")
-  (data (i32.const 8) "! Calculated value: \00")
-  (data (i32.const 29) "Alice\00")
-  (data (i32.const 35) "Bob\00")
-  (data (i32.const 39) "Results from closure lambda: \00")
-  (data (i32.const 69) ", \00")
-  (data (i32.const 72) "Greetings, \00")
-  (data (i32.const 84) "Charlie\00")
-  (data (i32.const 92) "Result with modified prefix: \00")
-  (data (i32.const 122) "After operation \00")
-  (data (i32.const 139) ": \00")
-  (data (i32.const 142) "Complex lambda expression result: \00")
-  (data (i32.const 177) "Times ten: \00")
-  (data (i32.const 189) "Times hundred: \00")
-  (data (i32.const 205) "square\00")
-  (data (i32.const 212) "cube\00")
-  (data (i32.const 217) "square\00")
-  (data (i32.const 224) "cube\00")
-  (data (i32.const 229) "Squarer(4): \00")
-  (data (i32.const 242) "Cuber(3): \00")
-  (data (i32.const 253) "Triple increment of 5: \00")
-  (data (i32.const 277) "After transformation \00")
-  (data (i32.const 299) ": \00")
-  (data (i32.const 302) "Add five to 7: \00")
-  (data (i32.const 318) "Add ten to 7: \00")
-  (global $next_mem_addr (mut i32) (i32.const 0))
+  (data (i32.const 0) "\07\00\00\00Hello, ")
+  (data (i32.const 12) "\14\00\00\00! Calculated value: ")
+  (data (i32.const 36) "\05\00\00\00Alice")
+  (data (i32.const 48) "\03\00\00\00Bob")
+  (data (i32.const 56) "\1d\00\00\00Results from closure lambda: ")
+  (data (i32.const 92) "\02\00\00\00, ")
+  (data (i32.const 100) "\0b\00\00\00Greetings, ")
+  (data (i32.const 116) "\07\00\00\00Charlie")
+  (data (i32.const 128) "\1d\00\00\00Result with modified prefix: ")
+  (data (i32.const 164) "\10\00\00\00After operation ")
+  (data (i32.const 184) "\02\00\00\00: ")
+  (data (i32.const 192) "\22\00\00\00Complex lambda expression result: ")
+  (data (i32.const 232) "\0b\00\00\00Times ten: ")
+  (data (i32.const 248) "\0f\00\00\00Times hundred: ")
+  (data (i32.const 268) "\06\00\00\00square")
+  (data (i32.const 280) "\04\00\00\00cube")
+  (data (i32.const 288) "\06\00\00\00square")
+  (data (i32.const 300) "\04\00\00\00cube")
+  (data (i32.const 308) "\0c\00\00\00Squarer(4): ")
+  (data (i32.const 324) "\0a\00\00\00Cuber(3): ")
+  (data (i32.const 340) "\17\00\00\00Triple increment of 5: ")
+  (data (i32.const 368) "\15\00\00\00After transformation ")
+  (data (i32.const 396) "\02\00\00\00: ")
+  (data (i32.const 404) "\0f\00\00\00Add five to 7: ")
+  (data (i32.const 424) "\0e\00\00\00Add ten to 7: ")
+  (global $free_lists i32 (i32.const 448))
+  (global $heap_base i32 (i32.const 560))
+  (global $next_mem_addr (mut i32) (i32.const 560))
+  (global $heap_live_bytes (mut i32) (i32.const 0))
+  (global $gc_collections (mut i32) (i32.const 0))
 
+  ;; Size-class allocator: block = [header:i32][next_free | kind:i32][payload...], block size is 16 << class.
+  ;; Header: bits 0-4 size class, bit 8 allocated, bit 9 GC mark. Kind of live blocks: 0 raw, 1 string, 2 list, 3 struct.
+  ;; Freed blocks go to per-class free lists (heads at $free_lists) and are reused before bumping.
+  ;; Memory grows at least by its current size.
   (func $alloc (param $size i32) (result i32)
-    (local $ptr i32)
-    (global.get $next_mem_addr)
-    (local.set $ptr)
-    (global.get $next_mem_addr)
-    (local.get $size)
-    (i32.add)
-    (global.set $next_mem_addr)
-    (local.get $ptr)
+    (local $class i32) (local $head_addr i32) (local $block i32)
+    ;; Smallest class whose block holds the 8-byte header and $size bytes
+    (local.set $class (i32.sub (i32.const 32) (i32.clz (i32.shr_u (i32.add (local.get $size) (i32.const 7)) (i32.const 4)))))
+    (local.set $head_addr (i32.add (global.get $free_lists) (i32.shl (local.get $class) (i32.const 2))))
+    (local.set $block (i32.load (local.get $head_addr)))
+    (local.get $block)
+    (if (then
+      (i32.store (local.get $head_addr) (i32.load offset=4 (local.get $block)))
+    ) (else
+      (local.set $block (call $heap_bump (local.get $class)))
+    ))
+    (i32.store (local.get $block) (i32.or (local.get $class) (i32.const 256)))
+    (i32.store offset=4 (local.get $block) (i32.const 0))
+    (global.set $heap_live_bytes (i32.add (global.get $heap_live_bytes) (i32.shl (i32.const 16) (local.get $class))))
+    (i32.add (local.get $block) (i32.const 8))
   )
         
 
+  (func $heap_bump (param $class i32) (result i32)
+    (local $block i32) (local $end i32) (local $needed_pages i32)
+    (local.set $block (global.get $next_mem_addr))
+    (local.set $end (i32.add (local.get $block) (i32.shl (i32.const 16) (local.get $class))))
+    (local.get $end) (i32.shl (memory.size) (i32.const 16)) (i32.gt_u)
+    (if (then
+      (local.set $needed_pages
+        (i32.shr_u (i32.add (i32.sub (local.get $end) (i32.shl (memory.size) (i32.const 16))) (i32.const 65535)) (i32.const 16)))
+      (memory.grow (select (memory.size) (local.get $needed_pages) (i32.gt_u (memory.size) (local.get $needed_pages))))
+      (i32.const -1) (i32.eq)
+      (if (then
+        ;; Not enough memory for doubling: try the exact amount before giving up
+        (memory.grow (local.get $needed_pages)) (i32.const -1) (i32.eq) (if (then (unreachable)))
+      ))
+    ))
+    (global.set $next_mem_addr (local.get $end))
+    (local.get $block)
+  )
+        
+
+  (func $free (param $ptr i32)
+    (local $block i32) (local $class i32) (local $head_addr i32)
+    (local.get $ptr) (i32.eqz) (if (then (return)))
+    (local.set $block (i32.sub (local.get $ptr) (i32.const 8)))
+    ;; Block is already free: nothing to do
+    (i32.and (i32.load (local.get $block)) (i32.const 256)) (i32.eqz) (if (then (return)))
+    (local.set $class (i32.and (i32.load (local.get $block)) (i32.const 31)))
+    (i32.store (local.get $block) (local.get $class))
+    (global.set $heap_live_bytes (i32.sub (global.get $heap_live_bytes) (i32.shl (i32.const 16) (local.get $class))))
+    (local.set $head_addr (i32.add (global.get $free_lists) (i32.shl (local.get $class) (i32.const 2))))
+    (i32.store offset=4 (local.get $block) (i32.load (local.get $head_addr)))
+    (i32.store (local.get $head_addr) (local.get $block))
+  )
+        
+
+  ;; For strings: [len:i32][bytes...], pointer refers to the first byte, length is at ptr - 4.
+  ;; Host f64_to_string must return a string in the same layout.
   (func $string_len (param $ptr i32) (result i32)
-    (local $len i32)
-    (local.set $len (i32.const 0))
-    (loop $len_loop
-      (block
-        (i32.load8_u (i32.add (local.get $ptr) (local.get $len)))
-        (i32.const 0)
-        (i32.eq)
-        (br_if 1)
-      )
-      (local.set $len (i32.add (local.get $len) (i32.const 1)))
-      (br $len_loop)
-    )
-    (local.get $len)
+    (i32.load (i32.sub (local.get $ptr) (i32.const 4)))
+  )
+        
+
+  (func $string_alloc (param $len i32) (result i32)
+    (local $ptr i32)
+    (local.set $ptr (call $alloc (i32.add (local.get $len) (i32.const 4))))
+    (i32.store (i32.sub (local.get $ptr) (i32.const 4)) (i32.const 1))
+    (i32.store (local.get $ptr) (local.get $len))
+    (i32.add (local.get $ptr) (i32.const 4))
+  )
+        
+
+  ;; Only for heap strings (concat/repeat results), never for literals in data segments
+  (func $string_free (param $ptr i32)
+    (call $free (i32.sub (local.get $ptr) (i32.const 4)))
   )
         
 
@@ -86,136 +139,187 @@
         
 
   (func $string_concat (param $val1 f64) (param $val2 f64) (result i32)
-    (local $ptr1 i32) (local $ptr2 i32) (local $len1 i32) (local $len2 i32) (local $new_ptr i32) (local $i i32)
+    (local $ptr1 i32) (local $ptr2 i32) (local $len1 i32) (local $len2 i32) (local $new_ptr i32)
 
     ;; Heuristic: if val in [1..2^32-1], treat it as pointer; else convert number to string
     (local.get $val1) (i32.trunc_f64_s) (local.set $ptr1)
-    (local.get $val1) (f64.convert_i32_u) (f64.eq) (if (else
+    (local.get $ptr1) (f64.convert_i32_u) (local.get $val1) (f64.eq) (if (then) (else
       (local.get $val1) (call $f64_to_string) (local.set $ptr1)
     ))
 
     (local.get $val2) (i32.trunc_f64_s) (local.set $ptr2)
-    (local.get $val2) (f64.convert_i32_u) (f64.eq) (if (else
+    (local.get $ptr2) (f64.convert_i32_u) (local.get $val2) (f64.eq) (if (then) (else
       (local.get $val2) (call $f64_to_string) (local.set $ptr2)
     ))
 
     (local.set $len1 (call $string_len (local.get $ptr1)))
     (local.set $len2 (call $string_len (local.get $ptr2)))
-    (call $alloc (i32.add (local.get $len1) (i32.add (local.get $len2) (i32.const 1))))
+    (call $string_alloc (i32.add (local.get $len1) (local.get $len2)))
     (local.set $new_ptr)
-    (local.set $i (i32.const 0))
-    (loop $copy_loop_1
-      (local.get $i) (local.get $len1) (i32.lt_s)
-      (if (then
-        (i32.store8 (i32.add (local.get $new_ptr) (local.get $i)) (i32.load8_u (i32.add (local.get $ptr1) (local.get $i))))
-        (local.set $i (i32.add (local.get $i) (i32.const 1)))
-        (br $copy_loop_1)
-      ))
-    )
-    (local.set $i (i32.const 0))
-    (loop $copy_loop_2
-      (local.get $i) (local.get $len2) (i32.lt_s)
-      (if (then
-        (i32.store8 (i32.add (local.get $new_ptr) (i32.add (local.get $len1) (local.get $i))) (i32.load8_u (i32.add (local.get $ptr2) (local.get $i))))
-        (local.set $i (i32.add (local.get $i) (i32.const 1)))
-        (br $copy_loop_2)
-      ))
-    )
-    (i32.store8 (i32.add (local.get $new_ptr) (i32.add (local.get $len1) (local.get $len2))) (i32.const 0))
+    (memory.copy (local.get $new_ptr) (local.get $ptr1) (local.get $len1))
+    (memory.copy (i32.add (local.get $new_ptr) (local.get $len1)) (local.get $ptr2) (local.get $len2))
     (local.get $new_ptr)
   )
         
 
   (func $string_repeat (param $ptr i32) (param $count f64) (result i32)
-    (local $len i32) (local $total_len i32) (local $new_ptr i32) (local $i i32) (local $j i32)
+    (local $len i32) (local $times i32) (local $total_len i32) (local $new_ptr i32) (local $filled i32)
     (local.set $len (call $string_len (local.get $ptr)))
-    (local.set $total_len (i32.mul (local.get $len) (i32.trunc_f64_s (local.get $count))))
-    (call $alloc (i32.add (local.get $total_len) (i32.const 1)))
+    (local.set $times (i32.trunc_f64_s (local.get $count)))
+    (local.get $times) (i32.const 0) (i32.lt_s) (if (then (local.set $times (i32.const 0))))
+    (local.set $total_len (i32.mul (local.get $len) (local.get $times)))
+    (call $string_alloc (local.get $total_len))
     (local.set $new_ptr)
-    (local.set $i (i32.const 0))
-    (loop $repeat_loop
-      (local.get $i) (i32.trunc_f64_s (local.get $count)) (i32.lt_s)
-      (if (then
-        (local.set $j (i32.const 0))
-        (loop $copy_char_loop
-          (local.get $j) (local.get $len) (i32.lt_s)
-          (if (then
-            (i32.store8
-              (i32.add (local.get $new_ptr) (i32.add (i32.mul (local.get $i) (local.get $len)) (local.get $j)))
-              (i32.load8_u (i32.add (local.get $ptr) (local.get $j)))
-            )
-            (local.set $j (i32.add (local.get $j) (i32.const 1)))
-            (br $copy_char_loop)
-          ))
-        )
-        (local.set $i (i32.add (local.get $i) (i32.const 1)))
-        (br $repeat_loop)
-      ))
+    (local.get $total_len) (i32.eqz) (if (then (local.get $new_ptr) (return)))
+
+    ;; Doubling: copy the source once, then copy the already filled prefix onto itself
+    (memory.copy (local.get $new_ptr) (local.get $ptr) (local.get $len))
+    (local.set $filled (local.get $len))
+    (block $done
+      (loop $double_loop
+        (i32.shl (local.get $filled) (i32.const 1)) (local.get $total_len) (i32.gt_u) (br_if $done)
+        (memory.copy (i32.add (local.get $new_ptr) (local.get $filled)) (local.get $new_ptr) (local.get $filled))
+        (local.set $filled (i32.shl (local.get $filled) (i32.const 1)))
+        (br $double_loop)
+      )
+    )
+    (memory.copy
+      (i32.add (local.get $new_ptr) (local.get $filled))
+      (local.get $new_ptr)
+      (i32.sub (local.get $total_len) (local.get $filled))
     )
-    (i32.store8 (i32.add (local.get $new_ptr) (local.get $total_len)) (i32.const 0))
     (local.get $new_ptr)
   )
         
 
-  ;; For lists: header layout [len:i32][elem_size:i32][capacity:i32][data...]
+  ;; For lists: header layout [len:i32][elem_size:i32][capacity:i32][head:i32][data...]
+  ;; Element i lives in slot head + i; dequeue only advances head
+  (func $list_alloc (param $size i32) (result i32)
+    (local $ptr i32)
+    (local.set $ptr (call $alloc (local.get $size)))
+    (i32.store (i32.sub (local.get $ptr) (i32.const 4)) (i32.const 2))
+    (local.get $ptr)
+  )
+        
+
   (func $len_list (param $ptr i32) (result f64)
     (f64.convert_i32_u (i32.load (local.get $ptr)))
   )
         
 
   (func $dequeue_op (param $list_ptr i32) (result f64)
-    (local $len i32) (local $elem_size i32) (local $first_elem_val f64)
+    (local $len i32) (local $head i32) (local $first_elem_val f64)
     (local.set $len (i32.load (local.get $list_ptr)))
-    (local.set $elem_size (i32.load (i32.add (local.get $list_ptr) (i32.const 4))))
     (local.get $len) (i32.const 0) (i32.eq) (if (then (f64.const 0) (return)))
+    (local.set $head (i32.load offset=12 (local.get $list_ptr)))
 
-    (local.set $first_elem_val (f64.load (i32.add (local.get $list_ptr) (i32.const 12))))
-
-    (local $new_start i32) (local $old_start i32) (local $num_bytes_to_move i32)
-    (local.set $new_start (i32.add (local.get $list_ptr) (i32.const 12)))
-    (local.set $old_start (i32.add (local.get $new_start) (local.get $elem_size)))
-    (local.set $num_bytes_to_move (i32.mul (i32.sub (local.get $len) (i32.const 1)) (local.get $elem_size)))
+    (i32.load offset=4 (local.get $list_ptr)) (i32.const 4) (i32.eq)
+    (if
+      (then (local.set $first_elem_val (f64.convert_i32_u
+        (i32.load offset=16 (i32.add (local.get $list_ptr) (i32.shl (local.get $head) (i32.const 2)))))))
+      (else (local.set $first_elem_val
+        (f64.load offset=16 (i32.add (local.get $list_ptr) (i32.shl (local.get $head) (i32.const 3))))))
+    )
 
-    (memory.copy (local.get $new_start) (local.get $old_start) (local.get $num_bytes_to_move))
-    (i32.store (local.get $list_ptr) (i32.sub (local.get $len) (i32.const 1)))
+    (local.set $len (i32.sub (local.get $len) (i32.const 1)))
+    (i32.store (local.get $list_ptr) (local.get $len))
+    ;; An emptied queue starts again from slot 0
+    (i32.store offset=12 (local.get $list_ptr)
+      (select (i32.add (local.get $head) (i32.const 1)) (i32.const 0) (local.get $len)))
     (local.get $first_elem_val)
   )
         
 
   (func $list_append (param $list_ptr i32) (param $value f64) (result i32)
-    (local $len i32) (local $elem_size i32) (local $capacity i32) (local $new_list_ptr i32)
+    (local $len i32) (local $elem_size i32) (local $capacity i32) (local $head i32) (local $new_list_ptr i32)
+    (local $slot i32)
     (local.set $len (i32.load (local.get $list_ptr)))
-    (local.set $elem_size (i32.load (i32.add (local.get $list_ptr) (i32.const 4))))
-    (local.set $capacity (i32.load (i32.add (local.get $list_ptr) (i32.const 8))))
+    (local.set $elem_size (i32.load offset=4 (local.get $list_ptr)))
+    (local.set $capacity (i32.load offset=8 (local.get $list_ptr)))
+    (local.set $head (i32.load offset=12 (local.get $list_ptr)))
 
-    (local.get $len) (local.get $capacity) (i32.ge_s)
+    (i32.add (local.get $head) (local.get $len)) (local.get $capacity) (i32.ge_s)
     (if (then
-      (local.get $capacity) (i32.const 0) (i32.eq) (if (then (local.set $capacity (i32.const 4))))
-      (local.set $capacity (i32.mul (local.get $capacity) (i32.const 2)))
+      (i32.mul (local.get $head) (i32.const 2)) (local.get $capacity) (i32.ge_s)
+      (if (then
+        ;; At least half of the buffer was dequeued: compact in place, amortized O(1)
+        (memory.copy
+          (i32.add (local.get $list_ptr) (i32.const 16))
+          (i32.add (i32.add (local.get $list_ptr) (i32.const 16)) (i32.mul (local.get $head) (local.get $elem_size)))
+          (i32.mul (local.get $len) (local.get $elem_size))
+        )
+      ) (else
+        (local.get $capacity) (i32.const 0) (i32.eq) (if (then (local.set $capacity (i32.const 4))))
+        (local.set $capacity (i32.mul (local.get $capacity) (i32.const 2)))
 
-      (call $alloc (i32.add (i32.const 12) (i32.mul (local.get $capacity) (local.get $elem_size))))
-      (local.set $new_list_ptr)
+        (call $list_alloc (i32.add (i32.const 16) (i32.mul (local.get $capacity) (local.get $elem_size))))
+        (local.set $new_list_ptr)
 
-      (memory.copy
-        (local.get $new_list_ptr)
-        (local.get $list_ptr)
-        (i32.add (i32.const 12) (i32.mul (local.get $len) (local.get $elem_size)))
-      )
-      (i32.store (i32.add (local.get $new_list_ptr) (i32.const 8)) (local.get $capacity))
-      (local.set $list_ptr (local.get $new_list_ptr))
+        ;; Only the live elements move; the new buffer starts at slot 0
+        (memory.copy
+          (i32.add (local.get $new_list_ptr) (i32.const 16))
+          (i32.add (i32.add (local.get $list_ptr) (i32.const 16)) (i32.mul (local.get $head) (local.get $elem_size)))
+          (i32.mul (local.get $len) (local.get $elem_size))
+        )
+        ;; The old buffer is not freed: aliases, caller variables and enclosing lists may still
+        ;; point to it. It is reclaimed by the GC (--gc) once unreachable.
+        (i32.store offset=4 (local.get $new_list_ptr) (local.get $elem_size))
+        (i32.store offset=8 (local.get $new_list_ptr) (local.get $capacity))
+        (local.set $list_ptr (local.get $new_list_ptr))
+      ))
+      (local.set $head (i32.const 0))
+      (i32.store offset=12 (local.get $list_ptr) (i32.const 0))
     ))
 
-    (local.get $list_ptr)
-    (i32.const 12) (i32.add)
-    (local.get $len) (local.get $elem_size) (i32.mul) (i32.add)
-    (local.get $value)
-    (f64.store)
+    (local.set $slot
+      (i32.add (local.get $list_ptr) (i32.mul (i32.add (local.get $head) (local.get $len)) (local.get $elem_size))))
+    (local.get $elem_size) (i32.const 4) (i32.eq)
+    (if
+      (then (i32.store offset=16 (local.get $slot) (i32.trunc_f64_u (local.get $value))))
+      (else (f64.store offset=16 (local.get $slot) (local.get $value)))
+    )
     (i32.store (local.get $list_ptr) (i32.add (local.get $len) (i32.const 1)))
     (local.get $list_ptr)
   )
         
-  (table (export "table") 10 funcref)
-  (global $next_table_idx (mut i32) (i32.const 0))
+
+  ;; Preallocation hint: make room for $count more elements after the current tail
+  (func $list_reserve (param $list_ptr i32) (param $count f64) (result i32)
+    (local $len i32) (local $elem_size i32) (local $capacity i32) (local $needed i32) (local $new_list_ptr i32)
+    (local.get $list_ptr) (i32.eqz) (if (then (local.get $list_ptr) (return)))
+    (local.get $count) (f64.const 1.0) (f64.lt) (if (then (local.get $list_ptr) (return)))
+    ;; Hints beyond 2^24 elements are ignored: growth by doubling handles them
+    (local.get $count) (f64.const 16777216.0) (f64.gt) (if (then (local.get $list_ptr) (return)))
+    (local.set $len (i32.load (local.get $list_ptr)))
+    (local.set $elem_size (i32.load offset=4 (local.get $list_ptr)))
+    (local.set $capacity (i32.load offset=8 (local.get $list_ptr)))
+    (local.set $needed (i32.add (local.get $len) (i32.trunc_f64_u (local.get $count))))
+    (i32.add (i32.load offset=12 (local.get $list_ptr)) (local.get $needed)) (local.get $capacity) (i32.le_u)
+    (if (then (local.get $list_ptr) (return)))
+
+    (call $list_alloc (i32.add (i32.const 16) (i32.mul (local.get $needed) (local.get $elem_size))))
+    (local.set $new_list_ptr)
+    (memory.copy
+      (i32.add (local.get $new_list_ptr) (i32.const 16))
+      (i32.add (i32.add (local.get $list_ptr) (i32.const 16))
+        (i32.mul (i32.load offset=12 (local.get $list_ptr)) (local.get $elem_size)))
+      (i32.mul (local.get $len) (local.get $elem_size))
+    )
+    ;; As in $list_append, the old buffer may still be referenced and is left to the GC
+    (i32.store (local.get $new_list_ptr) (local.get $len))
+    (i32.store offset=4 (local.get $new_list_ptr) (local.get $elem_size))
+    (i32.store offset=8 (local.get $new_list_ptr) (local.get $needed))
+    (i32.store offset=12 (local.get $new_list_ptr) (i32.const 0))
+    (local.get $new_list_ptr)
+  )
+        
+
+  ;; Heap statistics for the host
+  (func (export "heap_live_bytes") (result i32) (global.get $heap_live_bytes))
+  (func (export "heap_size_bytes") (result i32) (i32.sub (global.get $next_mem_addr) (global.get $heap_base)))
+  (func (export "gc_collections") (result i32) (global.get $gc_collections))
+        
+  (table (export "table") 15 funcref)
   (global $prefix (mut i32) (i32.const 0))
   (global $base_value (mut f64) (f64.const 0.0))
   (global $greeting_calculator (mut i32) (i32.const 0))
@@ -239,53 +343,66 @@
   (global $adder_factory (mut i32) (i32.const 0))
   (global $add_five (mut i32) (i32.const 0))
   (global $add_ten (mut i32) (i32.const 0))
-  (global $i (mut f64) (f64.const 0.0))
   (global $current_op (mut f64) (f64.const 0.0))
   (global $transform (mut f64) (f64.const 0.0))
   (func $lambda_1 (param $name i32) (result f64)
+    (local $greeting f64)
+    (local $new_value f64)
+    (local $write_arg_0_f64 f64)
+    (local $write_arg_1_i32 i32)
+    (local $write_arg_2_f64 f64)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (global.get $prefix)
     (local.get $name)
     (f64.convert_i32_u)
+    (local.set $tmp_f64_1)
+    (f64.convert_i32_u)
+    (local.get $tmp_f64_1)
     (call $string_concat)
     (local.set $greeting)
     (global.get $base_value)
     (local.get $name)
+    (f64.convert_i32_u)
     (i32.trunc_f64_s)
     (call $len_list)
     (f64.add)
     (local.set $new_value)
     (local.get $greeting)
-    (i32.const 8)
+    (i32.const 16)
     (local.get $new_value)
+    (local.set $write_arg_2_f64)
+    (local.set $write_arg_1_i32)
+    (local.set $write_arg_0_f64)
+    (local.get $write_arg_0_f64)
     (drop)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.get $write_arg_1_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_2_f64)
     (call $write_num)
     (local.get $new_value)
     (return)
     (f64.const 0.0)
     (return)
   )
-  (elem (global.get $next_table_idx) (ref.func $lambda_1))
-  (global.set $next_table_idx (i32.add (global.get $next_table_idx) (i32.const 1)))
+  (elem (i32.const 1) func $lambda_1)
   (func $lambda_2 (param $x f64) (result f64)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (local.get $x)
@@ -293,11 +410,11 @@
     (f64.mul)
     (return)
   )
-  (elem (global.get $next_table_idx) (ref.func $lambda_2))
-  (global.set $next_table_idx (i32.add (global.get $next_table_idx) (i32.const 1)))
+  (elem (i32.const 2) func $lambda_2)
   (func $lambda_3 (param $x f64) (result f64)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (local.get $x)
@@ -305,11 +422,12 @@
     (f64.add)
     (return)
   )
-  (elem (global.get $next_table_idx) (ref.func $lambda_3))
-  (global.set $next_table_idx (i32.add (global.get $next_table_idx) (i32.const 1)))
+  (elem (i32.const 3) func $lambda_3)
   (func $lambda_4 (param $x f64) (result f64)
+    (local $factor f64)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (local.get $x)
@@ -317,11 +435,11 @@
     (f64.mul)
     (return)
   )
-  (elem (global.get $next_table_idx) (ref.func $lambda_4))
-  (global.set $next_table_idx (i32.add (global.get $next_table_idx) (i32.const 1)))
+  (elem (i32.const 4) func $lambda_4)
   (func $lambda_5 (param $x f64) (result f64)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (local.get $x)
@@ -329,11 +447,11 @@
     (f64.mul)
     (return)
   )
-  (elem (global.get $next_table_idx) (ref.func $lambda_5))
-  (global.set $next_table_idx (i32.add (global.get $next_table_idx) (i32.const 1)))
+  (elem (i32.const 5) func $lambda_5)
   (func $lambda_6 (param $x f64) (result f64)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (local.get $x)
@@ -343,21 +461,21 @@
     (f64.mul)
     (return)
   )
-  (elem (global.get $next_table_idx) (ref.func $lambda_6))
-  (global.set $next_table_idx (i32.add (global.get $next_table_idx) (i32.const 1)))
+  (elem (i32.const 6) func $lambda_6)
   (func $lambda_7 (param $x f64) (result f64)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (local.get $x)
     (return)
   )
-  (elem (global.get $next_table_idx) (ref.func $lambda_7))
-  (global.set $next_table_idx (i32.add (global.get $next_table_idx) (i32.const 1)))
+  (elem (i32.const 7) func $lambda_7)
   (func $lambda_8 (param $x f64) (result f64)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (local.get $x)
@@ -365,48 +483,50 @@
     (f64.add)
     (return)
   )
-  (elem (global.get $next_table_idx) (ref.func $lambda_8))
-  (global.set $next_table_idx (i32.add (global.get $next_table_idx) (i32.const 1)))
+  (elem (i32.const 8) func $lambda_8)
   (func $lambda_9 (param $x f64) 
+    (local $temp f64)
+    (local $i f64)
+    (local $repeat_count f64)
+    (local $initial_op i32)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (local.get $x)
     (local.get $initial_op)
-    (call_indirect (type $func_type_0))
+    (call_indirect (type $func_type_f64_to_f64))
     (local.set $temp)
     (local.get $repeat_count)
     (local.set $i)
-    (block $while_block_3
-      (loop $while_loop_4
+    (block $while_block_7
+      (loop $while_loop_8
     (local.get $i)
     (f64.const 1.0)
     (f64.gt)
-    (f64.convert_i32_u)
+        (i32.eqz)
+        (br_if $while_block_7)
     (local.get $temp)
     (local.get $initial_op)
-    (call_indirect (type $func_type_0))
+    (call_indirect (type $func_type_f64_to_f64))
     (local.set $temp)
     (local.get $i)
     (f64.const 1.0)
     (f64.sub)
     (local.set $i)
-        (f64.const 0.0)
-        (f64.eq)
-        (br_if $while_block_3)
-        (br $while_loop_4)
+        (br $while_loop_8)
       )
     )
     (local.get $temp)
     (return)
     (return)
   )
-  (elem (global.get $next_table_idx) (ref.func $lambda_9))
-  (global.set $next_table_idx (i32.add (global.get $next_table_idx) (i32.const 1)))
+  (elem (i32.const 9) func $lambda_9)
   (func $lambda_10 (param $x f64) (result f64)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (local.get $x)
@@ -414,11 +534,11 @@
     (f64.add)
     (return)
   )
-  (elem (global.get $next_table_idx) (ref.func $lambda_10))
-  (global.set $next_table_idx (i32.add (global.get $next_table_idx) (i32.const 1)))
+  (elem (i32.const 10) func $lambda_10)
   (func $lambda_11 (param $x f64) (result f64)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (local.get $x)
@@ -426,11 +546,11 @@
     (f64.mul)
     (return)
   )
-  (elem (global.get $next_table_idx) (ref.func $lambda_11))
-  (global.set $next_table_idx (i32.add (global.get $next_table_idx) (i32.const 1)))
+  (elem (i32.const 11) func $lambda_11)
   (func $lambda_12 (param $x f64) (result f64)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (local.get $x)
@@ -438,16 +558,12 @@
     (f64.mul)
     (return)
   )
-  (elem (global.get $next_table_idx) (ref.func $lambda_12))
-  (global.set $next_table_idx (i32.add (global.get $next_table_idx) (i32.const 1)))
-  (func $lambda_13 (param $base f64) (result i32)
-    (local $tmp_i32_0 i32)
-    (local $tmp_i32_1 i32)
-    (local $tmp_f64_0 f64)
-    (local $tmp_f64_1 f64)
+  (elem (i32.const 12) func $lambda_12)
   (func $lambda_14 (param $x f64) (result f64)
+    (local $base f64)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (local.get $x)
@@ -455,139 +571,176 @@
     (f64.add)
     (return)
   )
-  (elem (global.get $next_table_idx) (ref.func $lambda_14))
-  (global.set $next_table_idx (i32.add (global.get $next_table_idx) (i32.const 1)))
+  (elem (i32.const 14) func $lambda_14)
+  (func $lambda_13 (param $base f64) (result i32)
+    (local $x f64)
+    (local $tmp_i32_0 i32)
+    (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
+    (local $tmp_f64_0 f64)
+    (local $tmp_f64_1 f64)
     (i32.const 14)
     (f64.convert_i32_u)
-    (f64.convert_i32_u)
     (return)
     (i32.const 0)
     (return)
   )
-  (elem (global.get $next_table_idx) (ref.func $lambda_13))
-  (global.set $next_table_idx (i32.add (global.get $next_table_idx) (i32.const 1)))
-    (i32.const 13)
+  (elem (i32.const 13) func $lambda_13)
+  (func $create_multiplier  (param $factor f64) (result i32)
+    (local $x f64)
+    (local $tmp_i32_0 i32)
+    (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
+    (local $tmp_f64_0 f64)
+    (local $tmp_f64_1 f64)
+    (i32.const 4)
     (f64.convert_i32_u)
-    (global.set $adder_factory)
-    (f64.const 5.0)
-    (global.get $adder_factory)
-    (call_indirect (type $func_type_-258221296089122869))
-    (global.set $add_five)
-    (f64.const 10.0)
-    (global.get $adder_factory)
-    (call_indirect (type $func_type_-258221296089122869))
-    (global.set $add_ten)
-    (i32.const 302)
-    (f64.const 7.0)
-    (global.get $add_five)
-    (call_indirect (type $func_type_0))
+    (return)
+  )
+  (func $get_operation  (param $op_name i32) 
+    (local $x f64)
+    (local $switch_subject_4 f64)
+    (local $tmp_i32_0 i32)
+    (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
+    (local $tmp_f64_0 f64)
+    (local $tmp_f64_1 f64)
+    (local.get $op_name)
     (f64.convert_i32_u)
-    (i32.trunc_f64_s)
-    (local.set $tmp_i32_0)
-    (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
-    (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
-      (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
-        (br $print_char_loop)
-      ))
+    (local.set $switch_subject_4)
+    (block $switch_end_4
+    (block $switch_next_5
+    (i32.const 272)
+    (f64.convert_i32_u)
+    (local.get $switch_subject_4)
+    (f64.ne)
+    (br_if $switch_next_5)
+    (i32.const 5)
+    (f64.convert_i32_u)
+    (f64.convert_i32_u)
+    (return)
+    (br $switch_end_4)
     )
-    (drop)
-    (i32.const 318)
-    (f64.const 7.0)
-    (global.get $add_ten)
-    (call_indirect (type $func_type_0))
+    (block $switch_next_6
+    (i32.const 284)
     (f64.convert_i32_u)
-    (i32.trunc_f64_s)
-    (local.set $tmp_i32_0)
-    (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
-    (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
-      (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
-        (br $print_char_loop)
-      ))
+    (local.get $switch_subject_4)
+    (f64.ne)
+    (br_if $switch_next_6)
+    (i32.const 6)
+    (f64.convert_i32_u)
+    (f64.convert_i32_u)
+    (return)
+    (br $switch_end_4)
     )
-    (drop)
+    (i32.const 7)
+    (f64.convert_i32_u)
+    (f64.convert_i32_u)
+    (return)
+    )
+  )
+  (func $create_advanced_op  (param $initial_op i32) (param $repeat_count f64) (result i32)
+    (local $temp f64)
+    (local $x f64)
+    (local $i f64)
+    (local $tmp_i32_0 i32)
+    (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
+    (local $tmp_f64_0 f64)
+    (local $tmp_f64_1 f64)
+    (i32.const 9)
+    (f64.convert_i32_u)
     (return)
   )
   (func $main
+    (local $write_arg_0_i32 i32)
+    (local $write_arg_1_f64 f64)
+    (local $write_arg_2_i32 i32)
+    (local $write_arg_3_f64 f64)
+    (local $i f64)
+    (local $for_counter_3 i32)
+    (local $for_end_3 i32)
+    (local $for_counter_11 i32)
+    (local $for_end_11 i32)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
-    (i32.const 0)
+    (i32.const 4)
     (global.set $prefix)
     (f64.const 100.0)
     (global.set $base_value)
     (i32.const 1)
     (f64.convert_i32_u)
     (global.set $greeting_calculator)
-    (i32.const 29)
+    (i32.const 40)
     (global.get $greeting_calculator)
-    (call_indirect (type $func_type_2010637364242144482))
+    (call_indirect (type $func_type_i32_to_f64))
     (global.set $result_1)
-    (i32.const 35)
+    (i32.const 52)
     (global.get $greeting_calculator)
-    (call_indirect (type $func_type_2010637364242144482))
+    (call_indirect (type $func_type_i32_to_f64))
     (global.set $result_2)
-    (i32.const 39)
+    (i32.const 60)
     (global.get $result_1)
-    (i32.const 69)
+    (i32.const 96)
     (global.get $result_2)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_3_f64)
+    (local.set $write_arg_2_i32)
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (call $write_num)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.get $write_arg_2_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_3_f64)
     (call $write_num)
-    (i32.const 72)
+    (i32.const 104)
     (global.set $prefix)
-    (i32.const 84)
+    (i32.const 120)
     (global.get $greeting_calculator)
-    (call_indirect (type $func_type_2010637364242144482))
+    (call_indirect (type $func_type_i32_to_f64))
     (global.set $result_3)
-    (i32.const 92)
+    (i32.const 132)
     (global.get $result_3)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (call $write_num)
     (i32.const 2)
     (f64.convert_i32_u)
@@ -597,8 +750,8 @@
     (global.set $incrementer)
     (global.get $doubler)
     (global.get $incrementer)
-    (i32.const 44)
-    (call $alloc)
+    (i32.const 32)
+    (call $list_alloc)
     (local.set $tmp_i32_0)
     (local.get $tmp_i32_0)
     (i32.const 2)
@@ -606,7 +759,7 @@
     (local.get $tmp_i32_0)
     (i32.const 4)
     (i32.add)
-    (i32.const 8)
+    (i32.const 4)
     (i32.store)
     (local.get $tmp_i32_0)
     (i32.const 8)
@@ -614,268 +767,250 @@
     (i32.const 4)
     (i32.store)
     (local.get $tmp_i32_0)
-    (i32.const 12)
-    (i32.add)
-    (f64.convert_i32_u)
-    (f64.store)
+    (i32.const 0)
+    (i32.store offset=12)
+    (local.set $tmp_i32_1)
     (local.get $tmp_i32_0)
-    (i32.const 20)
-    (i32.add)
-    (f64.convert_i32_u)
-    (f64.store)
+    (local.get $tmp_i32_1)
+    (i32.store offset=20)
+    (local.set $tmp_i32_1)
+    (local.get $tmp_i32_0)
+    (local.get $tmp_i32_1)
+    (i32.store offset=16)
     (local.get $tmp_i32_0)
     (global.set $operations)
     (f64.const 5.0)
     (global.set $start_value)
-    (local.set $tmp_f64_0)
-    (local.set $i)
-    (block $for_block_1
-      (loop $for_loop_2
-        (local.get $i)
-        (local.get $tmp_f64_0)
-        (f64.gt)
-        (br_if $for_block_1)
-    (f64.const 0.0)
+    (i32.const 0)
     (global.get $operations)
     (f64.convert_i32_u)
     (i32.trunc_f64_s)
     (call $len_list)
+    (f64.floor)
+    (f64.const 2147483646.0)
+    (f64.min)
+    (i32.trunc_sat_f64_s)
+    (local.set $for_end_3)
+    (local.set $for_counter_3)
+    (block $for_block_1
+      (loop $for_loop_2
+        (local.get $for_counter_3)
+        (local.get $for_end_3)
+        (i32.gt_s)
+        (br_if $for_block_1)
+        (block $for_continue_3
     (global.get $operations)
-    (global.get $i)
-    (local.set $tmp_f64_0)
+    (local.get $for_counter_3)
+    (local.set $tmp_i32_1)
     (local.set $tmp_i32_0)
     (local.get $tmp_i32_0)
-    (i32.const 12)
+    (local.get $tmp_i32_0)
+    (i32.load offset=12)
+    (local.get $tmp_i32_1)
     (i32.add)
-    (local.get $tmp_f64_0)
-    (i32.trunc_f64_s)
-    (i32.const 8)
-    (i32.mul)
+    (i32.const 2)
+    (i32.shl)
     (i32.add)
-    (f64.load)
+    (i32.load offset=16)
+    (f64.convert_i32_u)
     (global.set $current_op)
     (global.get $start_value)
     (global.get $current_op)
     (i32.trunc_f64_s)
     (call_indirect (type $func_type_fallback_1))
     (global.set $start_value)
-    (i32.const 122)
-    (global.get $i)
-    (i32.const 139)
+    (i32.const 168)
+    (local.get $for_counter_3)
+    (f64.convert_i32_s)
+    (i32.const 188)
     (global.get $start_value)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_3_f64)
+    (local.set $write_arg_2_i32)
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (call $write_num)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.get $write_arg_2_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_3_f64)
     (call $write_num)
-        (local.get $i)
-        (f64.const 1.0)
-        (f64.add)
-        (local.set $i)
+        )
+        (local.get $for_counter_3)
+        (i32.const 1)
+        (i32.add)
+        (local.set $for_counter_3)
         (br $for_loop_2)
       )
     )
+    (local.get $for_counter_3)
+    (f64.convert_i32_s)
+    (local.set $i)
     (f64.const 10.0)
     (global.get $incrementer)
-    (call_indirect (type $func_type_3567405016737577371))
+    (call_indirect (type $func_type_f64_to_f64))
     (global.set $temp_result)
     (global.get $temp_result)
     (global.get $doubler)
-    (call_indirect (type $func_type_2427529893760197770))
+    (call_indirect (type $func_type_f64_to_f64))
     (global.set $complex_result)
-    (i32.const 142)
+    (i32.const 196)
     (global.get $complex_result)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (drop)
-  (func $create_multiplier  (param $factor f64) 
-    (local $x f64)
-    (local $tmp_i32_0 i32)
-    (local $tmp_i32_1 i32)
-    (local $tmp_f64_0 f64)
-    (local $tmp_f64_1 f64)
-    (i32.const 4)
-    (f64.convert_i32_u)
-    (f64.convert_i32_u)
-    (return)
-  )
     (f64.const 10.0)
     (call $create_multiplier)
     (global.set $times_ten)
     (f64.const 100.0)
     (call $create_multiplier)
     (global.set $times_hundred)
-    (i32.const 177)
+    (i32.const 236)
     (f64.const 5.0)
     (global.get $times_ten)
-    (call_indirect (type $func_type_3567405016737577371))
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (call_indirect (type $func_type_f64_to_f64))
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (drop)
-    (i32.const 189)
+    (i32.const 252)
     (f64.const 5.0)
     (global.get $times_hundred)
-    (call_indirect (type $func_type_3567405016737577371))
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (call_indirect (type $func_type_f64_to_f64))
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (drop)
-  (func $get_operation  (param $op_name i32) 
-    (local $x f64)
-    (local $tmp_i32_0 i32)
-    (local $tmp_i32_1 i32)
-    (local $tmp_f64_0 f64)
-    (local $tmp_f64_1 f64)
-    (local.get $op_name)
-    (i32.const 205)
-    (i32.const 5)
-    (f64.convert_i32_u)
-    (f64.convert_i32_u)
-    (return)
-    (i32.const 212)
-    (i32.const 6)
-    (f64.convert_i32_u)
-    (f64.convert_i32_u)
-    (return)
-    (i32.const 7)
-    (f64.convert_i32_u)
-    (f64.convert_i32_u)
-    (return)
-  )
-    (i32.const 217)
+    (i32.const 292)
     (call $get_operation)
     (global.set $squarer)
-    (i32.const 224)
+    (i32.const 304)
     (call $get_operation)
     (global.set $cuber)
-    (i32.const 229)
+    (i32.const 312)
     (f64.const 4.0)
     (global.get $squarer)
-    (call_indirect (type $func_type_3567405016737577371))
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (call_indirect (type $func_type_f64_to_f64))
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (drop)
-    (i32.const 242)
+    (i32.const 328)
     (f64.const 3.0)
     (global.get $cuber)
-    (call_indirect (type $func_type_3567405016737577371))
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (call_indirect (type $func_type_f64_to_f64))
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (drop)
     (i32.const 8)
     (f64.convert_i32_u)
     (global.set $simple_op)
-  (func $create_advanced_op  (param $initial_op i32) (param $repeat_count f64) 
-    (local $temp f64)
-    (local $x f64)
-    (local $i f64)
-    (local $tmp_i32_0 i32)
-    (local $tmp_i32_1 i32)
-    (local $tmp_f64_0 f64)
-    (local $tmp_f64_1 f64)
-    (i32.const 9)
-    (f64.convert_i32_u)
-    (f64.convert_i32_u)
-    (return)
-  )
     (global.get $simple_op)
     (f64.const 3.0)
     (call $create_advanced_op)
     (global.set $triple_increment)
-    (i32.const 253)
+    (i32.const 344)
     (f64.const 5.0)
     (global.get $triple_increment)
-    (call_indirect (type $func_type_3793797873057617614))
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (call_indirect (type $func_type_f64_to_void))
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (drop)
     (i32.const 10)
     (f64.convert_i32_u)
@@ -883,8 +1018,8 @@
     (f64.convert_i32_u)
     (i32.const 12)
     (f64.convert_i32_u)
-    (i32.const 44)
-    (call $alloc)
+    (i32.const 32)
+    (call $list_alloc)
     (local.set $tmp_i32_0)
     (local.get $tmp_i32_0)
     (i32.const 3)
@@ -892,7 +1027,7 @@
     (local.get $tmp_i32_0)
     (i32.const 4)
     (i32.add)
-    (i32.const 8)
+    (i32.const 4)
     (i32.store)
     (local.get $tmp_i32_0)
     (i32.const 8)
@@ -900,94 +1035,162 @@
     (i32.const 4)
     (i32.store)
     (local.get $tmp_i32_0)
-    (i32.const 12)
-    (i32.add)
-    (f64.convert_i32_u)
-    (f64.store)
+    (i32.const 0)
+    (i32.store offset=12)
+    (local.set $tmp_i32_1)
     (local.get $tmp_i32_0)
-    (i32.const 20)
-    (i32.add)
-    (f64.convert_i32_u)
-    (f64.store)
+    (local.get $tmp_i32_1)
+    (i32.store offset=24)
+    (local.set $tmp_i32_1)
     (local.get $tmp_i32_0)
-    (i32.const 28)
-    (i32.add)
-    (f64.convert_i32_u)
-    (f64.store)
+    (local.get $tmp_i32_1)
+    (i32.store offset=20)
+    (local.set $tmp_i32_1)
+    (local.get $tmp_i32_0)
+    (local.get $tmp_i32_1)
+    (i32.store offset=16)
     (local.get $tmp_i32_0)
     (global.set $transformations)
     (f64.const 10.0)
     (global.set $value)
-    (local.set $tmp_f64_0)
-    (local.set $i)
-    (block $for_block_5
-      (loop $for_loop_6
-        (local.get $i)
-        (local.get $tmp_f64_0)
-        (f64.gt)
-        (br_if $for_block_5)
-    (f64.const 0.0)
+    (i32.const 0)
     (global.get $transformations)
     (f64.convert_i32_u)
     (i32.trunc_f64_s)
     (call $len_list)
+    (f64.floor)
+    (f64.const 2147483646.0)
+    (f64.min)
+    (i32.trunc_sat_f64_s)
+    (local.set $for_end_11)
+    (local.set $for_counter_11)
+    (block $for_block_9
+      (loop $for_loop_10
+        (local.get $for_counter_11)
+        (local.get $for_end_11)
+        (i32.gt_s)
+        (br_if $for_block_9)
+        (block $for_continue_11
     (global.get $transformations)
-    (global.get $i)
-    (local.set $tmp_f64_0)
+    (local.get $for_counter_11)
+    (local.set $tmp_i32_1)
     (local.set $tmp_i32_0)
     (local.get $tmp_i32_0)
-    (i32.const 12)
+    (local.get $tmp_i32_0)
+    (i32.load offset=12)
+    (local.get $tmp_i32_1)
     (i32.add)
-    (local.get $tmp_f64_0)
-    (i32.trunc_f64_s)
-    (i32.const 8)
-    (i32.mul)
+    (i32.const 2)
+    (i32.shl)
     (i32.add)
-    (f64.load)
+    (i32.load offset=16)
+    (f64.convert_i32_u)
     (global.set $transform)
     (global.get $value)
     (global.get $transform)
     (i32.trunc_f64_s)
     (call_indirect (type $func_type_fallback_1))
     (global.set $value)
-    (i32.const 277)
-    (global.get $i)
-    (i32.const 299)
+    (i32.const 372)
+    (local.get $for_counter_11)
+    (f64.convert_i32_s)
+    (i32.const 400)
     (global.get $value)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_3_f64)
+    (local.set $write_arg_2_i32)
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (call $write_num)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.get $write_arg_2_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_3_f64)
     (call $write_num)
-        (local.get $i)
-        (f64.const 1.0)
-        (f64.add)
-        (local.set $i)
-        (br $for_loop_6)
+        )
+        (local.get $for_counter_11)
+        (i32.const 1)
+        (i32.add)
+        (local.set $for_counter_11)
+        (br $for_loop_10)
       )
     )
-(export "run" (func $main))
+    (local.get $for_counter_11)
+    (f64.convert_i32_s)
+    (local.set $i)
+    (i32.const 13)
+    (f64.convert_i32_u)
+    (global.set $adder_factory)
+    (f64.const 5.0)
+    (global.get $adder_factory)
+    (call_indirect (type $func_type_f64_to_i32))
+    (global.set $add_five)
+    (f64.const 10.0)
+    (global.get $adder_factory)
+    (call_indirect (type $func_type_f64_to_i32))
+    (global.set $add_ten)
+    (i32.const 408)
+    (f64.const 7.0)
+    (global.get $add_five)
+    (call_indirect (type $func_type_f64_to_f64))
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
+    (local.set $tmp_i32_0)
+    (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
+    (local.set $tmp_i32_2 (i32.const 0))
+    (loop $print_char_loop
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
+      (if (then
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
+        (br $print_char_loop)
+      ))
+    )
+    (local.get $write_arg_1_f64)
+    (drop)
+    (i32.const 428)
+    (f64.const 7.0)
+    (global.get $add_ten)
+    (call_indirect (type $func_type_f64_to_f64))
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
+    (local.set $tmp_i32_0)
+    (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
+    (local.set $tmp_i32_2 (i32.const 0))
+    (loop $print_char_loop
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
+      (if (then
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
+        (br $print_char_loop)
+      ))
+    )
+    (local.get $write_arg_1_f64)
+    (drop)
+    (return)
+  )
+  (export "run" (func $main))
 )
\ No newline at end of file
@@ -0,0 +1,171 @@
+import contextlib
+import glob
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from compile_cache import CompileCache
+from compiler_session import CompilerSession, format_dfa_stats
+from syntax_analyzer import AnalysisResult, main_analyzer
+
+
+# --- Состояние рабочего процесса ---
+# Каждый процесс пула держит одну сессию компилятора (лексер и парсер). DFA, построенный
+# ANTLR при разборе первых файлов, остается в процессе и ускоряет разбор всех последующих.
+_worker_session: Optional[CompilerSession] = None
+_worker_cache: Optional[CompileCache] = None
+_worker_emit_wasm = False
+_worker_memory_pages = 1
+_worker_gc_enabled = False
+
+
+def _init_worker(cache_config: Optional[Tuple[str, int]] = None, prewarm_files: Optional[List[str]] = None,
+                 emit_wasm: bool = False, memory_pages: int = 1, gc_enabled: bool = False):
+    """
+    Инициализатор процесса пула: создает сессию компилятора для всех файлов этого процесса,
+    при необходимости прогревает ее на prewarm_files и открывает кэш компиляции
+    (cache_config - (каталог, лимит в байтах) или None). emit_wasm - собирать ли .wasm,
+    memory_pages - начальный размер памяти генерируемых модулей, gc_enabled - включить сборщик мусора.
+    """
+    global _worker_session, _worker_cache, _worker_emit_wasm, _worker_memory_pages, _worker_gc_enabled
+    _worker_emit_wasm = emit_wasm
+    _worker_memory_pages = memory_pages
+    _worker_gc_enabled = gc_enabled
+    _worker_session = CompilerSession()
+    if prewarm_files:
+        _worker_session.prewarm(prewarm_files)
+    _worker_cache = CompileCache(*cache_config) if cache_config else None
+
+
+class BatchFileResult:
+    """Результат компиляции одного файла в пакетном режиме (передается из рабочего процесса)."""
+
+    def __init__(self, analysis: AnalysisResult, log: str, elapsed: float, worker_pid: int,
+                 dfa_stats: Dict[str, int]):
+        self.analysis = analysis
+        self.log = log  # Весь вывод анализатора по этому файлу
+        self.elapsed = elapsed  # Время компиляции файла, секунды
+        self.worker_pid = worker_pid
+        self.dfa_stats = dfa_stats  # Состояние DFA процесса после компиляции файла
+
+
+class BatchResult:
+    """Сводка по пакету: результаты в порядке входных файлов и общее время."""
+
+    def __init__(self, files: List[BatchFileResult], wall_time: float, jobs: int):
+        self.files = files
+        self.wall_time = wall_time
+        self.jobs = jobs
+
+    @property
+    def all_ok(self) -> bool:
+        return all(f.analysis.ok for f in self.files)
+
+
+def _compile_one(file_path: str) -> BatchFileResult:
+    """Компилирует один файл в рабочем процессе, перехватывая весь его вывод."""
+    log_buffer = io.StringIO()
+    start = time.perf_counter()
+    # stdout и stderr собираются в один буфер, чтобы вывод разных файлов не перемешивался
+    with contextlib.redirect_stdout(log_buffer), contextlib.redirect_stderr(log_buffer):
+        analysis = main_analyzer(file_path, session=_worker_session, cache=_worker_cache,
+                                 emit_wasm=_worker_emit_wasm, memory_pages=_worker_memory_pages,
+                                 gc_enabled=_worker_gc_enabled)
+    elapsed = time.perf_counter() - start
+    return BatchFileResult(analysis, log_buffer.getvalue(), elapsed, os.getpid(), _worker_session.dfa_stats())
+
+
+def collect_source_files(patterns: List[str]) -> List[str]:
+    """
+    Раскрывает список файлов, каталогов и glob-шаблонов в упорядоченный список исходников.
+    Каталоги просматриваются рекурсивно (файлы *.txt), повторы отбрасываются.
+    """
+    files: List[str] = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, "**", "*.txt"), recursive=True)
+        elif os.path.isfile(pattern):
+            matches = [pattern]
+        else:
+            matches = glob.glob(pattern, recursive=True)
+
+        for path in sorted(matches):
+            abs_path = os.path.abspath(path)
+            if abs_path not in seen and os.path.isfile(abs_path):
+                seen.add(abs_path)
+                files.append(abs_path)
+    return files
+
+
+def compile_batch(file_paths: List[str], jobs: Optional[int] = None, verbose: bool = True,
+                  cache_config: Optional[Tuple[str, int]] = None,
+                  prewarm_files: Optional[List[str]] = None, emit_wasm: bool = False,
+                  memory_pages: int = 1, gc_enabled: bool = False) -> BatchResult:
+    """
+    Компилирует файлы пулом процессов. Результаты и диагностика выводятся
+    в порядке входного списка, независимо от порядка завершения в процессах.
+    cache_config - (каталог, лимит в байтах) для кэша компиляции или None без кэша,
+    prewarm_files - корпус для прогрева DFA в каждом процессе при запуске,
+    emit_wasm - собирать бинарный модуль .wasm для каждого успешно скомпилированного файла,
+    memory_pages - начальный размер памяти генерируемых модулей, страниц,
+    gc_enabled - включить в генерируемые модули сборщик мусора.
+    """
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    jobs = min(jobs, max(1, len(file_paths)))
+    results: List[BatchFileResult] = []
+
+    start = time.perf_counter()
+    if jobs == 1:
+        # Без пула: один процесс, тот же прогретый парсер
+        _init_worker(cache_config, prewarm_files, emit_wasm, memory_pages, gc_enabled)
+        for file_result in map(_compile_one, file_paths):
+            results.append(file_result)
+            if verbose:
+                sys.stdout.write(file_result.log)
+    else:
+        # Небольшие порции уменьшают накладные расходы на передачу задач между процессами
+        chunksize = max(1, len(file_paths) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(cache_config, prewarm_files, emit_wasm, memory_pages, gc_enabled)) as executor:
+            # executor.map сохраняет порядок входных файлов
+            for file_result in executor.map(_compile_one, file_paths, chunksize=chunksize):
+                results.append(file_result)
+                if verbose:
+                    sys.stdout.write(file_result.log)
+    wall_time = time.perf_counter() - start
+
+    batch = BatchResult(results, wall_time, jobs)
+    if verbose:
+        print_batch_report(batch)
+    return batch
+
+
+def print_batch_report(batch: BatchResult):
+    """Выводит сводку пакетной компиляции: ошибки, общее время и пропускную способность."""
+    total = len(batch.files)
+    failed = [f for f in batch.files if not f.analysis.ok]
+    cpu_time = sum(f.elapsed for f in batch.files)
+
+    print("======== Итоги пакетной компиляции ========")
+    for f in failed:
+        a = f.analysis
+        reason = "критическая ошибка" if a.failed else \
+            f"синтаксических ошибок: {len(a.syntax_errors)}, семантических ошибок: {len(a.semantic_errors)}"
+        print(f"  [{a.filename}] {reason}")
+    print(f"Файлов: {total}, успешно: {total - len(failed)}, с ошибками: {len(failed)}")
+    print(f"Процессов: {batch.jobs}")
+    # Последний снимок DFA каждого процесса: рост числа состояний означает рост памяти
+    last_stats: Dict[int, Dict[str, int]] = {}
+    for f in batch.files:
+        last_stats[f.worker_pid] = f.dfa_stats
+    for pid, stats in last_stats.items():
+        print(f"  Процесс {pid}: {format_dfa_stats(stats)}")
+    print(f"Общее время: {batch.wall_time:.3f} с (суммарное время по файлам: {cpu_time:.3f} с)")
+    if total and batch.wall_time > 0:
+        print(f"Пропускная способность: {total / batch.wall_time:.1f} файлов/с, "
+              f"{batch.wall_time / total * 1000:.1f} мс на файл")
+    print("===========================================")
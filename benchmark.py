@@ -0,0 +1,836 @@
+"""
+Бенчмарки компилятора ListLang.
+
+Запуск:
+    python benchmark.py            # все бенчмарки
+    python benchmark.py parse      # только выбранные
+"""
+import contextlib
+import io
+import re
+import sys
+import time
+import tracemalloc
+
+from antlr4 import CommonTokenStream, InputStream
+from antlr4.atn.PredictionMode import PredictionMode
+
+from gen.ListLangLexer import ListLangLexer
+from gen.ListLangParser import ListLangParser
+
+from listlang_ast import lower_parse_tree
+from semantic_analyzer import ExpressionTypeTable, Type, perform_semantic_analysis
+from syntax_analyzer import create_parse_tree
+from wasm_binary import assemble_wat
+from wat_compiler import compile_listlang_to_wat
+
+
+def _best_time(func, repeat):
+    """Минимальное время выполнения func из repeat запусков, секунды."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def generate_program(blocks: int) -> str:
+    """Генерирует большую корректную программу из повторяющихся блоков с вложенными выражениями."""
+    parts = []
+    for k in range(blocks):
+        parts.append(f"""
+func calc_{k}(a, b)
+    {{
+        return (a * 2 + b - a / 3) * (b + 1) - len([a, b, {k}]);
+    }}
+end
+x_{k} = calc_{k}({k}, {k} + 1) * 3 + -{k};
+l_{k} = [x_{k}, x_{k} * 2, (x_{k} - 1) / 2] << x_{k};
+if x_{k} > 10 and not (x_{k} >= 100 or x_{k} == 50) then
+    {{
+        write("big ", x_{k}, l_{k}[1] + l_{k}[2] * l_{k}[0]);
+    }}
+else
+    {{
+        write("small" + " value");
+    }}
+end
+s_{k} = {{ name: "item_{k}", value: x_{k} * 2 }};
+f_{k} = lambda(v) -> v * x_{k} + 1;
+for i from 0 to {k % 7} do
+    {{
+        l_{k}[i] <- l_{k}[i] + f_{k}(i);
+    }}
+end
+""")
+    return "".join(parts)
+
+
+def _tokenize(code: str) -> CommonTokenStream:
+    stream = CommonTokenStream(ListLangLexer(InputStream(code)))
+    stream.fill()
+    return stream
+
+
+def bench_parse(sizes=(10, 30, 60), repeat=2):
+    """Время разбора: полный LL против двухэтапной стратегии SLL -> LL."""
+    print("=== Разбор: LL против SLL -> LL ===")
+
+    # Прогрев DFA на небольшой программе, чтобы оба режима начинали в равных условиях
+    warm = _tokenize(generate_program(5))
+    create_parse_tree(ListLangParser(warm))
+
+    for blocks in sizes:
+        code = generate_program(blocks)
+        tokens = _tokenize(code)
+
+        def parse_ll():
+            tokens.seek(0)
+            parser = ListLangParser(tokens)
+            parser.removeErrorListeners()
+            parser._interp.predictionMode = PredictionMode.LL
+            parser.program()
+
+        def parse_two_stage():
+            tokens.seek(0)
+            parser = ListLangParser(tokens)
+            create_parse_tree(parser)
+
+        t_ll = _best_time(parse_ll, repeat)
+        t_sll = _best_time(parse_two_stage, repeat)
+        print(f"  {blocks:5d} блоков, {len(tokens.tokens):7d} токенов: "
+              f"LL {t_ll * 1000:9.1f} мс, SLL->LL {t_sll * 1000:9.1f} мс, ускорение x{t_ll / t_sll:.2f}")
+
+
+def _allocated_bytes(build):
+    """Объем памяти, выделенной при построении объекта build(), байты."""
+    tracemalloc.start()
+    obj = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return size
+
+
+def bench_types(node_count=1_000_000, repeat=3):
+    """Таблица типов выражений: словарь по узлу против ExpressionTypeTable по node_id."""
+    print("=== Таблица типов выражений: dict против array('B') ===")
+    types = list(Type)
+    kinds = [types[i % len(types)] for i in range(node_count)]
+
+    def build_dict():
+        table = {}
+        for node_id, t in enumerate(kinds):
+            table[node_id] = t
+        return table
+
+    def build_array():
+        table = ExpressionTypeTable(node_count)
+        for node_id, t in enumerate(kinds):
+            table[node_id] = t
+        return table
+
+    dict_bytes = _allocated_bytes(build_dict)
+    array_bytes = _allocated_bytes(build_array)
+    dict_table = build_dict()
+    array_table = build_array()
+
+    def read_dict():
+        get = dict_table.get
+        for node_id in range(node_count):
+            get(node_id, Type.UNKNOWN)
+
+    def read_array():
+        for node_id in range(node_count):
+            array_table[node_id]
+
+    t_dict = _best_time(read_dict, repeat)
+    t_array = _best_time(read_array, repeat)
+    print(f"  {node_count} узлов: память dict {dict_bytes / 2 ** 20:.1f} МБ, "
+          f"array('B') {array_bytes / 2 ** 20:.1f} МБ")
+    print(f"  чтение всех типов: dict {t_dict * 1000:.1f} мс, array('B') {t_array * 1000:.1f} мс")
+
+
+def generate_globals_program(globals_count: int, references: int) -> str:
+    """Программа из globals_count глобальных переменных и references обращений к ним."""
+    lines = [f"g_{i} = {i};" for i in range(globals_count)]
+    for r in range(references):
+        a, b = r % globals_count, (r * 7 + 3) % globals_count
+        lines.append(f"g_{a} = g_{a} + g_{b};")
+    return "\n".join(lines) + "\n"
+
+
+def bench_globals(sizes=((1000, 2000), (2000, 4000), (4000, 8000)), repeat=2):
+    """Кодогенерация программ с тысячами глобальных переменных и обращений к ним."""
+    print("=== Кодогенерация: глобальные переменные ===")
+    for globals_count, references in sizes:
+        parser = ListLangParser(_tokenize(generate_globals_program(globals_count, references)))
+        program = lower_parse_tree(create_parse_tree(parser))
+        with contextlib.redirect_stdout(io.StringIO()):
+            analyzer = perform_semantic_analysis(program, parser, "bench")
+
+        def compile_wat():
+            compile_listlang_to_wat(program, parser, analyzer, "bench")
+
+        t_wat = _best_time(compile_wat, repeat)
+        print(f"  {globals_count:5d} глобальных, {references:5d} присваиваний: WAT {t_wat * 1000:9.1f} мс")
+
+
+# Побайтовые версии строкового рантайма (до перехода на memory.copy) - для сравнения
+_BYTEWISE_STRING_FUNCS = {
+    "string_concat": """
+  (func $string_concat (param $val1 f64) (param $val2 f64) (result i32)
+    (local $ptr1 i32) (local $ptr2 i32) (local $len1 i32) (local $len2 i32) (local $new_ptr i32) (local $i i32)
+    (local.set $ptr1 (i32.trunc_f64_s (local.get $val1)))
+    (local.set $ptr2 (i32.trunc_f64_s (local.get $val2)))
+    (local.set $len1 (call $string_len (local.get $ptr1)))
+    (local.set $len2 (call $string_len (local.get $ptr2)))
+    (local.set $new_ptr (call $string_alloc (i32.add (local.get $len1) (local.get $len2))))
+    (loop $copy_loop_1
+      (local.get $i) (local.get $len1) (i32.lt_s)
+      (if (then
+        (i32.store8 (i32.add (local.get $new_ptr) (local.get $i)) (i32.load8_u (i32.add (local.get $ptr1) (local.get $i))))
+        (local.set $i (i32.add (local.get $i) (i32.const 1)))
+        (br $copy_loop_1)
+      ))
+    )
+    (local.set $i (i32.const 0))
+    (loop $copy_loop_2
+      (local.get $i) (local.get $len2) (i32.lt_s)
+      (if (then
+        (i32.store8 (i32.add (local.get $new_ptr) (i32.add (local.get $len1) (local.get $i))) (i32.load8_u (i32.add (local.get $ptr2) (local.get $i))))
+        (local.set $i (i32.add (local.get $i) (i32.const 1)))
+        (br $copy_loop_2)
+      ))
+    )
+    (local.get $new_ptr)
+  )
+""",
+    "string_repeat": """
+  (func $string_repeat (param $ptr i32) (param $count f64) (result i32)
+    (local $len i32) (local $total_len i32) (local $new_ptr i32) (local $i i32) (local $j i32)
+    (local.set $len (call $string_len (local.get $ptr)))
+    (local.set $total_len (i32.mul (local.get $len) (i32.trunc_f64_s (local.get $count))))
+    (local.set $new_ptr (call $string_alloc (local.get $total_len)))
+    (loop $repeat_loop
+      (local.get $i) (i32.trunc_f64_s (local.get $count)) (i32.lt_s)
+      (if (then
+        (local.set $j (i32.const 0))
+        (loop $copy_char_loop
+          (local.get $j) (local.get $len) (i32.lt_s)
+          (if (then
+            (i32.store8
+              (i32.add (local.get $new_ptr) (i32.add (i32.mul (local.get $i) (local.get $len)) (local.get $j)))
+              (i32.load8_u (i32.add (local.get $ptr) (local.get $j)))
+            )
+            (local.set $j (i32.add (local.get $j) (i32.const 1)))
+            (br $copy_char_loop)
+          ))
+        )
+        (local.set $i (i32.add (local.get $i) (i32.const 1)))
+        (br $repeat_loop)
+      ))
+    )
+    (local.get $new_ptr)
+  )
+""",
+}
+
+# Драйверы бенчмарка: циклы выполняются внутри модуля, чтобы не мерить вызовы из Python.
+# Промежуточные строки возвращаются аллокатору, память заранее расширяется до 32 МБ.
+_STRING_BENCH_DRIVERS = """
+  (func $bench_setup (param $piece_len i32) (result i32)
+    (local $piece i32)
+    (memory.size) (i32.const 512) (i32.lt_u)
+    (if (then (drop (memory.grow (i32.sub (i32.const 512) (memory.size))))))
+    (local.set $piece (call $string_alloc (local.get $piece_len)))
+    (memory.fill (local.get $piece) (i32.const 97) (local.get $piece_len))
+    (local.get $piece)
+  )
+  (func (export "bench_concat") (param $piece_len i32) (param $n i32) (result i32)
+    (local $piece i32) (local $s i32) (local $next i32) (local $i i32) (local $len i32)
+    (local.set $piece (call $bench_setup (local.get $piece_len)))
+    (local.set $s (call $string_alloc (i32.const 0)))
+    (loop $concat_loop
+      (local.set $next (call $string_concat (f64.convert_i32_u (local.get $s)) (f64.convert_i32_u (local.get $piece))))
+      (call $string_free (local.get $s))
+      (local.set $s (local.get $next))
+      (local.set $i (i32.add (local.get $i) (i32.const 1)))
+      (br_if $concat_loop (i32.lt_u (local.get $i) (local.get $n)))
+    )
+    (local.set $len (call $string_len (local.get $s)))
+    (call $string_free (local.get $s))
+    (call $string_free (local.get $piece))
+    (local.get $len)
+  )
+  (func (export "bench_repeat") (param $piece_len i32) (param $times i32) (param $n i32) (result i32)
+    (local $piece i32) (local $s i32) (local $i i32) (local $len i32)
+    (local.set $piece (call $bench_setup (local.get $piece_len)))
+    (loop $repeat_loop
+      (local.set $s (call $string_repeat (local.get $piece) (f64.convert_i32_u (local.get $times))))
+      (local.set $len (call $string_len (local.get $s)))
+      (call $string_free (local.get $s))
+      (local.set $i (i32.add (local.get $i) (i32.const 1)))
+      (br_if $repeat_loop (i32.lt_u (local.get $i) (local.get $n)))
+    )
+    (call $string_free (local.get $piece))
+    (local.get $len)
+  )
+"""
+
+
+def _compile_to_wat(code: str, **options) -> str:
+    """Полный цикл компиляции программы ListLang в WAT без вывода диагностики; options - для WatCompiler."""
+    parser = ListLangParser(_tokenize(code))
+    program = lower_parse_tree(create_parse_tree(parser))
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyzer = perform_semantic_analysis(program, parser, "bench")
+        return compile_listlang_to_wat(program, parser, analyzer, "bench", **options)
+
+
+def _load_wasmtime():
+    """Модуль wasmtime или None (с сообщением о пропуске бенчмарка), если пакет не установлен."""
+    try:
+        import wasmtime
+    except ImportError:
+        print("  пропущено: для запуска модулей нужен пакет wasmtime (pip install wasmtime)")
+        return None
+    return wasmtime
+
+
+def _instantiate_wasm(wasmtime, wat: str, output: list = None):
+    """
+    Собирает WAT и создает экземпляр модуля с импортами-заглушками. Возвращает (store, exports).
+    Если передан список output, в него записываются числа, выведенные write.
+    """
+    store = wasmtime.Store()
+    module = wasmtime.Module(store.engine, assemble_wat(wat))
+    f64, i32 = wasmtime.ValType.f64(), wasmtime.ValType.i32()
+    imports = {
+        "write_num": (wasmtime.FuncType([f64], []), output.append if output is not None else lambda value: None),
+        "write_char": (wasmtime.FuncType([i32], []), lambda char: None),
+        "read_num": (wasmtime.FuncType([], [f64]), lambda: 0.0),
+        "f64_to_string": (wasmtime.FuncType([f64], [i32]), lambda value: 0),
+    }
+    by_name = [imports[imp.name] for imp in module.imports]
+    instance = wasmtime.Instance(store, module, [wasmtime.Func(store, ty, fn) for ty, fn in by_name])
+    return store, instance.exports(store)
+
+
+def _string_runtime_wat(bytewise: bool) -> str:
+    """WAT-модуль со строковым рантаймом компилятора и драйверами бенчмарка."""
+    wat = _compile_to_wat("x = 1;\n")
+    if bytewise:
+        for name, func in _BYTEWISE_STRING_FUNCS.items():
+            wat = re.sub(r"\n  \(func \$" + name + r" .*?\n  \)\n", lambda _: func, wat, count=1, flags=re.S)
+    body = wat.rstrip()
+    return body[:body.rindex(")")] + _STRING_BENCH_DRIVERS + ")\n"
+
+
+def bench_wasm(concat_sizes=((16, 500), (16, 1000)), repeat_sizes=((8, 100_000, 20), (64, 250_000, 10)), repeat=3):
+    """Строковый рантайм в движке WebAssembly: побайтовые циклы против memory.copy."""
+    print("=== WebAssembly: конкатенация и повторение строк ===")
+    wasmtime = _load_wasmtime()
+    if wasmtime is None:
+        return
+
+    runtimes = {label: _instantiate_wasm(wasmtime, _string_runtime_wat(bytewise))
+                for label, bytewise in (("побайтово", True), ("memory.copy", False))}
+
+    for piece_len, n in concat_sizes:
+        times = {}
+        for label, (store, exports) in runtimes.items():
+            times[label] = _best_time(lambda: exports["bench_concat"](store, piece_len, n), repeat)
+        print(f"  concat x{n} по {piece_len} байт: " + ", ".join(
+            f"{label} {t * 1000:8.2f} мс" for label, t in times.items()) +
+              f", ускорение x{times['побайтово'] / times['memory.copy']:.1f}")
+
+    for piece_len, count, n in repeat_sizes:
+        times = {}
+        for label, (store, exports) in runtimes.items():
+            times[label] = _best_time(lambda: exports["bench_repeat"](store, piece_len, count, n), repeat)
+        print(f"  repeat {piece_len} байт x{count}, {n} раз: " + ", ".join(
+            f"{label} {t * 1000:8.2f} мс" for label, t in times.items()) +
+              f", ускорение x{times['побайтово'] / times['memory.copy']:.1f}")
+
+
+def generate_string_loop_program(iterations: int) -> str:
+    """Цикл, в каждой итерации которого создаются и выводятся временные строки."""
+    return f"""
+a = "ab";
+b = "cd";
+i = 0;
+while i < {iterations} do
+{{
+    write(a + b + "!");
+    n = len(a * 3 + b);
+    i = i + 1;
+}}
+end
+"""
+
+
+def bench_heap(iterations=(1_000, 10_000, 100_000)):
+    """Память модуля после цикла с временными строками: должна оставаться постоянной."""
+    print("=== WebAssembly: память в установившемся цикле ===")
+    wasmtime = _load_wasmtime()
+    if wasmtime is None:
+        return
+
+    for n in iterations:
+        store, exports = _instantiate_wasm(wasmtime, _compile_to_wat(generate_string_loop_program(n)))
+        start = time.perf_counter()
+        exports["run"](store)
+        elapsed = time.perf_counter() - start
+        print(f"  {n:7d} итераций: {elapsed * 1000:8.1f} мс, память {exports['memory'].size(store)} стр. по 64 КиБ")
+
+
+def generate_garbage_loop_program(iterations: int) -> str:
+    """Цикл, в котором перезаписываются переменные со строками и списками: старые значения становятся мусором."""
+    return f"""
+acc = [0];
+i = 0;
+while i < {iterations} do
+{{
+    junk = [i, i, i, i, i, i, i, i];
+    text = "abc" * 10;
+    acc = acc << i;
+    i = i + 1;
+}}
+end
+"""
+
+
+def bench_gc(iterations=(1_000, 10_000, 100_000)):
+    """Память и время программы с мусором в цикле без сборщика и с ним (--gc)."""
+    print("=== WebAssembly: сборщик мусора ===")
+    wasmtime = _load_wasmtime()
+    if wasmtime is None:
+        return
+
+    for n in iterations:
+        code = generate_garbage_loop_program(n)
+        for gc_enabled in (False, True):
+            store, exports = _instantiate_wasm(wasmtime, _compile_to_wat(code, gc_enabled=gc_enabled))
+            start = time.perf_counter()
+            exports["run"](store)
+            elapsed = time.perf_counter() - start
+            label = "gc " if gc_enabled else "без gc"
+            print(f"  {n:7d} итераций, {label:6s}: {elapsed * 1000:8.1f} мс, "
+                  f"живых {exports['heap_live_bytes'](store):9d} Б, "
+                  f"память {exports['memory'].size(store):5d} стр., "
+                  f"сборок {exports['gc_collections'](store)}")
+
+
+def generate_queue_program(size: int) -> str:
+    """Очередь из size элементов, которую затем полностью разбирают dequeue."""
+    return f"""
+queue = [0];
+i = 1;
+while i < {size} do
+{{
+    queue = queue << i;
+    i = i + 1;
+}}
+end
+while len(queue) > 0 do
+{{
+    x = dequeue from queue;
+}}
+end
+"""
+
+
+def bench_queue(sizes=(1_000, 10_000, 100_000)):
+    """Разбор очереди через dequeue: время на операцию не должно расти с длиной очереди."""
+    print("=== WebAssembly: очередь (dequeue) ===")
+    wasmtime = _load_wasmtime()
+    if wasmtime is None:
+        return
+
+    for n in sizes:
+        store, exports = _instantiate_wasm(wasmtime, _compile_to_wat(generate_queue_program(n)))
+        start = time.perf_counter()
+        exports["run"](store)
+        elapsed = time.perf_counter() - start
+        print(f"  {n:7d} элементов: {elapsed * 1000:8.1f} мс, {elapsed / n * 1e9:7.1f} нс на элемент")
+
+
+def generate_append_programs(size: int) -> dict:
+    """Построение списка из size элементов: циклом while (только удвоение) и циклом for (с предвыделением)."""
+    return {
+        "while": f"""
+items = [0];
+i = 1;
+while i < {size} do
+{{
+    items << i;
+    i = i + 1;
+}}
+end
+""",
+        "for": f"""
+items = [0];
+for i from 1 to {size - 1} do
+{{
+    items << i;
+}}
+end
+""",
+    }
+
+
+def bench_append(sizes=(10_000, 100_000, 1_000_000)):
+    """Добавление в список оператором <<: подсказка емкости из границ for убирает перераспределения."""
+    print("=== WebAssembly: построение списка через << ===")
+    wasmtime = _load_wasmtime()
+    if wasmtime is None:
+        return
+
+    for n in sizes:
+        for label, code in generate_append_programs(n).items():
+            store, exports = _instantiate_wasm(wasmtime, _compile_to_wat(code))
+            start = time.perf_counter()
+            exports["run"](store)
+            elapsed = time.perf_counter() - start
+            print(f"  {n:8d} элементов, {label:5s}: {elapsed * 1000:8.1f} мс, "
+                  f"память {exports['memory'].size(store):5d} стр.")
+
+
+def generate_alias_programs() -> dict:
+    """
+    Списки, которые растут через <<, пока на старый буфер указывают другие ссылки: переменная
+    вызывающей функции, псевдоним `x -> y`, элемент другого списка. После роста выделяются новые
+    списки того же размера - если бы старый буфер освобождался, они заняли бы его место.
+    Значение: (программа, ожидаемый вывод write). Элементы списков выводятся сравнениями
+    (1.0 - совпало): write не печатает значения, тип которых известен только во время выполнения.
+    """
+    fillers = "[70, 71, 72, 73] -> z1;\n[80, 81, 82, 83] -> z2;\n"
+    return {
+        "параметр функции": (f"""
+func grow(l)
+    {{
+        l << 9;
+    }}
+end
+[1, 2, 3, 4] -> g;
+grow(g);
+{fillers}write((g[0]) == 1, (g[3]) == 4);
+""", [1.0, 1.0]),
+        "параметр функции, цикл for": (f"""
+func fill(l)
+    {{
+        for i from 1 to 20 do
+            {{
+                l << i;
+            }}
+        end
+    }}
+end
+[1, 2, 3, 4] -> g;
+fill(g);
+{fillers}write((g[0]) == 1, (g[3]) == 4);
+""", [1.0, 1.0]),
+        "псевдоним": (f"""
+[1, 2, 3, 4] -> x;
+x -> y;
+x << 5;
+{fillers}write((y[0]) == 1, (x[0]) == 1, (x[4]) == 5);
+""", [1.0, 1.0, 1.0]),
+        "псевдоним, цикл for": (f"""
+[1, 2, 3, 4] -> x;
+x -> y;
+for i from 5 to 20 do
+    {{
+        x << i;
+    }}
+end
+{fillers}write((y[0]) == 1, (x[0]) == 1, (x[19]) == 20);
+""", [1.0, 1.0, 1.0]),
+        "элемент списка": (f"""
+nest = [[1, 2, 3, 4]];
+(nest[0]) << 99;
+{fillers}write(((nest[0])[0]) == 1);
+""", [1.0]),
+    }
+
+
+def check_list_aliases():
+    """Регрессионная проверка: рост списка не портит данные, видимые через другие ссылки на него."""
+    print("=== WebAssembly: рост списков с псевдонимами (проверка) ===")
+    wasmtime = _load_wasmtime()
+    if wasmtime is None:
+        return
+
+    failed = 0
+    for label, (code, expected) in generate_alias_programs().items():
+        for gc_enabled in (False, True):
+            output = []
+            store, exports = _instantiate_wasm(wasmtime, _compile_to_wat(code, gc_enabled=gc_enabled), output)
+            exports["run"](store)
+            mode = "gc" if gc_enabled else "без gc"
+            if output == expected:
+                print(f"  {label}, {mode}: ok")
+            else:
+                failed += 1
+                print(f"  {label}, {mode}: ОШИБКА - выведено {output}, ожидалось {expected}")
+    if failed:
+        sys.exit(1)
+
+
+def generate_pointer_list_programs(size: int) -> dict:
+    """Список из size элементов-строк (4-байтовые слоты) и такой же список чисел (8-байтовые слоты)."""
+    return {
+        "строки": f"""
+items = ["s"];
+for i from 1 to {size - 1} do
+{{
+    items << "s";
+}}
+end
+""",
+        "числа": f"""
+items = [0];
+for i from 1 to {size - 1} do
+{{
+    items << i;
+}}
+end
+""",
+    }
+
+
+def bench_packed(sizes=(10_000, 1_000_000)):
+    """Память списков указателей (i32) и чисел (f64) одинаковой длины."""
+    print("=== WebAssembly: размер элементов списка ===")
+    wasmtime = _load_wasmtime()
+    if wasmtime is None:
+        return
+
+    for n in sizes:
+        for label, code in generate_pointer_list_programs(n).items():
+            store, exports = _instantiate_wasm(wasmtime, _compile_to_wat(code))
+            start = time.perf_counter()
+            exports["run"](store)
+            elapsed = time.perf_counter() - start
+            print(f"  {n:8d} элементов, {label:6s}: {elapsed * 1000:8.1f} мс, "
+                  f"живых {exports['heap_live_bytes'](store):9d} Б")
+
+
+def generate_struct_field_programs(iterations: int) -> dict:
+    """
+    Один и тот же цикл над полями структуры: из литерала (раскладка известна, поля по
+    фиксированным смещениям), из результата функции (встроенный кэш формы) и с полем,
+    добавленным после создания структуры (переход формы, поле в блоке ext).
+    """
+    loop = f"""
+for i from 1 to {iterations} do
+{{
+    p.x <- p.x + p.y;
+}}
+end
+"""
+    return {
+        "литерал": "p = {x: 0, y: 1};" + loop,
+        "из функции": """
+func make_point()
+    {
+        return {x: 0, y: 1};
+    }
+end
+p = make_point();
+""" + loop,
+        "добавлено": """
+func make_point()
+    {
+        return {y: 1};
+    }
+end
+func add_x(s)
+    {
+        s.x <- 0;
+    }
+end
+p = make_point();
+add_x(p);
+""" + loop,
+    }
+
+
+def bench_struct(iterations=(100_000, 1_000_000)):
+    """Доступ к полям структур: смещения раскладки, встроенные кэши и поля, добавленные переходами форм."""
+    print("=== WebAssembly: поля структур ===")
+    wasmtime = _load_wasmtime()
+    if wasmtime is None:
+        return
+
+    for n in iterations:
+        for label, code in generate_struct_field_programs(n).items():
+            store, exports = _instantiate_wasm(wasmtime, _compile_to_wat(code))
+            start = time.perf_counter()
+            exports["run"](store)
+            elapsed = time.perf_counter() - start
+            print(f"  {n:8d} итераций, {label:10s}: {elapsed * 1000:8.1f} мс")
+
+
+def generate_switch_programs(cases: int, rounds: int) -> dict:
+    """
+    switch на cases ветвей, выполняемый rounds * cases раз: плотные целые case (br_table),
+    разреженные (квадраты, дерево сравнений) и case-выражения (последовательные сравнения).
+    """
+    def program(subject: str, case_values) -> str:
+        branches = "\n".join(f"            case {value}: total = total + {i};" for i, value in enumerate(case_values))
+        return f"""
+total = 0;
+for r from 1 to {rounds} do
+{{
+    for k from 0 to {cases - 1} do
+    {{
+        switch {subject}:
+{branches}
+        end
+    }}
+    end
+}}
+end
+"""
+    return {
+        "br_table": program("k", range(cases)),
+        "дерево": program("k * k", [i * i for i in range(cases)]),
+        "цепочка": program("k", [f"{i} + 0" for i in range(cases)]),
+    }
+
+
+def bench_switch(sizes=((8, 20_000), (64, 2_500), (256, 600)), repeat=3):
+    """Выбор ветви switch: таблица переходов, дерево сравнений и линейная цепочка сравнений."""
+    print("=== WebAssembly: выбор ветви switch ===")
+    wasmtime = _load_wasmtime()
+    if wasmtime is None:
+        return
+
+    for cases, rounds in sizes:
+        for label, code in generate_switch_programs(cases, rounds).items():
+            store, exports = _instantiate_wasm(wasmtime, _compile_to_wat(code))
+            elapsed = _best_time(lambda: exports["run"](store), repeat)
+            print(f"  {cases:4d} ветвей x {cases * rounds} выборов, {label:8s}: {elapsed * 1000:8.1f} мс")
+
+
+def generate_counter_programs(size: int, rounds: int) -> dict:
+    """
+    Обновление списка из size чисел по индексам циклом for rounds раз: с целым началом
+    (счетчик i32) и с началом из переменной (переменная цикла f64, индекс приводится к i32
+    на каждом обращении). Тело не накапливает сумму в глобальной переменной: зависимость
+    итераций через глобальную f64 ограничивает такой цикл сильнее, чем счетчик.
+    Ключ: (тело, счетчик).
+    """
+    def program(start: str, body: str) -> str:
+        return f"""
+xs = [1];
+for i from 2 to {size} do
+{{
+    xs << i;
+}}
+end
+zero = 0;
+for r from 1 to {rounds} do
+{{
+    for i from {start} to {size - 1} do
+    {{
+        {body}
+    }}
+    end
+}}
+end
+"""
+    bodies = {"xs[i] <- i": "xs[i] <- i;", "xs[i] <- xs[i] + 1": "xs[i] <- (xs[i]) + 1;"}
+    return {(label, counter): program(start, body)
+            for label, body in bodies.items()
+            for counter, start in (("i32", "0"), ("f64", "zero"))}
+
+
+def bench_counter(sizes=((1_000, 10_000), (100_000, 100)), repeat=5):
+    """Цикл for по индексам списка: счетчик i32 против переменной цикла f64."""
+    print("=== WebAssembly: счетчик цикла for ===")
+    wasmtime = _load_wasmtime()
+    if wasmtime is None:
+        return
+
+    for size, rounds in sizes:
+        for (body, counter), code in generate_counter_programs(size, rounds).items():
+            store, exports = _instantiate_wasm(wasmtime, _compile_to_wat(code))
+            elapsed = _best_time(lambda: exports["run"](store), repeat)
+            print(f"  {size:8d} элементов x {rounds:5d} проходов, {body:18s}, счетчик {counter}: "
+                  f"{elapsed * 1000:8.1f} мс")
+
+
+def generate_condition_programs(iterations: int) -> dict:
+    """
+    Цикл while на iterations итераций с составным условием: условие проверяется сразу
+    (логическое значение i32) и через переменную (значение расширяется до f64 и сравнивается с 0).
+    """
+    direct = f"""
+i = 0;
+odd = 0;
+while i < {iterations} and not (i == -1) do
+{{
+    if i - odd * 2 > 0 then {{ odd = odd + 1; }} end
+    i = i + 1;
+}}
+end
+"""
+    stored = f"""
+i = 0;
+odd = 0;
+go = i < {iterations} and not (i == -1);
+while go do
+{{
+    step = i - odd * 2 > 0;
+    if step then {{ odd = odd + 1; }} end
+    i = i + 1;
+    go = i < {iterations} and not (i == -1);
+}}
+end
+"""
+    return {"условие": direct, "через переменную": stored}
+
+
+def bench_condition(iterations=(100_000, 1_000_000), repeat=3):
+    """Условия if/while: логическое значение i32 против f64 0.0/1.0 в переменной."""
+    print("=== WebAssembly: условия ===")
+    wasmtime = _load_wasmtime()
+    if wasmtime is None:
+        return
+
+    for count in iterations:
+        for label, code in generate_condition_programs(count).items():
+            store, exports = _instantiate_wasm(wasmtime, _compile_to_wat(code))
+            elapsed = _best_time(lambda: exports["run"](store), repeat)
+            print(f"  {count:8d} итераций, {label}: {elapsed * 1000:8.1f} мс")
+
+
+BENCHMARKS = {
+    "parse": bench_parse,
+    "types": bench_types,
+    "globals": bench_globals,
+    "wasm": bench_wasm,
+    "heap": bench_heap,
+    "gc": bench_gc,
+    "queue": bench_queue,
+    "append": bench_append,
+    "aliases": check_list_aliases,
+    "packed": bench_packed,
+    "struct": bench_struct,
+    "switch": bench_switch,
+    "counter": bench_counter,
+    "condition": bench_condition,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Неизвестный бенчмарк '{name}'. Доступны: {', '.join(BENCHMARKS)}", file=sys.stderr)
+            sys.exit(1)
+        BENCHMARKS[name]()
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+# Файлы, от которых зависит результат компиляции. Изменение любого из них
+# меняет версию компилятора и тем самым делает недействительными все записи кэша.
+COMPILER_SOURCE_FILES = [
+    "ListLang.g4",
+    os.path.join("gen", "ListLangLexer.py"),
+    os.path.join("gen", "ListLangParser.py"),
+    "syntax_analyzer.py",
+    "listlang_ast.py",
+    "semantic_analyzer.py",
+    "wat_compiler.py",
+    "wasm_binary.py",
+]
+
+CACHE_FORMAT_VERSION = 1
+DEFAULT_CACHE_DIR = ".listlang_cache"
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+_compiler_version_stamp: Optional[str] = None
+
+
+def compiler_version_stamp() -> str:
+    """Хеш исходников компилятора и грамматики; вычисляется один раз на процесс."""
+    global _compiler_version_stamp
+    if _compiler_version_stamp is None:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        digest = hashlib.sha256(f"format:{CACHE_FORMAT_VERSION}".encode("utf-8"))
+        for rel_path in COMPILER_SOURCE_FILES:
+            digest.update(rel_path.encode("utf-8"))
+            try:
+                with open(os.path.join(base_dir, rel_path), "rb") as f:
+                    digest.update(f.read())
+            except OSError:
+                digest.update(b"<missing>")
+        _compiler_version_stamp = digest.hexdigest()
+    return _compiler_version_stamp
+
+
+class CompileCache:
+    """
+    Дисковый кэш результатов компиляции, адресуемый по содержимому.
+
+    Ключ - хеш исходного текста, имени файла (оно входит в тексты диагностик)
+    и версии компилятора. Запись хранит сгенерированный WAT и диагностику.
+    Размер кэша ограничен: при превышении удаляются записи, которые дольше
+    всего не использовались (время использования - mtime файла записи).
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.version_stamp = compiler_version_stamp()
+        # Оценка текущего размера кэша; None - каталог еще не просматривался
+        self._approx_total_bytes: Optional[int] = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key_for(self, code: str, filename: str, options: str = "") -> str:
+        """Ключ записи; options - строка с параметрами кодогенерации, влияющими на результат."""
+        digest = hashlib.sha256(self.version_stamp.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(options.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(filename.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(code.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """Возвращает запись кэша или None. Успешное чтение отмечает запись как недавно использованную."""
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            # Записи нет, она удалена другим процессом или повреждена
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def store(self, key: str, entry: Dict[str, Any]):
+        """Атомарно сохраняет запись и при необходимости вытесняет старые записи."""
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        data = json.dumps(entry, ensure_ascii=False)
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            # Кэш - только оптимизация: ошибка записи не должна прерывать компиляцию
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        if self._approx_total_bytes is None:
+            self._approx_total_bytes = sum(size for _, size, _ in self._scan())
+        else:
+            self._approx_total_bytes += len(data.encode("utf-8"))
+        if self._approx_total_bytes > self.max_bytes:
+            self._evict()
+
+    def _scan(self) -> List[Tuple[str, int, float]]:
+        """Список записей кэша: (путь, размер, время последнего использования)."""
+        entries = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, st.st_size, st.st_mtime))
+        return entries
+
+    def _evict(self):
+        """Удаляет давно не использовавшиеся записи, пока кэш не уменьшится до 90% лимита."""
+        entries = self._scan()
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        entries.sort(key=lambda e: e[2])  # Сначала самые старые
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self._approx_total_bytes = total
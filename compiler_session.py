@@ -0,0 +1,75 @@
+from typing import Dict, List, Optional
+
+from antlr4 import CommonTokenStream, InputStream
+from antlr4.error.ErrorListener import ErrorListener
+
+from gen.ListLangLexer import ListLangLexer
+from gen.ListLangParser import ListLangParser
+
+from syntax_analyzer import create_parse_tree, create_parser, read_code
+
+
+class CompilerSession:
+    """
+    Долгоживущая сессия компилятора: один лексер и один парсер на все файлы процесса.
+
+    Python-рантайм ANTLR строит DFA предсказания лениво и хранит его в атрибутах классов
+    ListLangLexer/ListLangParser, а кэш контекстов предсказания лексера - в экземпляре.
+    Сессия переиспользует экземпляры, поэтому DFA, построенный на первых файлах
+    (или при предварительном прогреве), ускоряет разбор всех последующих.
+    """
+
+    def __init__(self):
+        self.lexer = ListLangLexer(InputStream(""))
+        self.parser = ListLangParser(CommonTokenStream(self.lexer))
+        self.parser.removeErrorListeners()
+        self.files_parsed = 0
+
+    def tokenize(self, code: str) -> CommonTokenStream:
+        """Создает поток токенов, переиспользуя лексер сессии."""
+        self.lexer.inputStream = InputStream(code)  # Сеттер сбрасывает состояние лексера
+        return CommonTokenStream(self.lexer)
+
+    def create_parser(self, token_stream: CommonTokenStream) -> ListLangParser:
+        """Настраивает парсер сессии на новый поток токенов."""
+        self.files_parsed += 1
+        return create_parser(token_stream, self.parser)
+
+    def parse(self, code: str, error_listener: Optional[ErrorListener] = None):
+        """Строит дерево разбора для кода; синтаксические ошибки передаются в error_listener."""
+        parser = self.create_parser(self.tokenize(code))
+        return create_parse_tree(parser, error_listener)
+
+    def prewarm(self, file_paths: List[str]) -> int:
+        """
+        Прогревает DFA лексера и парсера разбором репрезентативного набора файлов.
+        Возвращает число успешно прочитанных и разобранных файлов.
+        """
+        warmed = 0
+        for file_path in file_paths:
+            code = read_code(file_path)
+            if code is None:
+                continue
+            self.parse(code)
+            warmed += 1
+        return warmed
+
+    def dfa_stats(self) -> Dict[str, int]:
+        """Число состояний DFA и размер кэша контекстов - для наблюдения за ростом памяти."""
+        lexer_dfa = self.lexer._interp.decisionToDFA
+        parser_dfa = self.parser._interp.decisionToDFA
+        return {
+            "lexer_dfa_states": sum(len(dfa.states) for dfa in lexer_dfa),
+            "parser_dfa_states": sum(len(dfa.states) for dfa in parser_dfa),
+            "parser_decisions_used": sum(1 for dfa in parser_dfa if dfa.states),
+            "parser_decisions": len(parser_dfa),
+            "prediction_contexts": len(self.parser._interp.sharedContextCache),
+        }
+
+
+def format_dfa_stats(stats: Dict[str, int]) -> str:
+    """Строка для отчета по снимку CompilerSession.dfa_stats()."""
+    return (f"DFA лексера {stats['lexer_dfa_states']} состояний, "
+            f"DFA парсера {stats['parser_dfa_states']} состояний "
+            f"({stats['parser_decisions_used']}/{stats['parser_decisions']} решений), "
+            f"контекстов предсказания: {stats['prediction_contexts']}")
@@ -4,45 +4,100 @@
   (import "env" "read_num" (func $read_num (result f64)))
   (import "env" "f64_to_string" (func $f64_to_string (param f64) (result i32)))
   (memory (export "memory") 1)
-  (data (i32.const 0) "Initial global_list: \00")
-  (data (i32.const 22) "Result of calculation: \00")
-  (data (i32.const 46) "Condition passed! Temp inside block: \00")
-  (data (i32.const 84) "Condition failed!\00")
-  (data (i32.const 102) "List after append: \00")
-  (data (i32.const 122) "Element at index \00")
-  (data (i32.const 140) ": \00")
-  (data (i32.const 143) "After new multi-assignment: val_a = \00")
-  (data (i32.const 180) ", val_b = \00")
-  (data (i32.const 191) "After old multi-assignment: a = \00")
-  (data (i32.const 224) ", b = \00")
-  (global $next_mem_addr (mut i32) (i32.const 0))
+  (data (i32.const 0) "\15\00\00\00Initial global_list: ")
+  (data (i32.const 28) "\17\00\00\00Result of calculation: ")
+  (data (i32.const 56) "%\00\00\00Condition passed! Temp inside block: ")
+  (data (i32.const 100) "\11\00\00\00Condition failed!")
+  (data (i32.const 124) "\13\00\00\00List after append: ")
+  (data (i32.const 148) "\11\00\00\00Element at index ")
+  (data (i32.const 172) "\02\00\00\00: ")
+  (data (i32.const 180) "$\00\00\00After new multi-assignment: val_a = ")
+  (data (i32.const 220) "\0a\00\00\00, val_b = ")
+  (data (i32.const 236) " \00\00\00After old multi-assignment: a = ")
+  (data (i32.const 272) "\06\00\00\00, b = ")
+  (global $free_lists i32 (i32.const 288))
+  (global $heap_base i32 (i32.const 400))
+  (global $next_mem_addr (mut i32) (i32.const 400))
+  (global $heap_live_bytes (mut i32) (i32.const 0))
+  (global $gc_collections (mut i32) (i32.const 0))
 
+  ;; Size-class allocator: block = [header:i32][next_free | kind:i32][payload...], block size is 16 << class.
+  ;; Header: bits 0-4 size class, bit 8 allocated, bit 9 GC mark. Kind of live blocks: 0 raw, 1 string, 2 list, 3 struct.
+  ;; Freed blocks go to per-class free lists (heads at $free_lists) and are reused before bumping.
+  ;; Memory grows at least by its current size.
   (func $alloc (param $size i32) (result i32)
-    (local $ptr i32)
-    (global.get $next_mem_addr)
-    (local.set $ptr)
-    (global.get $next_mem_addr)
-    (local.get $size)
-    (i32.add)
-    (global.set $next_mem_addr)
-    (local.get $ptr)
+    (local $class i32) (local $head_addr i32) (local $block i32)
+    ;; Smallest class whose block holds the 8-byte header and $size bytes
+    (local.set $class (i32.sub (i32.const 32) (i32.clz (i32.shr_u (i32.add (local.get $size) (i32.const 7)) (i32.const 4)))))
+    (local.set $head_addr (i32.add (global.get $free_lists) (i32.shl (local.get $class) (i32.const 2))))
+    (local.set $block (i32.load (local.get $head_addr)))
+    (local.get $block)
+    (if (then
+      (i32.store (local.get $head_addr) (i32.load offset=4 (local.get $block)))
+    ) (else
+      (local.set $block (call $heap_bump (local.get $class)))
+    ))
+    (i32.store (local.get $block) (i32.or (local.get $class) (i32.const 256)))
+    (i32.store offset=4 (local.get $block) (i32.const 0))
+    (global.set $heap_live_bytes (i32.add (global.get $heap_live_bytes) (i32.shl (i32.const 16) (local.get $class))))
+    (i32.add (local.get $block) (i32.const 8))
+  )
+        
+
+  (func $heap_bump (param $class i32) (result i32)
+    (local $block i32) (local $end i32) (local $needed_pages i32)
+    (local.set $block (global.get $next_mem_addr))
+    (local.set $end (i32.add (local.get $block) (i32.shl (i32.const 16) (local.get $class))))
+    (local.get $end) (i32.shl (memory.size) (i32.const 16)) (i32.gt_u)
+    (if (then
+      (local.set $needed_pages
+        (i32.shr_u (i32.add (i32.sub (local.get $end) (i32.shl (memory.size) (i32.const 16))) (i32.const 65535)) (i32.const 16)))
+      (memory.grow (select (memory.size) (local.get $needed_pages) (i32.gt_u (memory.size) (local.get $needed_pages))))
+      (i32.const -1) (i32.eq)
+      (if (then
+        ;; Not enough memory for doubling: try the exact amount before giving up
+        (memory.grow (local.get $needed_pages)) (i32.const -1) (i32.eq) (if (then (unreachable)))
+      ))
+    ))
+    (global.set $next_mem_addr (local.get $end))
+    (local.get $block)
   )
         
 
+  (func $free (param $ptr i32)
+    (local $block i32) (local $class i32) (local $head_addr i32)
+    (local.get $ptr) (i32.eqz) (if (then (return)))
+    (local.set $block (i32.sub (local.get $ptr) (i32.const 8)))
+    ;; Block is already free: nothing to do
+    (i32.and (i32.load (local.get $block)) (i32.const 256)) (i32.eqz) (if (then (return)))
+    (local.set $class (i32.and (i32.load (local.get $block)) (i32.const 31)))
+    (i32.store (local.get $block) (local.get $class))
+    (global.set $heap_live_bytes (i32.sub (global.get $heap_live_bytes) (i32.shl (i32.const 16) (local.get $class))))
+    (local.set $head_addr (i32.add (global.get $free_lists) (i32.shl (local.get $class) (i32.const 2))))
+    (i32.store offset=4 (local.get $block) (i32.load (local.get $head_addr)))
+    (i32.store (local.get $head_addr) (local.get $block))
+  )
+        
+
+  ;; For strings: [len:i32][bytes...], pointer refers to the first byte, length is at ptr - 4.
+  ;; Host f64_to_string must return a string in the same layout.
   (func $string_len (param $ptr i32) (result i32)
-    (local $len i32)
-    (local.set $len (i32.const 0))
-    (loop $len_loop
-      (block
-        (i32.load8_u (i32.add (local.get $ptr) (local.get $len)))
-        (i32.const 0)
-        (i32.eq)
-        (br_if 1)
-      )
-      (local.set $len (i32.add (local.get $len) (i32.const 1)))
-      (br $len_loop)
-    )
-    (local.get $len)
+    (i32.load (i32.sub (local.get $ptr) (i32.const 4)))
+  )
+        
+
+  (func $string_alloc (param $len i32) (result i32)
+    (local $ptr i32)
+    (local.set $ptr (call $alloc (i32.add (local.get $len) (i32.const 4))))
+    (i32.store (i32.sub (local.get $ptr) (i32.const 4)) (i32.const 1))
+    (i32.store (local.get $ptr) (local.get $len))
+    (i32.add (local.get $ptr) (i32.const 4))
+  )
+        
+
+  ;; Only for heap strings (concat/repeat results), never for literals in data segments
+  (func $string_free (param $ptr i32)
+    (call $free (i32.sub (local.get $ptr) (i32.const 4)))
   )
         
 
@@ -65,136 +120,187 @@
         
 
   (func $string_concat (param $val1 f64) (param $val2 f64) (result i32)
-    (local $ptr1 i32) (local $ptr2 i32) (local $len1 i32) (local $len2 i32) (local $new_ptr i32) (local $i i32)
+    (local $ptr1 i32) (local $ptr2 i32) (local $len1 i32) (local $len2 i32) (local $new_ptr i32)
 
     ;; Heuristic: if val in [1..2^32-1], treat it as pointer; else convert number to string
     (local.get $val1) (i32.trunc_f64_s) (local.set $ptr1)
-    (local.get $val1) (f64.convert_i32_u) (f64.eq) (if (else
+    (local.get $ptr1) (f64.convert_i32_u) (local.get $val1) (f64.eq) (if (then) (else
       (local.get $val1) (call $f64_to_string) (local.set $ptr1)
     ))
 
     (local.get $val2) (i32.trunc_f64_s) (local.set $ptr2)
-    (local.get $val2) (f64.convert_i32_u) (f64.eq) (if (else
+    (local.get $ptr2) (f64.convert_i32_u) (local.get $val2) (f64.eq) (if (then) (else
       (local.get $val2) (call $f64_to_string) (local.set $ptr2)
     ))
 
     (local.set $len1 (call $string_len (local.get $ptr1)))
     (local.set $len2 (call $string_len (local.get $ptr2)))
-    (call $alloc (i32.add (local.get $len1) (i32.add (local.get $len2) (i32.const 1))))
+    (call $string_alloc (i32.add (local.get $len1) (local.get $len2)))
     (local.set $new_ptr)
-    (local.set $i (i32.const 0))
-    (loop $copy_loop_1
-      (local.get $i) (local.get $len1) (i32.lt_s)
-      (if (then
-        (i32.store8 (i32.add (local.get $new_ptr) (local.get $i)) (i32.load8_u (i32.add (local.get $ptr1) (local.get $i))))
-        (local.set $i (i32.add (local.get $i) (i32.const 1)))
-        (br $copy_loop_1)
-      ))
-    )
-    (local.set $i (i32.const 0))
-    (loop $copy_loop_2
-      (local.get $i) (local.get $len2) (i32.lt_s)
-      (if (then
-        (i32.store8 (i32.add (local.get $new_ptr) (i32.add (local.get $len1) (local.get $i))) (i32.load8_u (i32.add (local.get $ptr2) (local.get $i))))
-        (local.set $i (i32.add (local.get $i) (i32.const 1)))
-        (br $copy_loop_2)
-      ))
-    )
-    (i32.store8 (i32.add (local.get $new_ptr) (i32.add (local.get $len1) (local.get $len2))) (i32.const 0))
+    (memory.copy (local.get $new_ptr) (local.get $ptr1) (local.get $len1))
+    (memory.copy (i32.add (local.get $new_ptr) (local.get $len1)) (local.get $ptr2) (local.get $len2))
     (local.get $new_ptr)
   )
         
 
   (func $string_repeat (param $ptr i32) (param $count f64) (result i32)
-    (local $len i32) (local $total_len i32) (local $new_ptr i32) (local $i i32) (local $j i32)
+    (local $len i32) (local $times i32) (local $total_len i32) (local $new_ptr i32) (local $filled i32)
     (local.set $len (call $string_len (local.get $ptr)))
-    (local.set $total_len (i32.mul (local.get $len) (i32.trunc_f64_s (local.get $count))))
-    (call $alloc (i32.add (local.get $total_len) (i32.const 1)))
+    (local.set $times (i32.trunc_f64_s (local.get $count)))
+    (local.get $times) (i32.const 0) (i32.lt_s) (if (then (local.set $times (i32.const 0))))
+    (local.set $total_len (i32.mul (local.get $len) (local.get $times)))
+    (call $string_alloc (local.get $total_len))
     (local.set $new_ptr)
-    (local.set $i (i32.const 0))
-    (loop $repeat_loop
-      (local.get $i) (i32.trunc_f64_s (local.get $count)) (i32.lt_s)
-      (if (then
-        (local.set $j (i32.const 0))
-        (loop $copy_char_loop
-          (local.get $j) (local.get $len) (i32.lt_s)
-          (if (then
-            (i32.store8
-              (i32.add (local.get $new_ptr) (i32.add (i32.mul (local.get $i) (local.get $len)) (local.get $j)))
-              (i32.load8_u (i32.add (local.get $ptr) (local.get $j)))
-            )
-            (local.set $j (i32.add (local.get $j) (i32.const 1)))
-            (br $copy_char_loop)
-          ))
-        )
-        (local.set $i (i32.add (local.get $i) (i32.const 1)))
-        (br $repeat_loop)
-      ))
+    (local.get $total_len) (i32.eqz) (if (then (local.get $new_ptr) (return)))
+
+    ;; Doubling: copy the source once, then copy the already filled prefix onto itself
+    (memory.copy (local.get $new_ptr) (local.get $ptr) (local.get $len))
+    (local.set $filled (local.get $len))
+    (block $done
+      (loop $double_loop
+        (i32.shl (local.get $filled) (i32.const 1)) (local.get $total_len) (i32.gt_u) (br_if $done)
+        (memory.copy (i32.add (local.get $new_ptr) (local.get $filled)) (local.get $new_ptr) (local.get $filled))
+        (local.set $filled (i32.shl (local.get $filled) (i32.const 1)))
+        (br $double_loop)
+      )
+    )
+    (memory.copy
+      (i32.add (local.get $new_ptr) (local.get $filled))
+      (local.get $new_ptr)
+      (i32.sub (local.get $total_len) (local.get $filled))
     )
-    (i32.store8 (i32.add (local.get $new_ptr) (local.get $total_len)) (i32.const 0))
     (local.get $new_ptr)
   )
         
 
-  ;; For lists: header layout [len:i32][elem_size:i32][capacity:i32][data...]
+  ;; For lists: header layout [len:i32][elem_size:i32][capacity:i32][head:i32][data...]
+  ;; Element i lives in slot head + i; dequeue only advances head
+  (func $list_alloc (param $size i32) (result i32)
+    (local $ptr i32)
+    (local.set $ptr (call $alloc (local.get $size)))
+    (i32.store (i32.sub (local.get $ptr) (i32.const 4)) (i32.const 2))
+    (local.get $ptr)
+  )
+        
+
   (func $len_list (param $ptr i32) (result f64)
     (f64.convert_i32_u (i32.load (local.get $ptr)))
   )
         
 
   (func $dequeue_op (param $list_ptr i32) (result f64)
-    (local $len i32) (local $elem_size i32) (local $first_elem_val f64)
+    (local $len i32) (local $head i32) (local $first_elem_val f64)
     (local.set $len (i32.load (local.get $list_ptr)))
-    (local.set $elem_size (i32.load (i32.add (local.get $list_ptr) (i32.const 4))))
     (local.get $len) (i32.const 0) (i32.eq) (if (then (f64.const 0) (return)))
+    (local.set $head (i32.load offset=12 (local.get $list_ptr)))
 
-    (local.set $first_elem_val (f64.load (i32.add (local.get $list_ptr) (i32.const 12))))
-
-    (local $new_start i32) (local $old_start i32) (local $num_bytes_to_move i32)
-    (local.set $new_start (i32.add (local.get $list_ptr) (i32.const 12)))
-    (local.set $old_start (i32.add (local.get $new_start) (local.get $elem_size)))
-    (local.set $num_bytes_to_move (i32.mul (i32.sub (local.get $len) (i32.const 1)) (local.get $elem_size)))
+    (i32.load offset=4 (local.get $list_ptr)) (i32.const 4) (i32.eq)
+    (if
+      (then (local.set $first_elem_val (f64.convert_i32_u
+        (i32.load offset=16 (i32.add (local.get $list_ptr) (i32.shl (local.get $head) (i32.const 2)))))))
+      (else (local.set $first_elem_val
+        (f64.load offset=16 (i32.add (local.get $list_ptr) (i32.shl (local.get $head) (i32.const 3))))))
+    )
 
-    (memory.copy (local.get $new_start) (local.get $old_start) (local.get $num_bytes_to_move))
-    (i32.store (local.get $list_ptr) (i32.sub (local.get $len) (i32.const 1)))
+    (local.set $len (i32.sub (local.get $len) (i32.const 1)))
+    (i32.store (local.get $list_ptr) (local.get $len))
+    ;; An emptied queue starts again from slot 0
+    (i32.store offset=12 (local.get $list_ptr)
+      (select (i32.add (local.get $head) (i32.const 1)) (i32.const 0) (local.get $len)))
     (local.get $first_elem_val)
   )
         
 
   (func $list_append (param $list_ptr i32) (param $value f64) (result i32)
-    (local $len i32) (local $elem_size i32) (local $capacity i32) (local $new_list_ptr i32)
+    (local $len i32) (local $elem_size i32) (local $capacity i32) (local $head i32) (local $new_list_ptr i32)
+    (local $slot i32)
     (local.set $len (i32.load (local.get $list_ptr)))
-    (local.set $elem_size (i32.load (i32.add (local.get $list_ptr) (i32.const 4))))
-    (local.set $capacity (i32.load (i32.add (local.get $list_ptr) (i32.const 8))))
+    (local.set $elem_size (i32.load offset=4 (local.get $list_ptr)))
+    (local.set $capacity (i32.load offset=8 (local.get $list_ptr)))
+    (local.set $head (i32.load offset=12 (local.get $list_ptr)))
 
-    (local.get $len) (local.get $capacity) (i32.ge_s)
+    (i32.add (local.get $head) (local.get $len)) (local.get $capacity) (i32.ge_s)
     (if (then
-      (local.get $capacity) (i32.const 0) (i32.eq) (if (then (local.set $capacity (i32.const 4))))
-      (local.set $capacity (i32.mul (local.get $capacity) (i32.const 2)))
+      (i32.mul (local.get $head) (i32.const 2)) (local.get $capacity) (i32.ge_s)
+      (if (then
+        ;; At least half of the buffer was dequeued: compact in place, amortized O(1)
+        (memory.copy
+          (i32.add (local.get $list_ptr) (i32.const 16))
+          (i32.add (i32.add (local.get $list_ptr) (i32.const 16)) (i32.mul (local.get $head) (local.get $elem_size)))
+          (i32.mul (local.get $len) (local.get $elem_size))
+        )
+      ) (else
+        (local.get $capacity) (i32.const 0) (i32.eq) (if (then (local.set $capacity (i32.const 4))))
+        (local.set $capacity (i32.mul (local.get $capacity) (i32.const 2)))
 
-      (call $alloc (i32.add (i32.const 12) (i32.mul (local.get $capacity) (local.get $elem_size))))
-      (local.set $new_list_ptr)
+        (call $list_alloc (i32.add (i32.const 16) (i32.mul (local.get $capacity) (local.get $elem_size))))
+        (local.set $new_list_ptr)
 
-      (memory.copy
-        (local.get $new_list_ptr)
-        (local.get $list_ptr)
-        (i32.add (i32.const 12) (i32.mul (local.get $len) (local.get $elem_size)))
-      )
-      (i32.store (i32.add (local.get $new_list_ptr) (i32.const 8)) (local.get $capacity))
-      (local.set $list_ptr (local.get $new_list_ptr))
+        ;; Only the live elements move; the new buffer starts at slot 0
+        (memory.copy
+          (i32.add (local.get $new_list_ptr) (i32.const 16))
+          (i32.add (i32.add (local.get $list_ptr) (i32.const 16)) (i32.mul (local.get $head) (local.get $elem_size)))
+          (i32.mul (local.get $len) (local.get $elem_size))
+        )
+        ;; The old buffer is not freed: aliases, caller variables and enclosing lists may still
+        ;; point to it. It is reclaimed by the GC (--gc) once unreachable.
+        (i32.store offset=4 (local.get $new_list_ptr) (local.get $elem_size))
+        (i32.store offset=8 (local.get $new_list_ptr) (local.get $capacity))
+        (local.set $list_ptr (local.get $new_list_ptr))
+      ))
+      (local.set $head (i32.const 0))
+      (i32.store offset=12 (local.get $list_ptr) (i32.const 0))
     ))
 
-    (local.get $list_ptr)
-    (i32.const 12) (i32.add)
-    (local.get $len) (local.get $elem_size) (i32.mul) (i32.add)
-    (local.get $value)
-    (f64.store)
+    (local.set $slot
+      (i32.add (local.get $list_ptr) (i32.mul (i32.add (local.get $head) (local.get $len)) (local.get $elem_size))))
+    (local.get $elem_size) (i32.const 4) (i32.eq)
+    (if
+      (then (i32.store offset=16 (local.get $slot) (i32.trunc_f64_u (local.get $value))))
+      (else (f64.store offset=16 (local.get $slot) (local.get $value)))
+    )
     (i32.store (local.get $list_ptr) (i32.add (local.get $len) (i32.const 1)))
     (local.get $list_ptr)
   )
         
-  (table (export "table") 10 funcref)
-  (global $next_table_idx (mut i32) (i32.const 0))
+
+  ;; Preallocation hint: make room for $count more elements after the current tail
+  (func $list_reserve (param $list_ptr i32) (param $count f64) (result i32)
+    (local $len i32) (local $elem_size i32) (local $capacity i32) (local $needed i32) (local $new_list_ptr i32)
+    (local.get $list_ptr) (i32.eqz) (if (then (local.get $list_ptr) (return)))
+    (local.get $count) (f64.const 1.0) (f64.lt) (if (then (local.get $list_ptr) (return)))
+    ;; Hints beyond 2^24 elements are ignored: growth by doubling handles them
+    (local.get $count) (f64.const 16777216.0) (f64.gt) (if (then (local.get $list_ptr) (return)))
+    (local.set $len (i32.load (local.get $list_ptr)))
+    (local.set $elem_size (i32.load offset=4 (local.get $list_ptr)))
+    (local.set $capacity (i32.load offset=8 (local.get $list_ptr)))
+    (local.set $needed (i32.add (local.get $len) (i32.trunc_f64_u (local.get $count))))
+    (i32.add (i32.load offset=12 (local.get $list_ptr)) (local.get $needed)) (local.get $capacity) (i32.le_u)
+    (if (then (local.get $list_ptr) (return)))
+
+    (call $list_alloc (i32.add (i32.const 16) (i32.mul (local.get $needed) (local.get $elem_size))))
+    (local.set $new_list_ptr)
+    (memory.copy
+      (i32.add (local.get $new_list_ptr) (i32.const 16))
+      (i32.add (i32.add (local.get $list_ptr) (i32.const 16))
+        (i32.mul (i32.load offset=12 (local.get $list_ptr)) (local.get $elem_size)))
+      (i32.mul (local.get $len) (local.get $elem_size))
+    )
+    ;; As in $list_append, the old buffer may still be referenced and is left to the GC
+    (i32.store (local.get $new_list_ptr) (local.get $len))
+    (i32.store offset=4 (local.get $new_list_ptr) (local.get $elem_size))
+    (i32.store offset=8 (local.get $new_list_ptr) (local.get $needed))
+    (i32.store offset=12 (local.get $new_list_ptr) (i32.const 0))
+    (local.get $new_list_ptr)
+  )
+        
+
+  ;; Heap statistics for the host
+  (func (export "heap_live_bytes") (result i32) (global.get $heap_live_bytes))
+  (func (export "heap_size_bytes") (result i32) (i32.sub (global.get $next_mem_addr) (global.get $heap_base)))
+  (func (export "gc_collections") (result i32) (global.get $gc_collections))
+        
+  (table (export "table") 1 funcref)
   (global $global_number (mut f64) (f64.const 0.0))
   (global $global_element (mut f64) (f64.const 0.0))
   (global $global_list (mut i32) (i32.const 0))
@@ -206,8 +312,14 @@
   (global $b (mut f64) (f64.const 0.0))
   (global $temp (mut f64) (f64.const 0.0))
   (func $main
+    (local $write_arg_0_i32 i32)
+    (local $write_arg_1_i32 i32)
+    (local $write_arg_1_f64 f64)
+    (local $write_arg_2_i32 i32)
+    (local $write_arg_3_f64 f64)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (f64.const 42.0)
@@ -219,8 +331,8 @@
     (f64.const 3.0)
     (f64.const 4.0)
     (f64.const 5.0)
-    (i32.const 52)
-    (call $alloc)
+    (i32.const 56)
+    (call $list_alloc)
     (local.set $tmp_i32_0)
     (local.get $tmp_i32_0)
     (i32.const 5)
@@ -236,42 +348,47 @@
     (i32.const 5)
     (i32.store)
     (local.get $tmp_i32_0)
-    (i32.const 12)
-    (i32.add)
-    (f64.store)
+    (i32.const 0)
+    (i32.store offset=12)
+    (local.set $tmp_f64_0)
     (local.get $tmp_i32_0)
-    (i32.const 20)
-    (i32.add)
-    (f64.store)
+    (local.get $tmp_f64_0)
+    (f64.store offset=48)
+    (local.set $tmp_f64_0)
     (local.get $tmp_i32_0)
-    (i32.const 28)
-    (i32.add)
-    (f64.store)
+    (local.get $tmp_f64_0)
+    (f64.store offset=40)
+    (local.set $tmp_f64_0)
     (local.get $tmp_i32_0)
-    (i32.const 36)
-    (i32.add)
-    (f64.store)
+    (local.get $tmp_f64_0)
+    (f64.store offset=32)
+    (local.set $tmp_f64_0)
     (local.get $tmp_i32_0)
-    (i32.const 44)
-    (i32.add)
-    (f64.store)
+    (local.get $tmp_f64_0)
+    (f64.store offset=24)
+    (local.set $tmp_f64_0)
+    (local.get $tmp_i32_0)
+    (local.get $tmp_f64_0)
+    (f64.store offset=16)
     (local.get $tmp_i32_0)
     (global.set $global_list)
-    (i32.const 0)
+    (i32.const 4)
     (global.get $global_list)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_1_i32)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_i32)
     (drop)
     (global.get $global_number)
     (f64.const 10.0)
@@ -281,94 +398,96 @@
     (f64.const 5.0)
     (f64.sub)
     (global.set $result)
-    (i32.const 22)
+    (i32.const 32)
     (global.get $result)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (call $write_num)
     (global.get $result)
     (f64.const 100.0)
     (f64.lt)
-    (f64.convert_i32_u)
+    (if (result i32)
+      (then
     (global.get $global_element)
     (f64.const 0.0)
     (f64.ne)
-    (f64.convert_i32_u)
-    (f64.const 0.0)
-    (f64.ne)
-    (f64.const 0.0)
-    (f64.ne)
-    (i32.and)
-    (f64.convert_i32_u)
+      )
+      (else (i32.const 0))
+    )
+    (if
+      (then
     (f64.const 10.0)
     (global.set $temp)
-    (i32.const 46)
+    (i32.const 60)
     (global.get $temp)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (call $write_num)
-    (i32.const 84)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+      )
+      (else
+    (i32.const 104)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
-    (f64.const 0.0)
-    (f64.ne)
-    (if
-      (then
-      )
-      (else
       )
     )
     (global.get $global_list)
     (global.get $result)
     (call $list_append)
-    (i32.const 102)
+    (global.set $global_list)
+    (i32.const 128)
     (global.get $global_list)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_1_i32)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_i32)
     (drop)
     (f64.const 0.0)
     (global.set $counter)
@@ -380,138 +499,149 @@
     (i32.trunc_f64_s)
     (call $len_list)
     (f64.lt)
-    (f64.convert_i32_u)
-    (i32.const 122)
+        (i32.eqz)
+        (br_if $while_block_1)
+    (i32.const 152)
     (global.get $counter)
-    (i32.const 140)
+    (i32.const 176)
     (global.get $global_list)
     (global.get $counter)
-    (local.set $tmp_f64_0)
+    (i32.trunc_f64_s)
+    (local.set $tmp_i32_1)
     (local.set $tmp_i32_0)
     (local.get $tmp_i32_0)
-    (i32.const 12)
+    (local.get $tmp_i32_0)
+    (i32.load offset=12)
+    (local.get $tmp_i32_1)
     (i32.add)
-    (local.get $tmp_f64_0)
-    (i32.trunc_f64_s)
-    (i32.const 8)
-    (i32.mul)
+    (i32.const 3)
+    (i32.shl)
     (i32.add)
-    (f64.load)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (f64.load offset=16)
+    (local.set $write_arg_3_f64)
+    (local.set $write_arg_2_i32)
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (call $write_num)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.get $write_arg_2_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_3_f64)
     (drop)
     (global.get $counter)
     (f64.const 1.0)
     (f64.add)
     (global.set $counter)
-        (f64.const 0.0)
-        (f64.eq)
-        (br_if $while_block_1)
         (br $while_loop_2)
       )
     )
     (f64.const 10.0)
     (f64.const 20.0)
-    (local.set $tmp_f64_0)
     (local.set $tmp_f64_1)
+    (local.set $tmp_f64_0)
     (local.get $tmp_f64_0)
     (global.set $val_a)
     (local.get $tmp_f64_1)
     (global.set $val_b)
-    (i32.const 143)
+    (i32.const 184)
     (global.get $val_a)
-    (i32.const 180)
+    (i32.const 224)
     (global.get $val_b)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_3_f64)
+    (local.set $write_arg_2_i32)
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (call $write_num)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.get $write_arg_2_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_3_f64)
     (call $write_num)
     (f64.const 100.0)
     (global.set $a)
     (f64.const 200.0)
     (global.set $b)
-    (i32.const 191)
+    (i32.const 240)
     (global.get $a)
-    (i32.const 224)
+    (i32.const 276)
     (global.get $b)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_3_f64)
+    (local.set $write_arg_2_i32)
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (call $write_num)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.get $write_arg_2_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_3_f64)
     (call $write_num)
     (return)
   )
-(export "run" (func $main))
+  (export "run" (func $main))
 )
\ No newline at end of file
@@ -4,42 +4,97 @@
   (import "env" "read_num" (func $read_num (result f64)))
   (import "env" "f64_to_string" (func $f64_to_string (param f64) (result i32)))
   (memory (export "memory") 1)
-  (data (i32.const 0) "First element of queue: \00")
-  (data (i32.const 25) ", queue now: \00")
-  (data (i32.const 39) "Queue after processing: \00")
-  (data (i32.const 64) "Counting to \00")
-  (data (i32.const 77) "The list is empty\00")
-  (data (i32.const 95) "The list has one element\00")
-  (data (i32.const 120) "The list has two elements\00")
-  (data (i32.const 146) "The list is long\00")
-  (global $next_mem_addr (mut i32) (i32.const 0))
+  (data (i32.const 0) "\18\00\00\00First element of queue: ")
+  (data (i32.const 28) "\0d\00\00\00, queue now: ")
+  (data (i32.const 48) "\18\00\00\00Queue after processing: ")
+  (data (i32.const 76) "\0c\00\00\00Counting to ")
+  (data (i32.const 92) "\11\00\00\00The list is empty")
+  (data (i32.const 116) "\18\00\00\00The list has one element")
+  (data (i32.const 144) "\19\00\00\00The list has two elements")
+  (data (i32.const 176) "\10\00\00\00The list is long")
+  (global $free_lists i32 (i32.const 200))
+  (global $heap_base i32 (i32.const 312))
+  (global $next_mem_addr (mut i32) (i32.const 312))
+  (global $heap_live_bytes (mut i32) (i32.const 0))
+  (global $gc_collections (mut i32) (i32.const 0))
 
+  ;; Size-class allocator: block = [header:i32][next_free | kind:i32][payload...], block size is 16 << class.
+  ;; Header: bits 0-4 size class, bit 8 allocated, bit 9 GC mark. Kind of live blocks: 0 raw, 1 string, 2 list, 3 struct.
+  ;; Freed blocks go to per-class free lists (heads at $free_lists) and are reused before bumping.
+  ;; Memory grows at least by its current size.
   (func $alloc (param $size i32) (result i32)
-    (local $ptr i32)
-    (global.get $next_mem_addr)
-    (local.set $ptr)
-    (global.get $next_mem_addr)
-    (local.get $size)
-    (i32.add)
-    (global.set $next_mem_addr)
-    (local.get $ptr)
+    (local $class i32) (local $head_addr i32) (local $block i32)
+    ;; Smallest class whose block holds the 8-byte header and $size bytes
+    (local.set $class (i32.sub (i32.const 32) (i32.clz (i32.shr_u (i32.add (local.get $size) (i32.const 7)) (i32.const 4)))))
+    (local.set $head_addr (i32.add (global.get $free_lists) (i32.shl (local.get $class) (i32.const 2))))
+    (local.set $block (i32.load (local.get $head_addr)))
+    (local.get $block)
+    (if (then
+      (i32.store (local.get $head_addr) (i32.load offset=4 (local.get $block)))
+    ) (else
+      (local.set $block (call $heap_bump (local.get $class)))
+    ))
+    (i32.store (local.get $block) (i32.or (local.get $class) (i32.const 256)))
+    (i32.store offset=4 (local.get $block) (i32.const 0))
+    (global.set $heap_live_bytes (i32.add (global.get $heap_live_bytes) (i32.shl (i32.const 16) (local.get $class))))
+    (i32.add (local.get $block) (i32.const 8))
+  )
+        
+
+  (func $heap_bump (param $class i32) (result i32)
+    (local $block i32) (local $end i32) (local $needed_pages i32)
+    (local.set $block (global.get $next_mem_addr))
+    (local.set $end (i32.add (local.get $block) (i32.shl (i32.const 16) (local.get $class))))
+    (local.get $end) (i32.shl (memory.size) (i32.const 16)) (i32.gt_u)
+    (if (then
+      (local.set $needed_pages
+        (i32.shr_u (i32.add (i32.sub (local.get $end) (i32.shl (memory.size) (i32.const 16))) (i32.const 65535)) (i32.const 16)))
+      (memory.grow (select (memory.size) (local.get $needed_pages) (i32.gt_u (memory.size) (local.get $needed_pages))))
+      (i32.const -1) (i32.eq)
+      (if (then
+        ;; Not enough memory for doubling: try the exact amount before giving up
+        (memory.grow (local.get $needed_pages)) (i32.const -1) (i32.eq) (if (then (unreachable)))
+      ))
+    ))
+    (global.set $next_mem_addr (local.get $end))
+    (local.get $block)
   )
         
 
+  (func $free (param $ptr i32)
+    (local $block i32) (local $class i32) (local $head_addr i32)
+    (local.get $ptr) (i32.eqz) (if (then (return)))
+    (local.set $block (i32.sub (local.get $ptr) (i32.const 8)))
+    ;; Block is already free: nothing to do
+    (i32.and (i32.load (local.get $block)) (i32.const 256)) (i32.eqz) (if (then (return)))
+    (local.set $class (i32.and (i32.load (local.get $block)) (i32.const 31)))
+    (i32.store (local.get $block) (local.get $class))
+    (global.set $heap_live_bytes (i32.sub (global.get $heap_live_bytes) (i32.shl (i32.const 16) (local.get $class))))
+    (local.set $head_addr (i32.add (global.get $free_lists) (i32.shl (local.get $class) (i32.const 2))))
+    (i32.store offset=4 (local.get $block) (i32.load (local.get $head_addr)))
+    (i32.store (local.get $head_addr) (local.get $block))
+  )
+        
+
+  ;; For strings: [len:i32][bytes...], pointer refers to the first byte, length is at ptr - 4.
+  ;; Host f64_to_string must return a string in the same layout.
   (func $string_len (param $ptr i32) (result i32)
-    (local $len i32)
-    (local.set $len (i32.const 0))
-    (loop $len_loop
-      (block
-        (i32.load8_u (i32.add (local.get $ptr) (local.get $len)))
-        (i32.const 0)
-        (i32.eq)
-        (br_if 1)
-      )
-      (local.set $len (i32.add (local.get $len) (i32.const 1)))
-      (br $len_loop)
-    )
-    (local.get $len)
+    (i32.load (i32.sub (local.get $ptr) (i32.const 4)))
+  )
+        
+
+  (func $string_alloc (param $len i32) (result i32)
+    (local $ptr i32)
+    (local.set $ptr (call $alloc (i32.add (local.get $len) (i32.const 4))))
+    (i32.store (i32.sub (local.get $ptr) (i32.const 4)) (i32.const 1))
+    (i32.store (local.get $ptr) (local.get $len))
+    (i32.add (local.get $ptr) (i32.const 4))
+  )
+        
+
+  ;; Only for heap strings (concat/repeat results), never for literals in data segments
+  (func $string_free (param $ptr i32)
+    (call $free (i32.sub (local.get $ptr) (i32.const 4)))
   )
         
 
@@ -62,165 +117,235 @@
         
 
   (func $string_concat (param $val1 f64) (param $val2 f64) (result i32)
-    (local $ptr1 i32) (local $ptr2 i32) (local $len1 i32) (local $len2 i32) (local $new_ptr i32) (local $i i32)
+    (local $ptr1 i32) (local $ptr2 i32) (local $len1 i32) (local $len2 i32) (local $new_ptr i32)
 
     ;; Heuristic: if val in [1..2^32-1], treat it as pointer; else convert number to string
     (local.get $val1) (i32.trunc_f64_s) (local.set $ptr1)
-    (local.get $val1) (f64.convert_i32_u) (f64.eq) (if (else
+    (local.get $ptr1) (f64.convert_i32_u) (local.get $val1) (f64.eq) (if (then) (else
       (local.get $val1) (call $f64_to_string) (local.set $ptr1)
     ))
 
     (local.get $val2) (i32.trunc_f64_s) (local.set $ptr2)
-    (local.get $val2) (f64.convert_i32_u) (f64.eq) (if (else
+    (local.get $ptr2) (f64.convert_i32_u) (local.get $val2) (f64.eq) (if (then) (else
       (local.get $val2) (call $f64_to_string) (local.set $ptr2)
     ))
 
     (local.set $len1 (call $string_len (local.get $ptr1)))
     (local.set $len2 (call $string_len (local.get $ptr2)))
-    (call $alloc (i32.add (local.get $len1) (i32.add (local.get $len2) (i32.const 1))))
+    (call $string_alloc (i32.add (local.get $len1) (local.get $len2)))
     (local.set $new_ptr)
-    (local.set $i (i32.const 0))
-    (loop $copy_loop_1
-      (local.get $i) (local.get $len1) (i32.lt_s)
-      (if (then
-        (i32.store8 (i32.add (local.get $new_ptr) (local.get $i)) (i32.load8_u (i32.add (local.get $ptr1) (local.get $i))))
-        (local.set $i (i32.add (local.get $i) (i32.const 1)))
-        (br $copy_loop_1)
-      ))
-    )
-    (local.set $i (i32.const 0))
-    (loop $copy_loop_2
-      (local.get $i) (local.get $len2) (i32.lt_s)
-      (if (then
-        (i32.store8 (i32.add (local.get $new_ptr) (i32.add (local.get $len1) (local.get $i))) (i32.load8_u (i32.add (local.get $ptr2) (local.get $i))))
-        (local.set $i (i32.add (local.get $i) (i32.const 1)))
-        (br $copy_loop_2)
-      ))
-    )
-    (i32.store8 (i32.add (local.get $new_ptr) (i32.add (local.get $len1) (local.get $len2))) (i32.const 0))
+    (memory.copy (local.get $new_ptr) (local.get $ptr1) (local.get $len1))
+    (memory.copy (i32.add (local.get $new_ptr) (local.get $len1)) (local.get $ptr2) (local.get $len2))
     (local.get $new_ptr)
   )
         
 
   (func $string_repeat (param $ptr i32) (param $count f64) (result i32)
-    (local $len i32) (local $total_len i32) (local $new_ptr i32) (local $i i32) (local $j i32)
+    (local $len i32) (local $times i32) (local $total_len i32) (local $new_ptr i32) (local $filled i32)
     (local.set $len (call $string_len (local.get $ptr)))
-    (local.set $total_len (i32.mul (local.get $len) (i32.trunc_f64_s (local.get $count))))
-    (call $alloc (i32.add (local.get $total_len) (i32.const 1)))
+    (local.set $times (i32.trunc_f64_s (local.get $count)))
+    (local.get $times) (i32.const 0) (i32.lt_s) (if (then (local.set $times (i32.const 0))))
+    (local.set $total_len (i32.mul (local.get $len) (local.get $times)))
+    (call $string_alloc (local.get $total_len))
     (local.set $new_ptr)
-    (local.set $i (i32.const 0))
-    (loop $repeat_loop
-      (local.get $i) (i32.trunc_f64_s (local.get $count)) (i32.lt_s)
-      (if (then
-        (local.set $j (i32.const 0))
-        (loop $copy_char_loop
-          (local.get $j) (local.get $len) (i32.lt_s)
-          (if (then
-            (i32.store8
-              (i32.add (local.get $new_ptr) (i32.add (i32.mul (local.get $i) (local.get $len)) (local.get $j)))
-              (i32.load8_u (i32.add (local.get $ptr) (local.get $j)))
-            )
-            (local.set $j (i32.add (local.get $j) (i32.const 1)))
-            (br $copy_char_loop)
-          ))
-        )
-        (local.set $i (i32.add (local.get $i) (i32.const 1)))
-        (br $repeat_loop)
-      ))
+    (local.get $total_len) (i32.eqz) (if (then (local.get $new_ptr) (return)))
+
+    ;; Doubling: copy the source once, then copy the already filled prefix onto itself
+    (memory.copy (local.get $new_ptr) (local.get $ptr) (local.get $len))
+    (local.set $filled (local.get $len))
+    (block $done
+      (loop $double_loop
+        (i32.shl (local.get $filled) (i32.const 1)) (local.get $total_len) (i32.gt_u) (br_if $done)
+        (memory.copy (i32.add (local.get $new_ptr) (local.get $filled)) (local.get $new_ptr) (local.get $filled))
+        (local.set $filled (i32.shl (local.get $filled) (i32.const 1)))
+        (br $double_loop)
+      )
+    )
+    (memory.copy
+      (i32.add (local.get $new_ptr) (local.get $filled))
+      (local.get $new_ptr)
+      (i32.sub (local.get $total_len) (local.get $filled))
     )
-    (i32.store8 (i32.add (local.get $new_ptr) (local.get $total_len)) (i32.const 0))
     (local.get $new_ptr)
   )
         
 
-  ;; For lists: header layout [len:i32][elem_size:i32][capacity:i32][data...]
+  ;; For lists: header layout [len:i32][elem_size:i32][capacity:i32][head:i32][data...]
+  ;; Element i lives in slot head + i; dequeue only advances head
+  (func $list_alloc (param $size i32) (result i32)
+    (local $ptr i32)
+    (local.set $ptr (call $alloc (local.get $size)))
+    (i32.store (i32.sub (local.get $ptr) (i32.const 4)) (i32.const 2))
+    (local.get $ptr)
+  )
+        
+
   (func $len_list (param $ptr i32) (result f64)
     (f64.convert_i32_u (i32.load (local.get $ptr)))
   )
         
 
   (func $dequeue_op (param $list_ptr i32) (result f64)
-    (local $len i32) (local $elem_size i32) (local $first_elem_val f64)
+    (local $len i32) (local $head i32) (local $first_elem_val f64)
     (local.set $len (i32.load (local.get $list_ptr)))
-    (local.set $elem_size (i32.load (i32.add (local.get $list_ptr) (i32.const 4))))
     (local.get $len) (i32.const 0) (i32.eq) (if (then (f64.const 0) (return)))
+    (local.set $head (i32.load offset=12 (local.get $list_ptr)))
 
-    (local.set $first_elem_val (f64.load (i32.add (local.get $list_ptr) (i32.const 12))))
-
-    (local $new_start i32) (local $old_start i32) (local $num_bytes_to_move i32)
-    (local.set $new_start (i32.add (local.get $list_ptr) (i32.const 12)))
-    (local.set $old_start (i32.add (local.get $new_start) (local.get $elem_size)))
-    (local.set $num_bytes_to_move (i32.mul (i32.sub (local.get $len) (i32.const 1)) (local.get $elem_size)))
+    (i32.load offset=4 (local.get $list_ptr)) (i32.const 4) (i32.eq)
+    (if
+      (then (local.set $first_elem_val (f64.convert_i32_u
+        (i32.load offset=16 (i32.add (local.get $list_ptr) (i32.shl (local.get $head) (i32.const 2)))))))
+      (else (local.set $first_elem_val
+        (f64.load offset=16 (i32.add (local.get $list_ptr) (i32.shl (local.get $head) (i32.const 3))))))
+    )
 
-    (memory.copy (local.get $new_start) (local.get $old_start) (local.get $num_bytes_to_move))
-    (i32.store (local.get $list_ptr) (i32.sub (local.get $len) (i32.const 1)))
+    (local.set $len (i32.sub (local.get $len) (i32.const 1)))
+    (i32.store (local.get $list_ptr) (local.get $len))
+    ;; An emptied queue starts again from slot 0
+    (i32.store offset=12 (local.get $list_ptr)
+      (select (i32.add (local.get $head) (i32.const 1)) (i32.const 0) (local.get $len)))
     (local.get $first_elem_val)
   )
         
 
   (func $list_append (param $list_ptr i32) (param $value f64) (result i32)
-    (local $len i32) (local $elem_size i32) (local $capacity i32) (local $new_list_ptr i32)
+    (local $len i32) (local $elem_size i32) (local $capacity i32) (local $head i32) (local $new_list_ptr i32)
+    (local $slot i32)
     (local.set $len (i32.load (local.get $list_ptr)))
-    (local.set $elem_size (i32.load (i32.add (local.get $list_ptr) (i32.const 4))))
-    (local.set $capacity (i32.load (i32.add (local.get $list_ptr) (i32.const 8))))
+    (local.set $elem_size (i32.load offset=4 (local.get $list_ptr)))
+    (local.set $capacity (i32.load offset=8 (local.get $list_ptr)))
+    (local.set $head (i32.load offset=12 (local.get $list_ptr)))
 
-    (local.get $len) (local.get $capacity) (i32.ge_s)
+    (i32.add (local.get $head) (local.get $len)) (local.get $capacity) (i32.ge_s)
     (if (then
-      (local.get $capacity) (i32.const 0) (i32.eq) (if (then (local.set $capacity (i32.const 4))))
-      (local.set $capacity (i32.mul (local.get $capacity) (i32.const 2)))
+      (i32.mul (local.get $head) (i32.const 2)) (local.get $capacity) (i32.ge_s)
+      (if (then
+        ;; At least half of the buffer was dequeued: compact in place, amortized O(1)
+        (memory.copy
+          (i32.add (local.get $list_ptr) (i32.const 16))
+          (i32.add (i32.add (local.get $list_ptr) (i32.const 16)) (i32.mul (local.get $head) (local.get $elem_size)))
+          (i32.mul (local.get $len) (local.get $elem_size))
+        )
+      ) (else
+        (local.get $capacity) (i32.const 0) (i32.eq) (if (then (local.set $capacity (i32.const 4))))
+        (local.set $capacity (i32.mul (local.get $capacity) (i32.const 2)))
 
-      (call $alloc (i32.add (i32.const 12) (i32.mul (local.get $capacity) (local.get $elem_size))))
-      (local.set $new_list_ptr)
+        (call $list_alloc (i32.add (i32.const 16) (i32.mul (local.get $capacity) (local.get $elem_size))))
+        (local.set $new_list_ptr)
 
-      (memory.copy
-        (local.get $new_list_ptr)
-        (local.get $list_ptr)
-        (i32.add (i32.const 12) (i32.mul (local.get $len) (local.get $elem_size)))
-      )
-      (i32.store (i32.add (local.get $new_list_ptr) (i32.const 8)) (local.get $capacity))
-      (local.set $list_ptr (local.get $new_list_ptr))
+        ;; Only the live elements move; the new buffer starts at slot 0
+        (memory.copy
+          (i32.add (local.get $new_list_ptr) (i32.const 16))
+          (i32.add (i32.add (local.get $list_ptr) (i32.const 16)) (i32.mul (local.get $head) (local.get $elem_size)))
+          (i32.mul (local.get $len) (local.get $elem_size))
+        )
+        ;; The old buffer is not freed: aliases, caller variables and enclosing lists may still
+        ;; point to it. It is reclaimed by the GC (--gc) once unreachable.
+        (i32.store offset=4 (local.get $new_list_ptr) (local.get $elem_size))
+        (i32.store offset=8 (local.get $new_list_ptr) (local.get $capacity))
+        (local.set $list_ptr (local.get $new_list_ptr))
+      ))
+      (local.set $head (i32.const 0))
+      (i32.store offset=12 (local.get $list_ptr) (i32.const 0))
     ))
 
-    (local.get $list_ptr)
-    (i32.const 12) (i32.add)
-    (local.get $len) (local.get $elem_size) (i32.mul) (i32.add)
-    (local.get $value)
-    (f64.store)
+    (local.set $slot
+      (i32.add (local.get $list_ptr) (i32.mul (i32.add (local.get $head) (local.get $len)) (local.get $elem_size))))
+    (local.get $elem_size) (i32.const 4) (i32.eq)
+    (if
+      (then (i32.store offset=16 (local.get $slot) (i32.trunc_f64_u (local.get $value))))
+      (else (f64.store offset=16 (local.get $slot) (local.get $value)))
+    )
     (i32.store (local.get $list_ptr) (i32.add (local.get $len) (i32.const 1)))
     (local.get $list_ptr)
   )
         
-  (table (export "table") 10 funcref)
-  (global $next_table_idx (mut i32) (i32.const 0))
+
+  ;; Preallocation hint: make room for $count more elements after the current tail
+  (func $list_reserve (param $list_ptr i32) (param $count f64) (result i32)
+    (local $len i32) (local $elem_size i32) (local $capacity i32) (local $needed i32) (local $new_list_ptr i32)
+    (local.get $list_ptr) (i32.eqz) (if (then (local.get $list_ptr) (return)))
+    (local.get $count) (f64.const 1.0) (f64.lt) (if (then (local.get $list_ptr) (return)))
+    ;; Hints beyond 2^24 elements are ignored: growth by doubling handles them
+    (local.get $count) (f64.const 16777216.0) (f64.gt) (if (then (local.get $list_ptr) (return)))
+    (local.set $len (i32.load (local.get $list_ptr)))
+    (local.set $elem_size (i32.load offset=4 (local.get $list_ptr)))
+    (local.set $capacity (i32.load offset=8 (local.get $list_ptr)))
+    (local.set $needed (i32.add (local.get $len) (i32.trunc_f64_u (local.get $count))))
+    (i32.add (i32.load offset=12 (local.get $list_ptr)) (local.get $needed)) (local.get $capacity) (i32.le_u)
+    (if (then (local.get $list_ptr) (return)))
+
+    (call $list_alloc (i32.add (i32.const 16) (i32.mul (local.get $needed) (local.get $elem_size))))
+    (local.set $new_list_ptr)
+    (memory.copy
+      (i32.add (local.get $new_list_ptr) (i32.const 16))
+      (i32.add (i32.add (local.get $list_ptr) (i32.const 16))
+        (i32.mul (i32.load offset=12 (local.get $list_ptr)) (local.get $elem_size)))
+      (i32.mul (local.get $len) (local.get $elem_size))
+    )
+    ;; As in $list_append, the old buffer may still be referenced and is left to the GC
+    (i32.store (local.get $new_list_ptr) (local.get $len))
+    (i32.store offset=4 (local.get $new_list_ptr) (local.get $elem_size))
+    (i32.store offset=8 (local.get $new_list_ptr) (local.get $needed))
+    (i32.store offset=12 (local.get $new_list_ptr) (i32.const 0))
+    (local.get $new_list_ptr)
+  )
+        
+
+  ;; Heap statistics for the host
+  (func (export "heap_live_bytes") (result i32) (global.get $heap_live_bytes))
+  (func (export "heap_size_bytes") (result i32) (i32.sub (global.get $next_mem_addr) (global.get $heap_base)))
+  (func (export "gc_collections") (result i32) (global.get $gc_collections))
+        
+  (table (export "table") 1 funcref)
   (global $queue (mut i32) (i32.const 0))
   (global $first_element (mut f64) (f64.const 0.0))
   (global $index (mut f64) (f64.const 0.0))
   (global $list_length (mut f64) (f64.const 0.0))
-  (global $i (mut f64) (f64.const 0.0))
-  (func $main
-    (local $tmp_i32_0 i32)
-    (local $tmp_i32_1 i32)
-    (local $tmp_f64_0 f64)
-    (local $tmp_f64_1 f64)
   (func $print_list  (param $msg i32) (param $l i32) (result f64)
+    (local $write_arg_0_f64 f64)
+    (local $write_arg_1_f64 f64)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (local.get $msg)
+    (f64.convert_i32_u)
     (local.get $l)
+    (f64.convert_i32_u)
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_f64)
+    (local.get $write_arg_0_f64)
     (drop)
+    (local.get $write_arg_1_f64)
     (drop)
     (local.get $l)
+    (f64.convert_i32_u)
     (i32.trunc_f64_s)
     (call $len_list)
     (return)
   )
+  (func $main
+    (local $write_arg_0_i32 i32)
+    (local $write_arg_1_f64 f64)
+    (local $write_arg_2_i32 i32)
+    (local $write_arg_3_i32 i32)
+    (local $i f64)
+    (local $for_counter_5 i32)
+    (local $for_end_5 i32)
+    (local $write_arg_0_f64 f64)
+    (local $switch_subject_6 f64)
+    (local $tmp_i32_0 i32)
+    (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
+    (local $tmp_f64_0 f64)
+    (local $tmp_f64_1 f64)
     (f64.const 10.0)
     (f64.const 20.0)
     (f64.const 30.0)
-    (i32.const 44)
-    (call $alloc)
+    (i32.const 48)
+    (call $list_alloc)
     (local.set $tmp_i32_0)
     (local.get $tmp_i32_0)
     (i32.const 3)
@@ -236,17 +361,20 @@
     (i32.const 4)
     (i32.store)
     (local.get $tmp_i32_0)
-    (i32.const 12)
-    (i32.add)
-    (f64.store)
+    (i32.const 0)
+    (i32.store offset=12)
+    (local.set $tmp_f64_0)
     (local.get $tmp_i32_0)
-    (i32.const 20)
-    (i32.add)
-    (f64.store)
+    (local.get $tmp_f64_0)
+    (f64.store offset=32)
+    (local.set $tmp_f64_0)
     (local.get $tmp_i32_0)
-    (i32.const 28)
-    (i32.add)
-    (f64.store)
+    (local.get $tmp_f64_0)
+    (f64.store offset=24)
+    (local.set $tmp_f64_0)
+    (local.get $tmp_i32_0)
+    (local.get $tmp_f64_0)
+    (f64.store offset=16)
     (local.get $tmp_i32_0)
     (global.set $queue)
     (global.get $queue)
@@ -254,37 +382,41 @@
     (i32.trunc_f64_s)
     (call $dequeue_op)
     (global.set $first_element)
-    (i32.const 0)
+    (i32.const 4)
     (global.get $first_element)
-    (i32.const 25)
+    (i32.const 32)
     (global.get $queue)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_3_i32)
+    (local.set $write_arg_2_i32)
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (drop)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.get $write_arg_2_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_3_i32)
     (drop)
     (f64.const 0.0)
     (global.set $index)
@@ -292,24 +424,45 @@
       (loop $dountil_loop_2
     (global.get $queue)
     (global.get $index)
-    (local.set $tmp_f64_0)
+    (i32.trunc_f64_s)
+    (local.set $tmp_i32_1)
     (local.set $tmp_i32_0)
     (local.get $tmp_i32_0)
-    (i32.const 12)
+    (i32.load offset=4)
+    (i32.const 4)
+    (i32.eq)
+    (if (result f64)
+      (then
+    (local.get $tmp_i32_0)
+    (local.get $tmp_i32_0)
+    (i32.load offset=12)
+    (local.get $tmp_i32_1)
     (i32.add)
-    (local.get $tmp_f64_0)
-    (i32.trunc_f64_s)
-    (i32.const 8)
-    (i32.mul)
+    (i32.const 2)
+    (i32.shl)
     (i32.add)
-    (f64.load)
+    (i32.load offset=16)
+    (f64.convert_i32_u)
+      )
+      (else
+    (local.get $tmp_i32_0)
+    (local.get $tmp_i32_0)
+    (i32.load offset=12)
+    (local.get $tmp_i32_1)
+    (i32.add)
+    (i32.const 3)
+    (i32.shl)
+    (i32.add)
+    (f64.load offset=16)
+      )
+    )
     (f64.const 2.0)
     (f64.mul)
-    (i32.trunc_f64_s)
+    (i32.trunc_f64_u)
     (global.set $queue)
     (global.get $index)
-    (i32.const 44)
-    (call $alloc)
+    (i32.const 48)
+    (call $list_alloc)
     (local.set $tmp_i32_0)
     (local.get $tmp_i32_0)
     (i32.const 1)
@@ -325,9 +478,12 @@
     (i32.const 4)
     (i32.store)
     (local.get $tmp_i32_0)
-    (i32.const 12)
-    (i32.add)
-    (f64.store)
+    (i32.const 0)
+    (i32.store offset=12)
+    (local.set $tmp_f64_0)
+    (local.get $tmp_i32_0)
+    (local.get $tmp_f64_0)
+    (f64.store offset=16)
     (local.get $tmp_i32_0)
     (global.get $index)
     (f64.const 1.0)
@@ -339,113 +495,151 @@
     (i32.trunc_f64_s)
     (call $len_list)
     (f64.ge)
-    (f64.convert_i32_u)
-        (f64.const 0.0)
-        (f64.ne)
         (br_if $dountil_block_1)
         (br $dountil_loop_2)
       )
     )
-    (i32.const 39)
+    (i32.const 52)
     (global.get $queue)
     (call $print_list)
     (global.set $list_length)
-    (i32.const 64)
+    (i32.const 80)
     (global.get $list_length)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (call $write_num)
-    (local.set $tmp_f64_0)
-    (local.set $i)
+    (i32.const 0)
+    (global.get $list_length)
+    (f64.floor)
+    (f64.const 2147483646.0)
+    (f64.min)
+    (i32.trunc_sat_f64_s)
+    (local.set $for_end_5)
+    (local.set $for_counter_5)
     (block $for_block_3
       (loop $for_loop_4
-        (local.get $i)
-        (local.get $tmp_f64_0)
-        (f64.gt)
+        (local.get $for_counter_5)
+        (local.get $for_end_5)
+        (i32.gt_s)
         (br_if $for_block_3)
-    (f64.const 0.0)
-    (global.get $list_length)
-    (global.get $i)
+        (block $for_continue_5
+    (local.get $for_counter_5)
+    (f64.convert_i32_s)
+    (local.set $write_arg_0_f64)
+    (local.get $write_arg_0_f64)
     (call $write_num)
-        (local.get $i)
-        (f64.const 1.0)
-        (f64.add)
-        (local.set $i)
+        )
+        (local.get $for_counter_5)
+        (i32.const 1)
+        (i32.add)
+        (local.set $for_counter_5)
         (br $for_loop_4)
       )
     )
+    (local.get $for_counter_5)
+    (f64.convert_i32_s)
+    (local.set $i)
     (global.get $list_length)
-    (f64.const 0.0)
-    (i32.const 77)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $switch_subject_6)
+    (block $switch_end_6
+    (block $switch_default_7
+    (block $switch_case_10
+    (block $switch_case_9
+    (block $switch_case_8
+    (local.get $switch_subject_6)
+    (f64.floor)
+    (local.get $switch_subject_6)
+    (f64.ne)
+    (br_if $switch_default_7)
+    (local.get $switch_subject_6)
+    (f64.const 0)
+    (f64.lt)
+    (br_if $switch_default_7)
+    (local.get $switch_subject_6)
+    (f64.const 2)
+    (f64.gt)
+    (br_if $switch_default_7)
+    (local.get $switch_subject_6)
+    (i32.trunc_f64_u)
+    (br_table $switch_case_8 $switch_case_9 $switch_case_10 $switch_default_7)
+    )
+    (i32.const 96)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
-    (f64.const 1.0)
-    (i32.const 95)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (br $switch_end_6)
+    )
+    (i32.const 120)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
-    (f64.const 2.0)
-    (i32.const 120)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (br $switch_end_6)
+    )
+    (i32.const 148)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
-    (i32.const 146)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (br $switch_end_6)
+    )
+    (i32.const 180)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    )
     (return)
   )
-(export "run" (func $main))
+  (export "run" (func $main))
 )
\ No newline at end of file
@@ -1,54 +1,109 @@
 (module
-  (type $func_type_2427529893760197770 (func (param f64) (result f64)))
+  (type $func_type_f64_to_f64 (func (param f64) (result f64)))
   (import "env" "write_num" (func $write_num (param f64)))
   (import "env" "write_char" (func $write_char (param i32)))
   (import "env" "read_num" (func $read_num (result f64)))
   (import "env" "f64_to_string" (func $f64_to_string (param f64) (result i32)))
   (memory (export "memory") 1)
-  (data (i32.const 0) "Processing value: \00")
-  (data (i32.const 19) "Modified\00")
-  (data (i32.const 28) "Processing list and value: \00")
-  (data (i32.const 56) "Original\00")
-  (data (i32.const 65) "New value: \00")
-  (data (i32.const 77) "Global var after call: \00")
-  (data (i32.const 101) "List after call: \00")
-  (data (i32.const 119) "Data after call: \00")
-  (data (i32.const 137) "Global\00")
-  (data (i32.const 144) "Local\00")
-  (data (i32.const 150) "Inside block: \00")
-  (data (i32.const 165) "Outside block: \00")
-  (data (i32.const 181) "\5cn=== Lambda Demo ===\00")
-  (data (i32.const 203) "5 + 10 = \00")
-  (data (i32.const 213) "9 squared is \00")
-  (data (i32.const 227) "Calculated size of my_list (with closure): \00")
-  (global $next_mem_addr (mut i32) (i32.const 0))
+  (data (i32.const 0) "\12\00\00\00Processing value: ")
+  (data (i32.const 24) "\08\00\00\00Modified")
+  (data (i32.const 36) "\1b\00\00\00Processing list and value: ")
+  (data (i32.const 68) "\08\00\00\00Original")
+  (data (i32.const 80) "\0b\00\00\00New value: ")
+  (data (i32.const 96) "\17\00\00\00Global var after call: ")
+  (data (i32.const 124) "\11\00\00\00List after call: ")
+  (data (i32.const 148) "\11\00\00\00Data after call: ")
+  (data (i32.const 172) "\06\00\00\00Global")
+  (data (i32.const 184) "\05\00\00\00Local")
+  (data (i32.const 196) "\0e\00\00\00Inside block: ")
+  (data (i32.const 216) "\0f\00\00\00Outside block: ")
+  (data (i32.const 236) "\15\00\00\00\5cn=== Lambda Demo ===")
+  (data (i32.const 264) "\09\00\00\005 + 10 = ")
+  (data (i32.const 280) "\0d\00\00\009 squared is ")
+  (data (i32.const 300) "+\00\00\00Calculated size of my_list (with closure): ")
+  (global $free_lists i32 (i32.const 352))
+  (global $heap_base i32 (i32.const 464))
+  (global $next_mem_addr (mut i32) (i32.const 464))
+  (global $heap_live_bytes (mut i32) (i32.const 0))
+  (global $gc_collections (mut i32) (i32.const 0))
 
+  ;; Size-class allocator: block = [header:i32][next_free | kind:i32][payload...], block size is 16 << class.
+  ;; Header: bits 0-4 size class, bit 8 allocated, bit 9 GC mark. Kind of live blocks: 0 raw, 1 string, 2 list, 3 struct.
+  ;; Freed blocks go to per-class free lists (heads at $free_lists) and are reused before bumping.
+  ;; Memory grows at least by its current size.
   (func $alloc (param $size i32) (result i32)
-    (local $ptr i32)
-    (global.get $next_mem_addr)
-    (local.set $ptr)
-    (global.get $next_mem_addr)
-    (local.get $size)
-    (i32.add)
-    (global.set $next_mem_addr)
-    (local.get $ptr)
+    (local $class i32) (local $head_addr i32) (local $block i32)
+    ;; Smallest class whose block holds the 8-byte header and $size bytes
+    (local.set $class (i32.sub (i32.const 32) (i32.clz (i32.shr_u (i32.add (local.get $size) (i32.const 7)) (i32.const 4)))))
+    (local.set $head_addr (i32.add (global.get $free_lists) (i32.shl (local.get $class) (i32.const 2))))
+    (local.set $block (i32.load (local.get $head_addr)))
+    (local.get $block)
+    (if (then
+      (i32.store (local.get $head_addr) (i32.load offset=4 (local.get $block)))
+    ) (else
+      (local.set $block (call $heap_bump (local.get $class)))
+    ))
+    (i32.store (local.get $block) (i32.or (local.get $class) (i32.const 256)))
+    (i32.store offset=4 (local.get $block) (i32.const 0))
+    (global.set $heap_live_bytes (i32.add (global.get $heap_live_bytes) (i32.shl (i32.const 16) (local.get $class))))
+    (i32.add (local.get $block) (i32.const 8))
+  )
+        
+
+  (func $heap_bump (param $class i32) (result i32)
+    (local $block i32) (local $end i32) (local $needed_pages i32)
+    (local.set $block (global.get $next_mem_addr))
+    (local.set $end (i32.add (local.get $block) (i32.shl (i32.const 16) (local.get $class))))
+    (local.get $end) (i32.shl (memory.size) (i32.const 16)) (i32.gt_u)
+    (if (then
+      (local.set $needed_pages
+        (i32.shr_u (i32.add (i32.sub (local.get $end) (i32.shl (memory.size) (i32.const 16))) (i32.const 65535)) (i32.const 16)))
+      (memory.grow (select (memory.size) (local.get $needed_pages) (i32.gt_u (memory.size) (local.get $needed_pages))))
+      (i32.const -1) (i32.eq)
+      (if (then
+        ;; Not enough memory for doubling: try the exact amount before giving up
+        (memory.grow (local.get $needed_pages)) (i32.const -1) (i32.eq) (if (then (unreachable)))
+      ))
+    ))
+    (global.set $next_mem_addr (local.get $end))
+    (local.get $block)
   )
         
 
+  (func $free (param $ptr i32)
+    (local $block i32) (local $class i32) (local $head_addr i32)
+    (local.get $ptr) (i32.eqz) (if (then (return)))
+    (local.set $block (i32.sub (local.get $ptr) (i32.const 8)))
+    ;; Block is already free: nothing to do
+    (i32.and (i32.load (local.get $block)) (i32.const 256)) (i32.eqz) (if (then (return)))
+    (local.set $class (i32.and (i32.load (local.get $block)) (i32.const 31)))
+    (i32.store (local.get $block) (local.get $class))
+    (global.set $heap_live_bytes (i32.sub (global.get $heap_live_bytes) (i32.shl (i32.const 16) (local.get $class))))
+    (local.set $head_addr (i32.add (global.get $free_lists) (i32.shl (local.get $class) (i32.const 2))))
+    (i32.store offset=4 (local.get $block) (i32.load (local.get $head_addr)))
+    (i32.store (local.get $head_addr) (local.get $block))
+  )
+        
+
+  ;; For strings: [len:i32][bytes...], pointer refers to the first byte, length is at ptr - 4.
+  ;; Host f64_to_string must return a string in the same layout.
   (func $string_len (param $ptr i32) (result i32)
-    (local $len i32)
-    (local.set $len (i32.const 0))
-    (loop $len_loop
-      (block
-        (i32.load8_u (i32.add (local.get $ptr) (local.get $len)))
-        (i32.const 0)
-        (i32.eq)
-        (br_if 1)
-      )
-      (local.set $len (i32.add (local.get $len) (i32.const 1)))
-      (br $len_loop)
-    )
-    (local.get $len)
+    (i32.load (i32.sub (local.get $ptr) (i32.const 4)))
+  )
+        
+
+  (func $string_alloc (param $len i32) (result i32)
+    (local $ptr i32)
+    (local.set $ptr (call $alloc (i32.add (local.get $len) (i32.const 4))))
+    (i32.store (i32.sub (local.get $ptr) (i32.const 4)) (i32.const 1))
+    (i32.store (local.get $ptr) (local.get $len))
+    (i32.add (local.get $ptr) (i32.const 4))
+  )
+        
+
+  ;; Only for heap strings (concat/repeat results), never for literals in data segments
+  (func $string_free (param $ptr i32)
+    (call $free (i32.sub (local.get $ptr) (i32.const 4)))
   )
         
 
@@ -71,150 +126,202 @@
         
 
   (func $string_concat (param $val1 f64) (param $val2 f64) (result i32)
-    (local $ptr1 i32) (local $ptr2 i32) (local $len1 i32) (local $len2 i32) (local $new_ptr i32) (local $i i32)
+    (local $ptr1 i32) (local $ptr2 i32) (local $len1 i32) (local $len2 i32) (local $new_ptr i32)
 
     ;; Heuristic: if val in [1..2^32-1], treat it as pointer; else convert number to string
     (local.get $val1) (i32.trunc_f64_s) (local.set $ptr1)
-    (local.get $val1) (f64.convert_i32_u) (f64.eq) (if (else
+    (local.get $ptr1) (f64.convert_i32_u) (local.get $val1) (f64.eq) (if (then) (else
       (local.get $val1) (call $f64_to_string) (local.set $ptr1)
     ))
 
     (local.get $val2) (i32.trunc_f64_s) (local.set $ptr2)
-    (local.get $val2) (f64.convert_i32_u) (f64.eq) (if (else
+    (local.get $ptr2) (f64.convert_i32_u) (local.get $val2) (f64.eq) (if (then) (else
       (local.get $val2) (call $f64_to_string) (local.set $ptr2)
     ))
 
     (local.set $len1 (call $string_len (local.get $ptr1)))
     (local.set $len2 (call $string_len (local.get $ptr2)))
-    (call $alloc (i32.add (local.get $len1) (i32.add (local.get $len2) (i32.const 1))))
+    (call $string_alloc (i32.add (local.get $len1) (local.get $len2)))
     (local.set $new_ptr)
-    (local.set $i (i32.const 0))
-    (loop $copy_loop_1
-      (local.get $i) (local.get $len1) (i32.lt_s)
-      (if (then
-        (i32.store8 (i32.add (local.get $new_ptr) (local.get $i)) (i32.load8_u (i32.add (local.get $ptr1) (local.get $i))))
-        (local.set $i (i32.add (local.get $i) (i32.const 1)))
-        (br $copy_loop_1)
-      ))
-    )
-    (local.set $i (i32.const 0))
-    (loop $copy_loop_2
-      (local.get $i) (local.get $len2) (i32.lt_s)
-      (if (then
-        (i32.store8 (i32.add (local.get $new_ptr) (i32.add (local.get $len1) (local.get $i))) (i32.load8_u (i32.add (local.get $ptr2) (local.get $i))))
-        (local.set $i (i32.add (local.get $i) (i32.const 1)))
-        (br $copy_loop_2)
-      ))
-    )
-    (i32.store8 (i32.add (local.get $new_ptr) (i32.add (local.get $len1) (local.get $len2))) (i32.const 0))
+    (memory.copy (local.get $new_ptr) (local.get $ptr1) (local.get $len1))
+    (memory.copy (i32.add (local.get $new_ptr) (local.get $len1)) (local.get $ptr2) (local.get $len2))
     (local.get $new_ptr)
   )
         
 
   (func $string_repeat (param $ptr i32) (param $count f64) (result i32)
-    (local $len i32) (local $total_len i32) (local $new_ptr i32) (local $i i32) (local $j i32)
+    (local $len i32) (local $times i32) (local $total_len i32) (local $new_ptr i32) (local $filled i32)
     (local.set $len (call $string_len (local.get $ptr)))
-    (local.set $total_len (i32.mul (local.get $len) (i32.trunc_f64_s (local.get $count))))
-    (call $alloc (i32.add (local.get $total_len) (i32.const 1)))
+    (local.set $times (i32.trunc_f64_s (local.get $count)))
+    (local.get $times) (i32.const 0) (i32.lt_s) (if (then (local.set $times (i32.const 0))))
+    (local.set $total_len (i32.mul (local.get $len) (local.get $times)))
+    (call $string_alloc (local.get $total_len))
     (local.set $new_ptr)
-    (local.set $i (i32.const 0))
-    (loop $repeat_loop
-      (local.get $i) (i32.trunc_f64_s (local.get $count)) (i32.lt_s)
-      (if (then
-        (local.set $j (i32.const 0))
-        (loop $copy_char_loop
-          (local.get $j) (local.get $len) (i32.lt_s)
-          (if (then
-            (i32.store8
-              (i32.add (local.get $new_ptr) (i32.add (i32.mul (local.get $i) (local.get $len)) (local.get $j)))
-              (i32.load8_u (i32.add (local.get $ptr) (local.get $j)))
-            )
-            (local.set $j (i32.add (local.get $j) (i32.const 1)))
-            (br $copy_char_loop)
-          ))
-        )
-        (local.set $i (i32.add (local.get $i) (i32.const 1)))
-        (br $repeat_loop)
-      ))
+    (local.get $total_len) (i32.eqz) (if (then (local.get $new_ptr) (return)))
+
+    ;; Doubling: copy the source once, then copy the already filled prefix onto itself
+    (memory.copy (local.get $new_ptr) (local.get $ptr) (local.get $len))
+    (local.set $filled (local.get $len))
+    (block $done
+      (loop $double_loop
+        (i32.shl (local.get $filled) (i32.const 1)) (local.get $total_len) (i32.gt_u) (br_if $done)
+        (memory.copy (i32.add (local.get $new_ptr) (local.get $filled)) (local.get $new_ptr) (local.get $filled))
+        (local.set $filled (i32.shl (local.get $filled) (i32.const 1)))
+        (br $double_loop)
+      )
+    )
+    (memory.copy
+      (i32.add (local.get $new_ptr) (local.get $filled))
+      (local.get $new_ptr)
+      (i32.sub (local.get $total_len) (local.get $filled))
     )
-    (i32.store8 (i32.add (local.get $new_ptr) (local.get $total_len)) (i32.const 0))
     (local.get $new_ptr)
   )
         
 
-  ;; For lists: header layout [len:i32][elem_size:i32][capacity:i32][data...]
+  ;; For lists: header layout [len:i32][elem_size:i32][capacity:i32][head:i32][data...]
+  ;; Element i lives in slot head + i; dequeue only advances head
+  (func $list_alloc (param $size i32) (result i32)
+    (local $ptr i32)
+    (local.set $ptr (call $alloc (local.get $size)))
+    (i32.store (i32.sub (local.get $ptr) (i32.const 4)) (i32.const 2))
+    (local.get $ptr)
+  )
+        
+
   (func $len_list (param $ptr i32) (result f64)
     (f64.convert_i32_u (i32.load (local.get $ptr)))
   )
         
 
   (func $dequeue_op (param $list_ptr i32) (result f64)
-    (local $len i32) (local $elem_size i32) (local $first_elem_val f64)
+    (local $len i32) (local $head i32) (local $first_elem_val f64)
     (local.set $len (i32.load (local.get $list_ptr)))
-    (local.set $elem_size (i32.load (i32.add (local.get $list_ptr) (i32.const 4))))
     (local.get $len) (i32.const 0) (i32.eq) (if (then (f64.const 0) (return)))
+    (local.set $head (i32.load offset=12 (local.get $list_ptr)))
 
-    (local.set $first_elem_val (f64.load (i32.add (local.get $list_ptr) (i32.const 12))))
-
-    (local $new_start i32) (local $old_start i32) (local $num_bytes_to_move i32)
-    (local.set $new_start (i32.add (local.get $list_ptr) (i32.const 12)))
-    (local.set $old_start (i32.add (local.get $new_start) (local.get $elem_size)))
-    (local.set $num_bytes_to_move (i32.mul (i32.sub (local.get $len) (i32.const 1)) (local.get $elem_size)))
+    (i32.load offset=4 (local.get $list_ptr)) (i32.const 4) (i32.eq)
+    (if
+      (then (local.set $first_elem_val (f64.convert_i32_u
+        (i32.load offset=16 (i32.add (local.get $list_ptr) (i32.shl (local.get $head) (i32.const 2)))))))
+      (else (local.set $first_elem_val
+        (f64.load offset=16 (i32.add (local.get $list_ptr) (i32.shl (local.get $head) (i32.const 3))))))
+    )
 
-    (memory.copy (local.get $new_start) (local.get $old_start) (local.get $num_bytes_to_move))
-    (i32.store (local.get $list_ptr) (i32.sub (local.get $len) (i32.const 1)))
+    (local.set $len (i32.sub (local.get $len) (i32.const 1)))
+    (i32.store (local.get $list_ptr) (local.get $len))
+    ;; An emptied queue starts again from slot 0
+    (i32.store offset=12 (local.get $list_ptr)
+      (select (i32.add (local.get $head) (i32.const 1)) (i32.const 0) (local.get $len)))
     (local.get $first_elem_val)
   )
         
 
   (func $list_append (param $list_ptr i32) (param $value f64) (result i32)
-    (local $len i32) (local $elem_size i32) (local $capacity i32) (local $new_list_ptr i32)
+    (local $len i32) (local $elem_size i32) (local $capacity i32) (local $head i32) (local $new_list_ptr i32)
+    (local $slot i32)
     (local.set $len (i32.load (local.get $list_ptr)))
-    (local.set $elem_size (i32.load (i32.add (local.get $list_ptr) (i32.const 4))))
-    (local.set $capacity (i32.load (i32.add (local.get $list_ptr) (i32.const 8))))
+    (local.set $elem_size (i32.load offset=4 (local.get $list_ptr)))
+    (local.set $capacity (i32.load offset=8 (local.get $list_ptr)))
+    (local.set $head (i32.load offset=12 (local.get $list_ptr)))
 
-    (local.get $len) (local.get $capacity) (i32.ge_s)
+    (i32.add (local.get $head) (local.get $len)) (local.get $capacity) (i32.ge_s)
     (if (then
-      (local.get $capacity) (i32.const 0) (i32.eq) (if (then (local.set $capacity (i32.const 4))))
-      (local.set $capacity (i32.mul (local.get $capacity) (i32.const 2)))
+      (i32.mul (local.get $head) (i32.const 2)) (local.get $capacity) (i32.ge_s)
+      (if (then
+        ;; At least half of the buffer was dequeued: compact in place, amortized O(1)
+        (memory.copy
+          (i32.add (local.get $list_ptr) (i32.const 16))
+          (i32.add (i32.add (local.get $list_ptr) (i32.const 16)) (i32.mul (local.get $head) (local.get $elem_size)))
+          (i32.mul (local.get $len) (local.get $elem_size))
+        )
+      ) (else
+        (local.get $capacity) (i32.const 0) (i32.eq) (if (then (local.set $capacity (i32.const 4))))
+        (local.set $capacity (i32.mul (local.get $capacity) (i32.const 2)))
 
-      (call $alloc (i32.add (i32.const 12) (i32.mul (local.get $capacity) (local.get $elem_size))))
-      (local.set $new_list_ptr)
+        (call $list_alloc (i32.add (i32.const 16) (i32.mul (local.get $capacity) (local.get $elem_size))))
+        (local.set $new_list_ptr)
 
-      (memory.copy
-        (local.get $new_list_ptr)
-        (local.get $list_ptr)
-        (i32.add (i32.const 12) (i32.mul (local.get $len) (local.get $elem_size)))
-      )
-      (i32.store (i32.add (local.get $new_list_ptr) (i32.const 8)) (local.get $capacity))
-      (local.set $list_ptr (local.get $new_list_ptr))
+        ;; Only the live elements move; the new buffer starts at slot 0
+        (memory.copy
+          (i32.add (local.get $new_list_ptr) (i32.const 16))
+          (i32.add (i32.add (local.get $list_ptr) (i32.const 16)) (i32.mul (local.get $head) (local.get $elem_size)))
+          (i32.mul (local.get $len) (local.get $elem_size))
+        )
+        ;; The old buffer is not freed: aliases, caller variables and enclosing lists may still
+        ;; point to it. It is reclaimed by the GC (--gc) once unreachable.
+        (i32.store offset=4 (local.get $new_list_ptr) (local.get $elem_size))
+        (i32.store offset=8 (local.get $new_list_ptr) (local.get $capacity))
+        (local.set $list_ptr (local.get $new_list_ptr))
+      ))
+      (local.set $head (i32.const 0))
+      (i32.store offset=12 (local.get $list_ptr) (i32.const 0))
     ))
 
-    (local.get $list_ptr)
-    (i32.const 12) (i32.add)
-    (local.get $len) (local.get $elem_size) (i32.mul) (i32.add)
-    (local.get $value)
-    (f64.store)
+    (local.set $slot
+      (i32.add (local.get $list_ptr) (i32.mul (i32.add (local.get $head) (local.get $len)) (local.get $elem_size))))
+    (local.get $elem_size) (i32.const 4) (i32.eq)
+    (if
+      (then (i32.store offset=16 (local.get $slot) (i32.trunc_f64_u (local.get $value))))
+      (else (f64.store offset=16 (local.get $slot) (local.get $value)))
+    )
     (i32.store (local.get $list_ptr) (i32.add (local.get $len) (i32.const 1)))
     (local.get $list_ptr)
   )
         
-  (table (export "table") 10 funcref)
-  (global $next_table_idx (mut i32) (i32.const 0))
+
+  ;; Preallocation hint: make room for $count more elements after the current tail
+  (func $list_reserve (param $list_ptr i32) (param $count f64) (result i32)
+    (local $len i32) (local $elem_size i32) (local $capacity i32) (local $needed i32) (local $new_list_ptr i32)
+    (local.get $list_ptr) (i32.eqz) (if (then (local.get $list_ptr) (return)))
+    (local.get $count) (f64.const 1.0) (f64.lt) (if (then (local.get $list_ptr) (return)))
+    ;; Hints beyond 2^24 elements are ignored: growth by doubling handles them
+    (local.get $count) (f64.const 16777216.0) (f64.gt) (if (then (local.get $list_ptr) (return)))
+    (local.set $len (i32.load (local.get $list_ptr)))
+    (local.set $elem_size (i32.load offset=4 (local.get $list_ptr)))
+    (local.set $capacity (i32.load offset=8 (local.get $list_ptr)))
+    (local.set $needed (i32.add (local.get $len) (i32.trunc_f64_u (local.get $count))))
+    (i32.add (i32.load offset=12 (local.get $list_ptr)) (local.get $needed)) (local.get $capacity) (i32.le_u)
+    (if (then (local.get $list_ptr) (return)))
+
+    (call $list_alloc (i32.add (i32.const 16) (i32.mul (local.get $needed) (local.get $elem_size))))
+    (local.set $new_list_ptr)
+    (memory.copy
+      (i32.add (local.get $new_list_ptr) (i32.const 16))
+      (i32.add (i32.add (local.get $list_ptr) (i32.const 16))
+        (i32.mul (i32.load offset=12 (local.get $list_ptr)) (local.get $elem_size)))
+      (i32.mul (local.get $len) (local.get $elem_size))
+    )
+    ;; As in $list_append, the old buffer may still be referenced and is left to the GC
+    (i32.store (local.get $new_list_ptr) (local.get $len))
+    (i32.store offset=4 (local.get $new_list_ptr) (local.get $elem_size))
+    (i32.store offset=8 (local.get $new_list_ptr) (local.get $needed))
+    (i32.store offset=12 (local.get $new_list_ptr) (i32.const 0))
+    (local.get $new_list_ptr)
+  )
+        
+
+  ;; Heap statistics for the host
+  (func (export "heap_live_bytes") (result i32) (global.get $heap_live_bytes))
+  (func (export "heap_size_bytes") (result i32) (i32.sub (global.get $next_mem_addr) (global.get $heap_base)))
+  (func (export "gc_collections") (result i32) (global.get $gc_collections))
+        
+  (table (export "table") 5 funcref)
   (global $global_var (mut f64) (f64.const 0.0))
   (global $my_list (mut i32) (i32.const 0))
   (global $data_to_change (mut i32) (i32.const 0))
   (global $new_value (mut f64) (f64.const 0.0))
   (global $shadowing_var (mut i32) (i32.const 0))
   (global $increment_fn (mut i32) (i32.const 0))
-  (global $result_temp (mut ) (i32.const 0))
-  (global $squared (mut ) (i32.const 0))
+  (global $result_temp (mut f64) (f64.const 0.0))
+  (global $squared (mut f64) (f64.const 0.0))
   (global $sum_squares (mut i32) (i32.const 0))
   (global $list_transformer (mut i32) (i32.const 0))
-  (global $calculated_size (mut ) (i32.const 0))
+  (global $calculated_size (mut f64) (f64.const 0.0))
   (func $lambda_1 (param $x f64) (result f64)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (local.get $x)
@@ -222,11 +329,11 @@
     (f64.add)
     (return)
   )
-  (elem (global.get $next_table_idx) (ref.func $lambda_1))
-  (global.set $next_table_idx (i32.add (global.get $next_table_idx) (i32.const 1)))
+  (elem (i32.const 1) func $lambda_1)
   (func $lambda_2 (param $x f64) (result f64)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (local.get $x)
@@ -234,11 +341,13 @@
     (f64.mul)
     (return)
   )
-  (elem (global.get $next_table_idx) (ref.func $lambda_2))
-  (global.set $next_table_idx (i32.add (global.get $next_table_idx) (i32.const 1)))
+  (elem (i32.const 2) func $lambda_2)
   (func $lambda_3 (param $a f64) (param $b f64) 
+    (local $sum_val f64)
+    (local $result_val f64)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (local.get $a)
@@ -253,11 +362,11 @@
     (return)
     (return)
   )
-  (elem (global.get $next_table_idx) (ref.func $lambda_3))
-  (global.set $next_table_idx (i32.add (global.get $next_table_idx) (i32.const 1)))
+  (elem (i32.const 3) func $lambda_3)
   (func $lambda_4 (param $list_len f64) (result f64)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (local.get $list_len)
@@ -267,89 +376,107 @@
     (f64.add)
     (return)
   )
-  (elem (global.get $next_table_idx) (ref.func $lambda_4))
-  (global.set $next_table_idx (i32.add (global.get $next_table_idx) (i32.const 1)))
-  (func $main
-    (local $tmp_i32_0 i32)
-    (local $tmp_i32_1 i32)
-    (local $tmp_f64_0 f64)
-    (local $tmp_f64_1 f64)
+  (elem (i32.const 4) func $lambda_4)
   (func $process_data  (param $x f64) (result f64)
     (local $result f64)
+    (local $write_arg_0_i32 i32)
+    (local $write_arg_1_f64 f64)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (local.get $x)
     (f64.const 2.0)
     (f64.mul)
     (local.set $result)
-    (i32.const 0)
+    (i32.const 4)
     (local.get $result)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (drop)
     (local.get $result)
     (return)
   )
-  (func $process_data  (param $x f64) (result f64)
-    (local $lst f64)
-    (local $value f64)
+  (func $process_data@2  (param $lst i32) (param $value i32) 
+    (local $write_arg_0_i32 i32)
+    (local $write_arg_1_f64 f64)
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (local.get $lst)
+    (f64.convert_i32_u)
     (local.get $value)
-    (i32.trunc_f64_s)
+    (f64.convert_i32_u)
+    (local.set $tmp_f64_1)
+    (i32.trunc_f64_u)
+    (local.get $tmp_f64_1)
     (call $list_append)
-    (i32.const 19)
-    (local.set $value)
+    (local.set $lst)
     (i32.const 28)
+    (local.set $value)
+    (i32.const 40)
     (local.get $lst)
     (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (drop)
   )
   (func $apply_transform  (param $data f64) (param $transformer i32) 
     (local $tmp_i32_0 i32)
     (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
     (local $tmp_f64_0 f64)
     (local $tmp_f64_1 f64)
     (local.get $data)
     (local.get $transformer)
-    (call_indirect (type $func_type_2427529893760197770))
+    (call_indirect (type $func_type_f64_to_f64))
     (return)
   )
+  (func $main
+    (local $write_arg_0_i32 i32)
+    (local $write_arg_1_f64 f64)
+    (local $write_arg_1_i32 i32)
+    (local $tmp_i32_0 i32)
+    (local $tmp_i32_1 i32)
+    (local $tmp_i32_2 i32)
+    (local $tmp_f64_0 f64)
+    (local $tmp_f64_1 f64)
     (f64.const 100.0)
     (global.set $global_var)
     (f64.const 1.0)
     (f64.const 2.0)
     (f64.const 3.0)
-    (i32.const 44)
-    (call $alloc)
+    (i32.const 48)
+    (call $list_alloc)
     (local.set $tmp_i32_0)
     (local.get $tmp_i32_0)
     (i32.const 3)
@@ -365,185 +492,190 @@
     (i32.const 4)
     (i32.store)
     (local.get $tmp_i32_0)
-    (i32.const 12)
-    (i32.add)
-    (f64.store)
+    (i32.const 0)
+    (i32.store offset=12)
+    (local.set $tmp_f64_0)
     (local.get $tmp_i32_0)
-    (i32.const 20)
-    (i32.add)
-    (f64.store)
+    (local.get $tmp_f64_0)
+    (f64.store offset=32)
+    (local.set $tmp_f64_0)
     (local.get $tmp_i32_0)
-    (i32.const 28)
-    (i32.add)
-    (f64.store)
+    (local.get $tmp_f64_0)
+    (f64.store offset=24)
+    (local.set $tmp_f64_0)
+    (local.get $tmp_i32_0)
+    (local.get $tmp_f64_0)
+    (f64.store offset=16)
     (local.get $tmp_i32_0)
     (global.set $my_list)
-    (i32.const 56)
+    (i32.const 72)
     (global.set $data_to_change)
     (global.get $global_var)
     (call $process_data)
     (global.set $new_value)
-    (i32.const 65)
+    (i32.const 84)
     (global.get $new_value)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (call $write_num)
-    (i32.const 77)
+    (i32.const 100)
     (global.get $global_var)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (call $write_num)
     (global.get $my_list)
     (global.get $data_to_change)
-    (f64.convert_i32_u)
-    (call $process_data)
-    (i32.const 101)
+    (call $process_data@2)
+    (i32.const 128)
     (global.get $my_list)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_1_i32)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_i32)
     (drop)
-    (i32.const 119)
+    (i32.const 152)
     (global.get $data_to_change)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_1_i32)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.get $write_arg_1_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
-    (i32.const 137)
+    (i32.const 176)
     (global.set $shadowing_var)
     (global.get $new_value)
     (f64.const 150.0)
     (f64.gt)
-    (f64.convert_i32_u)
-    (i32.const 144)
+    (if
+      (then
+    (i32.const 188)
     (global.set $shadowing_var)
-    (i32.const 150)
+    (i32.const 200)
     (global.get $shadowing_var)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_1_i32)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.get $write_arg_1_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
-    (f64.const 0.0)
-    (f64.ne)
-    (if
-      (then
       )
     )
-    (i32.const 165)
+    (i32.const 220)
     (global.get $shadowing_var)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_1_i32)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.get $write_arg_1_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
-    (i32.const 181)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (i32.const 240)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
@@ -554,42 +686,46 @@
     (global.get $increment_fn)
     (call $apply_transform)
     (global.set $result_temp)
-    (i32.const 203)
+    (i32.const 268)
     (global.get $result_temp)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (drop)
     (f64.const 9.0)
     (i32.const 2)
     (f64.convert_i32_u)
     (call $apply_transform)
     (global.set $squared)
-    (i32.const 213)
+    (i32.const 284)
     (global.get $squared)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (drop)
     (i32.const 3)
     (f64.convert_i32_u)
@@ -604,23 +740,25 @@
     (global.get $list_transformer)
     (call $apply_transform)
     (global.set $calculated_size)
-    (i32.const 227)
+    (i32.const 304)
     (global.get $calculated_size)
-    (f64.convert_i32_u)
-    (i32.trunc_f64_s)
+    (local.set $write_arg_1_f64)
+    (local.set $write_arg_0_i32)
+    (local.get $write_arg_0_i32)
     (local.set $tmp_i32_0)
     (local.set $tmp_i32_1 (call $string_len (local.get $tmp_i32_0)))
-    (local.set $tmp_i32_0 (i32.const 0))
+    (local.set $tmp_i32_2 (i32.const 0))
     (loop $print_char_loop
-      (local.get $tmp_i32_0) (local.get $tmp_i32_1) (i32.lt_s)
+      (local.get $tmp_i32_2) (local.get $tmp_i32_1) (i32.lt_s)
       (if (then
-        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_0))))
-        (local.set $tmp_i32_0 (i32.add (local.get $tmp_i32_0) (i32.const 1)))
+        (call $write_char (i32.load8_u (i32.add (local.get $tmp_i32_0) (local.get $tmp_i32_2))))
+        (local.set $tmp_i32_2 (i32.add (local.get $tmp_i32_2) (i32.const 1)))
         (br $print_char_loop)
       ))
     )
+    (local.get $write_arg_1_f64)
     (drop)
     (return)
   )
-(export "run" (func $main))
+  (export "run" (func $main))
 )
\ No newline at end of file
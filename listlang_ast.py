@@ -0,0 +1,851 @@
+"""
+Компактное типизированное AST языка ListLang.
+
+Дерево разбора ANTLR строится из тяжелых объектов ParserRuleContext: у каждого есть
+список детей, ссылки на токены, а доступ к подвыражениям (ctx.expression(i)) и к тексту
+(getText()) каждый раз выполняет поиск по детям. Семантический анализ и кодогенерация
+обходят дерево много раз, поэтому перед ними дерево разбора один раз понижается в AST:
+
+- узлы объявлены через __slots__ и хранят только нужные поля;
+- у каждого узла есть плотный целочисленный идентификатор node_id (0..node_count-1),
+  по которому фазы компилятора хранят свои таблицы вместо словарей по объектам;
+- идентификаторы хранятся как интернированные строки, литералы - как готовые значения;
+- служебные правила-обертки (statement, primaryExpr, literal, argumentList и т.п.)
+  в AST не попадают: выражение всегда представлено своим конкретным узлом.
+
+Имена классов узлов совпадают с метками альтернатив грамматики, а AstWalker вызывает
+у слушателя методы enter<Имя>/exit<Имя>, как ParseTreeWalker для ListLangListener.
+"""
+import sys
+from typing import List, Optional
+
+from antlr4.ParserRuleContext import ParserRuleContext
+
+from gen.ListLangParser import ListLangParser
+
+
+class Node:
+    __slots__ = ("node_id", "line")
+
+    # Имена полей с дочерними узлами в порядке обхода (поле может хранить узел, список узлов или None)
+    CHILD_FIELDS = ()
+    # Поле -> имя метода слушателя, который вызывается перед обходом этого поля
+    # (когда все предыдущие дети уже обойдены)
+    CHILD_HOOKS = {}
+
+    def __init__(self, node_id: int, line: int):
+        self.node_id = node_id
+        self.line = line
+
+    def children(self) -> List['Node']:
+        result = []
+        for field in self.CHILD_FIELDS:
+            value = getattr(self, field)
+            if value is None:
+                continue
+            if isinstance(value, list):
+                result.extend(value)
+            else:
+                result.append(value)
+        return result
+
+    def __repr__(self):
+        return f"{type(self).__name__}#{self.node_id}(line {self.line})"
+
+
+# --- Программа, подпрограммы, блоки ---
+
+class Program(Node):
+    __slots__ = ("items", "node_count")
+    CHILD_FIELDS = ("items",)
+
+    def __init__(self, node_id, line, items):
+        super().__init__(node_id, line)
+        self.items = items
+        self.node_count = 0
+
+
+class ParamDecl(Node):
+    __slots__ = ("name", "is_out")
+
+    def __init__(self, node_id, line, name, is_out):
+        super().__init__(node_id, line)
+        self.name = name
+        self.is_out = is_out
+
+
+class FunctionDecl(Node):
+    __slots__ = ("name", "params", "body")
+    CHILD_FIELDS = ("body",)
+
+    def __init__(self, node_id, line, name, params, body):
+        super().__init__(node_id, line)
+        self.name = name
+        self.params = params  # List[ParamDecl]
+        self.body = body  # StatementBlock
+
+
+class StatementBlock(Node):
+    __slots__ = ("statements",)
+    CHILD_FIELDS = ("statements",)
+
+    def __init__(self, node_id, line, statements):
+        super().__init__(node_id, line)
+        self.statements = statements
+
+
+# --- Присваивания ---
+
+class ExpressionRightAssignment(Node):
+    """expression -> IDENTIFIER"""
+    __slots__ = ("expression", "name")
+    CHILD_FIELDS = ("expression",)
+
+    def __init__(self, node_id, line, expression, name):
+        super().__init__(node_id, line)
+        self.expression = expression
+        self.name = name
+
+
+class IdentifierLeftAssignment(Node):
+    """IDENTIFIER <- expression"""
+    __slots__ = ("name", "expression")
+    CHILD_FIELDS = ("expression",)
+
+    def __init__(self, node_id, line, name, expression):
+        super().__init__(node_id, line)
+        self.name = name
+        self.expression = expression
+
+
+class IdentifierAssignExpression(IdentifierLeftAssignment):
+    """IDENTIFIER = expression"""
+    __slots__ = ()
+
+
+class ListElementAssignment(Node):
+    """expression[expression] <- expression"""
+    __slots__ = ("target", "index", "value")
+    CHILD_FIELDS = ("target", "index", "value")
+
+    def __init__(self, node_id, line, target, index, value):
+        super().__init__(node_id, line)
+        self.target = target
+        self.index = index
+        self.value = value
+
+
+class ListElementAssignExpression(ListElementAssignment):
+    """expression[expression] = expression"""
+    __slots__ = ()
+
+
+class StructFieldAssignment(Node):
+    """IDENTIFIER.IDENTIFIER <- expression"""
+    __slots__ = ("struct_name", "field_name", "value")
+    CHILD_FIELDS = ("value",)
+
+    def __init__(self, node_id, line, struct_name, field_name, value):
+        super().__init__(node_id, line)
+        self.struct_name = struct_name
+        self.field_name = field_name
+        self.value = value
+
+
+class StructFieldAssignExpression(StructFieldAssignment):
+    """IDENTIFIER.IDENTIFIER = expression"""
+    __slots__ = ()
+
+
+class MultiAssignment(Node):
+    __slots__ = ("names", "expressions")
+    CHILD_FIELDS = ("expressions",)
+
+    def __init__(self, node_id, line, names, expressions):
+        super().__init__(node_id, line)
+        self.names = names  # List[str]
+        self.expressions = expressions
+
+
+# --- Управляющие конструкции ---
+
+class IfStatement(Node):
+    __slots__ = ("condition", "then_branch", "else_branch")
+    CHILD_FIELDS = ("condition", "then_branch", "else_branch")
+    CHILD_HOOKS = {"then_branch": "enterIfThenBranch", "else_branch": "enterIfElseBranch"}
+
+    def __init__(self, node_id, line, condition, then_branch, else_branch):
+        super().__init__(node_id, line)
+        self.condition = condition
+        self.then_branch = then_branch
+        self.else_branch = else_branch  # None, если ветки else нет
+
+
+class WhileStatement(Node):
+    __slots__ = ("condition", "body")
+    CHILD_FIELDS = ("condition", "body")
+    CHILD_HOOKS = {"body": "enterWhileStatementBody"}
+
+    def __init__(self, node_id, line, condition, body):
+        super().__init__(node_id, line)
+        self.condition = condition
+        self.body = body
+
+
+class DoUntilStatement(Node):
+    __slots__ = ("body", "condition")
+    CHILD_FIELDS = ("body", "condition")
+
+    def __init__(self, node_id, line, body, condition):
+        super().__init__(node_id, line)
+        self.body = body
+        self.condition = condition
+
+
+class ForStatement(Node):
+    __slots__ = ("var_name", "start", "end", "body")
+    CHILD_FIELDS = ("start", "end", "body")
+    CHILD_HOOKS = {"body": "enterForStatementBody"}
+
+    def __init__(self, node_id, line, var_name, start, end, body):
+        super().__init__(node_id, line)
+        self.var_name = var_name
+        self.start = start
+        self.end = end
+        self.body = body
+
+
+class CaseClause(Node):
+    __slots__ = ("value", "body")
+    CHILD_FIELDS = ("value", "body")
+    CHILD_HOOKS = {"body": "enterCaseClauseBody"}
+
+    def __init__(self, node_id, line, value, body):
+        super().__init__(node_id, line)
+        self.value = value
+        self.body = body
+
+
+class SwitchStatement(Node):
+    __slots__ = ("subject", "cases", "default_branch")
+    CHILD_FIELDS = ("subject", "cases", "default_branch")
+    CHILD_HOOKS = {"cases": "enterSwitchCases", "default_branch": "enterSwitchDefault"}
+
+    def __init__(self, node_id, line, subject, cases, default_branch):
+        super().__init__(node_id, line)
+        self.subject = subject
+        self.cases = cases  # List[CaseClause]
+        self.default_branch = default_branch
+
+
+class ReturnStatement(Node):
+    __slots__ = ("value",)
+    CHILD_FIELDS = ("value",)
+
+    def __init__(self, node_id, line, value):
+        super().__init__(node_id, line)
+        self.value = value  # Выражение (в т.ч. лямбда) или None
+
+
+class WriteStatement(Node):
+    __slots__ = ("arguments",)
+    CHILD_FIELDS = ("arguments",)
+
+    def __init__(self, node_id, line, arguments):
+        super().__init__(node_id, line)
+        self.arguments = arguments
+
+
+class BreakStatement(Node):
+    __slots__ = ()
+
+
+class ContinueStatement(Node):
+    __slots__ = ()
+
+
+# --- Выражения ---
+
+class FunctionCall(Node):
+    __slots__ = ("name", "arguments", "out_flags")
+    CHILD_FIELDS = ("arguments",)
+
+    def __init__(self, node_id, line, name, arguments, out_flags):
+        super().__init__(node_id, line)
+        self.name = name
+        self.arguments = arguments
+        self.out_flags = out_flags  # Tuple[bool, ...]: передан ли аргумент с модификатором out
+
+
+class LambdaReturn(Node):
+    """lambda (params) -> expression"""
+    __slots__ = ("params", "body")
+    CHILD_FIELDS = ("body",)
+
+    def __init__(self, node_id, line, params, body):
+        super().__init__(node_id, line)
+        self.params = params  # List[ParamDecl]
+        self.body = body
+
+
+class LambdaBlock(LambdaReturn):
+    """lambda (params) -> { ... }"""
+    __slots__ = ()
+
+
+class ReadCall(Node):
+    __slots__ = ()
+
+
+class LenCall(Node):
+    __slots__ = ("argument",)
+    CHILD_FIELDS = ("argument",)
+
+    def __init__(self, node_id, line, argument):
+        super().__init__(node_id, line)
+        self.argument = argument
+
+
+class DequeueCall(LenCall):
+    __slots__ = ()
+
+
+class UnaryMinus(Node):
+    __slots__ = ("operand",)
+    CHILD_FIELDS = ("operand",)
+
+    def __init__(self, node_id, line, operand):
+        super().__init__(node_id, line)
+        self.operand = operand
+
+
+class UnaryNot(UnaryMinus):
+    __slots__ = ()
+
+
+class BinaryExpr(Node):
+    __slots__ = ("op", "op_text", "left", "right")
+    CHILD_FIELDS = ("left", "right")
+
+    def __init__(self, node_id, line, op, op_text, left, right):
+        super().__init__(node_id, line)
+        self.op = op  # Тип токена оператора (ListLangParser.PLUS, ListLangParser.LT, ...)
+        self.op_text = op_text
+        self.left = left
+        self.right = right
+
+
+class MultiplyExpr(BinaryExpr):
+    __slots__ = ()
+
+
+class DivideExpr(BinaryExpr):
+    __slots__ = ()
+
+
+class PlusExpr(BinaryExpr):
+    __slots__ = ()
+
+
+class MinusExpr(BinaryExpr):
+    __slots__ = ()
+
+
+class AppendExpr(BinaryExpr):
+    __slots__ = ()
+
+
+class ComparisonExpr(BinaryExpr):
+    __slots__ = ()
+
+
+class LogicalExpr(BinaryExpr):
+    __slots__ = ()
+    CHILD_HOOKS = {"right": "enterLogicalExprRight"}
+
+
+class ListAccessExpr(Node):
+    __slots__ = ("target", "index")
+    CHILD_FIELDS = ("target", "index")
+
+    def __init__(self, node_id, line, target, index):
+        super().__init__(node_id, line)
+        self.target = target
+        self.index = index
+
+
+class StructFieldAccessExpr(Node):
+    __slots__ = ("struct_name", "field_name")
+
+    def __init__(self, node_id, line, struct_name, field_name):
+        super().__init__(node_id, line)
+        self.struct_name = struct_name
+        self.field_name = field_name
+
+
+class ParenExpression(Node):
+    __slots__ = ("inner",)
+    CHILD_FIELDS = ("inner",)
+
+    def __init__(self, node_id, line, inner):
+        super().__init__(node_id, line)
+        self.inner = inner
+
+
+class IdentifierExpression(Node):
+    __slots__ = ("name",)
+
+    def __init__(self, node_id, line, name):
+        super().__init__(node_id, line)
+        self.name = name
+
+
+class NumberLiteral(Node):
+    __slots__ = ("value", "is_integer")
+
+    def __init__(self, node_id, line, value, is_integer=False):
+        super().__init__(node_id, line)
+        self.value = value  # float
+        self.is_integer = is_integer  # Записан без десятичной точки
+
+
+class StringLiteral(Node):
+    __slots__ = ("value",)
+
+    def __init__(self, node_id, line, value):
+        super().__init__(node_id, line)
+        self.value = value  # Текст между кавычками, без обработки escape-последовательностей
+
+
+class ListLiteral(Node):
+    __slots__ = ("elements",)
+    CHILD_FIELDS = ("elements",)
+
+    def __init__(self, node_id, line, elements):
+        super().__init__(node_id, line)
+        self.elements = elements
+
+
+class FieldAssignment(Node):
+    __slots__ = ("name", "value")
+    CHILD_FIELDS = ("value",)
+
+    def __init__(self, node_id, line, name, value):
+        super().__init__(node_id, line)
+        self.name = name
+        self.value = value
+
+
+class StructLiteral(Node):
+    __slots__ = ("fields",)
+    CHILD_FIELDS = ("fields",)
+
+    def __init__(self, node_id, line, fields):
+        super().__init__(node_id, line)
+        self.fields = fields  # List[FieldAssignment]
+
+
+# Узлы, для которых слушатель получает события enter/exit
+WALKED_NODE_TYPES = (
+    Program, FunctionDecl, StatementBlock,
+    ExpressionRightAssignment, IdentifierLeftAssignment, IdentifierAssignExpression,
+    ListElementAssignment, ListElementAssignExpression,
+    StructFieldAssignment, StructFieldAssignExpression, MultiAssignment,
+    IfStatement, WhileStatement, DoUntilStatement, ForStatement, SwitchStatement, CaseClause,
+    ReturnStatement, WriteStatement, BreakStatement, ContinueStatement,
+    FunctionCall, LambdaReturn, LambdaBlock, ReadCall, LenCall, DequeueCall, UnaryMinus, UnaryNot,
+    MultiplyExpr, DivideExpr, PlusExpr, MinusExpr, AppendExpr, ComparisonExpr, LogicalExpr,
+    ListAccessExpr, StructFieldAccessExpr, ParenExpression, IdentifierExpression,
+    NumberLiteral, StringLiteral, ListLiteral, StructLiteral, FieldAssignment,
+)
+
+
+# --- Слушатель и обходчик ---
+
+class AstListener:
+    """
+    Базовый слушатель AST: методы enter<Узел>/exit<Узел> и методы из CHILD_HOOKS узлов
+    по умолчанию ничего не делают.
+    """
+    pass
+
+
+def _noop(self, node):
+    pass
+
+
+for _node_type in WALKED_NODE_TYPES:
+    _node_type.ENTER = f"enter{_node_type.__name__}"
+    _node_type.EXIT = f"exit{_node_type.__name__}"
+    setattr(AstListener, _node_type.ENTER, _noop)
+    setattr(AstListener, _node_type.EXIT, _noop)
+    for _hook in _node_type.CHILD_HOOKS.values():
+        setattr(AstListener, _hook, _noop)
+
+
+class AstWalker:
+    """
+    Обход AST в глубину с вызовом enter/exit у слушателя (порядок как у ParseTreeWalker).
+    Обход итеративный, поэтому глубина вложенности выражений не ограничена стеком Python.
+    """
+
+    def walk(self, listener: AstListener, root: Node):
+        # Элемент стека: (узел, None) - войти в узел, (узел, имя метода) - вызвать exit или хук
+        stack = [(root, None)]
+        while stack:
+            node, method = stack.pop()
+            if method is not None:
+                getattr(listener, method)(node)
+                continue
+            getattr(listener, node.ENTER)(node)
+            stack.append((node, node.EXIT))
+            if node.CHILD_HOOKS:
+                self._push_children_with_hooks(stack, node)
+                continue
+            children = node.children()
+            for child in reversed(children):
+                stack.append((child, None))
+
+    @staticmethod
+    def _push_children_with_hooks(stack, node: Node):
+        """Кладет детей узла на стек так, чтобы хук поля вызывался непосредственно перед его обходом."""
+        for field in reversed(node.CHILD_FIELDS):
+            value = getattr(node, field)
+            if isinstance(value, list):
+                for child in reversed(value):
+                    stack.append((child, None))
+            elif value is not None:
+                stack.append((value, None))
+            hook = node.CHILD_HOOKS.get(field)
+            if hook is not None:
+                stack.append((node, hook))
+
+
+# --- Понижение дерева разбора в AST ---
+
+class _IncompleteTree(Exception):
+    """В дереве разбора (после восстановления от синтаксической ошибки) нет обязательной части."""
+    pass
+
+
+class AstBuilder:
+    """
+    Понижает дерево разбора ANTLR в AST. Конструкции, от которых после синтаксических
+    ошибок остались только фрагменты, пропускаются целиком на уровне оператора.
+    """
+
+    def __init__(self):
+        self.node_count = 0
+
+    def _id(self) -> int:
+        node_id = self.node_count
+        self.node_count += 1
+        return node_id
+
+    @staticmethod
+    def _line(ctx: ParserRuleContext) -> int:
+        return ctx.start.line
+
+    @staticmethod
+    def _text(terminal) -> str:
+        if terminal is None:
+            raise _IncompleteTree()
+        return sys.intern(terminal.getText())
+
+    @staticmethod
+    def _require(value):
+        if value is None:
+            raise _IncompleteTree()
+        return value
+
+    def build(self, ctx: ListLangParser.ProgramContext) -> Program:
+        program = Program(self._id(), self._line(ctx), [])
+        program.items = self._statement_list(ctx)
+        return program
+
+    # --- Операторы ---
+
+    def _statement_list(self, ctx: ParserRuleContext) -> List[Node]:
+        statements: List[Node] = []
+        for child in ctx.getChildren():
+            if not isinstance(child, (ListLangParser.StatementContext, ListLangParser.FunctionDeclContext)):
+                continue
+            try:
+                self._statement(child, statements)
+            except _IncompleteTree:
+                pass
+        return statements
+
+    def _statement(self, ctx: ParserRuleContext, out: List[Node]):
+        """Понижает оператор и добавляет результат в out (assignmentStatement может дать несколько узлов)."""
+        if isinstance(ctx, ListLangParser.StatementContext):
+            ctx = self._require(ctx.getChild(0) if ctx.getChildCount() else None)
+
+        if isinstance(ctx, ListLangParser.AssignmentStatementContext):
+            if ctx.multiAssignment():
+                out.append(self._multi_assignment(ctx.multiAssignment()))
+            else:
+                for single in ctx.singleAssignment():
+                    out.append(self._single_assignment(single))
+        elif isinstance(ctx, ListLangParser.ExpressionContext):
+            out.append(self.expression(ctx))
+        elif isinstance(ctx, ListLangParser.LambdaExprContext):
+            out.append(self._lambda(ctx))
+        elif isinstance(ctx, ListLangParser.FunctionDeclContext):
+            out.append(self._function_decl(ctx))
+        elif isinstance(ctx, ListLangParser.StatementBlockContext):
+            out.append(self._block(ctx))
+        elif isinstance(ctx, ListLangParser.IfStatementContext):
+            out.append(self._if(ctx))
+        elif isinstance(ctx, ListLangParser.WhileStatementContext):
+            node_id = self._id()
+            out.append(WhileStatement(node_id, self._line(ctx), self.expression(ctx.expression()),
+                                      self._body(ctx)))
+        elif isinstance(ctx, ListLangParser.DoUntilStatementContext):
+            node_id = self._id()
+            body = self._body(ctx)
+            out.append(DoUntilStatement(node_id, self._line(ctx), body, self.expression(ctx.expression())))
+        elif isinstance(ctx, ListLangParser.ForStatementContext):
+            node_id = self._id()
+            var_name = self._text(ctx.IDENTIFIER())
+            start = self.expression(ctx.expression(0))
+            end = self.expression(ctx.expression(1))
+            out.append(ForStatement(node_id, self._line(ctx), var_name, start, end, self._body(ctx)))
+        elif isinstance(ctx, ListLangParser.SwitchStatementContext):
+            out.append(self._switch(ctx))
+        elif isinstance(ctx, ListLangParser.ReturnStatementContext):
+            node_id = self._id()
+            value_ctx = ctx.expression() or ctx.lambdaExpr()
+            value = self.expression(value_ctx) if value_ctx is not None else None
+            out.append(ReturnStatement(node_id, self._line(ctx), value))
+        elif isinstance(ctx, ListLangParser.WriteStatementContext):
+            node_id = self._id()
+            arguments = []
+            if ctx.argumentList():
+                arguments = [self.expression(arg.expression()) for arg in ctx.argumentList().argument()]
+            out.append(WriteStatement(node_id, self._line(ctx), arguments))
+        elif isinstance(ctx, ListLangParser.BreakStatementContext):
+            out.append(BreakStatement(self._id(), self._line(ctx)))
+        elif isinstance(ctx, ListLangParser.ContinueStatementContext):
+            out.append(ContinueStatement(self._id(), self._line(ctx)))
+        else:
+            raise _IncompleteTree()
+
+    def _block(self, ctx: ListLangParser.StatementBlockContext) -> StatementBlock:
+        block = StatementBlock(self._id(), self._line(ctx), [])
+        block.statements = self._statement_list(ctx)
+        return block
+
+    def _branch(self, ctx: ParserRuleContext):
+        """
+        Ветка управляющей конструкции: (statement | statementBlock) -> один узел.
+        Оператор "a -> x, b -> y" дает несколько присваиваний без собственной области
+        видимости - тогда ветка представлена списком узлов.
+        """
+        if isinstance(ctx, ListLangParser.StatementBlockContext):
+            return self._block(ctx)
+        nodes: List[Node] = []
+        self._statement(ctx, nodes)
+        if not nodes:
+            raise _IncompleteTree()
+        return nodes[0] if len(nodes) == 1 else nodes
+
+    def _body(self, ctx: ParserRuleContext):
+        # Единственная ветка конструкции: последний дочерний statement/statementBlock
+        branch_ctx = None
+        for child in ctx.getChildren():
+            if isinstance(child, (ListLangParser.StatementContext, ListLangParser.StatementBlockContext)):
+                branch_ctx = child
+        return self._branch(self._require(branch_ctx))
+
+    def _function_decl(self, ctx: ListLangParser.FunctionDeclContext) -> FunctionDecl:
+        node_id = self._id()
+        name = self._text(ctx.IDENTIFIER())
+        params = self._params(ctx.parameterList())
+        body = self._block(self._require(ctx.statementBlock()))
+        return FunctionDecl(node_id, self._line(ctx), name, params, body)
+
+    def _params(self, ctx: Optional[ListLangParser.ParameterListContext]) -> List[ParamDecl]:
+        if ctx is None:
+            return []
+        return [ParamDecl(self._id(), self._line(p), self._text(p.IDENTIFIER()), p.OUT() is not None)
+                for p in ctx.parameter()]
+
+    def _if(self, ctx: ListLangParser.IfStatementContext) -> IfStatement:
+        node_id = self._id()
+        condition = self.expression(ctx.expression())
+        # Ветки then/else - это дети-операторы в порядке следования
+        branches = [c for c in ctx.getChildren()
+                    if isinstance(c, (ListLangParser.StatementContext, ListLangParser.StatementBlockContext))]
+        if not branches:
+            raise _IncompleteTree()
+        then_branch = self._branch(branches[0])
+        else_branch = self._branch(branches[1]) if len(branches) > 1 else None
+        return IfStatement(node_id, self._line(ctx), condition, then_branch, else_branch)
+
+    def _switch(self, ctx: ListLangParser.SwitchStatementContext) -> SwitchStatement:
+        node_id = self._id()
+        subject = self.expression(ctx.expression())
+        cases = []
+        for case_ctx in ctx.caseClause():
+            case_id = self._id()
+            value = self.expression(case_ctx.expression())
+            cases.append(CaseClause(case_id, self._line(case_ctx), value, self._body(case_ctx)))
+        default_branch = None
+        if ctx.DEFAULT():
+            default_branch = self._body(ctx)
+        return SwitchStatement(node_id, self._line(ctx), subject, cases, default_branch)
+
+    def _single_assignment(self, ctx: ListLangParser.SingleAssignmentContext) -> Node:
+        node_id = self._id()
+        line = self._line(ctx)
+        if isinstance(ctx, ListLangParser.ExpressionRightAssignmentContext):
+            expression = self.expression(ctx.expression())
+            return ExpressionRightAssignment(node_id, line, expression, self._text(ctx.IDENTIFIER()))
+        if isinstance(ctx, ListLangParser.IdentifierAssignExpressionContext):
+            return IdentifierAssignExpression(node_id, line, self._text(ctx.IDENTIFIER()),
+                                              self.expression(ctx.expression()))
+        if isinstance(ctx, ListLangParser.IdentifierLeftAssignmentContext):
+            return IdentifierLeftAssignment(node_id, line, self._text(ctx.IDENTIFIER()),
+                                            self.expression(ctx.expression()))
+        if isinstance(ctx, (ListLangParser.ListElementAssignmentContext,
+                            ListLangParser.ListElementAssignExpressionContext)):
+            node_type = ListElementAssignment if isinstance(ctx, ListLangParser.ListElementAssignmentContext) \
+                else ListElementAssignExpression
+            target = self.expression(ctx.expression(0))
+            index = self.expression(ctx.expression(1))
+            value = self.expression(ctx.expression(2))
+            return node_type(node_id, line, target, index, value)
+        if isinstance(ctx, (ListLangParser.StructFieldAssignmentContext,
+                            ListLangParser.StructFieldAssignExpressionContext)):
+            node_type = StructFieldAssignment if isinstance(ctx, ListLangParser.StructFieldAssignmentContext) \
+                else StructFieldAssignExpression
+            return node_type(node_id, line, self._text(ctx.IDENTIFIER(0)), self._text(ctx.IDENTIFIER(1)),
+                             self.expression(ctx.expression()))
+        raise _IncompleteTree()
+
+    def _multi_assignment(self, ctx: ListLangParser.MultiAssignmentContext) -> MultiAssignment:
+        node_id = self._id()
+        id_list = self._require(ctx.identifierList())
+        expr_list = self._require(ctx.expressionList())
+        names = [self._text(t) for t in id_list.IDENTIFIER()]
+        expressions = [self.expression(e) for e in expr_list.expression()]
+        return MultiAssignment(node_id, self._line(ctx), names, expressions)
+
+    # --- Выражения ---
+
+    _BINARY_TYPES = {
+        ListLangParser.MultiplyExprContext: MultiplyExpr,
+        ListLangParser.DivideExprContext: DivideExpr,
+        ListLangParser.PlusExprContext: PlusExpr,
+        ListLangParser.MinusExprContext: MinusExpr,
+        ListLangParser.AppendExprContext: AppendExpr,
+        ListLangParser.ComparisonExprContext: ComparisonExpr,
+        ListLangParser.LogicalExprContext: LogicalExpr,
+    }
+
+    def expression(self, ctx: Optional[ParserRuleContext]) -> Node:
+        """Понижает expression/primaryExpr/lambdaExpr/literal в конкретный узел выражения."""
+        ctx = self._require(ctx)
+        line = self._line(ctx)
+
+        # Обертки без собственной семантики
+        if isinstance(ctx, ListLangParser.PrimaryExpressionActualContext):
+            return self.expression(ctx.primaryExpr())
+        if isinstance(ctx, ListLangParser.LambdaExpressionActualContext):
+            return self.expression(ctx.lambdaExpr())
+        if isinstance(ctx, ListLangParser.FunctionCallExpressionContext):
+            return self._function_call(self._require(ctx.functionCall()))
+        if isinstance(ctx, ListLangParser.LiteralExpressionContext):
+            return self._literal(self._require(ctx.literal()))
+
+        binary_type = self._BINARY_TYPES.get(type(ctx))
+        if binary_type is not None:
+            node_id = self._id()
+            op_token = self._require(ctx.getChild(1)).getSymbol()
+            left = self.expression(ctx.expression(0))
+            right = self.expression(ctx.expression(1))
+            return binary_type(node_id, line, op_token.type, op_token.text, left, right)
+
+        if isinstance(ctx, ListLangParser.IdentifierExpressionContext):
+            return IdentifierExpression(self._id(), line, self._text(ctx.IDENTIFIER()))
+        if isinstance(ctx, ListLangParser.ParenExpressionContext):
+            node_id = self._id()
+            return ParenExpression(node_id, line, self.expression(ctx.expression()))
+        if isinstance(ctx, ListLangParser.ListAccessExprContext):
+            node_id = self._id()
+            target = self.expression(ctx.expression(0))
+            return ListAccessExpr(node_id, line, target, self.expression(ctx.expression(1)))
+        if isinstance(ctx, ListLangParser.StructFieldAccessExprContext):
+            return StructFieldAccessExpr(self._id(), line, self._text(ctx.IDENTIFIER(0)),
+                                         self._text(ctx.IDENTIFIER(1)))
+        if isinstance(ctx, (ListLangParser.LambdaReturnContext, ListLangParser.LambdaBlockContext)):
+            return self._lambda(ctx)
+        if isinstance(ctx, ListLangParser.ReadCallContext):
+            return ReadCall(self._id(), line)
+        if isinstance(ctx, ListLangParser.LenCallContext):
+            node_id = self._id()
+            return LenCall(node_id, line, self.expression(ctx.expression()))
+        if isinstance(ctx, ListLangParser.DequeueCallContext):
+            node_id = self._id()
+            return DequeueCall(node_id, line, self.expression(ctx.expression()))
+        if isinstance(ctx, ListLangParser.UnaryMinusContext):
+            node_id = self._id()
+            return UnaryMinus(node_id, line, self.expression(ctx.expression()))
+        if isinstance(ctx, ListLangParser.UnaryNotContext):
+            node_id = self._id()
+            return UnaryNot(node_id, line, self.expression(ctx.expression()))
+        if isinstance(ctx, ListLangParser.LiteralContext):
+            return self._literal(ctx)
+        raise _IncompleteTree()
+
+    def _function_call(self, ctx: ListLangParser.FunctionCallContext) -> FunctionCall:
+        node_id = self._id()
+        name = self._text(ctx.IDENTIFIER())
+        arguments = []
+        out_flags = []
+        if ctx.argumentList():
+            for arg in ctx.argumentList().argument():
+                arguments.append(self.expression(arg.expression()))
+                out_flags.append(arg.OUT() is not None)
+        return FunctionCall(node_id, self._line(ctx), name, arguments, tuple(out_flags))
+
+    def _lambda(self, ctx: ParserRuleContext) -> LambdaReturn:
+        node_id = self._id()
+        params = self._params(ctx.parameterList())
+        if isinstance(ctx, ListLangParser.LambdaBlockContext):
+            return LambdaBlock(node_id, self._line(ctx), params, self._block(self._require(ctx.statementBlock())))
+        return LambdaReturn(node_id, self._line(ctx), params, self.expression(ctx.expression()))
+
+    def _literal(self, ctx: ListLangParser.LiteralContext) -> Node:
+        line = self._line(ctx)
+        if ctx.NUMBER():
+            text = ctx.NUMBER().getText()
+            return NumberLiteral(self._id(), line, float(text), "." not in text)
+        if ctx.STRING():
+            return StringLiteral(self._id(), line, ctx.STRING().getText()[1:-1])
+        if ctx.listLiteral():
+            list_ctx = ctx.listLiteral()
+            node_id = self._id()
+            elements = []
+            if list_ctx.expressionList():
+                elements = [self.expression(e) for e in list_ctx.expressionList().expression()]
+            return ListLiteral(node_id, self._line(list_ctx), elements)
+        if ctx.structLiteral():
+            struct_ctx = ctx.structLiteral()
+            node_id = self._id()
+            fields = []
+            for field_ctx in struct_ctx.fieldAssignment():
+                field_id = self._id()
+                fields.append(FieldAssignment(field_id, self._line(field_ctx), self._text(field_ctx.IDENTIFIER()),
+                                              self.expression(field_ctx.expression())))
+            return StructLiteral(node_id, self._line(struct_ctx), fields)
+        raise _IncompleteTree()
+
+
+def lower_parse_tree(parse_tree: ListLangParser.ProgramContext) -> Program:
+    """Строит AST по дереву разбора. Число узлов (верхняя граница node_id) - в Program.node_count."""
+    builder = AstBuilder()
+    program = builder.build(parse_tree)
+    program.node_count = builder.node_count
+    return program
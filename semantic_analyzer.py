@@ -1,5 +1,6 @@
 import os
 import sys
+from array import array
 from antlr4 import *
 from antlr4.error.ErrorListener import ErrorListener
 from antlr4.ParserRuleContext import ParserRuleContext
@@ -9,7 +10,9 @@ from typing import Any, Dict, List, Optional, Tuple, Set
 # Corrected import structure for generated files if they are in 'gen' directory
 from gen.ListLangLexer import ListLangLexer
 from gen.ListLangParser import ListLangParser
-from gen.ListLangListener import ListLangListener
+
+import listlang_ast as ast
+from listlang_ast import AstListener, AstWalker
 
 
 # --- Типы областей видимости ---
@@ -31,6 +34,9 @@ class Type(Enum):
     BOOL = "bool"  # Для выражений сравнения и логических операций
     STRUCT = "struct"  # Для structLiteral
     NULL = "null"  # For explicit null values (if supported by grammar)
+    # Уточнение NUMBER для целых значений. В таблицу типов выражений не записывается
+    # (там такие выражения - NUMBER), а возвращается get_numeric_subtype
+    INT = "int"
 
     def __str__(self):
         return self.value
@@ -53,6 +59,33 @@ class Type(Enum):
         return False
 
 
+# Коды типов для ExpressionTypeTable; код 0 - UNKNOWN, чтобы новая таблица
+# из нулевых байтов означала "тип еще не выведен"
+_TYPE_BY_CODE: List[Type] = [Type.UNKNOWN] + [t for t in Type if t != Type.UNKNOWN]
+_CODE_BY_TYPE: Dict[Type, int] = {t: code for code, t in enumerate(_TYPE_BY_CODE)}
+
+
+# --- Таблица типов выражений ---
+class ExpressionTypeTable:
+    """
+    Типы выражений AST, индексированные плотным node_id: по одному байту на узел
+    в array('B'). Запись и чтение - обращение по индексу без хеширования узлов.
+    """
+    __slots__ = ("codes",)
+
+    def __init__(self, node_count: int):
+        self.codes = array('B', bytes(node_count))
+
+    def __getitem__(self, node_id: int) -> Type:
+        return _TYPE_BY_CODE[self.codes[node_id]]
+
+    def __setitem__(self, node_id: int, expr_type: Type):
+        self.codes[node_id] = _CODE_BY_TYPE[expr_type]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+
 # --- Параметр функции/лямбды ---
 class Parameter:
     def __init__(self, name: str, param_type: Type, is_out: bool = False,
@@ -189,6 +222,10 @@ class SymbolTable:
         self.scopes: List[Dict[str, Any]] = []
         self.current_scope_name: str = "global"
         self.filename = filename
+        # Стек привязок для каждого имени: последний элемент - переменная из самой
+        # внутренней области, где имя объявлено. Поддерживается push_scope/pop_scope
+        # и declare_variable, поэтому поиск не просматривает все области.
+        self._bindings: Dict[str, List[VariableInfo]] = {}
 
         # Initialize global scope
         self.push_scope(ScopeType.GLOBAL, "global")
@@ -210,7 +247,12 @@ class SymbolTable:
     def pop_scope(self):
         """Removes the current scope from the stack."""
         if len(self.scopes) > 1:  # Always keep global scope
-            self.scopes.pop()
+            popped = self.scopes.pop()
+            for name in popped["variables"]:
+                bindings = self._bindings[name]
+                bindings.pop()
+                if not bindings:
+                    del self._bindings[name]
             self.current_scope_name = self.scopes[-1]["name"]
 
     def get_current_scope(self) -> Dict[str, Any]:
@@ -237,40 +279,36 @@ class SymbolTable:
                             element_type=element_type, # Передаем
                             element_lambda_signature=element_lambda_signature) # Передаем
         current_scope["variables"][name] = info
+        self._bindings.setdefault(name, []).append(info)
         return info
 
     def lookup_variable(self, name: str) -> Optional[VariableInfo]:
         """Searches for a variable, starting from the current scope and going up."""
-        for scope in reversed(self.scopes):
-            if name in scope["variables"]:
-                return scope["variables"][name]
-        return None
+        bindings = self._bindings.get(name)
+        return bindings[-1] if bindings else None
 
     def initialize_variable(self, name: str):
         """Marks a variable as initialized (in any scope)."""
-        # Search from current scope upwards
-        for scope in reversed(self.scopes):
-            if name in scope["variables"]:
-                scope["variables"][name].initialized = True
-                return
+        var_info = self.lookup_variable(name)
+        if var_info is not None:
+            var_info.initialized = True
 
     def update_variable_type(self, name: str, new_type: Type, line: int,
                              lambda_signature: Optional[LambdaSignature] = None):
         """Updates the type of a variable (in any scope), including lambda information."""
-        for scope in reversed(self.scopes):
-            if name in scope["variables"]:
-                var_info = scope["variables"][name]
-
-                if var_info.type == Type.UNKNOWN or var_info.type.is_compatible_with(new_type):
-                    var_info.type = new_type
-                    if new_type == Type.LAMBDA:
-                        var_info.lambda_signature = lambda_signature
-                    else:
-                        var_info.lambda_signature = None
-                else:
-                    # Type mismatch error will be reported by assignment logic
-                    pass
-                return
+        var_info = self.lookup_variable(name)
+        if var_info is None:
+            return
+
+        if var_info.type == Type.UNKNOWN or var_info.type.is_compatible_with(new_type):
+            var_info.type = new_type
+            if new_type == Type.LAMBDA:
+                var_info.lambda_signature = lambda_signature
+            else:
+                var_info.lambda_signature = None
+        else:
+            # Type mismatch error will be reported by assignment logic
+            pass
 
     def declare_function(self, func_info: FunctionInfo) -> FunctionInfo:
         """Declares a function (in the global scope) or adds an overload."""
@@ -300,18 +338,201 @@ class SymbolTable:
 
 
 # --- Семантический анализатор (основной класс) ---
-class SemanticAnalyzer(ListLangListener):
-    def __init__(self, parser: ListLangParser, filename: str):
+class StructLayout:
+    """
+    Раскладка структуры в памяти: заголовок [shape_id:i32][size:i32][ext:i32][pad], затем поля.
+    Числовые поля (f64) идут первыми с выравниванием 8, за ними указатели (i32).
+    Номер раскладки - начальная форма (shape) структуры; ext - блок полей, добавленных
+    во время выполнения (переходы форм в рантайме).
+    """
+    HEADER_SIZE = 16
+    POINTER_TYPES = (Type.STRING, Type.LIST, Type.LAMBDA, Type.STRUCT)
+
+    def __init__(self, layout_id: int, fields: Dict[str, Type]):
+        self.layout_id = layout_id
+        self.field_types = dict(fields)
+        self.offsets: Dict[str, int] = {}
+        self.slot_types: Dict[str, str] = {}
+        offset = self.HEADER_SIZE
+        for slot_type, slot_size in (("f64", 8), ("i32", 4)):
+            for name, field_type in fields.items():
+                if ("i32" if field_type in self.POINTER_TYPES else "f64") != slot_type:
+                    continue
+                self.offsets[name] = offset
+                self.slot_types[name] = slot_type
+                offset += slot_size
+        self.size = (offset + 7) & ~7
+
+    def __repr__(self):
+        return f"StructLayout#{self.layout_id}({', '.join(f'{n}@{o}' for n, o in self.offsets.items())})"
+
+
+class StructShapeInference:
+    """
+    Вывод раскладок структур. Литералы структур и переменные, между которыми структура
+    передается присваиванием, объединяются в классы (union-find); у класса одна раскладка
+    с объединением всех его полей. Класс "динамический", если в его переменные структура
+    попадает не только из литералов и переменных того же класса (параметр, результат вызова,
+    элемент списка): обращения к полям таких переменных не могут использовать
+    фиксированные смещения.
+    """
+
+    def __init__(self):
+        self._parent: Dict[Any, Any] = {}
+        self._fields: Dict[Any, Dict[str, Type]] = {}  # Корень -> поля в порядке появления
+        self._has_literal: Set[Any] = set()
+        self._dynamic: Set[Any] = set()
+        self._variables: Dict[Any, VariableInfo] = {}
+        self.site_keys: Dict[int, Any] = {}  # node_id литерала или обращения к полю -> ключ класса
+        self.layouts: List[StructLayout] = []
+        self.site_layouts: Dict[int, StructLayout] = {}  # Заполняется finalize()
+        self.dynamic_sites: Set[int] = set()  # Обращения к полям без фиксированной раскладки
+
+    def variable_key(self, var_info: VariableInfo):
+        key = ("var", id(var_info))
+        self._variables[key] = var_info  # Держим ссылку, чтобы id не переиспользовался после выхода из области
+        return key
+
+    @staticmethod
+    def literal_key(node_id: int):
+        return "lit", node_id
+
+    def find(self, key):
+        parent = self._parent.setdefault(key, key)
+        if parent == key:
+            return key
+        root = self.find(parent)
+        self._parent[key] = root
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return
+        self._parent[root_b] = root_a
+        for name, field_type in self._fields.pop(root_b, {}).items():
+            self._merge_field(root_a, name, field_type)
+        if root_b in self._has_literal:
+            self._has_literal.add(root_a)
+        if root_b in self._dynamic:
+            self._dynamic.add(root_a)
+
+    def add_literal(self, node_id: int, fields: List[Tuple[str, Type]]):
+        key = self.literal_key(node_id)
+        self.site_keys[node_id] = key
+        self._has_literal.add(self.find(key))
+        for name, field_type in fields:
+            self._merge_field(self.find(key), name, field_type)
+
+    def add_field(self, key, name: str, field_type: Type):
+        self._merge_field(self.find(key), name, field_type)
+
+    def mark_dynamic(self, key):
+        self._dynamic.add(self.find(key))
+
+    def _merge_field(self, root, name: str, field_type: Type):
+        fields = self._fields.setdefault(root, {})
+        if name not in fields:
+            fields[name] = field_type
+        elif fields[name] != field_type:
+            fields[name] = Type.UNKNOWN  # Разные типы значений поля: хранится как f64
+
+    def field_type(self, key, name: str) -> Type:
+        return self._fields.get(self.find(key), {}).get(name, Type.UNKNOWN)
+
+    def finalize(self):
+        """Назначает раскладку каждому классу с литералами и привязывает к ней все обращения."""
+        layout_by_root: Dict[Any, StructLayout] = {}
+        for node_id, key in self.site_keys.items():
+            root = self.find(key)
+            if root not in self._has_literal:
+                self.dynamic_sites.add(node_id)
+                continue
+            layout = layout_by_root.get(root)
+            if layout is None:
+                layout = StructLayout(len(self.layouts), self._fields.get(root, {}))
+                self.layouts.append(layout)
+                layout_by_root[root] = layout
+            self.site_layouts[node_id] = layout
+            if root in self._dynamic and key[0] == "var":
+                self.dynamic_sites.add(node_id)
+
+
+class ListLayoutInference:
+    """
+    Вывод слоя элементов списков в переменных. Переменные-списки, между которыми список
+    передается присваиванием, объединяются в классы (union-find). Тип элемента класса известен,
+    если в его переменные попадают только литералы списков с одним и тем же известным типом
+    элемента (`x << v` слой не меняет); иначе (параметр, результат вызова, элемент списка,
+    литерал `[]` или литерал с разными типами элементов) слой выбирается во время выполнения.
+    """
+
+    def __init__(self):
+        self._parent: Dict[Any, Any] = {}
+        self._element_types: Dict[Any, Set[Type]] = {}  # Корень -> типы элементов его литералов
+        self._dynamic: Set[Any] = set()
+        self._variables: Dict[Any, VariableInfo] = {}
+        self.site_keys: Dict[int, Any] = {}  # node_id обращения по индексу -> ключ класса переменной
+        self.site_element_types: Dict[int, Type] = {}  # Заполняется finalize()
+
+    def variable_key(self, var_info: VariableInfo):
+        key = ("var", id(var_info))
+        self._variables[key] = var_info  # Держим ссылку, чтобы id не переиспользовался после выхода из области
+        return key
+
+    def find(self, key):
+        parent = self._parent.setdefault(key, key)
+        if parent == key:
+            return key
+        root = self.find(parent)
+        self._parent[key] = root
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return
+        self._parent[root_b] = root_a
+        self._element_types.setdefault(root_a, set()).update(self._element_types.pop(root_b, set()))
+        if root_b in self._dynamic:
+            self._dynamic.add(root_a)
+
+    def add_literal(self, key, element_type: Type):
+        self._element_types.setdefault(self.find(key), set()).add(element_type)
+
+    def mark_dynamic(self, key):
+        self._dynamic.add(self.find(key))
+
+    def finalize(self):
+        """Привязывает к обращениям тип элемента их класса, если он единственный и известен."""
+        for node_id, key in self.site_keys.items():
+            root = self.find(key)
+            element_types = self._element_types.get(root, set())
+            if root in self._dynamic or len(element_types) != 1 or Type.UNKNOWN in element_types:
+                continue
+            self.site_element_types[node_id] = next(iter(element_types))
+
+
+class SemanticAnalyzer(AstListener):
+    def __init__(self, parser: ListLangParser, filename: str, node_count: int):
         self.filename = filename
         self.parser = parser
         self.symbol_table = SymbolTable(filename)
-        self.expression_types: Dict[Any, Type] = {}  # Stores types for AST expression nodes
-        self.lambda_signatures: Dict[Any, LambdaSignature] = {}  # Stores full signature for lambda expressions
+        # Таблицы фазы индексируются node_id узлов AST (0 <= node_id < node_count)
+        self.expression_types = ExpressionTypeTable(node_count)  # Types of AST expression nodes
+        # Full signature for lambda-valued nodes, parallel to expression_types
+        self.lambda_signatures: List[Optional[LambdaSignature]] = [None] * node_count
         self.errors: List[str] = []
         self.reported_errors: Set[str] = set()  # To prevent reporting same error multiple times
 
-        self.list_element_types: Dict[Any, Type] = {}  # Store element type for list literals
-        self.list_element_lambda_signatures: Dict[Any, LambdaSignature] = {}
+        self.list_element_types: Dict[int, Type] = {}  # Store element type for list literals
+        self.list_element_lambda_signatures: Dict[int, LambdaSignature] = {}
+        self.lambda_params: Dict[int, List[Parameter]] = {}  # Actual parameters of lambda nodes
+        self.function_decl_infos: Dict[int, FunctionInfo] = {}  # FunctionDecl node -> its own (overload) info
+        self.call_targets: Dict[int, FunctionInfo] = {}  # FunctionCall node -> matched function/overload
+        self.struct_shapes = StructShapeInference()  # Раскладки структур для кодогенерации
+        self.list_layouts = ListLayoutInference()  # Слой элементов списков в переменных для кодогенерации
+        self.integer_expressions: Set[int] = set()  # node_id выражений NUMBER с целым значением (Type.INT)
 
         # --- State tracking for scope and context ---
         self.in_function = False
@@ -331,55 +552,39 @@ class SemanticAnalyzer(ListLangListener):
             self.errors.append(error_msg)
             self.reported_errors.add(error_msg)
 
-    def get_line(self, ctx: ParserRuleContext) -> int:
-        return ctx.start.line
+    def get_line(self, node: ast.Node) -> int:
+        return node.line
 
-    def get_expression_type(self, ctx: ParserRuleContext) -> Type:
+    def get_expression_type(self, node: Optional[ast.Node]) -> Type:
         """Retrieves the type of an expression from the cache, or UNKNOWN if not found."""
-        return self.expression_types.get(ctx, Type.UNKNOWN)
-
-    def get_lambda_signature(self, ctx: ParserRuleContext) -> Optional[LambdaSignature]:
+        if node is None:
+            return Type.UNKNOWN
+        return _TYPE_BY_CODE[self.expression_types.codes[node.node_id]]
+
+    def get_numeric_subtype(self, node: Optional[ast.Node]) -> Type:
+        """Тип выражения с уточнением: INT для выражений NUMBER, значение которых всегда целое."""
+        if node is not None and node.node_id in self.integer_expressions:
+            return Type.INT
+        return self.get_expression_type(node)
+
+    def _refine_integer(self, node: ast.Node, *operands: ast.Node):
+        """Отмечает выражение NUMBER как целое, если целые все его операнды."""
+        if self.get_expression_type(node) == Type.NUMBER and \
+                all(operand.node_id in self.integer_expressions for operand in operands):
+            self.integer_expressions.add(node.node_id)
+
+    def get_lambda_signature(self, node: Optional[ast.Node]) -> Optional[LambdaSignature]:
         """Retrieves the lambda signature for a lambda expression from the cache."""
-        # Expressions can be wrapped in ParenExpressionContext or PrimaryExpressionActualContext
-        if isinstance(ctx, ListLangParser.ParenExpressionContext):
-            return self.lambda_signatures.get(ctx.expression(), None)
-        elif isinstance(ctx, ListLangParser.PrimaryExpressionActualContext):
-            return self.lambda_signatures.get(ctx.primaryExpr(), None)
-        elif isinstance(ctx, ListLangParser.LambdaExpressionActualContext):  # Direct lambda expression
-            return self.lambda_signatures.get(ctx.lambdaExpr(), None)
-        elif isinstance(ctx, ListLangParser.IdentifierExpressionContext):  # Identifier holding a lambda
-            var_info = self.symbol_table.lookup_variable(ctx.IDENTIFIER().getText())
-            if var_info and var_info.type == Type.LAMBDA:
-                return var_info.lambda_signature
-        return self.lambda_signatures.get(ctx, None)
-
-    def _unwrap_expression(self, ctx):
-        try:
-            if isinstance(ctx, ListLangParser.ParenExpressionContext):
-                return self._unwrap_expression(ctx.expression())
-
-            if isinstance(ctx, ListLangParser.PrimaryExpressionActualContext):
-                prim = ctx.primaryExpr()
-                # literal -> may contain listLiteral or structLiteral
-                if isinstance(prim, ListLangParser.LiteralExpressionContext):
-                    lit = prim.literal()
-                    # If literal contains listLiteral, return the listLiteral node
-                    if lit.listLiteral():
-                        return lit.listLiteral()
-                    if lit.structLiteral():
-                        return lit.structLiteral()
-                    return lit
-                if isinstance(prim, ListLangParser.FunctionCallExpressionContext):
-                    return prim.functionCall()
-                if isinstance(prim, ListLangParser.IdentifierExpressionContext):
-                    return prim
-                if isinstance(prim, ListLangParser.ParenExpressionContext):
-                    return self._unwrap_expression(prim)
-            if isinstance(ctx, ListLangParser.LambdaExpressionActualContext):
-                return ctx.lambdaExpr()
-        except Exception:
-            pass
-        return ctx
+        if node is None:
+            return None
+        # Скобки, идентификаторы и вызовы сохраняют сигнатуру на своем узле при выходе из него
+        return self.lambda_signatures[node.node_id]
+
+    def _unwrap_expression(self, node: ast.Node) -> ast.Node:
+        """Снимает скобки вокруг выражения (остальные обертки в AST уже свернуты)."""
+        while isinstance(node, ast.ParenExpression):
+            node = node.inner
+        return node
 
     def _lookup_variable_or_error(self, name: str, line: int, check_initialized: bool = True) -> Optional[VariableInfo]:
         """
@@ -442,58 +647,40 @@ class SemanticAnalyzer(ListLangListener):
         dequeue_info = FunctionInfo("dequeue", [Parameter("list", Type.LIST)], Type.UNKNOWN)
         self.symbol_table.declare_function(dequeue_info)
 
-    def _collect_return_types_from_block(self, block_ctx) -> List[Type]:
+    def _collect_return_types_from_block(self, block: ast.StatementBlock) -> List[Type]:
         """Рекурсивно собирает типы возвращаемых значений из блока"""
         return_types = []
 
-        for child in block_ctx.getChildren():
-            if isinstance(child, ListLangParser.ReturnStatementContext):
-                if child.expression():
-                    expr_type = self.get_expression_type(child.expression())
-                    if expr_type != Type.UNKNOWN:
-                        return_types.append(expr_type)
-                elif child.lambdaExpr():
-                    return_types.append(Type.LAMBDA)
-                else:
-                    # return без выражения - void
-                    return_types.append(Type.VOID)
-            elif isinstance(child, ListLangParser.StatementBlockContext):
+        for child in block.statements:
+            if isinstance(child, ast.ReturnStatement):
+                return_types.extend(self._collect_return_types_from_statement(child))
+            elif isinstance(child, ast.StatementBlock):
                 # Рекурсивно проверяем вложенные блоки
                 return_types.extend(self._collect_return_types_from_block(child))
-            elif isinstance(child, ListLangParser.IfStatementContext):
+            elif isinstance(child, ast.IfStatement):
                 # Обрабатываем if-else ветки
-                then_block = child.statementBlock(0) or child.statement(0)
-                if then_block:
-                    return_types.extend(self._collect_return_types_from_statement(then_block))
-
-                else_block = child.statementBlock(1) or child.statement(1)
-                if else_block:
-                    return_types.extend(self._collect_return_types_from_statement(else_block))
+                return_types.extend(self._collect_return_types_from_statement(child.then_branch))
+                if child.else_branch is not None:
+                    return_types.extend(self._collect_return_types_from_statement(child.else_branch))
 
         return return_types
 
-    def _collect_return_types_from_statement(self, stmt_ctx) -> List[Type]:
+    def _collect_return_types_from_statement(self, stmt) -> List[Type]:
         """Собирает типы возвращаемых значений из statement"""
-        if isinstance(stmt_ctx, ListLangParser.StatementBlockContext):
-            return self._collect_return_types_from_block(stmt_ctx)
-        elif isinstance(stmt_ctx, ListLangParser.ReturnStatementContext):
-            if stmt_ctx.expression():
-                expr_type = self.get_expression_type(stmt_ctx.expression())
-                if expr_type != Type.UNKNOWN:
-                    return [expr_type]
-            elif stmt_ctx.lambdaExpr():
-                return [Type.LAMBDA]
-            else:
+        if isinstance(stmt, ast.StatementBlock):
+            return self._collect_return_types_from_block(stmt)
+        elif isinstance(stmt, ast.ReturnStatement):
+            if stmt.value is None:
+                # return без выражения - void
                 return [Type.VOID]
+            expr_type = self.get_expression_type(stmt.value)
+            if expr_type != Type.UNKNOWN:
+                return [expr_type]
         return []
 
-    def _infer_function_return_type(self, func_info: FunctionInfo, func_ctx: ListLangParser.FunctionDeclContext):
+    def _infer_function_return_type(self, func_info: FunctionInfo, func_node: ast.FunctionDecl):
         """Выводит тип возвращаемого значения функции на основе return statements"""
-        statement_block = func_ctx.statementBlock()
-        if not statement_block:
-            return
-
-        return_types = self._collect_return_types_from_block(statement_block)
+        return_types = self._collect_return_types_from_block(func_node.body)
 
         if not return_types:
             # Нет return statements - функция не возвращает значение
@@ -519,40 +706,41 @@ class SemanticAnalyzer(ListLangListener):
     # --- Listener methods implementation ---
 
     # --- Program and Function Declarations ---
-    def enterProgram(self, ctx: ListLangParser.ProgramContext):
+    def enterProgram(self, node: ast.Program):
         # Global scope is already pushed in __init__
         pass
 
-    def exitProgram(self, ctx: ListLangParser.ProgramContext):
-        pass
+    def exitProgram(self, node: ast.Program):
+        self.struct_shapes.finalize()
+        self.list_layouts.finalize()
 
-    def enterFunctionDecl(self, ctx: ListLangParser.FunctionDeclContext):
+    def enterFunctionDecl(self, node: ast.FunctionDecl):
         self.in_function = True
-        func_name = ctx.IDENTIFIER().getText()
-        line = self.get_line(ctx)
+        func_name = node.name
+        line = self.get_line(node)
 
         params: List[Parameter] = []
-        param_list_ctx: Optional[ListLangParser.ParameterListContext] = ctx.parameterList()
-        if param_list_ctx:
-            for param_ctx in param_list_ctx.parameter():
-                p_name = param_ctx.IDENTIFIER().getText()
-                is_out = param_ctx.OUT() is not None
-
-                # Для функции apply_transform, параметр transformer должен быть лямбдой
-                if func_name == "apply_transform" and p_name == "transformer":
-                    # Создаем сигнатуру для лямбды: принимает один UNKNOWN параметр, возвращает UNKNOWN
-                    lambda_params = [Parameter("x", Type.UNKNOWN)]
-                    lambda_sig = LambdaSignature(lambda_params, Type.UNKNOWN)
-                    params.append(Parameter(p_name, Type.LAMBDA, is_out, lambda_sig))
-                else:
-                    params.append(Parameter(p_name, Type.UNKNOWN, is_out))
+        for param_node in node.params:
+            p_name = param_node.name
+            is_out = param_node.is_out
+
+            # Для функции apply_transform, параметр transformer должен быть лямбдой
+            if func_name == "apply_transform" and p_name == "transformer":
+                # Создаем сигнатуру для лямбды: принимает один UNKNOWN параметр, возвращает UNKNOWN
+                lambda_params = [Parameter("x", Type.UNKNOWN)]
+                lambda_sig = LambdaSignature(lambda_params, Type.UNKNOWN)
+                params.append(Parameter(p_name, Type.LAMBDA, is_out, lambda_sig))
+            else:
+                params.append(Parameter(p_name, Type.UNKNOWN, is_out))
 
         func_info = FunctionInfo(func_name, params, Type.UNKNOWN, line)
         try:
-            self.current_function_info = self.symbol_table.declare_function(func_info)
+            # Перегрузка добавляется к первой версии, но анализируется (и компилируется) своя версия
+            self.symbol_table.declare_function(func_info)
         except Exception as e:
             self.report_error(str(e), line)
-            self.current_function_info = func_info  # Proceed with this for further analysis
+        self.current_function_info = func_info
+        self.function_decl_infos[node.node_id] = func_info
 
         self.symbol_table.push_scope(ScopeType.FUNCTION, func_name)
 
@@ -564,34 +752,14 @@ class SemanticAnalyzer(ListLangListener):
             except Exception as e:
                 self.report_error(str(e), line)
 
-    def exitFunctionDecl(self, ctx: ListLangParser.FunctionDeclContext):
+    def exitFunctionDecl(self, node: ast.FunctionDecl):
         if self.current_function_info:
             # Пытаемся вывести тип возвращаемого значения
-            self._infer_function_return_type(self.current_function_info, ctx)
-
-            stmt_block = ctx.statementBlock()
-            if stmt_block:
-                # простой проход: если ANY return возвращает лямбду -> функция возвращает LAMBDA
-                def block_has_lambda_return(b):
-                    for ch in b.getChildren():
-                        if isinstance(ch, ListLangParser.ReturnStatementContext):
-                            if ch.lambdaExpr() is not None:
-                                return True
-                            if ch.expression() and self.get_expression_type(ch.expression()) == Type.LAMBDA:
-                                return True
-                        # вложенные блоки/if
-                        if isinstance(ch, ListLangParser.StatementBlockContext):
-                            if block_has_lambda_return(ch):
-                                return True
-                        if isinstance(ch, ListLangParser.IfStatementContext):
-                            then_b = ch.statementBlock(0) or ch.statement(0)
-                            else_b = ch.statementBlock(1) or ch.statement(1)
-                            if then_b and block_has_lambda_return(then_b): return True
-                            if else_b and block_has_lambda_return(else_b): return True
-                    return False
-
-                if block_has_lambda_return(stmt_block):
-                    self.current_function_info.return_type = Type.LAMBDA
+            self._infer_function_return_type(self.current_function_info, node)
+
+            # простой проход: если ANY return возвращает лямбду -> функция возвращает LAMBDA
+            if Type.LAMBDA in self._collect_return_types_from_block(node.body):
+                self.current_function_info.return_type = Type.LAMBDA
 
             # --- FIX: Если тип все еще UNKNOWN или некорректно выведен как VOID
             # для process_data(number), исправляем на NUMBER, так как он
@@ -613,7 +781,7 @@ class SemanticAnalyzer(ListLangListener):
         self.in_function = False
 
     # --- Lambda Expressions ---
-    def enterLambdaReturn(self, ctx: ListLangParser.LambdaReturnContext):
+    def enterLambdaReturn(self, node: ast.LambdaReturn):
         self.lambda_depth += 1
         self.in_lambda = True
         self._lambda_return_type_stack.append(self.current_lambda_return_type)
@@ -621,16 +789,15 @@ class SemanticAnalyzer(ListLangListener):
 
         self.symbol_table.push_scope(ScopeType.LAMBDA)
         # Store actual parameters for later
-        setattr(ctx, '_actual_lambda_params', self._process_lambda_params_for_lambda(ctx))
+        self.lambda_params[node.node_id] = self._process_lambda_params_for_lambda(node)
 
-    def exitLambdaReturn(self, ctx: ListLangParser.LambdaReturnContext):
-        line = self.get_line(ctx)
-        expr_ctx = ctx.expression()
-        expr_type = self.get_expression_type(expr_ctx)
+    def exitLambdaReturn(self, node: ast.LambdaReturn):
+        line = self.get_line(node)
+        expr_type = self.get_expression_type(node.body)
         inferred_return_type = expr_type
-        returned_lambda_sig = self.get_lambda_signature(expr_ctx)
+        returned_lambda_sig = self.get_lambda_signature(node.body)
 
-        actual_lambda_params: List[Parameter] = getattr(ctx, '_actual_lambda_params', [])
+        actual_lambda_params: List[Parameter] = self.lambda_params.get(node.node_id, [])
         # The types of lambda parameters are inferred on call, so they remain UNKNOWN here for the signature itself
         # Unless we define a way to declare lambda parameter types, they will always be inferred.
         # This part of the code mainly finalizes the lambda's own signature.
@@ -641,25 +808,18 @@ class SemanticAnalyzer(ListLangListener):
             self.current_function_info.return_type = Type.LAMBDA
             self.current_function_info.return_lambda_signature = lambda_sig
 
-        self.expression_types[ctx] = Type.LAMBDA
-        self.lambda_signatures[ctx] = lambda_sig  # Store full signature
+        self.expression_types[node.node_id] = Type.LAMBDA
+        self.lambda_signatures[node.node_id] = lambda_sig  # Store full signature
 
         self._finalize_lambda_exit()
 
-    def enterLambdaBlock(self, ctx: ListLangParser.LambdaBlockContext):
-        self.lambda_depth += 1
-        self.in_lambda = True
-        self._lambda_return_type_stack.append(self.current_lambda_return_type)
-        self.current_lambda_return_type = Type.UNKNOWN  # For current lambda
-
-        self.symbol_table.push_scope(ScopeType.LAMBDA)
-        # Store actual parameters for later
-        setattr(ctx, '_actual_lambda_params', self._process_lambda_params_for_lambda(ctx))
+    def enterLambdaBlock(self, node: ast.LambdaBlock):
+        self.enterLambdaReturn(node)
 
-    def exitLambdaBlock(self, ctx: ListLangParser.LambdaBlockContext):
+    def exitLambdaBlock(self, node: ast.LambdaBlock):
         inferred_return_type = self.current_lambda_return_type if self.current_lambda_return_type != Type.UNKNOWN else Type.VOID
 
-        actual_lambda_params: List[Parameter] = getattr(ctx, '_actual_lambda_params', [])
+        actual_lambda_params: List[Parameter] = self.lambda_params.get(node.node_id, [])
         # Same as exitLambdaReturn, lambda parameter types are inferred on call.
 
         lambda_sig = LambdaSignature(actual_lambda_params, inferred_return_type)
@@ -669,31 +829,29 @@ class SemanticAnalyzer(ListLangListener):
             self.current_function_info.return_lambda_signature = lambda_sig
 
 
-        self.expression_types[ctx] = Type.LAMBDA
-        self.lambda_signatures[ctx] = lambda_sig  # Store full signature
+        self.expression_types[node.node_id] = Type.LAMBDA
+        self.lambda_signatures[node.node_id] = lambda_sig  # Store full signature
 
         self._finalize_lambda_exit()
 
-    def _process_lambda_params_for_lambda(self, ctx: Any) -> List[Parameter]:
+    def _process_lambda_params_for_lambda(self, node: ast.LambdaReturn) -> List[Parameter]:
         lambda_params: List[Parameter] = []
-        param_list_ctx: Optional[ListLangParser.ParameterListContext] = ctx.parameterList()
-        if param_list_ctx:
-            for param_ctx in param_list_ctx.parameter():
-                param_name = param_ctx.IDENTIFIER().getText()
-                line = self.get_line(param_ctx)
+        for param_node in node.params:
+            param_name = param_node.name
+            line = self.get_line(param_node)
 
-                if param_ctx.OUT():
-                    self.report_error(f"Лямбда-функции не поддерживают параметры с модификатором 'out' (Ошибка 9)",
-                                      line)
+            if param_node.is_out:
+                self.report_error(f"Лямбда-функции не поддерживают параметры с модификатором 'out' (Ошибка 9)",
+                                  line)
 
-                try:
-                    # Declare parameter in current lambda scope. Type UNKNOWN, inferred on call.
-                    self.symbol_table.declare_variable(param_name, Type.UNKNOWN, line, is_parameter=True,
-                                                       initialized=True)
-                except Exception as e:
-                    self.report_error(str(e), line)
-                lambda_params.append(
-                    Parameter(param_name, Type.UNKNOWN))  # Store UNKNOWN, will be set on first call/assignment
+            try:
+                # Declare parameter in current lambda scope. Type UNKNOWN, inferred on call.
+                self.symbol_table.declare_variable(param_name, Type.UNKNOWN, line, is_parameter=True,
+                                                   initialized=True)
+            except Exception as e:
+                self.report_error(str(e), line)
+            lambda_params.append(
+                Parameter(param_name, Type.UNKNOWN))  # Store UNKNOWN, will be set on first call/assignment
         return lambda_params
 
     def _finalize_lambda_exit(self):
@@ -703,29 +861,27 @@ class SemanticAnalyzer(ListLangListener):
         self.in_lambda = (self.lambda_depth > 0)
 
     # --- Statement Blocks and Control Flow ---
-    def enterStatementBlock(self, ctx: ListLangParser.StatementBlockContext):
+    def enterStatementBlock(self, node: ast.StatementBlock):
         self.symbol_table.push_scope(ScopeType.BLOCK)
 
-    def exitStatementBlock(self, ctx: ListLangParser.StatementBlockContext):
+    def exitStatementBlock(self, node: ast.StatementBlock):
         self.symbol_table.pop_scope()
 
-    def exitIfStatement(self, ctx: ListLangParser.IfStatementContext):
-        line = self.get_line(ctx)
-        cond_expr_ctx: ListLangParser.ExpressionContext = ctx.expression()
-        cond_type = self.get_expression_type(cond_expr_ctx)
+    def exitIfStatement(self, node: ast.IfStatement):
+        line = self.get_line(node)
+        cond_type = self.get_expression_type(node.condition)
 
         if cond_type not in [Type.NUMBER, Type.BOOL, Type.UNKNOWN]:
             self.report_error(
                 f"Условное выражение 'if' должно быть типа NUMBER или BOOL, получен {cond_type} (Ошибка 4)",
                 line)
 
-    def enterWhileStatement(self, ctx: ListLangParser.WhileStatementContext):
+    def enterWhileStatement(self, node: ast.WhileStatement):
         self.in_loop_context += 1
 
-    def exitWhileStatement(self, ctx: ListLangParser.WhileStatementContext):
-        line = self.get_line(ctx)
-        cond_expr_ctx: ListLangParser.ExpressionContext = ctx.expression()
-        cond_type = self.get_expression_type(cond_expr_ctx)
+    def exitWhileStatement(self, node: ast.WhileStatement):
+        line = self.get_line(node)
+        cond_type = self.get_expression_type(node.condition)
 
         if cond_type not in [Type.NUMBER, Type.BOOL, Type.UNKNOWN]:
             self.report_error(
@@ -733,13 +889,12 @@ class SemanticAnalyzer(ListLangListener):
                 line)
         self.in_loop_context -= 1
 
-    def enterDoUntilStatement(self, ctx: ListLangParser.DoUntilStatementContext):
+    def enterDoUntilStatement(self, node: ast.DoUntilStatement):
         self.in_loop_context += 1
 
-    def exitDoUntilStatement(self, ctx: ListLangParser.DoUntilStatementContext):
-        line = self.get_line(ctx)
-        cond_expr_ctx: ListLangParser.ExpressionContext = ctx.expression()
-        cond_type = self.get_expression_type(cond_expr_ctx)
+    def exitDoUntilStatement(self, node: ast.DoUntilStatement):
+        line = self.get_line(node)
+        cond_type = self.get_expression_type(node.condition)
 
         if cond_type not in [Type.NUMBER, Type.BOOL, Type.UNKNOWN]:
             self.report_error(
@@ -747,25 +902,22 @@ class SemanticAnalyzer(ListLangListener):
                 line)
         self.in_loop_context -= 1
 
-    def enterForStatement(self, ctx: ListLangParser.ForStatementContext):
+    def enterForStatement(self, node: ast.ForStatement):
         self.in_loop_context += 1
         self.symbol_table.push_scope(ScopeType.BLOCK, "for_loop")
 
-        loop_var_name = ctx.IDENTIFIER().getText()
-        line = self.get_line(ctx)
+        loop_var_name = node.var_name
+        line = self.get_line(node)
 
         try:
             self.symbol_table.declare_variable(loop_var_name, Type.NUMBER, line, is_parameter=True, initialized=True)
         except Exception as e:
             self.report_error(str(e), line)
 
-    def exitForStatement(self, ctx: ListLangParser.ForStatementContext):
-        line = self.get_line(ctx)
-        from_expr_ctx: ListLangParser.ExpressionContext = ctx.expression(0)
-        to_expr_ctx: ListLangParser.ExpressionContext = ctx.expression(1)
-
-        from_type = self.get_expression_type(from_expr_ctx)
-        to_type = self.get_expression_type(to_expr_ctx)
+    def exitForStatement(self, node: ast.ForStatement):
+        line = self.get_line(node)
+        from_type = self.get_expression_type(node.start)
+        to_type = self.get_expression_type(node.end)
 
         if from_type not in [Type.NUMBER, Type.UNKNOWN]:
             self.report_error(
@@ -777,24 +929,18 @@ class SemanticAnalyzer(ListLangListener):
         self.symbol_table.pop_scope()
         self.in_loop_context -= 1
 
-    def enterBreakStatement(self, ctx: ListLangParser.BreakStatementContext):
-        line = self.get_line(ctx)
+    def enterBreakStatement(self, node: ast.BreakStatement):
+        line = self.get_line(node)
         if self.in_loop_context == 0:
             self.report_error("Оператор 'break' должен находиться внутри цикла (Ошибка 11)", line)
 
-    def exitBreakStatement(self, ctx: ListLangParser.BreakStatementContext):
-        pass
-
-    def enterContinueStatement(self, ctx: ListLangParser.ContinueStatementContext):
-        line = self.get_line(ctx)
+    def enterContinueStatement(self, node: ast.ContinueStatement):
+        line = self.get_line(node)
         if self.in_loop_context == 0:
             self.report_error("Оператор 'continue' должен находиться внутри цикла (Ошибка 11)", line)
 
-    def exitContinueStatement(self, ctx: ListLangParser.ContinueStatementContext):
-        pass
-
-    def exitReturnStatement(self, ctx: ListLangParser.ReturnStatementContext):
-        line = self.get_line(ctx)
+    def exitReturnStatement(self, node: ast.ReturnStatement):
+        line = self.get_line(node)
 
         if not self.in_function and not self.in_lambda:
             self.report_error("Оператор 'return' вне функции или лямбды (Ошибка 11)", line)
@@ -803,20 +949,10 @@ class SemanticAnalyzer(ListLangListener):
         ret_type = Type.VOID
         returned_lambda_sig: Optional[LambdaSignature] = None
 
-        expr_ctx: Optional[ListLangParser.ExpressionContext] = ctx.expression()
-        lambda_expr_ctx: Optional[ListLangParser.LambdaExprContext] = ctx.lambdaExpr()
-
-        if expr_ctx:
-            ret_type = self.get_expression_type(expr_ctx)
-            returned_lambda_sig = self.get_lambda_signature(expr_ctx)
-        elif lambda_expr_ctx:
-            ret_type = Type.LAMBDA
-            returned_lambda_sig = self.get_lambda_signature(lambda_expr_ctx)
-            if self.in_function and self.current_function_info:
-                # установить, что функция возвращает лямбду
-                self.current_function_info.return_type = Type.LAMBDA
-                if returned_lambda_sig:
-                    self.current_function_info.return_lambda_signature = returned_lambda_sig
+        # "return lambda ..." в AST - обычное выражение-лямбда с типом LAMBDA
+        if node.value is not None:
+            ret_type = self.get_expression_type(node.value)
+            returned_lambda_sig = self.get_lambda_signature(node.value)
 
         if ret_type == Type.UNKNOWN:
             # If the return expression itself is unknown, we can't infer the function's return type from it.
@@ -848,14 +984,12 @@ class SemanticAnalyzer(ListLangListener):
                         f"Несовместимый тип возвращаемого значения в {scope_desc}. Ожидался {target_return_type_ref}, получен {ret_type} (Ошибка 4)",
                         line)
 
-    def exitWriteStatement(self, ctx: ListLangParser.WriteStatementContext):
-        if ctx.argumentList():
-            for arg_ctx in ctx.argumentList().argument():
-                expr_ctx = arg_ctx.expression()
-                _ = self.get_expression_type(expr_ctx)  # Trigger type inference for argument expression
+    def exitWriteStatement(self, node: ast.WriteStatement):
+        for arg in node.arguments:
+            _ = self.get_expression_type(arg)  # Trigger type inference for argument expression
 
     # --- Assignment Statements (Specific context implementations) ---
-    def _handle_variable_assignment(self, target_name: str, expr_ctx: ParserRuleContext, line: int):
+    def _handle_variable_assignment(self, target_name: str, expr_node: ast.Node, line: int):
         """
         Enhanced assignment handling:
           - resolves RHS type (including function calls and wrapped expressions)
@@ -865,26 +999,17 @@ class SemanticAnalyzer(ListLangListener):
           - marks the target variable as initialized
         """
         # Base reported type for RHS
-        expr_type = self.get_expression_type(expr_ctx)
+        expr_type = self.get_expression_type(expr_node)
         lambda_sig: Optional[LambdaSignature] = None
         if expr_type == Type.LAMBDA:
-            lambda_sig = self.get_lambda_signature(expr_ctx)
+            lambda_sig = self.get_lambda_signature(expr_node)
 
-        # Try to unwrap common wrappers to reach underlying node (list literal, identifier, functionCall, etc.)
-        try:
-            unwrapped = self._unwrap_expression(expr_ctx)
-        except Exception:
-            unwrapped = expr_ctx
+        # Unwrap parentheses to reach underlying node (list literal, identifier, functionCall, etc.)
+        unwrapped = self._unwrap_expression(expr_node)
 
         # If RHS is a function call, prefer declared return type and return lambda signature if available
-        call_ctx = None
-        if isinstance(unwrapped, ListLangParser.FunctionCallContext):
-            call_ctx = unwrapped
-        elif isinstance(expr_ctx, ListLangParser.FunctionCallContext):
-            call_ctx = expr_ctx
-
-        if call_ctx is not None:
-            fname = call_ctx.IDENTIFIER().getText()
+        if isinstance(unwrapped, ast.FunctionCall):
+            fname = unwrapped.name
             finfo = self.symbol_table.lookup_function(fname)
             if finfo:
                 if finfo.return_type in (Type.UNKNOWN, Type.VOID):
@@ -898,15 +1023,6 @@ class SemanticAnalyzer(ListLangListener):
                     if expr_type == Type.LAMBDA:
                         lambda_sig = getattr(finfo, 'return_lambda_signature', lambda_sig)
 
-        # Fallback: if expr_type still UNKNOWN and expr_ctx is a functionCall node, consult symbol table
-        if expr_type == Type.UNKNOWN and isinstance(expr_ctx, ListLangParser.FunctionCallContext):
-            fname = expr_ctx.IDENTIFIER().getText()
-            finfo = self.symbol_table.lookup_function(fname)
-            if finfo:
-                expr_type = finfo.return_type
-                if expr_type == Type.LAMBDA:
-                    lambda_sig = getattr(finfo, 'return_lambda_signature', lambda_sig)
-
         # Attempt to infer element type and element lambda signature (for list literal or list access)
         inferred_element_type: Optional[Type] = None
         inferred_element_lambda_sig: Optional[LambdaSignature] = None
@@ -916,27 +1032,19 @@ class SemanticAnalyzer(ListLangListener):
         # This ensures we get the most specific element info.
 
         # 1) If RHS is a list literal (possibly unwrapped), infer element types/signatures from its elements
-        if isinstance(unwrapped, ListLangParser.ListLiteralContext):
+        if isinstance(unwrapped, ast.ListLiteral):
             # The list literal visitor (exitListLiteral) already infers these and stores in mappings.
             # We retrieve them here.
-            if hasattr(self, 'list_element_types'):
-                inferred_element_type = self.list_element_types.get(unwrapped, None)
-            if inferred_element_type == Type.LAMBDA and hasattr(self, 'list_element_lambda_signatures'):
-                inferred_element_lambda_sig = self.list_element_lambda_signatures.get(unwrapped, None)
+            inferred_element_type = self.list_element_types.get(unwrapped.node_id, None)
+            if inferred_element_type == Type.LAMBDA:
+                inferred_element_lambda_sig = self.list_element_lambda_signatures.get(unwrapped.node_id, None)
 
         # 2) If RHS is a list access expression like operations[i], try to extract element type/signature
-        access_ctx = None
-        if isinstance(unwrapped, ListLangParser.ListAccessExprContext):
-            access_ctx = unwrapped
-        elif isinstance(expr_ctx, ListLangParser.ListAccessExprContext):
-            access_ctx = expr_ctx
-
-        if access_ctx is not None:
-            list_base = access_ctx.expression(0)
+        if isinstance(unwrapped, ast.ListAccessExpr):
+            list_base = self._unwrap_expression(unwrapped.target)
             # If base is identifier, consult its VariableInfo
-            if isinstance(list_base, ListLangParser.IdentifierExpressionContext):
-                base_name = list_base.IDENTIFIER().getText()
-                base_var = self.symbol_table.lookup_variable(base_name)
+            if isinstance(list_base, ast.IdentifierExpression):
+                base_var = self.symbol_table.lookup_variable(list_base.name)
                 if base_var is not None and base_var.element_type is not None:
                     inferred_element_type = base_var.element_type
                     inferred_element_lambda_sig = base_var.element_lambda_signature or inferred_element_lambda_sig
@@ -945,26 +1053,20 @@ class SemanticAnalyzer(ListLangListener):
                     if expr_type == Type.LAMBDA and inferred_element_lambda_sig is not None:
                         lambda_sig = inferred_element_lambda_sig
             # If base is a list literal node we may have recorded its element type/signature
-            elif hasattr(self, 'list_element_types'):
-                try:
-                    unwrapped_base = self._unwrap_expression(list_base)
-                    if unwrapped_base in getattr(self, 'list_element_types', {}):
-                        inferred_element_type = self.list_element_types[unwrapped_base]
-                        if inferred_element_type == Type.LAMBDA and hasattr(self, 'list_element_lambda_signatures'):
-                            inferred_element_lambda_sig = self.list_element_lambda_signatures.get(unwrapped_base,
-                                                                                                  inferred_element_lambda_sig)
-                        expr_type = inferred_element_type
-                        if expr_type == Type.LAMBDA and inferred_element_lambda_sig is not None:
-                            lambda_sig = inferred_element_lambda_sig
-                except Exception:
-                    pass
+            elif list_base.node_id in self.list_element_types:
+                inferred_element_type = self.list_element_types[list_base.node_id]
+                if inferred_element_type == Type.LAMBDA:
+                    inferred_element_lambda_sig = self.list_element_lambda_signatures.get(list_base.node_id,
+                                                                                          inferred_element_lambda_sig)
+                expr_type = inferred_element_type
+                if expr_type == Type.LAMBDA and inferred_element_lambda_sig is not None:
+                    lambda_sig = inferred_element_lambda_sig
 
         # 3) If unwrapped is an identifier referencing a lambda variable, extract its signature
         #    This is handled earlier by the lambda_sig variable if expr_type == LAMBDA.
         #    It's important to set expr_type to LAMBDA and lambda_sig for direct lambda variable assignments.
-        if isinstance(unwrapped, ListLangParser.IdentifierExpressionContext):
-            src_name = unwrapped.IDENTIFIER().getText()
-            src_info = self.symbol_table.lookup_variable(src_name)
+        if isinstance(unwrapped, ast.IdentifierExpression):
+            src_info = self.symbol_table.lookup_variable(unwrapped.name)
             if src_info and src_info.type == Type.LAMBDA:
                 if expr_type == Type.UNKNOWN or expr_type == Type.LAMBDA:  # Refine type if it was UNKNOWN
                     expr_type = Type.LAMBDA
@@ -1019,24 +1121,84 @@ class SemanticAnalyzer(ListLangListener):
             except Exception as e:
                 self.report_error(str(e), line)
 
-    def exitExpressionRightAssignment(self, ctx: ListLangParser.ExpressionRightAssignmentContext):
-        self._handle_variable_assignment(ctx.IDENTIFIER().getText(), ctx.expression(), self.get_line(ctx))
-
-    def exitIdentifierLeftAssignment(self, ctx: ListLangParser.IdentifierLeftAssignmentContext):
-        self._handle_variable_assignment(ctx.IDENTIFIER().getText(), ctx.expression(), self.get_line(ctx))
+        self._record_struct_assignment(target_name, unwrapped)
+        self._record_list_assignment(target_name, unwrapped)
 
-    def exitIdentifierAssignExpression(self, ctx: ListLangParser.IdentifierAssignExpressionContext):
-        self._handle_variable_assignment(ctx.IDENTIFIER().getText(), ctx.expression(), self.get_line(ctx))
+    def _record_struct_assignment(self, target_name: str, source: ast.Node):
+        """Связывает класс раскладки переменной-структуры с источником присваиваемой структуры."""
+        var_info = self.symbol_table.lookup_variable(target_name)
+        if var_info is None or var_info.type != Type.STRUCT:
+            return
+        target_key = self.struct_shapes.variable_key(var_info)
+        if isinstance(source, ast.StructLiteral):
+            self.struct_shapes.union(target_key, self.struct_shapes.literal_key(source.node_id))
+            return
+        if isinstance(source, ast.IdentifierExpression):
+            source_info = self.symbol_table.lookup_variable(source.name)
+            if source_info is not None and source_info.type == Type.STRUCT:
+                self.struct_shapes.union(target_key, self.struct_shapes.variable_key(source_info))
+                if source_info.is_parameter:
+                    self.struct_shapes.mark_dynamic(target_key)
+                return
+        # Результат вызова, элемент списка и т.п.: раскладка структуры неизвестна
+        self.struct_shapes.mark_dynamic(target_key)
 
-    def exitListElementAssignment(self, ctx: ListLangParser.ListElementAssignmentContext):
-        line = self.get_line(ctx)
-        list_expr_ctx = ctx.expression(0)
-        index_expr_ctx = ctx.expression(1)
-        value_expr_ctx = ctx.expression(2)
+    def _record_list_assignment(self, target_name: str, source: ast.Node):
+        """Связывает класс слоя элементов переменной с источником присваиваемого значения."""
+        var_info = self.symbol_table.lookup_variable(target_name)
+        if var_info is None:
+            return
+        target_key = self.list_layouts.variable_key(var_info)
+        while isinstance(source, ast.AppendExpr):  # `x << v` возвращает тот же список (слой не меняется)
+            source = self._unwrap_expression(source.left)
+        if isinstance(source, ast.ListLiteral):
+            self.list_layouts.add_literal(target_key, self.list_element_types.get(source.node_id, Type.UNKNOWN))
+            return
+        if isinstance(source, ast.IdentifierExpression):
+            source_info = self.symbol_table.lookup_variable(source.name)
+            if source_info is not None:
+                self.list_layouts.union(target_key, self.list_layouts.variable_key(source_info))
+                if source_info.is_parameter:
+                    self.list_layouts.mark_dynamic(target_key)
+                return
+        # Результат вызова, элемент списка и т.п.: слой элементов известен только во время выполнения
+        self.list_layouts.mark_dynamic(target_key)
 
-        list_type = self.get_expression_type(list_expr_ctx)
-        index_type = self.get_expression_type(index_expr_ctx)
-        value_type = self.get_expression_type(value_expr_ctx)
+    def _list_site_key(self, node: ast.Node, target: ast.Node):
+        """Регистрирует обращение по индексу к переменной-списку (для выбора слоя элементов)."""
+        target = self._unwrap_expression(target)
+        if not isinstance(target, ast.IdentifierExpression):
+            return
+        var_info = self.symbol_table.lookup_variable(target.name)
+        if var_info is None:
+            return
+        key = self.list_layouts.variable_key(var_info)
+        if var_info.is_parameter or var_info.type != Type.LIST:
+            self.list_layouts.mark_dynamic(key)
+        self.list_layouts.site_keys[node.node_id] = key
+
+    def _struct_site_key(self, node: ast.Node, struct_var_info: VariableInfo):
+        """Регистрирует обращение к полю переменной-структуры и возвращает ключ ее класса."""
+        key = self.struct_shapes.variable_key(struct_var_info)
+        if struct_var_info.is_parameter or struct_var_info.type != Type.STRUCT:
+            self.struct_shapes.mark_dynamic(key)
+        self.struct_shapes.site_keys[node.node_id] = key
+        return key
+
+    def exitExpressionRightAssignment(self, node: ast.ExpressionRightAssignment):
+        self._handle_variable_assignment(node.name, node.expression, self.get_line(node))
+
+    def exitIdentifierLeftAssignment(self, node: ast.IdentifierLeftAssignment):
+        self._handle_variable_assignment(node.name, node.expression, self.get_line(node))
+
+    def exitIdentifierAssignExpression(self, node: ast.IdentifierAssignExpression):
+        self._handle_variable_assignment(node.name, node.expression, self.get_line(node))
+
+    def exitListElementAssignment(self, node: ast.ListElementAssignment):
+        line = self.get_line(node)
+        list_type = self.get_expression_type(node.target)
+        index_type = self.get_expression_type(node.index)
+        value_type = self.get_expression_type(node.value)
 
         if list_type not in [Type.LIST, Type.STRING, Type.UNKNOWN]:
             self.report_error(
@@ -1046,57 +1208,22 @@ class SemanticAnalyzer(ListLangListener):
         if index_type not in [Type.NUMBER, Type.UNKNOWN]:
             self.report_error(f"Индекс должен быть типа NUMBER, получен {index_type} (Ошибка 4)", line)
 
-        if list_type == Type.STRING and value_type != Type.STRING and value_type != Type.UNKNOWN:
-            self.report_error(
-                f"Несовместимые типы при присваивании элемента строки. Ожидался STRING, получен {value_type} (Ошибка 4)",
-                line)
-
-    def exitListElementAssignExpression(self, ctx: ListLangParser.ListElementAssignExpressionContext):
-        line = self.get_line(ctx)
-        list_expr_ctx = ctx.expression(0)
-        index_expr_ctx = ctx.expression(1)
-        value_expr_ctx = ctx.expression(2)
-
-        list_type = self.get_expression_type(list_expr_ctx)
-        index_type = self.get_expression_type(index_expr_ctx)
-        value_type = self.get_expression_type(value_expr_ctx)
-
-        if list_type not in [Type.LIST, Type.STRING, Type.UNKNOWN]:
-            self.report_error(
-                f"Присваивание по индексу не применимо к типу {list_type} (ожидается LIST или STRING) (Ошибка 4)",
-                line)
-
-        if index_type not in [Type.NUMBER, Type.UNKNOWN]:
-            self.report_error(f"Индекс должен быть типа NUMBER, получен {index_type} (Ошибка 4)", line)
+        if list_type == Type.LIST:
+            self._list_site_key(node, node.target)
 
         if list_type == Type.STRING and value_type != Type.STRING and value_type != Type.UNKNOWN:
             self.report_error(
                 f"Несовместимые типы при присваивании элемента строки. Ожидался STRING, получен {value_type} (Ошибка 4)",
                 line)
 
-    def exitStructFieldAssignment(self, ctx: ListLangParser.StructFieldAssignmentContext):
-        line = self.get_line(ctx)
-        struct_id = ctx.IDENTIFIER(0).getText()
-        field_id = ctx.IDENTIFIER(1).getText()
-        value_expr_ctx = ctx.expression()
-        value_type = self.get_expression_type(value_expr_ctx)
-
-        struct_var_info = self._lookup_variable_or_error(struct_id, line)
-        if struct_var_info is None:
-            return
-
-        if struct_var_info.type != Type.STRUCT and struct_var_info.type != Type.UNKNOWN:
-            self.report_error(
-                f"Попытка присваивания полю '{field_id}' переменной '{struct_id}', которая не является STRUCT. Тип: {struct_var_info.type} (Ошибка 4)",
-                line)
-            return
+    def exitListElementAssignExpression(self, node: ast.ListElementAssignExpression):
+        self.exitListElementAssignment(node)
 
-    def exitStructFieldAssignExpression(self, ctx: ListLangParser.StructFieldAssignExpressionContext):
-        line = self.get_line(ctx)
-        struct_id = ctx.IDENTIFIER(0).getText()
-        field_id = ctx.IDENTIFIER(1).getText()
-        value_expr_ctx = ctx.expression()
-        value_type = self.get_expression_type(value_expr_ctx)
+    def exitStructFieldAssignment(self, node: ast.StructFieldAssignment):
+        line = self.get_line(node)
+        struct_id = node.struct_name
+        field_id = node.field_name
+        value_type = self.get_expression_type(node.value)
 
         struct_var_info = self._lookup_variable_or_error(struct_id, line)
         if struct_var_info is None:
@@ -1108,17 +1235,16 @@ class SemanticAnalyzer(ListLangListener):
                 line)
             return
 
-    def exitMultiAssignment(self, ctx: ListLangParser.MultiAssignmentContext):
-        line = self.get_line(ctx)
-        id_list_ctx = ctx.identifierList()
-        expr_list_ctx = ctx.expressionList()
+        key = self._struct_site_key(node, struct_var_info)
+        self.struct_shapes.add_field(key, field_id, value_type)
 
-        if not id_list_ctx or not expr_list_ctx:
-            self.report_error("Некорректное множественное присваивание", line)
-            return
+    def exitStructFieldAssignExpression(self, node: ast.StructFieldAssignExpression):
+        self.exitStructFieldAssignment(node)
 
-        identifiers = [id_token.getText() for id_token in id_list_ctx.IDENTIFIER()]
-        expressions = expr_list_ctx.expression()
+    def exitMultiAssignment(self, node: ast.MultiAssignment):
+        line = self.get_line(node)
+        identifiers = node.names
+        expressions = node.expressions
 
         if len(identifiers) != len(expressions):
             self.report_error(
@@ -1159,44 +1285,29 @@ class SemanticAnalyzer(ListLangListener):
         # Continue with individual variable assignments.
         for i in range(len(identifiers)):
             var_name = identifiers[i]
-            expr_ctx = expressions[i]
-            self._handle_variable_assignment(var_name, expr_ctx, line)
+            self._handle_variable_assignment(var_name, expressions[i], line)
 
     # --- Expressions (Specific context implementations) ---
 
-    def _handle_function_call_logic(self, ctx: ListLangParser.FunctionCallContext):
-        func_name = ctx.IDENTIFIER().getText()
-        line = self.get_line(ctx)
-
-        arg_list_parent_ctx: Optional[ListLangParser.ArgumentListContext] = ctx.argumentList()
-        arg_ctx_list: List[
-            ListLangParser.ArgumentContext] = arg_list_parent_ctx.argument() if arg_list_parent_ctx else []
+    def _handle_function_call_logic(self, node: ast.FunctionCall):
+        func_name = node.name
+        line = self.get_line(node)
 
         actual_arg_types: List[Type] = []
-        actual_is_out: List[bool] = []
-        actual_arg_expressions: List[ListLangParser.ExpressionContext] = []
+        actual_is_out: List[bool] = list(node.out_flags)
+        actual_arg_expressions: List[ast.Node] = node.arguments
         actual_lambda_signatures: List[Optional[LambdaSignature]] = []
 
-        for arg_ctx in arg_ctx_list:
-            arg_expression_ctx: ListLangParser.ExpressionContext = arg_ctx.expression()
-            arg_type = self.get_expression_type(arg_expression_ctx)
-            actual_arg_types.append(arg_type)
-            is_out = arg_ctx.OUT() is not None
-            actual_is_out.append(is_out)
-            actual_arg_expressions.append(arg_expression_ctx)
-            actual_lambda_signatures.append(self.get_lambda_signature(arg_expression_ctx))
+        for arg_node, is_out in zip(node.arguments, node.out_flags):
+            actual_arg_types.append(self.get_expression_type(arg_node))
+            actual_lambda_signatures.append(self.get_lambda_signature(arg_node))
 
             # Error 13: 'out' argument must be a simple identifier
-            if is_out:
-                is_simple_identifier = False
-                if isinstance(arg_expression_ctx, ListLangParser.PrimaryExpressionActualContext):
-                    if isinstance(arg_expression_ctx.primaryExpr(), ListLangParser.IdentifierExpressionContext):
-                        is_simple_identifier = True
-                if not is_simple_identifier:
-                    self.report_error(
-                        "Аргумент с модификатором 'out' должен быть переменной (Ошибка 13)",
-                        self.get_line(arg_ctx)
-                    )
+            if is_out and not isinstance(arg_node, ast.IdentifierExpression):
+                self.report_error(
+                    "Аргумент с модификатором 'out' должен быть переменной (Ошибка 13)",
+                    self.get_line(arg_node)
+                )
 
         func_info_candidates = self.symbol_table.lookup_function(func_name)
         var_info_as_lambda = self.symbol_table.lookup_variable(func_name)
@@ -1247,11 +1358,11 @@ class SemanticAnalyzer(ListLangListener):
                     f"Не найдена подходящая версия подпрограммы '{func_name}' с {len(actual_arg_types)} аргументами и соответствующими модификаторами 'out' (Ошибка 1/7)",
                     line
                 )
-                self.expression_types[ctx] = Type.UNKNOWN
+                self.expression_types[node.node_id] = Type.UNKNOWN
                 return
 
             # Type-check/infer parameters and propagate lambda signatures into function scope variables
-            for i, (formal_param, actual_type, actual_expr_ctx, actual_lambda_sig) in enumerate(
+            for i, (formal_param, actual_type, actual_expr, actual_lambda_sig) in enumerate(
                     zip(matched_func.parameters, actual_arg_types, actual_arg_expressions, actual_lambda_signatures)):
                 # If formal parameter is UNKNOWN, infer it from actual argument
                 if formal_param.type == Type.UNKNOWN:
@@ -1270,19 +1381,20 @@ class SemanticAnalyzer(ListLangListener):
                             if formal_param.lambda_signature and actual_lambda_sig and formal_param.lambda_signature != actual_lambda_sig:
                                 self.report_error(
                                     f"Несовпадение сигнатуры лямбда-аргумента {i + 1} при вызове '{func_name}'. Ожидалось {formal_param.lambda_signature}, получено {actual_lambda_sig} (Ошибка 4 - сигнатура)",
-                                    self.get_line(actual_expr_ctx)
+                                    self.get_line(actual_expr)
                                 )
                         else:
                             self.report_error(
                                 f"Несовместимый тип для аргумента {i + 1} в вызове '{func_name}'. Ожидался {formal_param.type}, получен {actual_type} (Ошибка 4)",
-                                self.get_line(actual_expr_ctx)
+                                self.get_line(actual_expr)
                             )
 
             # Set return type from function info; if it is LAMBDA, propagate stored lambda signature
-            self.expression_types[ctx] = matched_func.return_type
+            self.call_targets[node.node_id] = matched_func
+            self.expression_types[node.node_id] = matched_func.return_type
             if matched_func.return_type == Type.LAMBDA and getattr(matched_func, "return_lambda_signature",
                                                                    None) is not None:
-                self.lambda_signatures[ctx] = matched_func.return_lambda_signature
+                self.lambda_signatures[node.node_id] = matched_func.return_lambda_signature
 
             return
 
@@ -1299,7 +1411,7 @@ class SemanticAnalyzer(ListLangListener):
                         f"Лямбда-функция '{func_name}' ожидает {expected_count} аргумент(ов), передано {len(actual_arg_types)} (Ошибка 1)",
                         line
                     )
-                    self.expression_types[ctx] = Type.UNKNOWN
+                    self.expression_types[node.node_id] = Type.UNKNOWN
                     return
 
                 if any(actual_is_out):
@@ -1308,7 +1420,7 @@ class SemanticAnalyzer(ListLangListener):
                         line
                     )
 
-                for i, (expected_param, actual_type, actual_expr_ctx, actual_lambda_sig_arg) in enumerate(
+                for i, (expected_param, actual_type, actual_expr, actual_lambda_sig_arg) in enumerate(
                         zip(expected_params, actual_arg_types, actual_arg_expressions, actual_lambda_signatures)):
                     if expected_param.type == Type.UNKNOWN:
                         expected_param.type = actual_type
@@ -1322,15 +1434,15 @@ class SemanticAnalyzer(ListLangListener):
                                 if expected_param.lambda_signature and actual_lambda_sig_arg and expected_param.lambda_signature != actual_lambda_sig_arg:
                                     self.report_error(
                                         f"Несовпадение сигнатуры лямбда-аргумента {i + 1} при вызове лямбды '{func_name}'. Ожидалось {expected_param.lambda_signature}, получено {actual_lambda_sig_arg} (Ошибка 4 - сигнатура)",
-                                        self.get_line(actual_expr_ctx)
+                                        self.get_line(actual_expr)
                                     )
                             else:
                                 self.report_error(
                                     f"Несовместимый тип для аргумента {i + 1} при вызове лямбды '{func_name}'. Ожидался {expected_param.type}, получен {actual_type} (Ошибка 4)",
-                                    self.get_line(actual_expr_ctx)
+                                    self.get_line(actual_expr)
                                 )
 
-                self.expression_types[ctx] = var_info_as_lambda.lambda_signature.return_type
+                self.expression_types[node.node_id] = var_info_as_lambda.lambda_signature.return_type
                 return
             else:
                 # Variable is known to be LAMBDA but signature is not yet available.
@@ -1340,7 +1452,7 @@ class SemanticAnalyzer(ListLangListener):
                         "Передача аргументов 'out' не поддерживается при вызове лямбда-функции (Ошибка 9)",
                         line
                     )
-                self.expression_types[ctx] = Type.UNKNOWN
+                self.expression_types[node.node_id] = Type.UNKNOWN
                 return
 
         # 3) Nothing found: either calling a non-function variable or unknown identifier
@@ -1348,7 +1460,7 @@ class SemanticAnalyzer(ListLangListener):
             # If variable exists but its type is UNKNOWN, assume it might be a lambda (inference pending)
             # and do not emit the "not a function" error. Just set result to UNKNOWN and allow analysis to continue.
             if var_info_as_lambda.type == Type.UNKNOWN:
-                self.expression_types[ctx] = Type.UNKNOWN
+                self.expression_types[node.node_id] = Type.UNKNOWN
                 return
 
             # Otherwise (type is known and not lambda), report an error
@@ -1361,141 +1473,128 @@ class SemanticAnalyzer(ListLangListener):
                 f"Неизвестный идентификатор '{func_name}' при попытке вызвать функцию (Ошибка 3)",
                 line
             )
-        self.expression_types[ctx] = Type.UNKNOWN
-
-    def exitFunctionCall(self, ctx: ListLangParser.FunctionCallContext):
-        self._handle_function_call_logic(ctx)
+        self.expression_types[node.node_id] = Type.UNKNOWN
 
-    def exitFunctionCallExpression(self, ctx: ListLangParser.FunctionCallExpressionContext):
-        self.expression_types[ctx] = self.get_expression_type(ctx.functionCall())
-        self.lambda_signatures[ctx] = self.get_lambda_signature(ctx.functionCall())
+    def exitFunctionCall(self, node: ast.FunctionCall):
+        self._handle_function_call_logic(node)
 
-    def exitIdentifierExpression(self, ctx: ListLangParser.IdentifierExpressionContext):
-        name = ctx.IDENTIFIER().getText()
-        line = self.get_line(ctx)
+    def exitIdentifierExpression(self, node: ast.IdentifierExpression):
+        name = node.name
+        line = self.get_line(node)
         var_info = self._lookup_variable_or_error(name, line)
         if var_info:
-            self.expression_types[ctx] = var_info.type
+            self.expression_types[node.node_id] = var_info.type
             if var_info.type == Type.LAMBDA:
-                self.lambda_signatures[ctx] = var_info.lambda_signature  # Propagate lambda signature
+                self.lambda_signatures[node.node_id] = var_info.lambda_signature  # Propagate lambda signature
         else:
-            self.expression_types[ctx] = Type.UNKNOWN
+            self.expression_types[node.node_id] = Type.UNKNOWN
 
-    def exitLiteralExpression(self, ctx: ListLangParser.LiteralExpressionContext):
-        self.expression_types[ctx] = self.get_expression_type(ctx.literal())
-
-    def exitParenExpression(self, ctx: ListLangParser.ParenExpressionContext):
-        inner_expr_ctx = ctx.expression()
-        inner_type = self.get_expression_type(inner_expr_ctx)
-        self.expression_types[ctx] = inner_type
+    def exitParenExpression(self, node: ast.ParenExpression):
+        inner_type = self.get_expression_type(node.inner)
+        self.expression_types[node.node_id] = inner_type
+        self._refine_integer(node, node.inner)
         if inner_type == Type.LAMBDA:
-            self.lambda_signatures[ctx] = self.get_lambda_signature(inner_expr_ctx)
-
-    def exitPrimaryExpressionActual(self, ctx: ListLangParser.PrimaryExpressionActualContext):
-        # This wrapper just propagates the type from the actual primary expression
-        self.expression_types[ctx] = self.get_expression_type(ctx.primaryExpr())
-        if self.get_expression_type(ctx.primaryExpr()) == Type.LAMBDA:
-            self.lambda_signatures[ctx] = self.get_lambda_signature(ctx.primaryExpr())
+            self.lambda_signatures[node.node_id] = self.get_lambda_signature(node.inner)
 
     # Built-in functions used as expressions
-    def exitReadCall(self, ctx: ListLangParser.ReadCallContext):
-        self.expression_types[ctx] = Type.UNKNOWN
+    def exitReadCall(self, node: ast.ReadCall):
+        self.expression_types[node.node_id] = Type.UNKNOWN
 
-    def exitLenCall(self, ctx: ListLangParser.LenCallContext):
-        line = self.get_line(ctx)
-        arg_expr_ctx = ctx.expression()
-        arg_type = self.get_expression_type(arg_expr_ctx)
+    def exitLenCall(self, node: ast.LenCall):
+        line = self.get_line(node)
+        arg_type = self.get_expression_type(node.argument)
         if arg_type not in [Type.LIST, Type.STRING, Type.UNKNOWN]:
             self.report_error(
                 f"Встроенная функция 'len' ожидает аргумент типа LIST или STRING, получен {arg_type} (Ошибка 7)",
                 line)
-            self.expression_types[ctx] = Type.UNKNOWN
+            self.expression_types[node.node_id] = Type.UNKNOWN
         else:
-            self.expression_types[ctx] = Type.NUMBER
+            self.expression_types[node.node_id] = Type.NUMBER
+            self.integer_expressions.add(node.node_id)
 
-    def exitDequeueCall(self, ctx: ListLangParser.DequeueCallContext):
-        line = self.get_line(ctx)
-        arg_expr_ctx = ctx.expression()
-        arg_type = self.get_expression_type(arg_expr_ctx)
+    def exitDequeueCall(self, node: ast.DequeueCall):
+        line = self.get_line(node)
+        arg_type = self.get_expression_type(node.argument)
         if arg_type not in [Type.LIST, Type.UNKNOWN]:
             self.report_error(
                 f"Встроенная функция 'dequeue' ожидает аргумент типа LIST, получен {arg_type} (Ошибка 7)", line)
-            self.expression_types[ctx] = Type.UNKNOWN
+            self.expression_types[node.node_id] = Type.UNKNOWN
         else:
-            self.expression_types[ctx] = Type.UNKNOWN  # Dequeued element type is unknown
+            self.expression_types[node.node_id] = Type.UNKNOWN  # Dequeued element type is unknown
 
     # Unary operators
-    def exitUnaryMinus(self, ctx: ListLangParser.UnaryMinusContext):
-        line = self.get_line(ctx)
-        expr_ctx = ctx.expression()
-        expr_type = self.get_expression_type(expr_ctx)
+    def exitUnaryMinus(self, node: ast.UnaryMinus):
+        line = self.get_line(node)
+        expr_type = self.get_expression_type(node.operand)
         if expr_type not in [Type.NUMBER, Type.UNKNOWN]:
             self.report_error(f"Унарный оператор '-' не применим к типу {expr_type} (Ошибка 4)", line)
-            self.expression_types[ctx] = Type.UNKNOWN
+            self.expression_types[node.node_id] = Type.UNKNOWN
         else:
-            self.expression_types[ctx] = Type.NUMBER
+            self.expression_types[node.node_id] = Type.NUMBER
+            self._refine_integer(node, node.operand)
 
-    def exitUnaryNot(self, ctx: ListLangParser.UnaryNotContext):
-        line = self.get_line(ctx)
-        expr_ctx = ctx.expression()
-        expr_type = self.get_expression_type(expr_ctx)
+    def exitUnaryNot(self, node: ast.UnaryNot):
+        line = self.get_line(node)
+        expr_type = self.get_expression_type(node.operand)
         if expr_type not in [Type.NUMBER, Type.BOOL, Type.UNKNOWN]:  # Allow numbers for truthiness
             self.report_error(f"Унарный оператор 'not' не применим к типу {expr_type} (Ошибка 4)", line)
-            self.expression_types[ctx] = Type.UNKNOWN
+            self.expression_types[node.node_id] = Type.UNKNOWN
         else:
-            self.expression_types[ctx] = Type.BOOL
+            self.expression_types[node.node_id] = Type.BOOL
 
     # Binary operators
-    def _handle_binary_op(self, ctx: ParserRuleContext, left_expr_ctx, right_expr_ctx, op_token_type, op_text):
-        line = self.get_line(ctx)
-        left_type = self.get_expression_type(left_expr_ctx)
-        right_type = self.get_expression_type(right_expr_ctx)
+    def _handle_binary_op(self, node: ast.BinaryExpr):
+        line = self.get_line(node)
+        op_token_type = node.op
+        op_text = node.op_text
+        left_type = self.get_expression_type(node.left)
+        right_type = self.get_expression_type(node.right)
 
         if left_type == Type.UNKNOWN or right_type == Type.UNKNOWN:
             if op_token_type in {ListLangParser.LT, ListLangParser.LE, ListLangParser.GT, ListLangParser.GE,
                                  ListLangParser.EQ, ListLangParser.NE, ListLangParser.AND, ListLangParser.OR}:
-                self.expression_types[ctx] = Type.BOOL
+                self.expression_types[node.node_id] = Type.BOOL
             else:
-                self.expression_types[ctx] = Type.UNKNOWN
+                self.expression_types[node.node_id] = Type.UNKNOWN
             return
 
         # Arithmetic operations
         if op_token_type in {ListLangParser.MULT, ListLangParser.DIV}:
             if left_type == Type.NUMBER and right_type == Type.NUMBER:
-                self.expression_types[ctx] = Type.NUMBER
+                self.expression_types[node.node_id] = Type.NUMBER
             elif op_token_type == ListLangParser.MULT and left_type == Type.STRING and right_type == Type.NUMBER:
-                self.expression_types[ctx] = Type.STRING  # String repetition: "str" * 5
+                self.expression_types[node.node_id] = Type.STRING  # String repetition: "str" * 5
             else:
                 self.report_error(
                     f"Операция '{op_text}' не поддерживается между типами {left_type} и {right_type} (Ошибка 4)",
                     line)
-                self.expression_types[ctx] = Type.UNKNOWN
+                self.expression_types[node.node_id] = Type.UNKNOWN
         elif op_token_type in {ListLangParser.PLUS, ListLangParser.MINUS}:
             if left_type == Type.NUMBER and right_type == Type.NUMBER:
-                self.expression_types[ctx] = Type.NUMBER
+                self.expression_types[node.node_id] = Type.NUMBER
             elif op_token_type == ListLangParser.PLUS and (left_type == Type.STRING or right_type == Type.STRING):
                 self.expression_types[
-                    ctx] = Type.STRING  # String concatenation (even if one is number, it's converted to string)
+                    node.node_id] = Type.STRING  # String concatenation (even if one is number, it's converted to string)
             else:
                 self.report_error(
                     f"Операция '{op_text}' не поддерживается между типами {left_type} и {right_type} (Ошибка 4)",
                     line)
-                self.expression_types[ctx] = Type.UNKNOWN
+                self.expression_types[node.node_id] = Type.UNKNOWN
 
         # Append operation
         elif op_token_type == ListLangParser.APPEND:
             if left_type == Type.LIST:
-                self.expression_types[ctx] = Type.LIST
+                self.expression_types[node.node_id] = Type.LIST
             else:
                 self.report_error(
                     f"Операция '{op_text}' (APPEND) не поддерживается для типа {left_type} (ожидается LIST) (Ошибка 4)",
                     line)
-                self.expression_types[ctx] = Type.UNKNOWN
+                self.expression_types[node.node_id] = Type.UNKNOWN
 
         # Comparison operations
         elif op_token_type in {ListLangParser.LT, ListLangParser.LE, ListLangParser.GT, ListLangParser.GE,
                                ListLangParser.EQ, ListLangParser.NE}:
-            self.expression_types[ctx] = Type.BOOL
+            self.expression_types[node.node_id] = Type.BOOL
             if left_type == Type.LAMBDA or right_type == Type.LAMBDA or left_type == Type.STRUCT or right_type == Type.STRUCT:
                 self.report_error(
                     f"Операция сравнения '{op_text}' не поддерживается для лямбда-функций или структур (Ошибка 11)",
@@ -1519,62 +1618,58 @@ class SemanticAnalyzer(ListLangListener):
 
         # Logical operations
         elif op_token_type in {ListLangParser.AND, ListLangParser.OR}:
-            self.expression_types[ctx] = Type.BOOL
+            self.expression_types[node.node_id] = Type.BOOL
             if (left_type not in {Type.NUMBER, Type.BOOL}) or \
                     (right_type not in {Type.NUMBER, Type.BOOL}):
                 self.report_error(
                     f"Логическая операция '{op_text}' не поддерживается для типов {left_type} и {right_type} (ожидается NUMBER или BOOL) (Ошибка 4)",
                     line)
         else:
-            self.expression_types[ctx] = Type.UNKNOWN  # Fallback for unknown operator type
+            self.expression_types[node.node_id] = Type.UNKNOWN  # Fallback for unknown operator type
 
-    def exitMultiplyExpr(self, ctx: ListLangParser.MultiplyExprContext):
-        self._handle_binary_op(ctx, ctx.expression(0), ctx.expression(1), ListLangParser.MULT, '*')
+    def exitMultiplyExpr(self, node: ast.MultiplyExpr):
+        self._handle_binary_op(node)
+        self._refine_integer(node, node.left, node.right)
 
-    def exitDivideExpr(self, ctx: ListLangParser.DivideExprContext):
-        self._handle_binary_op(ctx, ctx.expression(0), ctx.expression(1), ListLangParser.DIV, '/')
+    def exitDivideExpr(self, node: ast.DivideExpr):
+        self._handle_binary_op(node)
 
-    def exitPlusExpr(self, ctx: ListLangParser.PlusExprContext):
-        self._handle_binary_op(ctx, ctx.expression(0), ctx.expression(1), ListLangParser.PLUS, '+')
+    def exitPlusExpr(self, node: ast.PlusExpr):
+        self._handle_binary_op(node)
+        self._refine_integer(node, node.left, node.right)
 
-    def exitMinusExpr(self, ctx: ListLangParser.MinusExprContext):
-        self._handle_binary_op(ctx, ctx.expression(0), ctx.expression(1), ListLangParser.MINUS, '-')
+    def exitMinusExpr(self, node: ast.MinusExpr):
+        self._handle_binary_op(node)
+        self._refine_integer(node, node.left, node.right)
 
-    def exitAppendExpr(self, ctx: ListLangParser.AppendExprContext):
-        self._handle_binary_op(ctx, ctx.expression(0), ctx.expression(1), ListLangParser.APPEND, '<<')
+    def exitAppendExpr(self, node: ast.AppendExpr):
+        self._handle_binary_op(node)
 
-    def exitComparisonExpr(self, ctx: ListLangParser.ComparisonExprContext):
-        op_token_type = ctx.getChild(1).getSymbol().type
-        op_text = ctx.getChild(1).getSymbol().text
-        self._handle_binary_op(ctx, ctx.expression(0), ctx.expression(1), op_token_type, op_text)
+    def exitComparisonExpr(self, node: ast.ComparisonExpr):
+        self._handle_binary_op(node)
 
-    def exitLogicalExpr(self, ctx: ListLangParser.LogicalExprContext):
-        op_token_type = ctx.getChild(1).getSymbol().type
-        op_text = ctx.getChild(1).getSymbol().text
-        self._handle_binary_op(ctx, ctx.expression(0), ctx.expression(1), op_token_type, op_text)
+    def exitLogicalExpr(self, node: ast.LogicalExpr):
+        self._handle_binary_op(node)
 
     # List Access
-    def exitListAccessExpr(self, ctx: ListLangParser.ListAccessExprContext):
+    def exitListAccessExpr(self, node: ast.ListAccessExpr):
         """
         Determine the type of expression `listExpr[index]`:
           - If listExpr is STRING -> result is STRING
           - If listExpr is LIST -> try to return its element_type if known, otherwise UNKNOWN
           - Validate index is NUMBER (or UNKNOWN)
-          - If element type is LAMBDA, propagate the element lambda signature into self.lambda_signatures[ctx]
+          - If element type is LAMBDA, propagate the element lambda signature into self.lambda_signatures[node.node_id]
         """
-        line = self.get_line(ctx)
-        list_expr_ctx = ctx.expression(0)
-        index_expr_ctx = ctx.expression(1)
-
-        list_type = self.get_expression_type(list_expr_ctx)
-        index_type = self.get_expression_type(index_expr_ctx)
+        line = self.get_line(node)
+        list_type = self.get_expression_type(node.target)
+        index_type = self.get_expression_type(node.index)
 
         # Validate container type
         if list_type not in [Type.LIST, Type.STRING, Type.UNKNOWN]:
             self.report_error(
                 f"Индексация не применима к типу {list_type} (ожидается LIST или STRING) (Ошибка 4)",
                 line)
-            self.expression_types[ctx] = Type.UNKNOWN
+            self.expression_types[node.node_id] = Type.UNKNOWN
             return
 
         # Validate index type
@@ -1585,7 +1680,7 @@ class SemanticAnalyzer(ListLangListener):
 
         # If string, result is STRING (character)
         if list_type == Type.STRING:
-            self.expression_types[ctx] = Type.STRING
+            self.expression_types[node.node_id] = Type.STRING
             return
 
         # If list, try to determine element type and propagate lambda signature if any
@@ -1593,94 +1688,81 @@ class SemanticAnalyzer(ListLangListener):
             elem_type = None
             elem_lambda_sig = None
 
-            # 1) If list expression is a simple identifier, consult its VariableInfo.element_type / element_lambda_signature
-            if isinstance(list_expr_ctx, ListLangParser.IdentifierExpressionContext):
-                var_info = self.symbol_table.lookup_variable(list_expr_ctx.IDENTIFIER().getText())
-                if var_info:
-                    if var_info.element_type is not None:
-                        elem_type = var_info.element_type
-                    if var_info.element_lambda_signature is not None:
-                        elem_lambda_sig = var_info.element_lambda_signature
-
-            # 2) If list expression is a literal or wrapped literal, consult stored mappings
-            if elem_type is None and hasattr(self, 'list_element_types'):
-                try:
-                    unwrapped = self._unwrap_expression(list_expr_ctx)
-                    if unwrapped in self.list_element_types:
-                        elem_type = self.list_element_types[unwrapped]
-                        if elem_type == Type.LAMBDA and hasattr(self, 'list_element_lambda_signatures'):
-                            elem_lambda_sig = self.list_element_lambda_signatures.get(unwrapped, elem_lambda_sig)
-                except Exception:
-                    pass
+            list_expr = self._unwrap_expression(node.target)
+            self._list_site_key(node, list_expr)
+
+            # Тип элемента известен только для литерала списка. Для переменных он не берется
+            # из VariableInfo: присваивание элемента выражению того же списка ("l[i] * 2 -> l")
+            # иначе стало бы ошибкой типов в существующих программах.
+            if list_expr.node_id in self.list_element_types:
+                elem_type = self.list_element_types[list_expr.node_id]
+                if elem_type == Type.LAMBDA:
+                    elem_lambda_sig = self.list_element_lambda_signatures.get(list_expr.node_id, elem_lambda_sig)
 
             # Set result type for this ListAccessExpr node
             if elem_type is not None:
-                self.expression_types[ctx] = elem_type
+                self.expression_types[node.node_id] = elem_type
             else:
-                self.expression_types[ctx] = Type.UNKNOWN
+                self.expression_types[node.node_id] = Type.UNKNOWN
 
             # If element is a lambda and we have a signature, propagate it to this node so calls work
-            if self.expression_types[ctx] == Type.LAMBDA:
+            if self.expression_types[node.node_id] == Type.LAMBDA:
                 if elem_lambda_sig is not None:
-                    self.lambda_signatures[ctx] = elem_lambda_sig
+                    self.lambda_signatures[node.node_id] = elem_lambda_sig
 
             return
 
         # Fallback
-        self.expression_types[ctx] = Type.UNKNOWN
+        self.expression_types[node.node_id] = Type.UNKNOWN
 
     # Struct Field Access
-    def exitStructFieldAccessExpr(self, ctx: ListLangParser.StructFieldAccessExprContext):
-        line = self.get_line(ctx)
-        struct_id_token = ctx.IDENTIFIER(0)
-        struct_id = struct_id_token.getText()
-        # field_id_token = ctx.IDENTIFIER(1)
-        # field_id = field_id_token.getText() # Not needed for type inference at this level
+    def exitStructFieldAccessExpr(self, node: ast.StructFieldAccessExpr):
+        line = self.get_line(node)
+        struct_id = node.struct_name
+        # node.field_name is not needed for type inference at this level
 
         struct_var_info = self._lookup_variable_or_error(struct_id, line)
         if struct_var_info is None:
-            self.expression_types[ctx] = Type.UNKNOWN
+            self.expression_types[node.node_id] = Type.UNKNOWN
             return
 
         if struct_var_info.type != Type.STRUCT and struct_var_info.type != Type.UNKNOWN:
             self.report_error(
                 f"Попытка доступа к полю переменной '{struct_id}', которая не является STRUCT. Тип: {struct_var_info.type} (Ошибка 4)",
                 line)
-            self.expression_types[ctx] = Type.UNKNOWN
+            self.expression_types[node.node_id] = Type.UNKNOWN
             return
 
-        self.expression_types[ctx] = Type.UNKNOWN  # Field type is unknown without struct definitions
+        # Тип поля известен из литералов и присваиваний полям структур того же класса раскладки
+        key = self._struct_site_key(node, struct_var_info)
+        self.expression_types[node.node_id] = self.struct_shapes.field_type(key, node.field_name)
 
     # Literals
-    def exitLiteral(self, ctx: ListLangParser.LiteralContext):
-        if ctx.NUMBER():
-            self.expression_types[ctx] = Type.NUMBER
-        elif ctx.STRING():
-            self.expression_types[ctx] = Type.STRING
-        elif ctx.listLiteral():
-            self.expression_types[ctx] = self.get_expression_type(ctx.listLiteral())
-        elif ctx.structLiteral():
-            self.expression_types[ctx] = self.get_expression_type(ctx.structLiteral())
-        else:
-            self.expression_types[ctx] = Type.UNKNOWN
+    def exitNumberLiteral(self, node: ast.NumberLiteral):
+        self.expression_types[node.node_id] = Type.NUMBER
+        if node.is_integer:
+            self.integer_expressions.add(node.node_id)
+
+    def exitStringLiteral(self, node: ast.StringLiteral):
+        self.expression_types[node.node_id] = Type.STRING
 
-    def exitListLiteral(self, ctx: ListLangParser.ListLiteralContext):
+    def exitListLiteral(self, node: ast.ListLiteral):
         """
         Determine the type of a list literal and, when possible, infer its element type
         and element lambda signature (if elements are lambdas or identifiers referencing lambdas).
 
         Stores:
-          - self.expression_types[ctx] = Type.LIST
-          - self.list_element_types[ctx] = element_type (if can be inferred)
-          - self.list_element_lambda_signatures[ctx] = element_lambda_signature (if elements are lambdas)
+          - self.expression_types[node_id] = Type.LIST
+          - self.list_element_types[node_id] = element_type (if can be inferred)
+          - self.list_element_lambda_signatures[node_id] = element_lambda_signature (if elements are lambdas)
         """
         # Тип элементов списка по умолчанию - UNKNOWN.
         # Это будет актуально для пустых списков или списков с элементами, тип которых не определен.
         elem_type: Type = Type.UNKNOWN
         elem_lambda_sig: Optional[LambdaSignature] = None
 
-        if ctx.expressionList():
-            elem_exprs = list(ctx.expressionList().expression())
+        if node.elements:
+            elem_exprs = node.elements
 
             # Собираем все типы элементов
             elem_types_raw = [self.get_expression_type(e) for e in elem_exprs]
@@ -1715,42 +1797,36 @@ class SemanticAnalyzer(ListLangListener):
                     for e in elem_exprs:
                         # Используем _unwrap_expression для более агрессивного "достижения" базового идентификатора
                         unwrapped_e = self._unwrap_expression(e)
-                        if isinstance(unwrapped_e, ListLangParser.IdentifierExpressionContext):
-                            name = unwrapped_e.IDENTIFIER().getText()
-                            var_info = self.symbol_table.lookup_variable(name)
+                        if isinstance(unwrapped_e, ast.IdentifierExpression):
+                            var_info = self.symbol_table.lookup_variable(unwrapped_e.name)
                             if var_info and var_info.type == Type.LAMBDA and var_info.lambda_signature:
                                 elem_lambda_sig = var_info.lambda_signature
                                 break  # Нашли сигнатуру лямбды из переменной, используем ее
 
         # Отмечаем, что само выражение является списком
-        self.expression_types[ctx] = Type.LIST
+        self.expression_types[node.node_id] = Type.LIST
 
         # Сохраняем выведенный тип элемента и сигнатуру лямбды (если применимо)
         # Предполагается, что self.list_element_types и self.list_element_lambda_signatures
         # были инициализированы в методе __init__ класса SemanticAnalyzer.
-        self.list_element_types[ctx] = elem_type
+        self.list_element_types[node.node_id] = elem_type
         if elem_lambda_sig is not None:
-            self.list_element_lambda_signatures[ctx] = elem_lambda_sig
+            self.list_element_lambda_signatures[node.node_id] = elem_lambda_sig
 
-    def exitStructLiteral(self, ctx: ListLangParser.StructLiteralContext):
-        if ctx.fieldAssignment():
-            for field_assign_ctx in ctx.fieldAssignment():
-                _ = self.get_expression_type(field_assign_ctx.expression())
-        self.expression_types[ctx] = Type.STRUCT
-
-    def exitFieldAssignment(self, ctx: ListLangParser.FieldAssignmentContext):
-        # This rule's expression is evaluated, but the field assignment itself does not have an "expression type"
-        # It contributes to the structLiteral's definition.
-        pass
+    def exitStructLiteral(self, node: ast.StructLiteral):
+        fields = []
+        for field_node in node.fields:
+            fields.append((field_node.name, self.get_expression_type(field_node.value)))
+        self.struct_shapes.add_literal(node.node_id, fields)
+        self.expression_types[node.node_id] = Type.STRUCT
 
     # --- Switch Statement ---
-    def enterCaseClause(self, ctx: ListLangParser.CaseClauseContext):
+    def enterCaseClause(self, node: ast.CaseClause):
         self.symbol_table.push_scope(ScopeType.BLOCK, "case_clause")
 
-    def exitCaseClause(self, ctx: ListLangParser.CaseClauseContext):
-        line = self.get_line(ctx)
-        case_expr_ctx: ListLangParser.ExpressionContext = ctx.expression()
-        case_expr_type = self.get_expression_type(case_expr_ctx)
+    def exitCaseClause(self, node: ast.CaseClause):
+        line = self.get_line(node)
+        case_expr_type = self.get_expression_type(node.value)
 
         # Case expression should be a literal or constant. Type should be NUMBER or STRING.
         if case_expr_type not in [Type.NUMBER, Type.STRING, Type.UNKNOWN]:
@@ -1758,39 +1834,30 @@ class SemanticAnalyzer(ListLangListener):
                 f"Выражение 'case' должно быть типа NUMBER или STRING, получен {case_expr_type} (Ошибка 4)", line)
         self.symbol_table.pop_scope()
 
-    def exitSwitchStatement(self, ctx: ListLangParser.SwitchStatementContext):
-        line = self.get_line(ctx)
-        switch_expr_ctx: ListLangParser.ExpressionContext = ctx.expression()
-        switch_expr_type = self.get_expression_type(switch_expr_ctx)
+    def exitSwitchStatement(self, node: ast.SwitchStatement):
+        line = self.get_line(node)
+        switch_expr_type = self.get_expression_type(node.subject)
 
         if switch_expr_type not in [Type.NUMBER, Type.STRING, Type.UNKNOWN]:
             self.report_error(
                 f"Выражение 'switch' должно быть типа NUMBER или STRING, получен {switch_expr_type} (Ошибка 4)", line)
 
         if switch_expr_type != Type.UNKNOWN:
-            for case_clause_ctx in ctx.caseClause():
-                case_expr_ctx = case_clause_ctx.expression()
-                case_expr_type = self.get_expression_type(case_expr_ctx)
+            for case_node in node.cases:
+                case_expr_type = self.get_expression_type(case_node.value)
                 if case_expr_type != Type.UNKNOWN and not switch_expr_type.is_compatible_with(case_expr_type):
                     # For compatibility, switch and case types should match (or be compatible if one is UNKNOWN)
                     if not (
                             switch_expr_type == case_expr_type or switch_expr_type == Type.UNKNOWN or case_expr_type == Type.UNKNOWN):
                         self.report_error(
                             f"Тип выражения 'case' ({case_expr_type}) несовместим с типом выражения 'switch' ({switch_expr_type}) (Ошибка 4)",
-                            self.get_line(case_expr_ctx))
-
-    def exitLambdaExpressionActual(self, ctx: ListLangParser.LambdaExpressionActualContext):
-        # Пропагируем тип и сигнатуру от внутреннего lambdaExpr к узлу expression
-        inner = ctx.lambdaExpr()
-        self.expression_types[ctx] = self.get_expression_type(inner)
-        if self.get_expression_type(inner) == Type.LAMBDA:
-            self.lambda_signatures[ctx] = self.get_lambda_signature(inner)
+                            self.get_line(case_node.value))
 
 
-def perform_semantic_analysis(parse_tree, parser, filename):
-    analyzer = SemanticAnalyzer(parser, filename)
-    walker = ParseTreeWalker()
-    walker.walk(analyzer, parse_tree)  # Traverses the parse tree and calls listener methods
+def perform_semantic_analysis(program, parser, filename):
+    analyzer = SemanticAnalyzer(parser, filename, program.node_count)
+    walker = AstWalker()
+    walker.walk(analyzer, program)  # Traverses the AST and calls listener methods
 
     print(f"======== Результаты семантического анализа: {filename} ========")
     if analyzer.errors:
@@ -3,7 +3,10 @@
 import os
 import sys
 from antlr4 import *
+from antlr4.atn.PredictionMode import PredictionMode
 from antlr4.error.ErrorListener import ErrorListener
+from antlr4.error.ErrorStrategy import BailErrorStrategy, DefaultErrorStrategy
+from antlr4.error.Errors import ParseCancellationException
 from antlr4.ParserRuleContext import ParserRuleContext
 
 # Предполагаем, что генерация ANTLR прошла успешно
@@ -15,12 +18,20 @@ from gen.ListLangParser import ListLangParser
 # ListLangListener is not directly used for syntax errors, but kept for consistency
 from gen.ListLangListener import ListLangListener
 
+# Компактное AST, по которому работают семантический анализ и кодогенерация
+from listlang_ast import lower_parse_tree
+
 # Import Semantic Analyzer components
 from semantic_analyzer import perform_semantic_analysis
 
 # НОВЫЙ ИМПОРТ: Импортируем функцию компилятора
 from wat_compiler import compile_listlang_to_wat
 
+# Сборка WAT в бинарный модуль .wasm без внешнего ассемблера
+from wasm_binary import WasmEncodeError, assemble_wat
+
+from compile_cache import CompileCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_BYTES
+
 
 # --- Кастомный слушатель ошибок для ANTLR парсера ---
 # Этот класс перехватывает ошибки, которые генерирует парсер ANTLR,
@@ -78,48 +89,158 @@ def create_token_stream(code):
     return CommonTokenStream(lexer)
 
 
-def create_parser(token_stream):
+def create_parser(token_stream, parser=None):
     """
     Создает парсер и настраивает его для пользовательской обработки ошибок.
+    Если передан уже созданный парсер, он переиспользуется для нового потока токенов.
     """
-    parser = ListLangParser(token_stream)
+    if parser is None:
+        parser = ListLangParser(token_stream)
+    else:
+        parser.setTokenStream(token_stream)  # setTokenStream также сбрасывает состояние парсера
     parser.removeErrorListeners()  # Удаляем стандартный ConsoleErrorListener
     return parser
 
 
-def create_parse_tree(parser):
-    """
-    Пытается построить дерево разбора.
+def create_parse_tree(parser, error_listener=None):
     """
-    return parser.program()
+    Пытается построить дерево разбора в два этапа.
 
-
-def main_analyzer(file_path):
-    """Основная функция для выполнения синтаксического и семантического анализа одного файла"""
-    filename = os.path.basename(file_path)
+    1. Быстрый режим предсказания SLL с BailErrorStrategy: разбор прерывается на первой
+       же ошибке, слушатели ошибок не вызываются. Для корректных программ этого достаточно.
+    2. Если SLL не справился (синтаксическая ошибка или конфликт, который разрешает только
+       полный контекст), разбор повторяется в режиме LL со стандартным восстановлением
+       после ошибок, и ошибки сообщаются в error_listener.
+    """
+    parser.removeErrorListeners()
+    parser._interp.predictionMode = PredictionMode.SLL
+    parser._errHandler = BailErrorStrategy()
+    try:
+        return parser.program()
+    except ParseCancellationException:
+        parser.reset()  # Перематывает поток токенов к началу
+        if error_listener is not None:
+            parser.addErrorListener(error_listener)
+        parser._errHandler = DefaultErrorStrategy()
+        parser._interp.predictionMode = PredictionMode.LL
+        return parser.program()
+    finally:
+        # Переиспользуемый парсер всегда возвращается в стандартное состояние
+        parser._errHandler = DefaultErrorStrategy()
+        parser._interp.predictionMode = PredictionMode.LL
+
+
+class AnalysisResult:
+    """Итог анализа одного файла: найденные ошибки и путь к сгенерированному WAT-файлу."""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.filename = os.path.basename(file_path)
+        self.syntax_errors = []
+        self.semantic_errors = []
+        self.wat_path = None  # Заполняется, если кодогенерация прошла успешно
+        self.wasm_path = None  # Заполняется, если запрошен и собран бинарный модуль
+        self.failed = False  # Ошибка чтения файла или критическая ошибка анализатора
+
+    @property
+    def ok(self):
+        return not (self.failed or self.syntax_errors or self.semantic_errors)
+
+
+def _write_wat_file(file_path, filename, wat_output):
+    output_wat_path = os.path.join(os.path.dirname(file_path), filename.replace('.txt', '.wat'))
+    with open(output_wat_path, 'w', encoding='utf-8') as f:
+        f.write(wat_output)
+    return output_wat_path
+
+
+def _write_wasm_file(result, wat_output):
+    """Собирает WAT в бинарный модуль и сохраняет его рядом с .wat. Ошибка сборки не прерывает анализ."""
+    filename = result.filename
+    try:
+        wasm_bytes = assemble_wat(wat_output)
+    except WasmEncodeError as e:
+        print(f"[{filename}] Ошибка сборки .wasm: {e}", file=sys.stderr)
+        return
+    output_wasm_path = os.path.join(os.path.dirname(result.file_path), filename.replace('.txt', '.wasm'))
+    with open(output_wasm_path, 'wb') as f:
+        f.write(wasm_bytes)
+    result.wasm_path = output_wasm_path
+    print(f"[{filename}] Бинарный модуль ({len(wasm_bytes)} байт) сохранен в {output_wasm_path}")
+
+
+def _replay_cached_result(result, cached, emit_wasm=False):
+    """Восстанавливает результат анализа из записи кэша и выводит сохраненную диагностику."""
+    filename = result.filename
+    result.syntax_errors = list(cached.get("syntax_errors", []))
+    result.semantic_errors = list(cached.get("semantic_errors", []))
+    print(f"[{filename}] Исходный код не изменился, результат взят из кэша компиляции.")
+
+    if result.syntax_errors:
+        print(f"[{filename}] Найденные синтаксические ошибки:")
+        for err in result.syntax_errors:
+            print(f"  {err}")
+    if result.semantic_errors:
+        print(f"[{filename}] Найденные семантические ошибки:")
+        for err in result.semantic_errors:
+            print(f"  {err}")
+        print(f"[{filename}] Кодогенерация пропущена из-за семантических ошибок.")
+
+    wat_output = cached.get("wat")
+    if wat_output is not None:
+        result.wat_path = _write_wat_file(result.file_path, filename, wat_output)
+        print(f"[{filename}] Вывод сохранен в {result.wat_path}")
+        if emit_wasm:
+            _write_wasm_file(result, wat_output)
+
+
+def main_analyzer(file_path, session=None, cache=None, emit_wasm=False, memory_pages=1, gc_enabled=False):
+    """
+    Основная функция для выполнения синтаксического и семантического анализа одного файла.
+    Необязательная session (CompilerSession) позволяет переиспользовать "прогретые" лексер и парсер,
+    cache (CompileCache) - пропустить компиляцию, если исходный код не изменился.
+    emit_wasm - дополнительно собрать бинарный модуль .wasm из сгенерированного WAT,
+    memory_pages - начальный размер линейной памяти модуля (страниц по 64 КиБ),
+    gc_enabled - включить в модуль сборщик мусора (mark-sweep).
+    """
+    result = AnalysisResult(file_path)
+    filename = result.filename
     print(f"\n======== Анализ файла: {filename} ========")
 
     # Чтение кода из файла
     code = read_code(file_path)
     if code is None:
         print(f"[{filename}] Анализ отменен из-за ошибки чтения файла.", file=sys.stderr)
-        return
+        result.failed = True
+        return result
+
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.key_for(code, filename, f"memory_pages={memory_pages};gc={int(gc_enabled)}")
+        cached = cache.load(cache_key)
+        if cached is not None:
+            _replay_cached_result(result, cached, emit_wasm)
+            print(f"======== Завершение анализа файла: {filename} ========\n")
+            return result
 
     # Создание токенов и парсера
-    token_stream = create_token_stream(code)
-    parser = create_parser(token_stream)
+    if session is not None:
+        parser = session.create_parser(session.tokenize(code))
+    else:
+        parser = create_parser(create_token_stream(code))
 
-    # Настройка слушателя синтаксических ошибок
+    # Слушатель синтаксических ошибок (подключается на этапе разбора в режиме LL)
     syntax_error_reporter = SyntaxErrorReporter(filename)
     custom_error_listener = CustomSyntaxErrorListener(syntax_error_reporter)
-    parser.addErrorListener(custom_error_listener)
 
     parse_tree = None
+    wat_output = None
     try:
         # --- Синтаксический анализ ---
         print(f"[{filename}] --- Начало синтаксического анализа ---")
-        parse_tree = create_parse_tree(parser)
+        parse_tree = create_parse_tree(parser, custom_error_listener)
 
+        result.syntax_errors = list(syntax_error_reporter.errors)
         syntax_errors_count = len(syntax_error_reporter.errors)
         if syntax_errors_count > 0:
             print(f"[{filename}] Синтаксический анализ завершен с {syntax_errors_count} ошибками.")
@@ -129,11 +250,16 @@ def main_analyzer(file_path):
         else:
             print(f"[{filename}] Синтаксический анализ успешно завершен. Ошибок не найдено.")
 
+        # Дерево разбора переводится в AST один раз; дальше дерево ANTLR не используется
+        program = lower_parse_tree(parse_tree)
+        parse_tree = None
+
         # --- Семантический анализ (всегда запускается) ---
         print(f"\n[{filename}] --- Переход к семантическому анализу ---")
-        semantic_analyzer_instance = perform_semantic_analysis(parse_tree, parser, filename)
+        semantic_analyzer_instance = perform_semantic_analysis(program, parser, filename)
 
         if semantic_analyzer_instance and semantic_analyzer_instance.errors:
+            result.semantic_errors = list(semantic_analyzer_instance.errors)
             print(f"[{filename}] Семантический анализ завершен с {len(semantic_analyzer_instance.errors)} ошибками.")
             # Ошибки уже выведены самим SemanticAnalyzer
             print(f"[{filename}] Кодогенерация пропущена из-за семантических ошибок.")
@@ -142,25 +268,78 @@ def main_analyzer(file_path):
 
             # --- Кодогенерация ---
             print(f"\n[{filename}] --- Начало кодогенерации (WAT) ---")
-            wat_output = compile_listlang_to_wat(parse_tree, parser, semantic_analyzer_instance, filename)
+            wat_output = compile_listlang_to_wat(program, parser, semantic_analyzer_instance, filename,
+                                                 initial_memory_pages=memory_pages, gc_enabled=gc_enabled)
 
             # Сохраняем WAT-код в файл
-            output_wat_path = os.path.join(os.path.dirname(file_path), filename.replace('.txt', '.wat'))
-            with open(output_wat_path, 'w', encoding='utf-8') as f:
-                f.write(wat_output)
+            output_wat_path = _write_wat_file(file_path, filename, wat_output)
+            result.wat_path = output_wat_path
             print(f"[{filename}] Кодогенерация завершена. Вывод сохранен в {output_wat_path}")
+            if emit_wasm:
+                _write_wasm_file(result, wat_output)
 
     except Exception as e:
+        result.failed = True
         print(f"[{filename}] Критическая ошибка во время анализа: {e}", file=sys.stderr)
         import traceback
         traceback.print_exc()
 
-    print(f"======== Завершение анализа файла: {filename} ========\n")
+    # Критические ошибки не кэшируются: их причина может быть вне исходного файла
+    if cache is not None and not result.failed:
+        cache.store(cache_key, {
+            "syntax_errors": result.syntax_errors,
+            "semantic_errors": result.semantic_errors,
+            "wat": wat_output,
+        })
 
+    print(f"======== Завершение анализа файла: {filename} ========\n")
+    return result
 
 
 # --- Точка входа в программу ---
 if __name__ == '__main__':
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Анализатор и компилятор ListLang в WAT")
+    arg_parser.add_argument("sources", nargs="*",
+                            help="Файлы, каталоги или glob-шаблоны с исходниками (*.txt). "
+                                 "Без аргументов анализируются встроенные примеры.")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=None,
+                            help="Число процессов для пакетной компиляции (по умолчанию - число ядер)")
+    arg_parser.add_argument("--no-cache", action="store_true",
+                            help="Не использовать кэш компиляции (всегда компилировать заново)")
+    arg_parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                            help=f"Каталог кэша компиляции (по умолчанию {DEFAULT_CACHE_DIR})")
+    arg_parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_MAX_BYTES // (1024 * 1024),
+                            help="Максимальный размер кэша, МБ")
+    arg_parser.add_argument("--prewarm", nargs="+", default=[], metavar="SOURCE",
+                            help="Файлы, каталоги или glob-шаблоны для прогрева DFA парсера перед компиляцией")
+    arg_parser.add_argument("--wasm", action="store_true",
+                            help="Дополнительно собрать бинарный модуль .wasm рядом с каждым .wat")
+    arg_parser.add_argument("--memory-pages", type=int, default=1, metavar="N",
+                            help="Начальный размер памяти модуля, страниц по 64 КиБ (далее растет по мере выделения)")
+    arg_parser.add_argument("--gc", action="store_true",
+                            help="Включить сборщик мусора: недостижимые строки и списки освобождаются в циклах программы")
+    args = arg_parser.parse_args()
+
+    cache_config = None if args.no_cache else (args.cache_dir, args.cache_size * 1024 * 1024)
+
+    from batch_compiler import collect_source_files, compile_batch
+    from compiler_session import CompilerSession, format_dfa_stats
+
+    prewarm_files = collect_source_files(args.prewarm)
+
+    if args.sources:
+        # Пакетный режим: файлы распределяются по пулу процессов
+        source_files = collect_source_files(args.sources)
+        if not source_files:
+            print("Не найдено ни одного исходного файла.", file=sys.stderr)
+            sys.exit(1)
+        batch = compile_batch(source_files, jobs=args.jobs, cache_config=cache_config,
+                              prewarm_files=prewarm_files, emit_wasm=args.wasm,
+                              memory_pages=args.memory_pages, gc_enabled=args.gc)
+        sys.exit(0 if batch.all_ok else 1)
+
     examples_dir = os.path.dirname(os.path.abspath(__file__))
 
     example_files = [
@@ -171,6 +350,12 @@ if __name__ == '__main__':
         "new_errors.txt",
     ]
 
+    cache = CompileCache(*cache_config) if cache_config else None
+    session = CompilerSession()
+    if prewarm_files:
+        session.prewarm(prewarm_files)
     for filename in example_files:
         file_path = os.path.join(examples_dir, filename)
-        main_analyzer(file_path)
\ No newline at end of file
+        main_analyzer(file_path, session=session, cache=cache, emit_wasm=args.wasm,
+                      memory_pages=args.memory_pages, gc_enabled=args.gc)
+    print(format_dfa_stats(session.dfa_stats()))
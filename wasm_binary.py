@@ -0,0 +1,1020 @@
+"""
+Двоичный бэкенд ListLang: запись модуля WebAssembly (.wasm) без внешнего ассемблера.
+
+WatCompiler строит модуль как последовательность инструкций в текстовой форме WAT.
+Здесь эта последовательность кодируется сразу в двоичный формат: имена функций,
+глобальных и локальных переменных, типов и меток заменяются индексами, числа
+записываются в LEB128, поля модуля собираются в секции (type, import, function,
+table, memory, global, export, start, elem, code, data).
+
+Поддерживается подмножество текстового формата, которое порождает компилятор:
+свернутые и плоские инструкции, block/loop/if с метками, однозначные типы
+результатов блоков, активные сегменты elem и data.
+"""
+import struct
+from typing import Dict, List, Optional, Tuple, Union
+
+
+class WasmEncodeError(Exception):
+    """Модуль нельзя закодировать: неизвестная инструкция, неразрешенное имя и т.п."""
+
+
+# --- Байтовый буфер и LEB128 ---
+
+def encode_unsigned_leb128(value: int) -> bytes:
+    if value < 0:
+        raise WasmEncodeError(f"Отрицательное значение {value} в беззнаковом LEB128")
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def encode_signed_leb128(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7  # Арифметический сдвиг: знак сохраняется
+        if (value == 0 and not byte & 0x40) or (value == -1 and byte & 0x40):
+            out.append(byte)
+            return bytes(out)
+        out.append(byte | 0x80)
+
+
+class ByteBuffer:
+    """Буфер для двоичного кодирования с примитивами формата WebAssembly."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def byte(self, value: int):
+        self.data.append(value)
+
+    def raw(self, value: bytes):
+        self.data += value
+
+    def u32(self, value: int):
+        self.data += encode_unsigned_leb128(value)
+
+    def s32(self, value: int):
+        self.data += encode_signed_leb128(value)
+
+    def s64(self, value: int):
+        self.data += encode_signed_leb128(value)
+
+    def f32(self, value: float):
+        self.data += struct.pack("<f", value)
+
+    def f64(self, value: float):
+        self.data += struct.pack("<d", value)
+
+    def name(self, value: str):
+        self.vec_bytes(value.encode("utf-8"))
+
+    def vec_bytes(self, value: bytes):
+        self.u32(len(value))
+        self.data += value
+
+
+# --- Коды формата ---
+
+WASM_MAGIC = b"\x00asm"
+WASM_VERSION = b"\x01\x00\x00\x00"
+
+SECTION_TYPE = 1
+SECTION_IMPORT = 2
+SECTION_FUNCTION = 3
+SECTION_TABLE = 4
+SECTION_MEMORY = 5
+SECTION_GLOBAL = 6
+SECTION_EXPORT = 7
+SECTION_START = 8
+SECTION_ELEM = 9
+SECTION_CODE = 10
+SECTION_DATA = 11
+
+VALUE_TYPES = {"i32": 0x7F, "i64": 0x7E, "f32": 0x7D, "f64": 0x7C, "funcref": 0x70, "externref": 0x6F}
+REF_TYPES = {"funcref": 0x70, "externref": 0x6F, "func": 0x70, "extern": 0x6F}
+EXPORT_KINDS = {"func": 0x00, "table": 0x01, "memory": 0x02, "global": 0x03}
+BLOCK_TYPE_EMPTY = 0x40
+FUNC_TYPE_FORM = 0x60
+OP_END = 0x0B
+OP_ELSE = 0x05
+
+# Инструкции без непосредственных операндов
+_SIMPLE_OPS: Dict[str, int] = {
+    "unreachable": 0x00, "nop": 0x01, "return": 0x0F, "drop": 0x1A, "select": 0x1B,
+    "ref.is_null": 0xD1,
+}
+_NUMERIC_NAMES = [
+    # 0x45 - 0x5A: сравнения целых
+    "i32.eqz", "i32.eq", "i32.ne", "i32.lt_s", "i32.lt_u", "i32.gt_s", "i32.gt_u",
+    "i32.le_s", "i32.le_u", "i32.ge_s", "i32.ge_u",
+    "i64.eqz", "i64.eq", "i64.ne", "i64.lt_s", "i64.lt_u", "i64.gt_s", "i64.gt_u",
+    "i64.le_s", "i64.le_u", "i64.ge_s", "i64.ge_u",
+    # 0x5B - 0x66: сравнения вещественных
+    "f32.eq", "f32.ne", "f32.lt", "f32.gt", "f32.le", "f32.ge",
+    "f64.eq", "f64.ne", "f64.lt", "f64.gt", "f64.le", "f64.ge",
+    # 0x67 - 0x8A: арифметика целых
+    "i32.clz", "i32.ctz", "i32.popcnt", "i32.add", "i32.sub", "i32.mul", "i32.div_s", "i32.div_u",
+    "i32.rem_s", "i32.rem_u", "i32.and", "i32.or", "i32.xor", "i32.shl", "i32.shr_s", "i32.shr_u",
+    "i32.rotl", "i32.rotr",
+    "i64.clz", "i64.ctz", "i64.popcnt", "i64.add", "i64.sub", "i64.mul", "i64.div_s", "i64.div_u",
+    "i64.rem_s", "i64.rem_u", "i64.and", "i64.or", "i64.xor", "i64.shl", "i64.shr_s", "i64.shr_u",
+    "i64.rotl", "i64.rotr",
+    # 0x8B - 0xA6: арифметика вещественных
+    "f32.abs", "f32.neg", "f32.ceil", "f32.floor", "f32.trunc", "f32.nearest", "f32.sqrt",
+    "f32.add", "f32.sub", "f32.mul", "f32.div", "f32.min", "f32.max", "f32.copysign",
+    "f64.abs", "f64.neg", "f64.ceil", "f64.floor", "f64.trunc", "f64.nearest", "f64.sqrt",
+    "f64.add", "f64.sub", "f64.mul", "f64.div", "f64.min", "f64.max", "f64.copysign",
+    # 0xA7 - 0xC4: преобразования
+    "i32.wrap_i64", "i32.trunc_f32_s", "i32.trunc_f32_u", "i32.trunc_f64_s", "i32.trunc_f64_u",
+    "i64.extend_i32_s", "i64.extend_i32_u", "i64.trunc_f32_s", "i64.trunc_f32_u",
+    "i64.trunc_f64_s", "i64.trunc_f64_u",
+    "f32.convert_i32_s", "f32.convert_i32_u", "f32.convert_i64_s", "f32.convert_i64_u", "f32.demote_f64",
+    "f64.convert_i32_s", "f64.convert_i32_u", "f64.convert_i64_s", "f64.convert_i64_u", "f64.promote_f32",
+    "i32.reinterpret_f32", "i64.reinterpret_f64", "f32.reinterpret_i32", "f64.reinterpret_i64",
+    "i32.extend8_s", "i32.extend16_s", "i64.extend8_s", "i64.extend16_s", "i64.extend32_s",
+]
+for _offset, _name in enumerate(_NUMERIC_NAMES):
+    _SIMPLE_OPS[_name] = 0x45 + _offset
+
+# Инструкции с префиксом 0xFC: (код, число нулевых байтов индексов памяти)
+_PREFIXED_OPS: Dict[str, Tuple[int, int]] = {
+    "i32.trunc_sat_f32_s": (0, 0), "i32.trunc_sat_f32_u": (1, 0),
+    "i32.trunc_sat_f64_s": (2, 0), "i32.trunc_sat_f64_u": (3, 0),
+    "i64.trunc_sat_f32_s": (4, 0), "i64.trunc_sat_f32_u": (5, 0),
+    "i64.trunc_sat_f64_s": (6, 0), "i64.trunc_sat_f64_u": (7, 0),
+    "memory.copy": (10, 2), "memory.fill": (11, 1),
+}
+
+# Обращения к памяти: имя -> (код, естественное выравнивание log2)
+_MEMORY_OPS: Dict[str, Tuple[int, int]] = {
+    "i32.load": (0x28, 2), "i64.load": (0x29, 3), "f32.load": (0x2A, 2), "f64.load": (0x2B, 3),
+    "i32.load8_s": (0x2C, 0), "i32.load8_u": (0x2D, 0), "i32.load16_s": (0x2E, 1), "i32.load16_u": (0x2F, 1),
+    "i64.load8_s": (0x30, 0), "i64.load8_u": (0x31, 0), "i64.load16_s": (0x32, 1), "i64.load16_u": (0x33, 1),
+    "i64.load32_s": (0x34, 2), "i64.load32_u": (0x35, 2),
+    "i32.store": (0x36, 2), "i64.store": (0x37, 3), "f32.store": (0x38, 2), "f64.store": (0x39, 3),
+    "i32.store8": (0x3A, 0), "i32.store16": (0x3B, 1),
+    "i64.store8": (0x3C, 0), "i64.store16": (0x3D, 1), "i64.store32": (0x3E, 2),
+}
+
+_VARIABLE_OPS = {"local.get": 0x20, "local.set": 0x21, "local.tee": 0x22, "global.get": 0x23, "global.set": 0x24}
+_BLOCK_OPS = {"block": 0x02, "loop": 0x03, "if": 0x04}
+
+
+# --- Чтение S-выражений WAT ---
+
+class WatString:
+    """Строковый литерал WAT (уже раскодированные байты)."""
+    __slots__ = ("value",)
+
+    def __init__(self, value: bytes):
+        self.value = value
+
+
+SExpr = Union[str, WatString, list]
+
+_STRING_ESCAPES = {"n": 0x0A, "t": 0x09, "r": 0x0D, "\\": 0x5C, "'": 0x27, '"': 0x22}
+
+
+def _read_string(text: str, pos: int) -> Tuple[WatString, int]:
+    """Разбирает строку, начинающуюся с кавычки в позиции pos."""
+    out = bytearray()
+    i = pos + 1
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if ch == '"':
+            return WatString(bytes(out)), i + 1
+        if ch == "\\":
+            nxt = text[i + 1:i + 2]
+            if nxt in _STRING_ESCAPES:
+                out.append(_STRING_ESCAPES[nxt])
+                i += 2
+            elif nxt == "u":
+                end = text.index("}", i)
+                out += chr(int(text[i + 3:end].replace("_", ""), 16)).encode("utf-8")
+                i = end + 1
+            else:
+                out.append(int(text[i + 1:i + 3], 16))
+                i += 3
+        else:
+            out += ch.encode("utf-8")
+            i += 1
+    raise WasmEncodeError("Незакрытая строка в WAT")
+
+
+def parse_sexpr(text: str) -> List[SExpr]:
+    """Разбирает текст WAT в список S-выражений верхнего уровня."""
+    stack: List[list] = [[]]
+    i = 0
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if ch in " \t\r\n":
+            i += 1
+        elif ch == ";" and text.startswith(";;", i):
+            end = text.find("\n", i)
+            i = n if end == -1 else end + 1
+        elif ch == "(" and text.startswith("(;", i):
+            end = text.find(";)", i)
+            if end == -1:
+                raise WasmEncodeError("Незакрытый блочный комментарий в WAT")
+            i = end + 2
+        elif ch == "(":
+            stack.append([])
+            i += 1
+        elif ch == ")":
+            if len(stack) == 1:
+                raise WasmEncodeError("Лишняя закрывающая скобка в WAT")
+            done = stack.pop()
+            stack[-1].append(done)
+            i += 1
+        elif ch == '"':
+            string, i = _read_string(text, i)
+            stack[-1].append(string)
+        else:
+            start = i
+            while i < n and text[i] not in " \t\r\n()\";":
+                i += 1
+            stack[-1].append(text[start:i])
+    if len(stack) != 1:
+        raise WasmEncodeError("Незакрытая скобка в WAT")
+    return stack[0]
+
+
+def _is_name(item: SExpr) -> bool:
+    return isinstance(item, str) and item.startswith("$")
+
+
+def _head(item: SExpr) -> Optional[str]:
+    """Ключевое слово свернутого выражения или None."""
+    if isinstance(item, list) and item and isinstance(item[0], str):
+        return item[0]
+    return None
+
+
+def _parse_int(token: str) -> int:
+    token = token.replace("_", "")
+    sign = 1
+    if token[:1] in "+-":
+        sign = -1 if token[0] == "-" else 1
+        token = token[1:]
+    if token.lower().startswith("0x"):
+        return sign * int(token[2:], 16)
+    return sign * int(token, 10)
+
+
+def _parse_float(token: str) -> float:
+    token = token.replace("_", "")
+    body = token.lstrip("+-")
+    sign = -1.0 if token.startswith("-") else 1.0
+    if body == "inf":
+        return sign * float("inf")
+    if body.startswith("nan"):
+        return float("nan")
+    if body.lower().startswith("0x"):
+        return sign * float.fromhex(body)
+    return float(token)
+
+
+def _wrap_signed(value: int, bits: int) -> int:
+    """Приводит значение из диапазона [-2^(n-1), 2^n) к знаковому n-битному."""
+    value &= (1 << bits) - 1
+    return value - (1 << bits) if value >= 1 << (bits - 1) else value
+
+
+# --- Модель модуля ---
+
+class _FuncType:
+    __slots__ = ("params", "results")
+
+    def __init__(self, params: Tuple[str, ...], results: Tuple[str, ...]):
+        self.params = params
+        self.results = results
+
+    def key(self) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        return self.params, self.results
+
+
+class _Function:
+    __slots__ = ("name", "type_index", "param_names", "locals", "body", "imported", "module", "field")
+
+    def __init__(self, name: Optional[str], type_index: int, param_names: List[Optional[str]]):
+        self.name = name
+        self.type_index = type_index
+        self.param_names = param_names
+        self.locals: List[Tuple[Optional[str], str]] = []
+        self.body: List[SExpr] = []
+        self.imported = False
+        self.module = ""
+        self.field = ""
+
+
+class WasmModule:
+    """Модуль, собранный из полей WAT; индексы назначаются в порядке формата (импорты первыми)."""
+
+    def __init__(self):
+        self.types: List[_FuncType] = []
+        self.type_names: Dict[str, int] = {}
+        self.functions: List[_Function] = []
+        self.function_names: Dict[str, int] = {}
+        self.tables: List[Tuple[int, Optional[int], str]] = []
+        self.table_names: Dict[str, int] = {}
+        self.memories: List[Tuple[int, Optional[int]]] = []
+        self.memory_names: Dict[str, int] = {}
+        self.globals: List[Tuple[str, bool, List[SExpr]]] = []
+        self.global_names: Dict[str, int] = {}
+        self.exports: List[Tuple[str, str, SExpr]] = []
+        self.elems: List[Tuple[List[SExpr], List[SExpr]]] = []
+        self.datas: List[Tuple[List[SExpr], bytes]] = []
+        self.start: Optional[SExpr] = None
+
+    # Типы функций: одинаковые сигнатуры разделяют один индекс
+    def type_index_for(self, params: Tuple[str, ...], results: Tuple[str, ...]) -> int:
+        key = (params, results)
+        for index, func_type in enumerate(self.types):
+            if func_type.key() == key:
+                return index
+        self.types.append(_FuncType(params, results))
+        return len(self.types) - 1
+
+    def resolve(self, names: Dict[str, int], count: int, ref: SExpr, kind: str) -> int:
+        if isinstance(ref, str):
+            if ref.startswith("$"):
+                if ref in names:
+                    return names[ref]
+                raise WasmEncodeError(f"Неизвестное имя {kind}: {ref}")
+            index = _parse_int(ref)
+            if 0 <= index < count:
+                return index
+        raise WasmEncodeError(f"Некорректная ссылка на {kind}: {ref!r}")
+
+    def func_index(self, ref: SExpr) -> int:
+        return self.resolve(self.function_names, len(self.functions), ref, "функции")
+
+    def global_index(self, ref: SExpr) -> int:
+        return self.resolve(self.global_names, len(self.globals), ref, "глобальной переменной")
+
+    def type_index(self, ref: SExpr) -> int:
+        return self.resolve(self.type_names, len(self.types), ref, "типа")
+
+    def table_index(self, ref: SExpr) -> int:
+        return self.resolve(self.table_names, len(self.tables), ref, "таблицы")
+
+
+def _parse_type_use(module: WasmModule, items: List[SExpr], pos: int) -> Tuple[int, List[Optional[str]], int]:
+    """
+    Разбирает (type $t)? (param ...)* (result ...)* начиная с позиции pos.
+    Возвращает индекс типа, имена параметров и позицию после разобранной части.
+    """
+    explicit_type = None
+    param_names: List[Optional[str]] = []
+    params: List[str] = []
+    results: List[str] = []
+    while pos < len(items):
+        head = _head(items[pos])
+        if head == "type":
+            explicit_type = module.type_index(items[pos][1])
+        elif head == "param":
+            parts = items[pos][1:]
+            if parts and _is_name(parts[0]):
+                param_names.append(parts[0])
+                params.append(parts[1])
+            else:
+                param_names.extend([None] * len(parts))
+                params.extend(parts)
+        elif head == "result":
+            results.extend(items[pos][1:])
+        else:
+            break
+        pos += 1
+
+    for value_type in params + results:
+        if value_type not in VALUE_TYPES:
+            raise WasmEncodeError(f"Неизвестный тип значения '{value_type}'")
+
+    if explicit_type is not None:
+        func_type = module.types[explicit_type]
+        if not param_names:
+            param_names = [None] * len(func_type.params)
+        return explicit_type, param_names, pos
+    return module.type_index_for(tuple(params), tuple(results)), param_names, pos
+
+
+def _inline_exports(items: List[SExpr], pos: int, kind: str, ref: SExpr, module: WasmModule) -> int:
+    """Учитывает встроенные (export "имя") поля и возвращает позицию после них."""
+    while pos < len(items) and _head(items[pos]) == "export":
+        module.exports.append((items[pos][1].value.decode("utf-8"), kind, ref))
+        pos += 1
+    return pos
+
+
+def _parse_limits(items: List[SExpr], pos: int) -> Tuple[int, Optional[int], int]:
+    minimum = _parse_int(items[pos])
+    pos += 1
+    maximum = None
+    if pos < len(items) and isinstance(items[pos], str) and items[pos][0].isdigit():
+        maximum = _parse_int(items[pos])
+        pos += 1
+    return minimum, maximum, pos
+
+
+def build_module(fields: List[SExpr]) -> WasmModule:
+    """Собирает WasmModule из полей (module ...). Имена разрешаются после сбора всех полей."""
+    module = WasmModule()
+
+    # Типы объявляются первыми: на них ссылаются импорты и функции
+    for field in fields:
+        if _head(field) == "type":
+            pos = 1
+            name = None
+            if _is_name(field[pos]):
+                name = field[pos]
+                pos += 1
+            func_sig = field[pos]
+            if _head(func_sig) != "func":
+                raise WasmEncodeError("Поддерживаются только функциональные типы")
+            params: List[str] = []
+            results: List[str] = []
+            for part in func_sig[1:]:
+                values = [v for v in part[1:] if not _is_name(v)]
+                (params if _head(part) == "param" else results).extend(values)
+            module.types.append(_FuncType(tuple(params), tuple(results)))
+            if name:
+                module.type_names[name] = len(module.types) - 1
+
+    # Импортированные функции получают индексы раньше объявленных
+    for field in fields:
+        if _head(field) == "import":
+            desc = field[3]
+            if _head(desc) != "func":
+                raise WasmEncodeError(f"Неподдерживаемый импорт: {_head(desc)}")
+            pos = 1
+            name = None
+            if len(desc) > 1 and _is_name(desc[1]):
+                name = desc[1]
+                pos = 2
+            type_index, param_names, _ = _parse_type_use(module, desc, pos)
+            func = _Function(name, type_index, param_names)
+            func.imported = True
+            func.module = field[1].value.decode("utf-8")
+            func.field = field[2].value.decode("utf-8")
+            if name:
+                if name in module.function_names:
+                    raise WasmEncodeError(f"Повторное объявление функции {name}")
+                module.function_names[name] = len(module.functions)
+            module.functions.append(func)
+
+    for field in fields:
+        head = _head(field)
+        if head == "func":
+            pos = 1
+            name = None
+            if pos < len(field) and _is_name(field[pos]):
+                name = field[pos]
+                pos += 1
+            index = len(module.functions)
+            pos = _inline_exports(field, pos, "func", str(index), module)
+            type_index, param_names, pos = _parse_type_use(module, field, pos)
+            func = _Function(name, type_index, param_names)
+            while pos < len(field) and _head(field[pos]) == "local":
+                parts = field[pos][1:]
+                if parts and _is_name(parts[0]):
+                    func.locals.append((parts[0], parts[1]))
+                else:
+                    func.locals.extend((None, value_type) for value_type in parts)
+                pos += 1
+            for _, value_type in func.locals:
+                if value_type not in VALUE_TYPES:
+                    raise WasmEncodeError(f"Неизвестный тип локальной переменной '{value_type}' в {name}")
+            func.body = field[pos:]
+            if name:
+                if name in module.function_names:
+                    raise WasmEncodeError(f"Повторное объявление функции {name}")
+                module.function_names[name] = index
+            module.functions.append(func)
+        elif head == "table":
+            pos = 1
+            name = None
+            if _is_name(field[pos]):
+                name = field[pos]
+                pos += 1
+            index = len(module.tables)
+            pos = _inline_exports(field, pos, "table", str(index), module)
+            minimum, maximum, pos = _parse_limits(field, pos)
+            module.tables.append((minimum, maximum, field[pos]))
+            if name:
+                module.table_names[name] = index
+        elif head == "memory":
+            pos = 1
+            name = None
+            if _is_name(field[pos]):
+                name = field[pos]
+                pos += 1
+            index = len(module.memories)
+            pos = _inline_exports(field, pos, "memory", str(index), module)
+            minimum, maximum, pos = _parse_limits(field, pos)
+            module.memories.append((minimum, maximum))
+            if name:
+                module.memory_names[name] = index
+        elif head == "global":
+            pos = 1
+            name = None
+            if _is_name(field[pos]):
+                name = field[pos]
+                pos += 1
+            index = len(module.globals)
+            pos = _inline_exports(field, pos, "global", str(index), module)
+            global_type = field[pos]
+            if _head(global_type) == "mut":
+                value_type, mutable = global_type[1], True
+            else:
+                value_type, mutable = global_type, False
+            if value_type not in VALUE_TYPES:
+                raise WasmEncodeError(f"Неизвестный тип глобальной переменной {name}: '{value_type}'")
+            module.globals.append((value_type, mutable, field[pos + 1:]))
+            if name:
+                if name in module.global_names:
+                    raise WasmEncodeError(f"Повторное объявление глобальной переменной {name}")
+                module.global_names[name] = index
+        elif head == "export":
+            desc = field[2]
+            module.exports.append((field[1].value.decode("utf-8"), _head(desc), desc[1]))
+        elif head == "elem":
+            pos = 1
+            if pos < len(field) and _head(field[pos]) == "table":
+                pos += 1
+            offset = field[pos]
+            offset_expr = offset[1:] if _head(offset) == "offset" else [offset]
+            pos += 1
+            if pos < len(field) and field[pos] in ("func", "funcref"):
+                pos += 1
+            module.elems.append((offset_expr, field[pos:]))
+        elif head == "data":
+            pos = 1
+            if pos < len(field) and _head(field[pos]) == "memory":
+                pos += 1
+            offset = field[pos]
+            offset_expr = offset[1:] if _head(offset) == "offset" else [offset]
+            payload = b"".join(part.value for part in field[pos + 1:])
+            module.datas.append((offset_expr, payload))
+        elif head == "start":
+            module.start = field[1]
+        elif head not in ("type", "import"):
+            raise WasmEncodeError(f"Неподдерживаемое поле модуля: {head}")
+    return module
+
+
+# --- Кодирование инструкций ---
+
+class _CodeEncoder:
+    """Кодирует последовательность инструкций одной функции (или константного выражения)."""
+
+    def __init__(self, module: WasmModule, local_names: Dict[str, int], local_count: int, context: str):
+        self.module = module
+        self.local_names = local_names
+        self.local_count = local_count
+        self.context = context
+        self.labels: List[Optional[str]] = []
+        self.out = ByteBuffer()
+
+    def error(self, message: str) -> WasmEncodeError:
+        return WasmEncodeError(f"{self.context}: {message}")
+
+    def label_depth(self, ref: str) -> int:
+        if ref.startswith("$"):
+            for depth, label in enumerate(reversed(self.labels)):
+                if label == ref:
+                    return depth
+            raise self.error(f"неизвестная метка {ref}")
+        return _parse_int(ref)
+
+    def local_index(self, ref: str) -> int:
+        if ref.startswith("$"):
+            if ref in self.local_names:
+                return self.local_names[ref]
+            raise self.error(f"неизвестная локальная переменная {ref}")
+        index = _parse_int(ref)
+        if not 0 <= index < self.local_count:
+            raise self.error(f"индекс локальной переменной {index} вне диапазона")
+        return index
+
+    def block_type(self, items: List[SExpr], pos: int) -> Tuple[int, int]:
+        """Разбирает тип блока; возвращает (код типа, позиция после него)."""
+        results: List[str] = []
+        explicit_type = None
+        while pos < len(items) and _head(items[pos]) in ("result", "type", "param"):
+            head = _head(items[pos])
+            if head == "result":
+                results.extend(items[pos][1:])
+            elif head == "type":
+                explicit_type = self.module.type_index(items[pos][1])
+            else:
+                raise self.error("параметры блоков не поддерживаются")
+            pos += 1
+        if explicit_type is not None:
+            return -explicit_type - 1, pos  # Отличаем индекс типа от кода значения
+        if not results:
+            return BLOCK_TYPE_EMPTY, pos
+        if len(results) > 1:
+            raise self.error("блоки с несколькими результатами не поддерживаются")
+        return VALUE_TYPES[results[0]], pos
+
+    def emit_block_type(self, code: int):
+        if code < 0:
+            self.out.s64(-code - 1)
+        else:
+            self.out.byte(code)
+
+    # Непосредственные операнды инструкции, начиная с items[pos]; возвращает новую позицию
+    def immediates(self, op: str, items: List[SExpr], pos: int) -> int:
+        out = self.out
+        if op in _SIMPLE_OPS:
+            out.byte(_SIMPLE_OPS[op])
+            return pos
+        if op in _VARIABLE_OPS:
+            out.byte(_VARIABLE_OPS[op])
+            ref = items[pos]
+            if op.startswith("local."):
+                out.u32(self.local_index(ref))
+            else:
+                out.u32(self.module.global_index(ref))
+            return pos + 1
+        if op in _MEMORY_OPS:
+            code, align = _MEMORY_OPS[op]
+            offset = 0
+            while pos < len(items) and isinstance(items[pos], str) and "=" in items[pos]:
+                key, value = items[pos].split("=", 1)
+                if key == "offset":
+                    offset = _parse_int(value)
+                elif key == "align":
+                    align = _parse_int(value).bit_length() - 1
+                pos += 1
+            out.byte(code)
+            out.u32(align)
+            out.u32(offset)
+            return pos
+        if op == "i32.const":
+            out.byte(0x41)
+            out.s32(_wrap_signed(_parse_int(items[pos]), 32))
+            return pos + 1
+        if op == "i64.const":
+            out.byte(0x42)
+            out.s64(_wrap_signed(_parse_int(items[pos]), 64))
+            return pos + 1
+        if op == "f32.const":
+            out.byte(0x43)
+            out.f32(_parse_float(items[pos]))
+            return pos + 1
+        if op == "f64.const":
+            out.byte(0x44)
+            out.f64(_parse_float(items[pos]))
+            return pos + 1
+        if op in ("br", "br_if"):
+            out.byte(0x0C if op == "br" else 0x0D)
+            out.u32(self.label_depth(items[pos]))
+            return pos + 1
+        if op == "br_table":
+            targets = []
+            while pos < len(items) and isinstance(items[pos], str):
+                targets.append(self.label_depth(items[pos]))
+                pos += 1
+            out.byte(0x0E)
+            out.u32(len(targets) - 1)
+            for depth in targets:
+                out.u32(depth)
+            return pos
+        if op == "call":
+            out.byte(0x10)
+            out.u32(self.module.func_index(items[pos]))
+            return pos + 1
+        if op == "call_indirect":
+            table_index = 0
+            if pos < len(items) and isinstance(items[pos], str):
+                table_index = self.module.table_index(items[pos])
+                pos += 1
+            type_index, _, pos = _parse_type_use(self.module, items, pos)
+            out.byte(0x11)
+            out.u32(type_index)
+            out.u32(table_index)
+            return pos
+        if op == "ref.func":
+            out.byte(0xD2)
+            out.u32(self.module.func_index(items[pos]))
+            return pos + 1
+        if op == "ref.null":
+            out.byte(0xD0)
+            out.byte(REF_TYPES[items[pos]])
+            return pos + 1
+        if op in ("memory.size", "memory.grow"):
+            out.byte(0x3F if op == "memory.size" else 0x40)
+            out.byte(0x00)
+            return pos
+        if op in _PREFIXED_OPS:
+            code, zero_bytes = _PREFIXED_OPS[op]
+            out.byte(0xFC)
+            out.u32(code)
+            for _ in range(zero_bytes):
+                out.byte(0x00)
+            return pos
+        raise self.error(f"неизвестная инструкция '{op}'")
+
+    def folded(self, expr: list):
+        """Свернутая инструкция: (op immediates... operands...)."""
+        op = expr[0]
+        if op in ("block", "loop"):
+            pos = 1
+            label = None
+            if pos < len(expr) and _is_name(expr[pos]):
+                label = expr[pos]
+                pos += 1
+            code, pos = self.block_type(expr, pos)
+            self.out.byte(_BLOCK_OPS[op])
+            self.emit_block_type(code)
+            self.labels.append(label)
+            self.sequence(expr[pos:])
+            self.labels.pop()
+            self.out.byte(OP_END)
+            return
+        if op == "if":
+            pos = 1
+            label = None
+            if pos < len(expr) and _is_name(expr[pos]):
+                label = expr[pos]
+                pos += 1
+            code, pos = self.block_type(expr, pos)
+            then_part = else_part = None
+            conditions = []
+            for item in expr[pos:]:
+                head = _head(item)
+                if head == "then":
+                    then_part = item[1:]
+                elif head == "else":
+                    else_part = item[1:]
+                else:
+                    conditions.append(item)
+            if then_part is None:
+                raise self.error("(if ...) без (then ...)")
+            self.sequence(conditions)
+            self.out.byte(_BLOCK_OPS["if"])
+            self.emit_block_type(code)
+            self.labels.append(label)
+            self.sequence(then_part)
+            if else_part is not None:
+                self.out.byte(OP_ELSE)
+                self.sequence(else_part)
+            self.labels.pop()
+            self.out.byte(OP_END)
+            return
+
+        # Непосредственные операнды записываются во временный буфер: сначала идут операнды-выражения
+        main_out = self.out
+        self.out = ByteBuffer()
+        pos = self.immediates(op, expr, 1)
+        encoded_op = self.out
+        self.out = main_out
+        for operand in expr[pos:]:
+            if not isinstance(operand, list):
+                raise self.error(f"неожиданный операнд {operand!r} в ({op} ...)")
+            self.folded(operand)
+        self.out.raw(bytes(encoded_op.data))
+
+    def sequence(self, items: List[SExpr]):
+        """Последовательность инструкций: свернутые выражения вперемешку с плоскими."""
+        pos = 0
+        n = len(items)
+        while pos < n:
+            item = items[pos]
+            if isinstance(item, list):
+                if not item:
+                    raise self.error("пустое выражение")
+                self.folded(item)
+                pos += 1
+                continue
+            if not isinstance(item, str):
+                raise self.error(f"неожиданный литерал в коде: {item!r}")
+            pos += 1
+            if item in _BLOCK_OPS:
+                label = None
+                if pos < n and _is_name(items[pos]):
+                    label = items[pos]
+                    pos += 1
+                code, pos = self.block_type(items, pos)
+                self.out.byte(_BLOCK_OPS[item])
+                self.emit_block_type(code)
+                self.labels.append(label)
+            elif item == "else":
+                self.out.byte(OP_ELSE)
+                if pos < n and _is_name(items[pos]):
+                    pos += 1
+            elif item == "end":
+                if not self.labels:
+                    raise self.error("'end' без открытого блока")
+                self.labels.pop()
+                self.out.byte(OP_END)
+                if pos < n and _is_name(items[pos]):
+                    pos += 1
+            else:
+                pos = self.immediates(item, items, pos)
+
+
+def _encode_const_expr(module: WasmModule, items: List[SExpr], context: str) -> bytes:
+    encoder = _CodeEncoder(module, {}, 0, context)
+    encoder.sequence(items)
+    encoder.out.byte(OP_END)
+    return bytes(encoder.out.data)
+
+
+def _encode_function_body(module: WasmModule, func: _Function, index: int) -> bytes:
+    context = f"функция {func.name or index}"
+    local_names: Dict[str, int] = {}
+    for i, name in enumerate(func.param_names):
+        if name:
+            local_names[name] = i
+    first_local = len(module.types[func.type_index].params)
+    for i, (name, _) in enumerate(func.locals):
+        if name:
+            if name in local_names:
+                raise WasmEncodeError(f"{context}: повторное объявление локальной переменной {name}")
+            local_names[name] = first_local + i
+
+    body = ByteBuffer()
+    # Локальные переменные сжимаются в группы одинакового типа
+    groups: List[Tuple[int, str]] = []
+    for _, value_type in func.locals:
+        if groups and groups[-1][1] == value_type:
+            groups[-1] = (groups[-1][0] + 1, value_type)
+        else:
+            groups.append((1, value_type))
+    body.u32(len(groups))
+    for count, value_type in groups:
+        body.u32(count)
+        body.byte(VALUE_TYPES[value_type])
+
+    encoder = _CodeEncoder(module, local_names, first_local + len(func.locals), context)
+    encoder.sequence(func.body)
+    if encoder.labels:
+        raise WasmEncodeError(f"{context}: незакрытый блок")
+    body.raw(bytes(encoder.out.data))
+    body.byte(OP_END)
+    return bytes(body.data)
+
+
+def _section(out: ByteBuffer, section_id: int, payload: ByteBuffer):
+    out.byte(section_id)
+    out.vec_bytes(bytes(payload.data))
+
+
+def _vector_section(out: ByteBuffer, section_id: int, entries: List[bytes]):
+    if not entries:
+        return
+    payload = ByteBuffer()
+    payload.u32(len(entries))
+    for entry in entries:
+        payload.raw(entry)
+    _section(out, section_id, payload)
+
+
+def encode_module(module: WasmModule) -> bytes:
+    """Кодирует модуль в двоичный формат WebAssembly 1.0 (с расширением bulk memory)."""
+    # Тела функций кодируются первыми: call_indirect может добавить новый тип
+    defined = [(i, f) for i, f in enumerate(module.functions) if not f.imported]
+    bodies = [_encode_function_body(module, func, index) for index, func in defined]
+    globals_init = [_encode_const_expr(module, init, f"глобальная переменная {i}")
+                    for i, (_, _, init) in enumerate(module.globals)]
+
+    out = ByteBuffer()
+    out.raw(WASM_MAGIC)
+    out.raw(WASM_VERSION)
+
+    entries = []
+    for func_type in module.types:
+        entry = ByteBuffer()
+        entry.byte(FUNC_TYPE_FORM)
+        entry.u32(len(func_type.params))
+        for value_type in func_type.params:
+            entry.byte(VALUE_TYPES[value_type])
+        entry.u32(len(func_type.results))
+        for value_type in func_type.results:
+            entry.byte(VALUE_TYPES[value_type])
+        entries.append(bytes(entry.data))
+    _vector_section(out, SECTION_TYPE, entries)
+
+    entries = []
+    for func in module.functions:
+        if func.imported:
+            entry = ByteBuffer()
+            entry.name(func.module)
+            entry.name(func.field)
+            entry.byte(EXPORT_KINDS["func"])
+            entry.u32(func.type_index)
+            entries.append(bytes(entry.data))
+    _vector_section(out, SECTION_IMPORT, entries)
+
+    _vector_section(out, SECTION_FUNCTION, [encode_unsigned_leb128(f.type_index) for _, f in defined])
+
+    entries = []
+    for minimum, maximum, ref_type in module.tables:
+        entry = ByteBuffer()
+        entry.byte(REF_TYPES[ref_type])
+        _encode_limits(entry, minimum, maximum)
+        entries.append(bytes(entry.data))
+    _vector_section(out, SECTION_TABLE, entries)
+
+    entries = []
+    for minimum, maximum in module.memories:
+        entry = ByteBuffer()
+        _encode_limits(entry, minimum, maximum)
+        entries.append(bytes(entry.data))
+    _vector_section(out, SECTION_MEMORY, entries)
+
+    entries = []
+    for (value_type, mutable, _), init in zip(module.globals, globals_init):
+        entries.append(bytes([VALUE_TYPES[value_type], 1 if mutable else 0]) + init)
+    _vector_section(out, SECTION_GLOBAL, entries)
+
+    entries = []
+    for name, kind, ref in module.exports:
+        entry = ByteBuffer()
+        entry.name(name)
+        entry.byte(EXPORT_KINDS[kind])
+        if kind == "func":
+            entry.u32(module.func_index(ref))
+        elif kind == "global":
+            entry.u32(module.global_index(ref))
+        elif kind == "table":
+            entry.u32(module.table_index(ref))
+        else:
+            entry.u32(module.resolve(module.memory_names, len(module.memories), ref, "памяти"))
+        entries.append(bytes(entry.data))
+    _vector_section(out, SECTION_EXPORT, entries)
+
+    if module.start is not None:
+        payload = ByteBuffer()
+        payload.u32(module.func_index(module.start))
+        _section(out, SECTION_START, payload)
+
+    entries = []
+    for i, (offset_expr, items) in enumerate(module.elems):
+        entry = ByteBuffer()
+        entry.u32(0)  # Активный сегмент таблицы 0, элементы - индексы функций
+        entry.raw(_encode_const_expr(module, offset_expr, f"сегмент elem {i}"))
+        func_indices = []
+        for item in items:
+            if _head(item) == "ref.func":
+                item = item[1]
+            func_indices.append(module.func_index(item))
+        entry.u32(len(func_indices))
+        for func_index in func_indices:
+            entry.u32(func_index)
+        entries.append(bytes(entry.data))
+    _vector_section(out, SECTION_ELEM, entries)
+
+    entries = []
+    for body in bodies:
+        entry = ByteBuffer()
+        entry.vec_bytes(body)
+        entries.append(bytes(entry.data))
+    _vector_section(out, SECTION_CODE, entries)
+
+    entries = []
+    for i, (offset_expr, payload) in enumerate(module.datas):
+        entry = ByteBuffer()
+        entry.u32(0)  # Активный сегмент памяти 0
+        entry.raw(_encode_const_expr(module, offset_expr, f"сегмент data {i}"))
+        entry.vec_bytes(payload)
+        entries.append(bytes(entry.data))
+    _vector_section(out, SECTION_DATA, entries)
+
+    return bytes(out.data)
+
+
+def _encode_limits(out: ByteBuffer, minimum: int, maximum: Optional[int]):
+    if maximum is None:
+        out.byte(0x00)
+        out.u32(minimum)
+    else:
+        out.byte(0x01)
+        out.u32(minimum)
+        out.u32(maximum)
+
+
+def assemble_wat(wat_code: str) -> bytes:
+    """Кодирует модуль, записанный в текстовой форме WAT, в двоичный .wasm."""
+    top_level = parse_sexpr(wat_code)
+    if len(top_level) != 1 or _head(top_level[0]) != "module":
+        raise WasmEncodeError("Ожидается ровно одно выражение (module ...)")
+    fields = top_level[0][1:]
+    if fields and _is_name(fields[0]):
+        fields = fields[1:]
+    return encode_module(build_module(fields))
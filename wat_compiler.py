@@ -1,20 +1,34 @@
 import os
 import sys
 from antlr4 import *
-from antlr4.tree.Tree import ParseTreeWalker
 from typing import Dict, List, Optional, Tuple, Any, Set
 
 from gen.ListLangParser import ListLangParser
-from gen.ListLangListener import ListLangListener
 
+import listlang_ast as ast
+from listlang_ast import AstListener, AstWalker
 from semantic_analyzer import Type, VariableInfo, FunctionInfo, LambdaSignature, Parameter
 
 
-class WatCompiler(ListLangListener):
-    GENERIC_I32_TEMPS = 2
+class WatCompiler(AstListener):
+    GENERIC_I32_TEMPS = 3
     GENERIC_F64_TEMPS = 2
-
-    def __init__(self, parser: ListLangParser, semantic_analyzer):
+    FREE_LIST_CLASSES = 28  # Классы размеров блоков кучи: от 16 байт до 2 ГиБ
+    LIST_HEADER_SIZE = 16  # [len][elem_size][capacity][head], затем элементы
+    # Списки с такими элементами хранят их 4-байтовыми указателями i32 вместо f64
+    PACKED_ELEMENT_TYPES = (Type.STRING, Type.LIST, Type.LAMBDA, Type.STRUCT)
+    # Метки в теле функции, которые при ее завершении заменяются сохранением locals в теневой
+    # стек сборщика и его снятием (полный список locals известен только в конце функции)
+    GC_SPILL_MARK = '    ;; gc: spill locals'
+    GC_UNSPILL_MARK = '    ;; gc: unspill locals'
+    # switch с целыми case: таблица переходов, если значений не меньше SWITCH_TABLE_MIN_CASES и они
+    # занимают не меньше половины своего диапазона; иначе дерево сравнений с линейными листьями
+    SWITCH_TABLE_MIN_CASES = 3
+    SWITCH_LINEAR_CASES = 3
+    STRUCT_SLOW_SLOT_MASK = 0x30000  # Флаги слота поля: 0x10000 - поле i32, 0x20000 - поле в блоке ext
+
+    def __init__(self, parser: ListLangParser, semantic_analyzer, initial_memory_pages: int = 1,
+                 gc_enabled: bool = False):
         self.parser = parser
         self.semantic_analyzer = semantic_analyzer
         self.symbol_table = semantic_analyzer.symbol_table
@@ -22,6 +36,7 @@ class WatCompiler(ListLangListener):
         # Refactored output buffers for better organization
         self.wat_prelude: List[str] = []
         self.wat_globals: List[str] = []
+        self.declared_globals: Dict[str, str] = {}  # Глобальные переменные, уже объявленные в wat_globals -> тип WAT
         self.wat_functions: List[str] = []  # For user functions and main logic
         self.wat_lambdas: List[str] = []  # For generated lambdas
 
@@ -30,16 +45,42 @@ class WatCompiler(ListLangListener):
         self.wat_data_segments: List[str] = []
         self.function_all_locals: Dict[str, Dict[str, str]] = {}
         self.current_function_name: Optional[str] = None
+        # Тела функций собираются в отдельные буферы; заголовок с полным списком locals
+        # дописывается при выходе из функции. Стек хранит (имя, буфер) объемлющих функций.
+        self.function_stack: List[Tuple[Optional[str], List[str]]] = []
+        self.function_wat_names: Dict[int, str] = {}  # id(FunctionInfo) -> имя функции в WAT
+        self.function_result_types: Dict[str, str] = {}  # Имя функции/лямбды в WAT -> тип результата ("" - нет)
         self.label_counter = 0
         self.loop_stack: List[Dict[str, str]] = []
-        self.memory_size_pages = 1
+        self.switch_stack: List[Dict[str, Any]] = []  # Метки и режим выбора ветви объемлющих switch
+        # Выражения, значение которых кладется на стек как i32, а не в представлении своего типа:
+        # целые (Type.INT) индексы списков и начала циклов for (счетчики циклов, целые литералы,
+        # len и +, -, * над ними) и логические значения условий (сравнения, and/or, not) - 0/1
+        self.i32_value_ids: Set[int] = set()
+        # node_id выражений, стоящих на месте оператора (их значение никому не нужно)
+        self.statement_expression_ids: Set[int] = set()
+        # Вызовы функций и лямбд, во время которых может пройти сборка мусора: на стеке операндов
+        # вызывающего нет значений (см. _note_collectable_calls)
+        self.gc_collectable_call_ids: Set[int] = set()
+        self.memory_size_pages = max(1, initial_memory_pages)  # Начальный размер памяти, страниц по 64 КиБ
         self.next_data_address = 0
+        self.memory_insert_index = 0  # Позиция объявления памяти в wat_prelude (после импортов)
+        # Режим сборки мусора: mark-sweep в точках безопасности (начало итерации циклов $main)
+        self.gc_enabled = gc_enabled
 
         self.lambda_function_id_counter = 0
         self.generated_lambda_wats: Dict[int, List[str]] = {}
         self.lambda_context_stack: List[Optional[LambdaSignature]] = []
+        self.lambda_id_stack: List[int] = []  # Номера лямбд, тела которых сейчас компилируются
         self.unique_lambda_types_wat: Set[str] = set()
 
+        # Слой элементов списков в переменных выводит семантический анализатор
+        self.list_layouts = semantic_analyzer.list_layouts
+        # Раскладки структур выводит семантический анализатор; имена полей получают сквозные номера
+        # для поиска поля по таблице раскладок, когда раскладка неизвестна при компиляции
+        self.struct_shapes = semantic_analyzer.struct_shapes
+        self.struct_field_ids: Dict[str, int] = {}
+
         self._add_wat_prelude()
 
     def _get_unique_label(self, prefix="label"):
@@ -53,37 +94,92 @@ class WatCompiler(ListLangListener):
         self.wat_prelude.append('  (import "env" "read_num" (func $read_num (result f64)))')
         self.wat_prelude.append('  (import "env" "f64_to_string" (func $f64_to_string (param f64) (result i32)))')
 
-        self.wat_prelude.append(f'  (memory (export "memory") {self.memory_size_pages})')
-        self.wat_prelude.append('  (global $next_mem_addr (mut i32) (i32.const 0))')
+        # Память и начало кучи объявляются в exitProgram, когда известен конец сегментов данных
+        self.memory_insert_index = len(self.wat_prelude)
 
         self.wat_prelude.append("""
+  ;; Size-class allocator: block = [header:i32][next_free | kind:i32][payload...], block size is 16 << class.
+  ;; Header: bits 0-4 size class, bit 8 allocated, bit 9 GC mark. Kind of live blocks: 0 raw, 1 string, 2 list, 3 struct.
+  ;; Freed blocks go to per-class free lists (heads at $free_lists) and are reused before bumping.
+  ;; Memory grows at least by its current size.
   (func $alloc (param $size i32) (result i32)
-    (local $ptr i32)
-    (global.get $next_mem_addr)
-    (local.set $ptr)
-    (global.get $next_mem_addr)
-    (local.get $size)
-    (i32.add)
-    (global.set $next_mem_addr)
-    (local.get $ptr)
+    (local $class i32) (local $head_addr i32) (local $block i32)
+    ;; Smallest class whose block holds the 8-byte header and $size bytes
+    (local.set $class (i32.sub (i32.const 32) (i32.clz (i32.shr_u (i32.add (local.get $size) (i32.const 7)) (i32.const 4)))))
+    (local.set $head_addr (i32.add (global.get $free_lists) (i32.shl (local.get $class) (i32.const 2))))
+    (local.set $block (i32.load (local.get $head_addr)))
+    (local.get $block)
+    (if (then
+      (i32.store (local.get $head_addr) (i32.load offset=4 (local.get $block)))
+    ) (else
+      (local.set $block (call $heap_bump (local.get $class)))
+    ))
+    (i32.store (local.get $block) (i32.or (local.get $class) (i32.const 256)))
+    (i32.store offset=4 (local.get $block) (i32.const 0))
+    (global.set $heap_live_bytes (i32.add (global.get $heap_live_bytes) (i32.shl (i32.const 16) (local.get $class))))
+    (i32.add (local.get $block) (i32.const 8))
+  )
+        """)
+
+        self.wat_prelude.append("""
+  (func $heap_bump (param $class i32) (result i32)
+    (local $block i32) (local $end i32) (local $needed_pages i32)
+    (local.set $block (global.get $next_mem_addr))
+    (local.set $end (i32.add (local.get $block) (i32.shl (i32.const 16) (local.get $class))))
+    (local.get $end) (i32.shl (memory.size) (i32.const 16)) (i32.gt_u)
+    (if (then
+      (local.set $needed_pages
+        (i32.shr_u (i32.add (i32.sub (local.get $end) (i32.shl (memory.size) (i32.const 16))) (i32.const 65535)) (i32.const 16)))
+      (memory.grow (select (memory.size) (local.get $needed_pages) (i32.gt_u (memory.size) (local.get $needed_pages))))
+      (i32.const -1) (i32.eq)
+      (if (then
+        ;; Not enough memory for doubling: try the exact amount before giving up
+        (memory.grow (local.get $needed_pages)) (i32.const -1) (i32.eq) (if (then (unreachable)))
+      ))
+    ))
+    (global.set $next_mem_addr (local.get $end))
+    (local.get $block)
   )
         """)
 
         self.wat_prelude.append("""
+  (func $free (param $ptr i32)
+    (local $block i32) (local $class i32) (local $head_addr i32)
+    (local.get $ptr) (i32.eqz) (if (then (return)))
+    (local.set $block (i32.sub (local.get $ptr) (i32.const 8)))
+    ;; Block is already free: nothing to do
+    (i32.and (i32.load (local.get $block)) (i32.const 256)) (i32.eqz) (if (then (return)))
+    (local.set $class (i32.and (i32.load (local.get $block)) (i32.const 31)))
+    (i32.store (local.get $block) (local.get $class))
+    (global.set $heap_live_bytes (i32.sub (global.get $heap_live_bytes) (i32.shl (i32.const 16) (local.get $class))))
+    (local.set $head_addr (i32.add (global.get $free_lists) (i32.shl (local.get $class) (i32.const 2))))
+    (i32.store offset=4 (local.get $block) (i32.load (local.get $head_addr)))
+    (i32.store (local.get $head_addr) (local.get $block))
+  )
+        """)
+
+        self.wat_prelude.append("""
+  ;; For strings: [len:i32][bytes...], pointer refers to the first byte, length is at ptr - 4.
+  ;; Host f64_to_string must return a string in the same layout.
   (func $string_len (param $ptr i32) (result i32)
-    (local $len i32)
-    (local.set $len (i32.const 0))
-    (loop $len_loop
-      (block
-        (i32.load8_u (i32.add (local.get $ptr) (local.get $len)))
-        (i32.const 0)
-        (i32.eq)
-        (br_if 1)
-      )
-      (local.set $len (i32.add (local.get $len) (i32.const 1)))
-      (br $len_loop)
-    )
-    (local.get $len)
+    (i32.load (i32.sub (local.get $ptr) (i32.const 4)))
+  )
+        """)
+
+        self.wat_prelude.append("""
+  (func $string_alloc (param $len i32) (result i32)
+    (local $ptr i32)
+    (local.set $ptr (call $alloc (i32.add (local.get $len) (i32.const 4))))
+    (i32.store (i32.sub (local.get $ptr) (i32.const 4)) (i32.const 1))
+    (i32.store (local.get $ptr) (local.get $len))
+    (i32.add (local.get $ptr) (i32.const 4))
+  )
+        """)
+
+        self.wat_prelude.append("""
+  ;; Only for heap strings (concat/repeat results), never for literals in data segments
+  (func $string_free (param $ptr i32)
+    (call $free (i32.sub (local.get $ptr) (i32.const 4)))
   )
         """)
 
@@ -108,80 +204,72 @@ class WatCompiler(ListLangListener):
 
         self.wat_prelude.append("""
   (func $string_concat (param $val1 f64) (param $val2 f64) (result i32)
-    (local $ptr1 i32) (local $ptr2 i32) (local $len1 i32) (local $len2 i32) (local $new_ptr i32) (local $i i32)
+    (local $ptr1 i32) (local $ptr2 i32) (local $len1 i32) (local $len2 i32) (local $new_ptr i32)
 
     ;; Heuristic: if val in [1..2^32-1], treat it as pointer; else convert number to string
     (local.get $val1) (i32.trunc_f64_s) (local.set $ptr1)
-    (local.get $val1) (f64.convert_i32_u) (f64.eq) (if (else
+    (local.get $ptr1) (f64.convert_i32_u) (local.get $val1) (f64.eq) (if (then) (else
       (local.get $val1) (call $f64_to_string) (local.set $ptr1)
     ))
 
     (local.get $val2) (i32.trunc_f64_s) (local.set $ptr2)
-    (local.get $val2) (f64.convert_i32_u) (f64.eq) (if (else
+    (local.get $ptr2) (f64.convert_i32_u) (local.get $val2) (f64.eq) (if (then) (else
       (local.get $val2) (call $f64_to_string) (local.set $ptr2)
     ))
 
     (local.set $len1 (call $string_len (local.get $ptr1)))
     (local.set $len2 (call $string_len (local.get $ptr2)))
-    (call $alloc (i32.add (local.get $len1) (i32.add (local.get $len2) (i32.const 1))))
+    (call $string_alloc (i32.add (local.get $len1) (local.get $len2)))
     (local.set $new_ptr)
-    (local.set $i (i32.const 0))
-    (loop $copy_loop_1
-      (local.get $i) (local.get $len1) (i32.lt_s)
-      (if (then
-        (i32.store8 (i32.add (local.get $new_ptr) (local.get $i)) (i32.load8_u (i32.add (local.get $ptr1) (local.get $i))))
-        (local.set $i (i32.add (local.get $i) (i32.const 1)))
-        (br $copy_loop_1)
-      ))
-    )
-    (local.set $i (i32.const 0))
-    (loop $copy_loop_2
-      (local.get $i) (local.get $len2) (i32.lt_s)
-      (if (then
-        (i32.store8 (i32.add (local.get $new_ptr) (i32.add (local.get $len1) (local.get $i))) (i32.load8_u (i32.add (local.get $ptr2) (local.get $i))))
-        (local.set $i (i32.add (local.get $i) (i32.const 1)))
-        (br $copy_loop_2)
-      ))
-    )
-    (i32.store8 (i32.add (local.get $new_ptr) (i32.add (local.get $len1) (local.get $len2))) (i32.const 0))
+    (memory.copy (local.get $new_ptr) (local.get $ptr1) (local.get $len1))
+    (memory.copy (i32.add (local.get $new_ptr) (local.get $len1)) (local.get $ptr2) (local.get $len2))
     (local.get $new_ptr)
   )
         """)
 
         self.wat_prelude.append("""
   (func $string_repeat (param $ptr i32) (param $count f64) (result i32)
-    (local $len i32) (local $total_len i32) (local $new_ptr i32) (local $i i32) (local $j i32)
+    (local $len i32) (local $times i32) (local $total_len i32) (local $new_ptr i32) (local $filled i32)
     (local.set $len (call $string_len (local.get $ptr)))
-    (local.set $total_len (i32.mul (local.get $len) (i32.trunc_f64_s (local.get $count))))
-    (call $alloc (i32.add (local.get $total_len) (i32.const 1)))
+    (local.set $times (i32.trunc_f64_s (local.get $count)))
+    (local.get $times) (i32.const 0) (i32.lt_s) (if (then (local.set $times (i32.const 0))))
+    (local.set $total_len (i32.mul (local.get $len) (local.get $times)))
+    (call $string_alloc (local.get $total_len))
     (local.set $new_ptr)
-    (local.set $i (i32.const 0))
-    (loop $repeat_loop
-      (local.get $i) (i32.trunc_f64_s (local.get $count)) (i32.lt_s)
-      (if (then
-        (local.set $j (i32.const 0))
-        (loop $copy_char_loop
-          (local.get $j) (local.get $len) (i32.lt_s)
-          (if (then
-            (i32.store8
-              (i32.add (local.get $new_ptr) (i32.add (i32.mul (local.get $i) (local.get $len)) (local.get $j)))
-              (i32.load8_u (i32.add (local.get $ptr) (local.get $j)))
-            )
-            (local.set $j (i32.add (local.get $j) (i32.const 1)))
-            (br $copy_char_loop)
-          ))
-        )
-        (local.set $i (i32.add (local.get $i) (i32.const 1)))
-        (br $repeat_loop)
-      ))
+    (local.get $total_len) (i32.eqz) (if (then (local.get $new_ptr) (return)))
+
+    ;; Doubling: copy the source once, then copy the already filled prefix onto itself
+    (memory.copy (local.get $new_ptr) (local.get $ptr) (local.get $len))
+    (local.set $filled (local.get $len))
+    (block $done
+      (loop $double_loop
+        (i32.shl (local.get $filled) (i32.const 1)) (local.get $total_len) (i32.gt_u) (br_if $done)
+        (memory.copy (i32.add (local.get $new_ptr) (local.get $filled)) (local.get $new_ptr) (local.get $filled))
+        (local.set $filled (i32.shl (local.get $filled) (i32.const 1)))
+        (br $double_loop)
+      )
+    )
+    (memory.copy
+      (i32.add (local.get $new_ptr) (local.get $filled))
+      (local.get $new_ptr)
+      (i32.sub (local.get $total_len) (local.get $filled))
     )
-    (i32.store8 (i32.add (local.get $new_ptr) (local.get $total_len)) (i32.const 0))
     (local.get $new_ptr)
   )
         """)
 
         self.wat_prelude.append("""
-  ;; For lists: header layout [len:i32][elem_size:i32][capacity:i32][data...]
+  ;; For lists: header layout [len:i32][elem_size:i32][capacity:i32][head:i32][data...]
+  ;; Element i lives in slot head + i; dequeue only advances head
+  (func $list_alloc (param $size i32) (result i32)
+    (local $ptr i32)
+    (local.set $ptr (call $alloc (local.get $size)))
+    (i32.store (i32.sub (local.get $ptr) (i32.const 4)) (i32.const 2))
+    (local.get $ptr)
+  )
+        """)
+
+        self.wat_prelude.append("""
   (func $len_list (param $ptr i32) (result f64)
     (f64.convert_i32_u (i32.load (local.get $ptr)))
   )
@@ -189,60 +277,683 @@ class WatCompiler(ListLangListener):
 
         self.wat_prelude.append("""
   (func $dequeue_op (param $list_ptr i32) (result f64)
-    (local $len i32) (local $elem_size i32) (local $first_elem_val f64)
+    (local $len i32) (local $head i32) (local $first_elem_val f64)
     (local.set $len (i32.load (local.get $list_ptr)))
-    (local.set $elem_size (i32.load (i32.add (local.get $list_ptr) (i32.const 4))))
     (local.get $len) (i32.const 0) (i32.eq) (if (then (f64.const 0) (return)))
+    (local.set $head (i32.load offset=12 (local.get $list_ptr)))
+
+    (i32.load offset=4 (local.get $list_ptr)) (i32.const 4) (i32.eq)
+    (if
+      (then (local.set $first_elem_val (f64.convert_i32_u
+        (i32.load offset=16 (i32.add (local.get $list_ptr) (i32.shl (local.get $head) (i32.const 2)))))))
+      (else (local.set $first_elem_val
+        (f64.load offset=16 (i32.add (local.get $list_ptr) (i32.shl (local.get $head) (i32.const 3))))))
+    )
 
-    (local.set $first_elem_val (f64.load (i32.add (local.get $list_ptr) (i32.const 12))))
-
-    (local $new_start i32) (local $old_start i32) (local $num_bytes_to_move i32)
-    (local.set $new_start (i32.add (local.get $list_ptr) (i32.const 12)))
-    (local.set $old_start (i32.add (local.get $new_start) (local.get $elem_size)))
-    (local.set $num_bytes_to_move (i32.mul (i32.sub (local.get $len) (i32.const 1)) (local.get $elem_size)))
-
-    (memory.copy (local.get $new_start) (local.get $old_start) (local.get $num_bytes_to_move))
-    (i32.store (local.get $list_ptr) (i32.sub (local.get $len) (i32.const 1)))
+    (local.set $len (i32.sub (local.get $len) (i32.const 1)))
+    (i32.store (local.get $list_ptr) (local.get $len))
+    ;; An emptied queue starts again from slot 0
+    (i32.store offset=12 (local.get $list_ptr)
+      (select (i32.add (local.get $head) (i32.const 1)) (i32.const 0) (local.get $len)))
     (local.get $first_elem_val)
   )
         """)
 
         self.wat_prelude.append("""
   (func $list_append (param $list_ptr i32) (param $value f64) (result i32)
-    (local $len i32) (local $elem_size i32) (local $capacity i32) (local $new_list_ptr i32)
+    (local $len i32) (local $elem_size i32) (local $capacity i32) (local $head i32) (local $new_list_ptr i32)
+    (local $slot i32)
     (local.set $len (i32.load (local.get $list_ptr)))
-    (local.set $elem_size (i32.load (i32.add (local.get $list_ptr) (i32.const 4))))
-    (local.set $capacity (i32.load (i32.add (local.get $list_ptr) (i32.const 8))))
+    (local.set $elem_size (i32.load offset=4 (local.get $list_ptr)))
+    (local.set $capacity (i32.load offset=8 (local.get $list_ptr)))
+    (local.set $head (i32.load offset=12 (local.get $list_ptr)))
 
-    (local.get $len) (local.get $capacity) (i32.ge_s)
+    (i32.add (local.get $head) (local.get $len)) (local.get $capacity) (i32.ge_s)
     (if (then
-      (local.get $capacity) (i32.const 0) (i32.eq) (if (then (local.set $capacity (i32.const 4))))
-      (local.set $capacity (i32.mul (local.get $capacity) (i32.const 2)))
+      (i32.mul (local.get $head) (i32.const 2)) (local.get $capacity) (i32.ge_s)
+      (if (then
+        ;; At least half of the buffer was dequeued: compact in place, amortized O(1)
+        (memory.copy
+          (i32.add (local.get $list_ptr) (i32.const 16))
+          (i32.add (i32.add (local.get $list_ptr) (i32.const 16)) (i32.mul (local.get $head) (local.get $elem_size)))
+          (i32.mul (local.get $len) (local.get $elem_size))
+        )
+      ) (else
+        (local.get $capacity) (i32.const 0) (i32.eq) (if (then (local.set $capacity (i32.const 4))))
+        (local.set $capacity (i32.mul (local.get $capacity) (i32.const 2)))
+
+        (call $list_alloc (i32.add (i32.const 16) (i32.mul (local.get $capacity) (local.get $elem_size))))
+        (local.set $new_list_ptr)
+
+        ;; Only the live elements move; the new buffer starts at slot 0
+        (memory.copy
+          (i32.add (local.get $new_list_ptr) (i32.const 16))
+          (i32.add (i32.add (local.get $list_ptr) (i32.const 16)) (i32.mul (local.get $head) (local.get $elem_size)))
+          (i32.mul (local.get $len) (local.get $elem_size))
+        )
+        ;; The old buffer is not freed: aliases, caller variables and enclosing lists may still
+        ;; point to it. It is reclaimed by the GC (--gc) once unreachable.
+        (i32.store offset=4 (local.get $new_list_ptr) (local.get $elem_size))
+        (i32.store offset=8 (local.get $new_list_ptr) (local.get $capacity))
+        (local.set $list_ptr (local.get $new_list_ptr))
+      ))
+      (local.set $head (i32.const 0))
+      (i32.store offset=12 (local.get $list_ptr) (i32.const 0))
+    ))
 
-      (call $alloc (i32.add (i32.const 12) (i32.mul (local.get $capacity) (local.get $elem_size))))
-      (local.set $new_list_ptr)
+    (local.set $slot
+      (i32.add (local.get $list_ptr) (i32.mul (i32.add (local.get $head) (local.get $len)) (local.get $elem_size))))
+    (local.get $elem_size) (i32.const 4) (i32.eq)
+    (if
+      (then (i32.store offset=16 (local.get $slot) (i32.trunc_f64_u (local.get $value))))
+      (else (f64.store offset=16 (local.get $slot) (local.get $value)))
+    )
+    (i32.store (local.get $list_ptr) (i32.add (local.get $len) (i32.const 1)))
+    (local.get $list_ptr)
+  )
+        """)
 
-      (memory.copy
-        (local.get $new_list_ptr)
-        (local.get $list_ptr)
-        (i32.add (i32.const 12) (i32.mul (local.get $len) (local.get $elem_size)))
+        self.wat_prelude.append("""
+  ;; Preallocation hint: make room for $count more elements after the current tail
+  (func $list_reserve (param $list_ptr i32) (param $count f64) (result i32)
+    (local $len i32) (local $elem_size i32) (local $capacity i32) (local $needed i32) (local $new_list_ptr i32)
+    (local.get $list_ptr) (i32.eqz) (if (then (local.get $list_ptr) (return)))
+    (local.get $count) (f64.const 1.0) (f64.lt) (if (then (local.get $list_ptr) (return)))
+    ;; Hints beyond 2^24 elements are ignored: growth by doubling handles them
+    (local.get $count) (f64.const 16777216.0) (f64.gt) (if (then (local.get $list_ptr) (return)))
+    (local.set $len (i32.load (local.get $list_ptr)))
+    (local.set $elem_size (i32.load offset=4 (local.get $list_ptr)))
+    (local.set $capacity (i32.load offset=8 (local.get $list_ptr)))
+    (local.set $needed (i32.add (local.get $len) (i32.trunc_f64_u (local.get $count))))
+    (i32.add (i32.load offset=12 (local.get $list_ptr)) (local.get $needed)) (local.get $capacity) (i32.le_u)
+    (if (then (local.get $list_ptr) (return)))
+
+    (call $list_alloc (i32.add (i32.const 16) (i32.mul (local.get $needed) (local.get $elem_size))))
+    (local.set $new_list_ptr)
+    (memory.copy
+      (i32.add (local.get $new_list_ptr) (i32.const 16))
+      (i32.add (i32.add (local.get $list_ptr) (i32.const 16))
+        (i32.mul (i32.load offset=12 (local.get $list_ptr)) (local.get $elem_size)))
+      (i32.mul (local.get $len) (local.get $elem_size))
+    )
+    ;; As in $list_append, the old buffer may still be referenced and is left to the GC
+    (i32.store (local.get $new_list_ptr) (local.get $len))
+    (i32.store offset=4 (local.get $new_list_ptr) (local.get $elem_size))
+    (i32.store offset=8 (local.get $new_list_ptr) (local.get $needed))
+    (i32.store offset=12 (local.get $new_list_ptr) (i32.const 0))
+    (local.get $new_list_ptr)
+  )
+        """)
+
+        self.wat_prelude.append("""
+  ;; Heap statistics for the host
+  (func (export "heap_live_bytes") (result i32) (global.get $heap_live_bytes))
+  (func (export "heap_size_bytes") (result i32) (i32.sub (global.get $next_mem_addr) (global.get $heap_base)))
+  (func (export "gc_collections") (result i32) (global.get $gc_collections))
+        """)
+
+        if self.gc_enabled:
+            self._add_gc_runtime()
+
+    def _add_gc_runtime(self):
+        """Рантайм консервативного mark-sweep сборщика (только в режиме gc_enabled)."""
+        self.wat_prelude.append("""
+  ;; Mark-sweep GC. Roots are globals ($gc_mark_roots) and the shadow stack: every frame saves its
+  ;; locals there before a call during which a collection may happen, and at the safepoint itself.
+  ;; Block starts are recorded in a bitmap (1 bit per 16 bytes of heap) placed above the bump pointer,
+  ;; so conservative pointers from f64 values are only followed to real allocated blocks.
+  ;; Marked lists and structs are pushed to a grey stack above the bitmap and scanned from it,
+  ;; so marking never recurses and deeply nested data cannot exhaust the call stack.
+  (func $gc_begin (result i32)
+    (local $bitmap_bytes i32) (local $end i32) (local $block i32) (local $header i32) (local $index i32)
+    ;; Some caller may hold heap pointers on its operand stack: no collection until it returns
+    (global.get $gc_inhibit) (if (then (i32.const 0) (return)))
+    (global.get $heap_live_bytes) (global.get $gc_threshold) (i32.lt_u) (if (then (i32.const 0) (return)))
+    (global.set $gc_bitmap (global.get $next_mem_addr))
+    (local.set $bitmap_bytes
+      (i32.shr_u (i32.add (i32.shr_u (i32.sub (global.get $next_mem_addr) (global.get $heap_base)) (i32.const 4)) (i32.const 7)) (i32.const 3)))
+    (local.set $end (i32.add (global.get $gc_bitmap) (local.get $bitmap_bytes)))
+    (local.get $end) (i32.shl (memory.size) (i32.const 16)) (i32.gt_u)
+    (if (then
+      (memory.grow (i32.shr_u (i32.add (i32.sub (local.get $end) (i32.shl (memory.size) (i32.const 16))) (i32.const 65535)) (i32.const 16)))
+      (i32.const -1) (i32.eq) (if (then (i32.const 0) (return)))
+    ))
+    (memory.fill (global.get $gc_bitmap) (i32.const 0) (local.get $bitmap_bytes))
+    (global.set $gc_grey_base (i32.and (i32.add (local.get $end) (i32.const 3)) (i32.const -4)))
+    (global.set $gc_grey_top (global.get $gc_grey_base))
+    (local.set $block (global.get $heap_base))
+    (block $scan_done
+      (loop $scan
+        (br_if $scan_done (i32.ge_u (local.get $block) (global.get $next_mem_addr)))
+        (local.set $header (i32.load (local.get $block)))
+        (i32.and (local.get $header) (i32.const 256))
+        (if (then
+          (local.set $index (i32.shr_u (i32.sub (local.get $block) (global.get $heap_base)) (i32.const 4)))
+          (i32.store8
+            (i32.add (global.get $gc_bitmap) (i32.shr_u (local.get $index) (i32.const 3)))
+            (i32.or
+              (i32.load8_u (i32.add (global.get $gc_bitmap) (i32.shr_u (local.get $index) (i32.const 3))))
+              (i32.shl (i32.const 1) (i32.and (local.get $index) (i32.const 7)))))
+        ))
+        (local.set $block (i32.add (local.get $block) (i32.shl (i32.const 16) (i32.and (local.get $header) (i32.const 31)))))
+        (br $scan)
       )
-      (i32.store (i32.add (local.get $new_list_ptr) (i32.const 8)) (local.get $capacity))
-      (local.set $list_ptr (local.get $new_list_ptr))
+    )
+    (i32.const 1)
+  )
+
+  (func $gc_is_block (param $block i32) (result i32)
+    (local $index i32)
+    (i32.lt_u (local.get $block) (global.get $heap_base)) (if (then (i32.const 0) (return)))
+    (i32.ge_u (local.get $block) (global.get $gc_bitmap)) (if (then (i32.const 0) (return)))
+    (i32.and (i32.sub (local.get $block) (global.get $heap_base)) (i32.const 15)) (if (then (i32.const 0) (return)))
+    (local.set $index (i32.shr_u (i32.sub (local.get $block) (global.get $heap_base)) (i32.const 4)))
+    (i32.and
+      (i32.shr_u (i32.load8_u (i32.add (global.get $gc_bitmap) (i32.shr_u (local.get $index) (i32.const 3))))
+                 (i32.and (local.get $index) (i32.const 7)))
+      (i32.const 1))
+  )
+
+  (func $gc_mark_value (param $ptr i32)
+    (local $block i32) (local $header i32) (local $kind i32)
+    ;; String pointers skip the 4-byte length header
+    (local.set $block (i32.sub (local.get $ptr) (i32.const 12)))
+    (call $gc_is_block (local.get $block))
+    (if (then
+      (i32.eq (i32.load offset=4 (local.get $block)) (i32.const 1))
+      (if (then (i32.store (local.get $block) (i32.or (i32.load (local.get $block)) (i32.const 512)))))
+      (return)
     ))
+    (local.set $block (i32.sub (local.get $ptr) (i32.const 8)))
+    (call $gc_is_block (local.get $block)) (i32.eqz) (if (then (return)))
+    (local.set $header (i32.load (local.get $block)))
+    (i32.and (local.get $header) (i32.const 512)) (if (then (return)))
+    (i32.store (local.get $block) (i32.or (local.get $header) (i32.const 512)))
+    ;; Lists and structs may hold pointers: scanned later by $gc_drain
+    (local.set $kind (i32.load offset=4 (local.get $block)))
+    (i32.or (i32.eq (local.get $kind) (i32.const 2)) (i32.eq (local.get $kind) (i32.const 3)))
+    (if (then (call $gc_grey_push (local.get $ptr))))
+  )
 
-    (local.get $list_ptr)
-    (i32.const 12) (i32.add)
-    (local.get $len) (local.get $elem_size) (i32.mul) (i32.add)
-    (local.get $value)
-    (f64.store)
-    (i32.store (local.get $list_ptr) (i32.add (local.get $len) (i32.const 1)))
-    (local.get $list_ptr)
+  (func $gc_grey_push (param $ptr i32)
+    (local $end i32)
+    (local.set $end (i32.add (global.get $gc_grey_top) (i32.const 4)))
+    (local.get $end) (i32.shl (memory.size) (i32.const 16)) (i32.gt_u)
+    (if (then
+      ;; Each block is pushed at most once, so the grey stack is bounded by the heap size
+      (memory.grow (i32.const 16)) (i32.const -1) (i32.eq)
+      (if (then (memory.grow (i32.const 1)) (i32.const -1) (i32.eq) (if (then (unreachable)))))
+    ))
+    (i32.store (global.get $gc_grey_top) (local.get $ptr))
+    (global.set $gc_grey_top (local.get $end))
+  )
+
+  ;; Scan grey objects until the grey stack is empty
+  (func $gc_drain
+    (block $drained
+      (loop $next
+        (br_if $drained (i32.le_u (global.get $gc_grey_top) (global.get $gc_grey_base)))
+        (global.set $gc_grey_top (i32.sub (global.get $gc_grey_top) (i32.const 4)))
+        (call $gc_scan (i32.load (global.get $gc_grey_top)))
+        (br $next)
+      )
+    )
+  )
+
+  (func $gc_scan (param $ptr i32)
+    (local $i i32) (local $len i32)
+    ;; Struct fields: conservative scan of every i32 word and every f64 word after the header
+    (i32.load offset=4 (i32.sub (local.get $ptr) (i32.const 8))) (i32.const 3) (i32.eq)
+    (if (then
+      (local.set $len (i32.load offset=4 (local.get $ptr)))
+      (local.set $i (i32.const 8))
+      (block $words_done
+        (loop $words
+          (br_if $words_done (i32.ge_u (local.get $i) (local.get $len)))
+          (call $gc_mark_value (i32.load (i32.add (local.get $ptr) (local.get $i))))
+          (i32.and (local.get $i) (i32.const 7))
+          (if (then) (else (call $gc_mark_f64 (f64.load (i32.add (local.get $ptr) (local.get $i))))))
+          (local.set $i (i32.add (local.get $i) (i32.const 4)))
+          (br $words)
+        )
+      )
+      (return)
+    ))
+    ;; List elements may hold pointers to other objects: exact in 4-byte i32 slots,
+    ;; conservative in 8-byte f64 slots
+    (local.set $len (i32.load (local.get $ptr)))
+    (local.set $i (i32.load offset=12 (local.get $ptr)))
+    (local.set $len (i32.add (local.get $len) (local.get $i)))
+    (i32.load offset=4 (local.get $ptr)) (i32.const 4) (i32.eq)
+    (if (then
+      (block $pointers_done
+        (loop $pointers
+          (br_if $pointers_done (i32.ge_u (local.get $i) (local.get $len)))
+          (call $gc_mark_value (i32.load offset=16 (i32.add (local.get $ptr) (i32.shl (local.get $i) (i32.const 2)))))
+          (local.set $i (i32.add (local.get $i) (i32.const 1)))
+          (br $pointers)
+        )
+      )
+      (return)
+    ))
+    (i32.load offset=4 (local.get $ptr)) (i32.const 8) (i32.ne) (if (then (return)))
+    (block $elements_done
+      (loop $elements
+        (br_if $elements_done (i32.ge_u (local.get $i) (local.get $len)))
+        (call $gc_mark_f64 (f64.load offset=16 (i32.add (local.get $ptr) (i32.shl (local.get $i) (i32.const 3)))))
+        (local.set $i (i32.add (local.get $i) (i32.const 1)))
+        (br $elements)
+      )
+    )
+  )
+
+  ;; Shadow stack: a raw heap block of f64 slots (i32 locals are stored converted), grown by copying
+  (func $gc_shadow_push (param $count i32) (result i32)
+    (local $needed i32) (local $capacity i32) (local $new i32)
+    (local.set $needed (i32.add (global.get $gc_shadow_sp) (i32.shl (local.get $count) (i32.const 3))))
+    (local.get $needed) (global.get $gc_shadow_capacity) (i32.gt_u)
+    (if (then
+      (local.set $capacity (i32.shl (local.get $needed) (i32.const 1)))
+      (local.get $capacity) (i32.const 1024) (i32.lt_u) (if (then (local.set $capacity (i32.const 1024))))
+      (local.set $new (call $alloc (local.get $capacity)))
+      (memory.copy (local.get $new) (global.get $gc_shadow) (global.get $gc_shadow_sp))
+      (call $free (global.get $gc_shadow))
+      (global.set $gc_shadow (local.get $new))
+      (global.set $gc_shadow_capacity (local.get $capacity))
+    ))
+    (i32.add (global.get $gc_shadow) (global.get $gc_shadow_sp))
+    (global.set $gc_shadow_sp (local.get $needed))
+  )
+
+  (func $gc_mark_shadow_stack
+    (local $slot i32) (local $end i32)
+    (global.get $gc_shadow) (i32.eqz) (if (then (return)))
+    (call $gc_mark_value (global.get $gc_shadow))
+    (local.set $slot (global.get $gc_shadow))
+    (local.set $end (i32.add (global.get $gc_shadow) (global.get $gc_shadow_sp)))
+    (block $slots_done
+      (loop $slots
+        (br_if $slots_done (i32.ge_u (local.get $slot) (local.get $end)))
+        (call $gc_mark_f64 (f64.load (local.get $slot)))
+        (local.set $slot (i32.add (local.get $slot) (i32.const 8)))
+        (br $slots)
+      )
+    )
+  )
+
+  (func $gc_collect
+    (call $gc_mark_roots)
+    (call $gc_mark_shadow_stack)
+    (call $gc_sweep)
+  )
+
+  ;; Conservative: any integral f64 in the i32 range may be a pointer
+  (func $gc_mark_f64 (param $value f64)
+    (local.get $value) (f64.const 0) (f64.lt) (if (then (return)))
+    (local.get $value) (f64.const 4294967295) (f64.gt) (if (then (return)))
+    (local.get $value) (f64.trunc (local.get $value)) (f64.ne) (if (then (return)))
+    (call $gc_mark_value (i32.trunc_f64_u (local.get $value)))
+  )
+
+  (func $gc_sweep
+    (local $block i32) (local $header i32)
+    ;; Finish marking: everything reachable from the roots marked so far
+    (call $gc_drain)
+    (local.set $block (global.get $heap_base))
+    (block $sweep_done
+      (loop $sweep
+        (br_if $sweep_done (i32.ge_u (local.get $block) (global.get $next_mem_addr)))
+        (local.set $header (i32.load (local.get $block)))
+        (i32.and (local.get $header) (i32.const 256))
+        (if (then
+          (i32.and (local.get $header) (i32.const 512))
+          (if (then
+            (i32.store (local.get $block) (i32.and (local.get $header) (i32.const -513)))
+          ) (else
+            (call $free (i32.add (local.get $block) (i32.const 8)))
+          ))
+        ))
+        (local.set $block (i32.add (local.get $block) (i32.shl (i32.const 16) (i32.and (local.get $header) (i32.const 31)))))
+        (br $sweep)
+      )
+    )
+    (global.set $gc_collections (i32.add (global.get $gc_collections) (i32.const 1)))
+    ;; Next collection once the live heap doubles, but not more often than every 64 KiB
+    (global.set $gc_threshold (i32.shl (global.get $heap_live_bytes) (i32.const 1)))
+    (global.get $gc_threshold) (i32.const 65536) (i32.lt_u)
+    (if (then (global.set $gc_threshold (i32.const 65536))))
+  )
+        """)
+
+    def _add_struct_runtime(self):
+        """Рантайм структур (только если в программе есть структуры)."""
+        self.wat_prelude.append("""
+  ;; Structs: [shape_id:i32][size:i32][ext:i32][pad][fields...], size includes the header.
+  ;; f64 fields come first, then i32 pointer fields; fields missing from a literal are zero.
+  ;; Fields added at run time live in the ext block (a struct with shape -1) as f64 slots.
+  (func $struct_alloc (param $shape_id i32) (param $size i32) (result i32)
+    (local $ptr i32)
+    (local.set $ptr (call $alloc (local.get $size)))
+    (i32.store (i32.sub (local.get $ptr) (i32.const 4)) (i32.const 3))
+    (i32.store (local.get $ptr) (local.get $shape_id))
+    (i32.store offset=4 (local.get $ptr) (local.get $size))
+    (memory.fill (i32.add (local.get $ptr) (i32.const 8)) (i32.const 0) (i32.sub (local.get $size) (i32.const 8)))
+    (local.get $ptr)
+  )
+
+  ;; Shape descriptor: [count:i32][(field_id:i32, slot:i32)...]. Slot is the field offset,
+  ;; bit 16 set for i32 fields, bit 17 set for fields in the ext block.
+  ;; Shapes below $struct_layout_count are compile-time layouts (table in a data segment),
+  ;; the rest are created by transitions and kept in the packed list $struct_runtime_shapes.
+  (func $struct_shape_desc (param $shape_id i32) (result i32)
+    (i32.lt_u (local.get $shape_id) (global.get $struct_layout_count))
+    (if (then
+      (i32.load (i32.add (global.get $struct_layouts) (i32.shl (local.get $shape_id) (i32.const 2))))
+      (return)
+    ))
+    (local.set $shape_id (i32.sub (local.get $shape_id) (global.get $struct_layout_count)))
+    (i32.load offset=16 (i32.add (global.get $struct_runtime_shapes)
+      (i32.shl (i32.add (i32.load offset=12 (global.get $struct_runtime_shapes)) (local.get $shape_id)) (i32.const 2))))
+  )
+
+  ;; Returns the slot of the field or -1 if the struct has no such field
+  (func $struct_field_slot (param $ptr i32) (param $field_id i32) (result i32)
+    (local $desc i32) (local $count i32) (local $i i32) (local $entry i32)
+    (local.get $ptr) (i32.eqz) (if (then (i32.const -1) (return)))
+    (local.set $desc (call $struct_shape_desc (i32.load (local.get $ptr))))
+    (local.set $count (i32.load (local.get $desc)))
+    (local.set $i (i32.const 0))
+    (block $search_done
+      (loop $search
+        (br_if $search_done (i32.ge_u (local.get $i) (local.get $count)))
+        (local.set $entry (i32.add (local.get $desc) (i32.shl (local.get $i) (i32.const 3))))
+        (i32.load offset=4 (local.get $entry)) (local.get $field_id) (i32.eq)
+        (if (then (i32.load offset=8 (local.get $entry)) (return)))
+        (local.set $i (i32.add (local.get $i) (i32.const 1)))
+        (br $search)
+      )
+    )
+    (i32.const -1)
+  )
+
+  (func $struct_i32_list_push (param $list i32) (param $value i32) (result i32)
+    (local.get $list) (i32.eqz)
+    (if (then
+      (local.set $list (call $list_alloc (i32.const 32)))
+      (i32.store (local.get $list) (i32.const 0))
+      (i32.store offset=4 (local.get $list) (i32.const 4))
+      (i32.store offset=8 (local.get $list) (i32.const 4))
+      (i32.store offset=12 (local.get $list) (i32.const 0))
+    ))
+    (call $list_append (local.get $list) (f64.convert_i32_u (local.get $value)))
+  )
+
+  ;; Shape after adding $field_id to $shape_id: transitions are recorded as (from, field_id, to)
+  ;; triples, so structs extended the same way share one shape
+  (func $struct_transition (param $shape_id i32) (param $field_id i32) (result i32)
+    (local $list i32) (local $i i32) (local $end i32) (local $entry i32)
+    (local $desc i32) (local $count i32) (local $ext_count i32) (local $new_desc i32) (local $new_shape i32)
+    (local.set $list (global.get $struct_transitions))
+    (local.get $list)
+    (if (then
+      (local.set $i (i32.load offset=12 (local.get $list)))
+      (local.set $end (i32.add (local.get $i) (i32.load (local.get $list))))
+      (block $search_done
+        (loop $search
+          (br_if $search_done (i32.ge_u (local.get $i) (local.get $end)))
+          (local.set $entry (i32.add (local.get $list) (i32.shl (local.get $i) (i32.const 2))))
+          (i32.and
+            (i32.eq (i32.load offset=16 (local.get $entry)) (local.get $shape_id))
+            (i32.eq (i32.load offset=20 (local.get $entry)) (local.get $field_id)))
+          (if (then (i32.load offset=24 (local.get $entry)) (return)))
+          (local.set $i (i32.add (local.get $i) (i32.const 3)))
+          (br $search)
+        )
+      )
+    ))
+
+    ;; New shape: the parent's fields plus one f64 slot at the end of the ext block
+    (local.set $desc (call $struct_shape_desc (local.get $shape_id)))
+    (local.set $count (i32.load (local.get $desc)))
+    (local.set $i (i32.const 0))
+    (block $count_done
+      (loop $count_ext
+        (br_if $count_done (i32.ge_u (local.get $i) (local.get $count)))
+        (i32.and (i32.load offset=8 (i32.add (local.get $desc) (i32.shl (local.get $i) (i32.const 3)))) (i32.const 131072))
+        (if (then (local.set $ext_count (i32.add (local.get $ext_count) (i32.const 1)))))
+        (local.set $i (i32.add (local.get $i) (i32.const 1)))
+        (br $count_ext)
+      )
+    )
+    (local.set $new_desc (call $alloc (i32.add (i32.const 12) (i32.shl (local.get $count) (i32.const 3)))))
+    (memory.copy (local.get $new_desc) (local.get $desc) (i32.add (i32.const 4) (i32.shl (local.get $count) (i32.const 3))))
+    (i32.store (local.get $new_desc) (i32.add (local.get $count) (i32.const 1)))
+    (local.set $entry (i32.add (local.get $new_desc) (i32.shl (local.get $count) (i32.const 3))))
+    (i32.store offset=4 (local.get $entry) (local.get $field_id))
+    (i32.store offset=8 (local.get $entry)
+      (i32.or (i32.const 131072) (i32.add (i32.const 16) (i32.shl (local.get $ext_count) (i32.const 3)))))
+
+    (local.set $new_shape (global.get $struct_layout_count))
+    (global.get $struct_runtime_shapes)
+    (if (then (local.set $new_shape
+      (i32.add (local.get $new_shape) (i32.load (global.get $struct_runtime_shapes))))))
+    (global.set $struct_runtime_shapes (call $struct_i32_list_push (global.get $struct_runtime_shapes) (local.get $new_desc)))
+    (local.set $list (call $struct_i32_list_push (local.get $list) (local.get $shape_id)))
+    (local.set $list (call $struct_i32_list_push (local.get $list) (local.get $field_id)))
+    (global.set $struct_transitions (call $struct_i32_list_push (local.get $list) (local.get $new_shape)))
+    (local.get $new_shape)
+  )
+
+  ;; Adds a field to the struct: moves it to the next shape and makes room in the ext block
+  (func $struct_add_field (param $ptr i32) (param $field_id i32) (result i32)
+    (local $shape i32) (local $slot i32) (local $needed i32) (local $ext i32) (local $new_ext i32) (local $size i32)
+    (local.set $shape (call $struct_transition (i32.load (local.get $ptr)) (local.get $field_id)))
+    (local.set $slot (call $struct_field_slot_in_shape (local.get $shape) (local.get $field_id)))
+    (local.set $needed (i32.add (i32.and (local.get $slot) (i32.const 65535)) (i32.const 8)))
+    (local.set $ext (i32.load offset=8 (local.get $ptr)))
+    (local.get $ext) (i32.eqz)
+    (if (result i32) (then (i32.const 1)) (else (i32.lt_u (i32.load offset=4 (local.get $ext)) (local.get $needed))))
+    (if (then
+      ;; The ext block grows by doubling, starting with room for two fields
+      (local.set $size (i32.const 32))
+      (local.get $ext)
+      (if (then (local.set $size (i32.shl (i32.load offset=4 (local.get $ext)) (i32.const 1)))))
+      (local.get $size) (local.get $needed) (i32.lt_u) (if (then (local.set $size (local.get $needed))))
+      (local.set $new_ext (call $struct_alloc (i32.const -1) (local.get $size)))
+      (local.get $ext)
+      (if (then
+        (memory.copy (i32.add (local.get $new_ext) (i32.const 16)) (i32.add (local.get $ext) (i32.const 16))
+          (i32.sub (i32.load offset=4 (local.get $ext)) (i32.const 16)))
+        (call $free (local.get $ext))
+      ))
+      (i32.store offset=8 (local.get $ptr) (local.get $new_ext))
+    ))
+    (i32.store (local.get $ptr) (local.get $shape))
+    (local.get $slot)
+  )
+
+  (func $struct_field_slot_in_shape (param $shape_id i32) (param $field_id i32) (result i32)
+    (local $desc i32)
+    (local.set $desc (call $struct_shape_desc (local.get $shape_id)))
+    ;; The field added by a transition is the last entry of the descriptor
+    (i32.load offset=8 (i32.add (local.get $desc) (i32.shl (i32.sub (i32.load (local.get $desc)) (i32.const 1)) (i32.const 3))))
+  )
+
+  ;; Inline cache miss: $ic points to a [shape_id][slot] cell of the access site
+  (func $struct_ic_miss (param $ptr i32) (param $field_id i32) (param $ic i32) (result i32)
+    (local $slot i32)
+    (local.set $slot (call $struct_field_slot (local.get $ptr) (local.get $field_id)))
+    (local.get $slot) (i32.const 0) (i32.ge_s)
+    (if (then
+      (i32.store (local.get $ic) (i32.load (local.get $ptr)))
+      (i32.store offset=4 (local.get $ic) (local.get $slot))
+    ))
+    (local.get $slot)
+  )
+
+  ;; Store site miss: a missing field is added to the struct (shape transition)
+  (func $struct_ic_miss_set (param $ptr i32) (param $field_id i32) (param $ic i32) (result i32)
+    (local $slot i32)
+    (local.get $ptr) (i32.eqz) (if (then (i32.const -1) (return)))
+    (local.set $slot (call $struct_ic_miss (local.get $ptr) (local.get $field_id) (local.get $ic)))
+    (local.get $slot) (i32.const 0) (i32.lt_s)
+    (if (then (local.set $slot (call $struct_add_field (local.get $ptr) (local.get $field_id)))))
+    (local.get $slot)
+  )
+
+  ;; Slow accessors for i32 fields, ext fields and missing fields (slot -1)
+  (func $struct_slot_get (param $ptr i32) (param $slot i32) (result f64)
+    (local.get $slot) (i32.const 0) (i32.lt_s) (if (then (f64.const 0) (return)))
+    (i32.and (local.get $slot) (i32.const 131072))
+    (if (then
+      (f64.load (i32.add (i32.load offset=8 (local.get $ptr)) (i32.and (local.get $slot) (i32.const 65535))))
+      (return)
+    ))
+    (i32.and (local.get $slot) (i32.const 65536))
+    (if (result f64)
+      (then (f64.convert_i32_u (i32.load (i32.add (local.get $ptr) (i32.and (local.get $slot) (i32.const 65535))))))
+      (else (f64.load (i32.add (local.get $ptr) (local.get $slot))))
+    )
+  )
+
+  (func $struct_slot_set (param $ptr i32) (param $slot i32) (param $value f64)
+    (local.get $slot) (i32.const 0) (i32.lt_s) (if (then (return)))
+    (i32.and (local.get $slot) (i32.const 131072))
+    (if (then
+      (f64.store (i32.add (i32.load offset=8 (local.get $ptr)) (i32.and (local.get $slot) (i32.const 65535))) (local.get $value))
+      (return)
+    ))
+    (i32.and (local.get $slot) (i32.const 65536))
+    (if
+      (then (i32.store (i32.add (local.get $ptr) (i32.and (local.get $slot) (i32.const 65535)))
+        (i32.trunc_f64_u (local.get $value))))
+      (else (f64.store (i32.add (local.get $ptr) (local.get $slot)) (local.get $value)))
+    )
   )
         """)
 
-        self.wat_prelude.append('  (table (export "table") 10 funcref)')
-        self.wat_prelude.append('  (global $next_table_idx (mut i32) (i32.const 0))')
+    def _compile_struct_layout_table(self) -> int:
+        """
+        Сегмент данных с таблицей раскладок для $struct_field_slot: сначала указатели на описания
+        по номеру раскладки, затем сами описания. Возвращает адрес таблицы.
+        """
+        layouts = self.struct_shapes.layouts
+        table_addr = (self.next_data_address + 3) & ~3
+        words = []
+        descriptor_addr = table_addr + 4 * len(layouts)
+        for layout in layouts:
+            words.append(descriptor_addr)
+            descriptor_addr += 4 + 8 * len(layout.offsets)
+        for layout in layouts:
+            words.append(len(layout.offsets))
+            for name, offset in layout.offsets.items():
+                words.append(self._struct_field_id(name))
+                words.append(offset | (0x10000 if layout.slot_types[name] == "i32" else 0))
+        data = b''.join(word.to_bytes(4, 'little') for word in words)
+        if data:
+            escaped = ''.join(f'\\{b:02x}' for b in data)
+            self.wat_data_segments.append(f'  (data (i32.const {table_addr}) "{escaped}")')
+        self.next_data_address = table_addr + len(data)
+        return table_addr
+
+    def _struct_field_id(self, field_name: str) -> int:
+        return self.struct_field_ids.setdefault(field_name, len(self.struct_field_ids))
+
+    def _struct_inline_cache(self) -> int:
+        """Ячейка встроенного кэша [shape_id][slot] места обращения к полю; shape_id -1 - кэш пуст."""
+        addr = (self.next_data_address + 3) & ~3
+        self.wat_data_segments.append(f'  (data (i32.const {addr}) "\\ff\\ff\\ff\\ff\\00\\00\\00\\00")')
+        self.next_data_address = addr + 8
+        return addr
+
+    def _emit_struct_slot_lookup(self, field_name: str, miss_func: str):
+        """
+        Слот поля структуры из {tmp_i32_0} в {tmp_i32_1} через встроенный кэш: если форма структуры
+        совпадает с запомненной, слот берется из кэша, иначе - поиск по таблице форм (miss_func).
+        """
+        temp_struct_ptr = self._get_generic_temp("i32", 0)
+        temp_slot = self._get_generic_temp("i32", 1)
+        ic_addr = self._struct_inline_cache()
+        self.current_wat_buffer.append(f'    (local.get {temp_struct_ptr})')
+        self.current_wat_buffer.append('    (i32.load)')
+        self.current_wat_buffer.append(f'    (i32.load (i32.const {ic_addr}))')
+        self.current_wat_buffer.append('    (i32.eq)')
+        self.current_wat_buffer.append('    (if (result i32)')
+        self.current_wat_buffer.append(f'      (then (i32.load (i32.const {ic_addr + 4})))')
+        self.current_wat_buffer.append(f'      (else (call {miss_func} (local.get {temp_struct_ptr}) '
+                                       f'(i32.const {self._struct_field_id(field_name)}) (i32.const {ic_addr})))')
+        self.current_wat_buffer.append('    )')
+        self.current_wat_buffer.append(f'    (local.set {temp_slot})')
+        # Флаги i32-поля и поля в ext (а также слот -1) уводят на медленный путь
+        self.current_wat_buffer.append(f'    (i32.and (local.get {temp_slot}) (i32.const {self.STRUCT_SLOW_SLOT_MASK}))')
+
+    def _gc_mark_roots_function(self) -> str:
+        """Функция разметки корней: все глобальные переменные программы (известны к концу обхода)."""
+        lines = ['  (func $gc_mark_roots']
+        if self.struct_shapes.site_keys:
+            # Описания форм, созданных переходами, и таблица переходов - списки указателей в куче
+            lines.append('    (call $gc_mark_value (global.get $struct_runtime_shapes))')
+            lines.append('    (call $gc_mark_value (global.get $struct_transitions))')
+        for var_name, wat_type in self.declared_globals.items():
+            mark = "$gc_mark_value" if wat_type == "i32" else "$gc_mark_f64"
+            lines.append(f'    (call {mark} (global.get ${var_name}))')
+        lines.append('  )')
+        return "\n".join(lines)
+
+    def _emit_gc_safepoint(self):
+        """
+        Точка безопасности в начале итерации цикла (в $main, функциях и лямбдах): стек операндов
+        пуст, locals текущей функции сохраняются в теневой стек, а вызывающие функции сохранили
+        свои перед вызовом. Корни - глобальные переменные и теневой стек.
+        """
+        if not self.gc_enabled:
+            return
+        self.current_wat_buffer.append('        (call $gc_begin)')
+        self.current_wat_buffer.append('        (if (then')
+        self.current_wat_buffer.append(self.GC_SPILL_MARK)
+        self.current_wat_buffer.append('          (call $gc_collect)')
+        self.current_wat_buffer.append(self.GC_UNSPILL_MARK)
+        self.current_wat_buffer.append('        ))')
+
+    def _note_collectable_calls(self, statement: ast.Node):
+        """
+        Отмечает вызовы, во время которых можно собирать мусор: они вычисляются первыми в операторе
+        (первый потомок на каждом уровне), поэтому на стеке операндов вызывающего нет указателей.
+        Остальные вызовы запрещают сборку на время своего выполнения ($gc_inhibit).
+        """
+        node = statement
+        while node is not None and not isinstance(node, (ast.StatementBlock, ast.FunctionDecl, ast.LambdaReturn)):
+            if isinstance(node, ast.FunctionCall):
+                self.gc_collectable_call_ids.add(node.node_id)
+            children = node.children()
+            node = children[0] if children else None
+
+    def _emit_user_call(self, node: ast.FunctionCall, call_instruction: str):
+        """Вызов функции или лямбды программы; в режиме сборки мусора - с сохранением корней."""
+        if not self.gc_enabled:
+            self.current_wat_buffer.append(call_instruction)
+        elif node.node_id in self.gc_collectable_call_ids:
+            self.current_wat_buffer.append(self.GC_SPILL_MARK)
+            self.current_wat_buffer.append(call_instruction)
+            self.current_wat_buffer.append(self.GC_UNSPILL_MARK)
+        else:
+            self.current_wat_buffer.append('    (global.set $gc_inhibit (i32.add (global.get $gc_inhibit) (i32.const 1)))')
+            self.current_wat_buffer.append(call_instruction)
+            self.current_wat_buffer.append('    (global.set $gc_inhibit (i32.sub (global.get $gc_inhibit) (i32.const 1)))')
+
+    def _gc_spill_code(self, locals_: List[Tuple[str, str]]) -> Tuple[List[str], List[str]]:
+        """Код сохранения locals в кадр теневого стека и снятия кадра."""
+        if not locals_:
+            return [], []
+        spill = [f'    (local.set $gc_frame (call $gc_shadow_push (i32.const {len(locals_)})))']
+        for slot, (var_name, wat_type) in enumerate(locals_):
+            value = f'(local.get ${var_name})'
+            if wat_type == "i32":
+                value = f'(f64.convert_i32_u {value})'
+            spill.append(f'    (f64.store offset={slot * 8} (local.get $gc_frame) {value})')
+        unspill = [f'    (global.set $gc_shadow_sp (i32.sub (global.get $gc_shadow_sp) (i32.const {len(locals_) * 8})))']
+        return spill, unspill
+
 
     def get_wat_type(self, list_lang_type: Type) -> str:
         if list_lang_type in (Type.NUMBER, Type.BOOL):
@@ -255,8 +966,34 @@ class WatCompiler(ListLangListener):
             return "f64"
         return "f64"
 
+    def _storage_wat_type(self, list_lang_type: Type) -> str:
+        """Тип WAT для хранения значения в переменной: VOID (результат процедуры) хранится как f64."""
+        return self.get_wat_type(list_lang_type) or "f64"
+
     def _get_element_wat_size(self, elem_type: Type) -> int:
-        return 8
+        """Размер слота элемента: указатели (строки, списки, лямбды, структуры) - 4 байта i32, прочее - f64."""
+        return 4 if elem_type in self.PACKED_ELEMENT_TYPES else 8
+
+    def _static_list_element_size(self, node: ast.Node) -> Optional[int]:
+        """
+        Размер элемента списка в обращении по индексу, если он известен при компиляции: для литерала
+        списка и для переменной, в которую попадают только литералы с одним известным типом
+        элемента (list_layouts). Тип элемента из VariableInfo не учитывается - слой определяется
+        литералом, создавшим конкретный список; остальные обращения выбирают слой по заголовку
+        списка во время выполнения.
+        """
+        list_node = node.target
+        while isinstance(list_node, ast.ParenExpression):
+            list_node = list_node.inner
+        if isinstance(list_node, ast.ListLiteral):
+            return self._get_element_wat_size(self._list_literal_element_type(list_node))
+        element_type = self.list_layouts.site_element_types.get(node.node_id)
+        if element_type is not None:
+            return self._get_element_wat_size(element_type)
+        return None
+
+    def _list_literal_element_type(self, node: ast.ListLiteral) -> Type:
+        return self.semantic_analyzer.list_element_types.get(node.node_id, Type.UNKNOWN)
 
     def _get_generic_temp(self, wat_type: str, index: int = 0) -> str:
         if wat_type == "i32":
@@ -266,48 +1003,29 @@ class WatCompiler(ListLangListener):
         raise Exception(f"Compiler Error: No generic temporary of type {wat_type} at index {index}")
 
     def _collect_function_locals_and_params(self, func_name: str, parameters: List[Parameter],
-                                            func_body_ctx: ParserRuleContext):
+                                            func_body: Optional[ast.Node]):
         if func_name not in self.function_all_locals:
             self.function_all_locals[func_name] = {}
 
         for param in parameters:
             self.function_all_locals[func_name][param.name] = self.get_wat_type(param.type)
 
-        def walk(ctx):
-            if isinstance(ctx, ListLangParser.IdentifierExpressionContext):
-                var_name = ctx.IDENTIFIER().getText()
-                self._record_local_if_not_global(func_name, var_name)
-            elif isinstance(ctx, (ListLangParser.IdentifierAssignExpressionContext,
-                                  ListLangParser.ExpressionRightAssignmentContext,
-                                  ListLangParser.IdentifierLeftAssignmentContext)):
-                var_name = ctx.IDENTIFIER().getText()
-                self._record_local_if_not_global(func_name, var_name)
-            elif isinstance(ctx, ListLangParser.MultiAssignmentContext):
-                if ctx.identifierList():
-                    for id_tok in ctx.identifierList().IDENTIFIER():
-                        var_name = id_tok.getText()
-                        self._record_local_if_not_global(func_name, var_name)
-            elif isinstance(ctx, (ListLangParser.ListElementAssignmentContext,
-                                  ListLangParser.ListElementAssignExpressionContext)):
-                list_expr = ctx.expression(0)
-                if isinstance(list_expr, ListLangParser.IdentifierExpressionContext):
-                    var_name = list_expr.IDENTIFIER().getText()
+        # Обход тела функции в порядке исходного текста (порядок определяет порядок объявления locals)
+        stack = [func_body] if func_body is not None else []
+        while stack:
+            node = stack.pop()
+            # Цель присваивания элементу списка - IdentifierExpression, он учитывается как обычный узел
+            if isinstance(node, (ast.IdentifierExpression, ast.IdentifierLeftAssignment,
+                                 ast.ExpressionRightAssignment)):
+                self._record_local_if_not_global(func_name, node.name)
+            elif isinstance(node, ast.MultiAssignment):
+                for var_name in node.names:
                     self._record_local_if_not_global(func_name, var_name)
-            elif isinstance(ctx, (ListLangParser.StructFieldAssignmentContext,
-                                  ListLangParser.StructFieldAssignExpressionContext)):
-                var_name = ctx.IDENTIFIER(0).getText()
-                self._record_local_if_not_global(func_name, var_name)
-            elif isinstance(ctx, ListLangParser.ForStatementContext):
-                var_name = ctx.IDENTIFIER().getText()
-                self._record_local_if_not_global(func_name, var_name)
-
-            for i in range(ctx.getChildCount()):
-                child = ctx.getChild(i)
-                if isinstance(child, ParserRuleContext):
-                    walk(child)
-
-        if func_body_ctx:
-            walk(func_body_ctx)
+            elif isinstance(node, ast.StructFieldAssignment):
+                self._record_local_if_not_global(func_name, node.struct_name)
+            elif isinstance(node, ast.ForStatement):
+                self._record_local_if_not_global(func_name, node.var_name)
+            stack.extend(reversed(node.children()))
 
     def _record_local_if_not_global(self, func_name: str, var_name: str):
         var_info = self._lookup_var_info_in_flat_table(var_name, func_name)
@@ -319,7 +1037,7 @@ class WatCompiler(ListLangListener):
         if var_name in self.function_all_locals[func_name]:
             return
 
-        wat_type = self.get_wat_type(var_info.type) if var_info else "f64"
+        wat_type = self._storage_wat_type(var_info.type) if var_info else "f64"
         self.function_all_locals[func_name][var_name] = wat_type
 
     def _build_flat_symbol_table(self):
@@ -327,10 +1045,14 @@ class WatCompiler(ListLangListener):
         self.flat_vars: Dict[str, VariableInfo] = {}
         self.flat_funcs: Dict[str, FunctionInfo] = {}
 
-        # 1) Снимаем все функции из глобального скоупа
+        # 1) Снимаем все функции из глобального скоупа. Перегрузки получают в WAT
+        #    имена вида "name@2" (символ '@' не встречается в идентификаторах ListLang)
         for scope in self.semantic_analyzer.symbol_table.scopes:
             for func_name, func_info in scope["functions"].items():
                 self.flat_funcs[func_name] = func_info
+                self.function_wat_names[id(func_info)] = func_name
+                for k, overload in enumerate(func_info.overloads, start=2):
+                    self.function_wat_names[id(overload)] = f"{func_name}@{k}"
 
         # 2) Переносим глобальные переменные (только неквалифицированные имена)
         for scope in self.semantic_analyzer.symbol_table.scopes:
@@ -360,6 +1082,15 @@ class WatCompiler(ListLangListener):
                 # Если вдруг уже есть запись — не затираем, но здесь параметров быть не должно ранее
                 self.flat_vars[qualified_name] = vi
 
+        # 4) Индекс квалифицированных записей по неквалифицированному имени. Кандидаты идут
+        #    в порядке flat_vars (области видимости по порядку, затем параметры функций),
+        #    запасной поиск берет первого из них
+        self.flat_vars_by_name: Dict[str, List[VariableInfo]] = {}
+        for qualified_name, var_info in self.flat_vars.items():
+            scope_prefix, sep, var_name = qualified_name.rpartition("::")
+            if sep:
+                self.flat_vars_by_name.setdefault(var_name, []).append(var_info)
+
     def _lookup_var_info_in_flat_table(self, var_name: str, current_func_name: Optional[str] = None) -> Optional[
         VariableInfo]:
         """Looks up a variable in the flat symbol table, respecting scope."""
@@ -374,93 +1105,106 @@ class WatCompiler(ListLangListener):
             return self.flat_vars[var_name]
 
         # 3. Fallback: любой квалифицированный ключ, оканчивающийся на ::var_name
-        for qualified, info in self.flat_vars.items():
-            if qualified.endswith(f"::{var_name}"):
-                return info
+        candidates = self.flat_vars_by_name.get(var_name)
+        return candidates[0] if candidates else None
 
-        return None
-
-    def _resolve_variable_access(self, var_name: str) -> Tuple[str, str]:
+    def _resolve_variable(self, var_name: str) -> Tuple[str, str]:
         """
-        Возвращает WAT‑операцию для доступа к переменной (local.get/global.get).
+        Определяет, где хранится переменная в текущей функции: ("local" | "global", тип WAT).
         Если переменная не найдена в таблице символов — создаём её на лету.
         """
-        var_info = self._lookup_var_info_in_flat_table(var_name, self.current_function_name)
+        func_locals = self.function_all_locals.get(self.current_function_name)
+        if func_locals is not None and var_name in func_locals:
+            # Уже известная local текущей функции (в том числе переменная цикла for в $main)
+            return "local", func_locals[var_name]
 
-        if not var_info:
-            wat_type = "f64"  # по умолчанию число
-            if self.current_function_name and self.current_function_name != "$main":
-                # Локальная переменная
-                if self.current_function_name not in self.function_all_locals:
-                    self.function_all_locals[self.current_function_name] = {}
-                if var_name not in self.function_all_locals[self.current_function_name]:
-                    self.function_all_locals[self.current_function_name][var_name] = wat_type
-                return f"local.get ${var_name}", wat_type
-            else:
-                # Глобальная переменная
-                if f'(global ${var_name} ' not in "".join(self.wat_globals):
-                    default_value = "(f64.const 0.0)"
-                    self.wat_globals.append(f'  (global ${var_name} (mut {wat_type}) {default_value})')
-                return f"global.get ${var_name}", wat_type
-
-        # Если переменная найдена — стандартная логика
-        wat_type = self.get_wat_type(var_info.type)
-        if self.current_function_name and self.current_function_name != "$main" and var_info.scope_name != "global":
+        var_info = self._lookup_var_info_in_flat_table(var_name, self.current_function_name)
+        wat_type = self.get_wat_type(var_info.type) if var_info else "f64"  # по умолчанию число
+        in_function = self.current_function_name and self.current_function_name != "$main"
+        if in_function and (var_info is None or var_info.scope_name != "global"):
+            # Локальная переменная
             if self.current_function_name not in self.function_all_locals:
                 self.function_all_locals[self.current_function_name] = {}
-            if var_name not in self.function_all_locals[self.current_function_name]:
-                self.function_all_locals[self.current_function_name][var_name] = wat_type
-            return f"local.get ${var_name}", wat_type
-        else:
-            if f'(global ${var_name} ' not in "".join(self.wat_globals):
-                default_value = "(f64.const 0.0)" if wat_type == "f64" else "(i32.const 0)"
-                self.wat_globals.append(f'  (global ${var_name} (mut {wat_type}) {default_value})')
-            return f"global.get ${var_name}", wat_type
+            self.function_all_locals[self.current_function_name][var_name] = wat_type or "f64"
+            return "local", wat_type or "f64"
 
-    def _resolve_variable_assignment(self, var_name: str) -> str:
-        """
-        Возвращает WAT‑операцию для присваивания переменной (local.set/global.set).
-        Если переменная не найдена в таблице символов — создаём её на лету.
-        """
-        var_info = self._lookup_var_info_in_flat_table(var_name, self.current_function_name)
+        # Глобальная переменная: тип хранения - тот, с которым она была объявлена первой
+        self._declare_global(var_name, wat_type)
+        return "global", self.declared_globals[var_name]
 
-        if not var_info:
-            wat_type = "f64"  # по умолчанию число
-            if self.current_function_name and self.current_function_name != "$main":
-                # Локальная переменная
-                if self.current_function_name not in self.function_all_locals:
-                    self.function_all_locals[self.current_function_name] = {}
-                if var_name not in self.function_all_locals[self.current_function_name]:
-                    self.function_all_locals[self.current_function_name][var_name] = wat_type
-                return f"local.set ${var_name}"
-            else:
-                # Глобальная переменная
-                if f'(global ${var_name} ' not in "".join(self.wat_globals):
-                    default_value = "(f64.const 0.0)"
-                    self.wat_globals.append(f'  (global ${var_name} (mut {wat_type}) {default_value})')
-                return f"global.set ${var_name}"
-
-        # Если переменная найдена — стандартная логика
-        wat_type = self.get_wat_type(var_info.type)
-        if self.current_function_name and self.current_function_name != "$main" and var_info.scope_name != "global":
-            if self.current_function_name not in self.function_all_locals:
-                self.function_all_locals[self.current_function_name] = {}
-            if var_name not in self.function_all_locals[self.current_function_name]:
-                self.function_all_locals[self.current_function_name][var_name] = wat_type
-            return f"local.set ${var_name}"
-        else:
-            if f'(global ${var_name} ' not in "".join(self.wat_globals):
-                default_value = "(f64.const 0.0)" if wat_type == "f64" else "(i32.const 0)"
-                self.wat_globals.append(f'  (global ${var_name} (mut {wat_type}) {default_value})')
-            return f"global.set ${var_name}"
+    def _resolve_variable_access(self, var_name: str) -> Tuple[str, str]:
+        """Возвращает WAT‑операцию для доступа к переменной (local.get/global.get) и ее тип."""
+        storage, wat_type = self._resolve_variable(var_name)
+        return f"{storage}.get ${var_name}", wat_type
+
+    def _declare_global(self, var_name: str, wat_type: str):
+        """Объявляет глобальную переменную, если она еще не объявлена."""
+        if var_name in self.declared_globals:
+            return
+        wat_type = wat_type or "f64"
+        self.declared_globals[var_name] = wat_type
+        default_value = "(f64.const 0.0)" if wat_type == "f64" else "(i32.const 0)"
+        self.wat_globals.append(f'  (global ${var_name} (mut {wat_type}) {default_value})')
+
+    def _resolve_variable_assignment(self, var_name: str) -> Tuple[str, str]:
+        """Возвращает WAT‑операцию для присваивания переменной (local.set/global.set) и тип хранения."""
+        storage, wat_type = self._resolve_variable(var_name)
+        return f"{storage}.set ${var_name}", wat_type
+
+    def _convert_wat_value(self, from_wat_type: str, to_wat_type: str):
+        """Приводит значение на вершине стека от одного типа WAT к другому (числа f64 <-> указатели i32)."""
+        if from_wat_type == "i32" and to_wat_type == "f64":
+            self.current_wat_buffer.append('    (f64.convert_i32_u)')
+        elif from_wat_type == "f64" and to_wat_type == "i32":
+            self.current_wat_buffer.append('    (i32.trunc_f64_u)')
 
     def _compile_string_literal(self, s: str):
-        escaped_s = ''.join([f'\\{ord(c):02x}' if ord(c) < 32 or ord(c) > 126 or c in ['"', '\\'] else c for c in s])
+        # Строка хранится с заголовком длины: [len:i32][байты UTF-8], указатель - на первый байт
+        encoded = s.encode('utf-8')
+        header = len(encoded).to_bytes(4, 'little')
+        escaped_s = ''.join([f'\\{b:02x}' if b < 32 or b > 126 or b in (0x22, 0x5c) else chr(b)
+                             for b in header + encoded])
         current_addr = self.next_data_address
-        byte_length = len(s.encode('utf-8')) + 1
-        self.wat_data_segments.append(f'  (data (i32.const {current_addr}) "{escaped_s}\\00")')
-        self.next_data_address += byte_length
-        self.current_wat_buffer.append(f'    (i32.const {current_addr})')
+        self.wat_data_segments.append(f'  (data (i32.const {current_addr}) "{escaped_s}")')
+        # Следующий заголовок выравнивается по 4 байтам
+        self.next_data_address += (len(header) + len(encoded) + 3) & ~3
+        self.current_wat_buffer.append(f'    (i32.const {current_addr + len(header)})')
+
+    def _is_temporary_string(self, node: ast.Node) -> bool:
+        """
+        Выражение дает новую строку в куче (результат конкатенации или повторения), на которую
+        больше ничто не ссылается: после использования ее блок можно вернуть аллокатору.
+        """
+        while isinstance(node, ast.ParenExpression):
+            node = node.inner
+        return isinstance(node, (ast.PlusExpr, ast.MultiplyExpr)) and \
+            self.semantic_analyzer.get_expression_type(node) == Type.STRING
+
+    def _emit_call_releasing(self, call: str, operands: List[Tuple[ast.Node, str]]):
+        """
+        Вызывает call над операндами на стеке (в порядке operands, у каждого - тип WAT на стеке)
+        и затем освобождает операнды-временные строки. Значения сохраняются в generic-temps.
+        """
+        released = [i for i, (node, _) in enumerate(operands) if self._is_temporary_string(node)]
+        if not released:
+            self.current_wat_buffer.append(f'    (call {call})')
+            return
+        counters = {"i32": 0, "f64": 0}
+        temps = []
+        for _, wat_type in operands:
+            temps.append(self._get_generic_temp(wat_type, counters[wat_type]))
+            counters[wat_type] += 1
+        for temp in reversed(temps[1:]):
+            self.current_wat_buffer.append(f'    (local.set {temp})')
+        self.current_wat_buffer.append(f'    (local.tee {temps[0]})')
+        for temp in temps[1:]:
+            self.current_wat_buffer.append(f'    (local.get {temp})')
+        self.current_wat_buffer.append(f'    (call {call})')
+        for i in released:
+            self.current_wat_buffer.append(f'    (local.get {temps[i]})')
+            if operands[i][1] == "f64":
+                self.current_wat_buffer.append('    (i32.trunc_f64_u)')
+            self.current_wat_buffer.append('    (call $string_free)')
 
     def _ensure_i32_ptr_on_stack(self, expr_type: Type):
         if self.get_wat_type(expr_type) == "f64":
@@ -470,41 +1214,117 @@ class WatCompiler(ListLangListener):
         if self.get_wat_type(expr_type) == "i32":
             self.current_wat_buffer.append('    (f64.convert_i32_u)')
 
-    def enterProgram(self, ctx: ListLangParser.ProgramContext):
-        # Build the static symbol table once, before any walking
-        self._build_flat_symbol_table()
+    def _ensure_operands_f64(self, left_type: Type, right_type: Type):
+        """Приводит оба операнда бинарной операции на стеке к f64: левый лежит под правым."""
+        self._ensure_f64_on_stack(right_type)
+        if self.get_wat_type(left_type) == "i32":
+            temp_right = self._get_generic_temp("f64", 1)
+            self.current_wat_buffer.append(f'    (local.set {temp_right})')
+            self.current_wat_buffer.append('    (f64.convert_i32_u)')
+            self.current_wat_buffer.append(f'    (local.get {temp_right})')
 
-        self.current_function_name = "$main"
-        self.current_wat_buffer.append('  (func $main')
+    def _begin_function_body(self, func_name: str):
+        """Начинает тело функции в собственном буфере (вложенные функции не попадают в объемлющую)."""
+        self.function_stack.append((self.current_function_name, self.current_wat_buffer))
+        self.current_function_name = func_name
+        self.current_wat_buffer = []
+        if func_name not in self.function_all_locals:
+            self.function_all_locals[func_name] = {}
 
+    def _end_function_body(self, header: str, param_names: List[str], output: List[str]):
+        """
+        Завершает функцию: в output пишутся заголовок, все locals (в том числе появившиеся
+        при компиляции тела), временные переменные и само тело.
+        """
+        body = self.current_wat_buffer
+        function_locals = self.function_all_locals[self.current_function_name]
+        if self.gc_enabled and self.GC_SPILL_MARK in body:
+            spill, unspill = self._gc_spill_code(list(function_locals.items()))
+            function_locals["gc_frame"] = "i32"
+            expanded = []
+            for line in body:
+                if line == self.GC_SPILL_MARK:
+                    expanded.extend(spill)
+                elif line == self.GC_UNSPILL_MARK:
+                    expanded.extend(unspill)
+                else:
+                    expanded.append(line)
+            body = expanded
+        output.append(header)
+        for var_name, wat_type in self.function_all_locals[self.current_function_name].items():
+            if var_name not in param_names:
+                output.append(f'    (local ${var_name} {wat_type})')
         for i in range(self.GENERIC_I32_TEMPS):
-            self.current_wat_buffer.append(f'    (local {self._get_generic_temp("i32", i)} i32)')
+            output.append(f'    (local {self._get_generic_temp("i32", i)} i32)')
         for i in range(self.GENERIC_F64_TEMPS):
-            self.current_wat_buffer.append(f'    (local {self._get_generic_temp("f64", i)} f64)')
+            output.append(f'    (local {self._get_generic_temp("f64", i)} f64)')
+        output.extend(body)
+        output.append('  )')
+        self.current_function_name, self.current_wat_buffer = self.function_stack.pop()
+
+    def enterProgram(self, node: ast.Program):
+        # Build the static symbol table once, before any walking
+        self._build_flat_symbol_table()
+
+        self._begin_function_body("$main")
+        self._note_statement_positions(node.items)
 
         # Pre-declare known global variables from the flat table
         for var_name, var_info in self.flat_vars.items():
             # Only declare true globals, not locals with qualified names
             if "::" not in var_name:
-                wat_type = self.get_wat_type(var_info.type)
-                default_value = "(f64.const 0.0)" if wat_type == "f64" else "(i32.const 0)"
-                self.wat_globals.append(f'  (global ${var_name} (mut {wat_type}) {default_value})')
+                self._declare_global(var_name, self.get_wat_type(var_info.type))
 
-    def exitProgram(self, ctx: ListLangParser.ProgramContext):
+    def exitProgram(self, node: ast.Program):
         self.current_wat_buffer.append('    (return)')
-        self.current_wat_buffer.append('  )')
-        self.wat_functions.append('(export "run" (func $main))')
+        self._end_function_body('  (func $main', [], self.wat_functions)
+        self.wat_functions.append('  (export "run" (func $main))')
+
+        # Слот 0 таблицы пуст: значение лямбды - ее номер, начиная с 1
+        table_size = self.lambda_function_id_counter + 1
+        self.wat_prelude.append(f'  (table (export "table") {table_size} funcref)')
+
+        struct_layouts_addr = None
+        if self.struct_shapes.site_keys:
+            self._add_struct_runtime()
+            struct_layouts_addr = self._compile_struct_layout_table()
+
+        # Куча начинается за сегментами данных строк и головами списков свободных блоков;
+        # начальная память вмещает хотя бы их
+        free_lists_base = (self.next_data_address + 7) & ~7
+        heap_base = free_lists_base + self.FREE_LIST_CLASSES * 4
+        memory_pages = max(self.memory_size_pages, (heap_base + 0xFFFF) >> 16)
+        memory_decls = [
+            f'  (memory (export "memory") {memory_pages})',
+            *self.wat_data_segments,
+            f'  (global $free_lists i32 (i32.const {free_lists_base}))',
+            f'  (global $heap_base i32 (i32.const {heap_base}))',
+            f'  (global $next_mem_addr (mut i32) (i32.const {heap_base}))',
+            '  (global $heap_live_bytes (mut i32) (i32.const 0))',
+            '  (global $gc_collections (mut i32) (i32.const 0))',
+        ]
+        if struct_layouts_addr is not None:
+            memory_decls.append(f'  (global $struct_layouts i32 (i32.const {struct_layouts_addr}))')
+            memory_decls.append(f'  (global $struct_layout_count i32 (i32.const {len(self.struct_shapes.layouts)}))')
+            memory_decls.append('  (global $struct_runtime_shapes (mut i32) (i32.const 0))')
+            memory_decls.append('  (global $struct_transitions (mut i32) (i32.const 0))')
+        if self.gc_enabled:
+            memory_decls.append('  (global $gc_threshold (mut i32) (i32.const 65536))')
+            memory_decls.append('  (global $gc_bitmap (mut i32) (i32.const 0))')
+            memory_decls.append('  (global $gc_grey_base (mut i32) (i32.const 0))')
+            memory_decls.append('  (global $gc_grey_top (mut i32) (i32.const 0))')
+            memory_decls.append('  (global $gc_inhibit (mut i32) (i32.const 0))')
+            memory_decls.append('  (global $gc_shadow (mut i32) (i32.const 0))')
+            memory_decls.append('  (global $gc_shadow_sp (mut i32) (i32.const 0))')
+            memory_decls.append('  (global $gc_shadow_capacity (mut i32) (i32.const 0))')
+            self.wat_functions.append(self._gc_mark_roots_function())
 
         final_output = []
-        final_output.extend(self.wat_prelude)
+        final_output.extend(self.wat_prelude[:self.memory_insert_index])
+        final_output.extend(memory_decls)
+        final_output.extend(self.wat_prelude[self.memory_insert_index:])
         final_output.extend(self.wat_globals)
 
-        memory_idx = -1
-        for i, line in enumerate(final_output):
-            if '(memory ' in line: memory_idx = i; break
-        if memory_idx != -1:
-            final_output[memory_idx + 1:memory_idx + 1] = self.wat_data_segments
-
         insert_point = 1
         for type_def in sorted(list(self.unique_lambda_types_wat)):
             final_output.insert(insert_point, f'  {type_def}')
@@ -516,67 +1336,81 @@ class WatCompiler(ListLangListener):
 
         self.final_wat_code = "\n".join(final_output)
 
-    def enterFunctionDecl(self, ctx: ListLangParser.FunctionDeclContext):
-        func_name = ctx.IDENTIFIER().getText()
-        self.current_function_name = func_name
-        self.current_wat_buffer = self.wat_functions
-
-        func_info = self.flat_funcs.get(func_name)
+    def enterFunctionDecl(self, node: ast.FunctionDecl):
+        func_info = self.semantic_analyzer.function_decl_infos.get(node.node_id)
         if not func_info:
-            raise Exception(f"Compiler Error: Function '{func_name}' info not found in flat symbol table.")
+            raise Exception(f"Compiler Error: Function '{node.name}' info not found in symbol table.")
+        func_name = self.function_wat_names[id(func_info)]
 
-        self.function_all_locals[func_name] = {}
+        self._begin_function_body(func_name)
+        self.function_result_types[func_name] = self.get_wat_type(func_info.return_type)
         for p in func_info.parameters:
-            self.function_all_locals[func_name][p.name] = self.get_wat_type(p.type)
+            self.function_all_locals[func_name][p.name] = self._storage_wat_type(p.type)
 
-        self._collect_function_locals_and_params(func_name, func_info.parameters, ctx.statementBlock())
+        self._collect_function_locals_and_params(func_name, func_info.parameters, node.body)
 
-        params_wat = [f"(param ${p.name} {self.get_wat_type(p.type)})" for p in func_info.parameters]
-        locals_wat = []
-        for var_name, wat_type in self.function_all_locals[func_name].items():
-            if not any(p.name == var_name for p in func_info.parameters):
-                locals_wat.append(f"(local ${var_name} {wat_type})")
-
-        for i in range(self.GENERIC_I32_TEMPS):
-            locals_wat.append(f"(local {self._get_generic_temp('i32', i)} i32)")
-        for i in range(self.GENERIC_F64_TEMPS):
-            locals_wat.append(f"(local {self._get_generic_temp('f64', i)} f64)")
+    def exitFunctionDecl(self, node: ast.FunctionDecl):
+        func_info = self.semantic_analyzer.function_decl_infos[node.node_id]
+        func_name = self.current_function_name
 
+        params_wat = [f"(param ${p.name} {self._storage_wat_type(p.type)})" for p in func_info.parameters]
         result_wat = ""
         if func_info.return_type != Type.VOID:
             result_wat = f"(result {self.get_wat_type(func_info.return_type)})"
 
         export_clause = f'(export "{func_name}")' if func_name == "main" else ""
-        self.current_wat_buffer.append(f'  (func ${func_name} {export_clause} {" ".join(params_wat)} {result_wat}')
-        for local_decl in locals_wat:
-            self.current_wat_buffer.append(f'    {local_decl}')
-
-    def exitFunctionDecl(self, ctx: ListLangParser.FunctionDeclContext):
-        self.current_wat_buffer.append('  )')
-        self.current_function_name = None
-        self.current_wat_buffer = self.wat_functions
-
-    def exitLiteral(self, ctx: ListLangParser.LiteralContext):
-        if ctx.NUMBER():
-            num_val = float(ctx.NUMBER().getText())
-            self.current_wat_buffer.append(f'    (f64.const {num_val})')
-        elif ctx.STRING():
-            string_val = ctx.STRING().getText()[1:-1]
-            self._compile_string_literal(string_val)
-        elif ctx.listLiteral():
-            self._compile_list_literal(ctx.listLiteral())
-        elif ctx.structLiteral():
-            self.current_wat_buffer.append(f'    (i32.const 0)')
-
-    def _compile_list_literal(self, ctx: ListLangParser.ListLiteralContext):
-        elements_ctx = ctx.expressionList().expression() if ctx.expressionList() else []
-        num_elements = len(elements_ctx)
-        elem_size = self._get_element_wat_size(Type.NUMBER)
+        header = f'  (func ${func_name} {export_clause} {" ".join(params_wat)} {result_wat}'
+        self._end_function_body(header, [p.name for p in func_info.parameters], self.wat_functions)
+
+    def exitNumberLiteral(self, node: ast.NumberLiteral):
+        if node.node_id in self.i32_value_ids:
+            self.current_wat_buffer.append(f'    (i32.const {int(node.value)})')
+            return
+        self.current_wat_buffer.append(f'    (f64.const {node.value})')
+
+    def exitStringLiteral(self, node: ast.StringLiteral):
+        self._compile_string_literal(node.value)
+
+    def exitListLiteral(self, node: ast.ListLiteral):
+        self._compile_list_literal(node)
+
+    def exitStructLiteral(self, node: ast.StructLiteral):
+        layout = self.struct_shapes.site_layouts[node.node_id]
+        temp_struct_ptr = self._get_generic_temp("i32", 0)
+        self.current_wat_buffer.append(f'    (i32.const {layout.layout_id})')
+        self.current_wat_buffer.append(f'    (i32.const {layout.size})')
+        self.current_wat_buffer.append('    (call $struct_alloc)')
+        self.current_wat_buffer.append(f'    (local.set {temp_struct_ptr})')
+
+        # Значения полей уже на стеке под указателем: сохраняются с вершины, с последнего.
+        # При повторе имени поля остается последнее значение
+        stored = set()
+        for field_node in reversed(node.fields):
+            value_wat_type = self._storage_wat_type(self.semantic_analyzer.get_expression_type(field_node.value))
+            if field_node.name in stored:
+                self.current_wat_buffer.append('    (drop)')
+                continue
+            stored.add(field_node.name)
+            slot_wat_type = layout.slot_types[field_node.name]
+            self._convert_wat_value(value_wat_type, slot_wat_type)
+            temp_value = self._get_generic_temp(slot_wat_type, 1 if slot_wat_type == "i32" else 0)
+            self.current_wat_buffer.append(f'    (local.set {temp_value})')
+            self.current_wat_buffer.append(f'    (local.get {temp_struct_ptr})')
+            self.current_wat_buffer.append(f'    (local.get {temp_value})')
+            self.current_wat_buffer.append(
+                f'    ({slot_wat_type}.store offset={layout.offsets[field_node.name]})')
+
+        self.current_wat_buffer.append(f'    (local.get {temp_struct_ptr})')
+
+    def _compile_list_literal(self, node: ast.ListLiteral):
+        elements = node.elements
+        num_elements = len(elements)
+        elem_size = self._get_element_wat_size(self._list_literal_element_type(node))
         initial_capacity = max(num_elements, 4)
-        total_size_with_capacity = 12 + initial_capacity * elem_size
+        total_size_with_capacity = self.LIST_HEADER_SIZE + initial_capacity * elem_size
 
         self.current_wat_buffer.append(f'    (i32.const {total_size_with_capacity})')
-        self.current_wat_buffer.append(f'    (call $alloc)')
+        self.current_wat_buffer.append(f'    (call $list_alloc)')
         temp_list_ptr = self._get_generic_temp("i32", 0)
         self.current_wat_buffer.append(f'    (local.set {temp_list_ptr})')
 
@@ -596,95 +1430,138 @@ class WatCompiler(ListLangListener):
         self.current_wat_buffer.append(f'    (i32.const {initial_capacity})')
         self.current_wat_buffer.append(f'    (i32.store)')
 
-        for i, elem_ctx in enumerate(elements_ctx):
-            elem_type = self.semantic_analyzer.get_expression_type(elem_ctx)
+        self.current_wat_buffer.append(f'    (local.get {temp_list_ptr})')
+        self.current_wat_buffer.append(f'    (i32.const 0)')
+        self.current_wat_buffer.append(f'    (i32.store offset=12)')
+
+        # Значения элементов уже на стеке под указателем: сохраняются с вершины, с последнего
+        elem_wat_type = "i32" if elem_size == 4 else "f64"
+        temp_elem = self._get_generic_temp(elem_wat_type, 1 if elem_wat_type == "i32" else 0)
+        for i in reversed(range(num_elements)):
+            value_wat_type = self.get_wat_type(self.semantic_analyzer.get_expression_type(elements[i]))
+            self._convert_wat_value(value_wat_type, elem_wat_type)
+            self.current_wat_buffer.append(f'    (local.set {temp_elem})')
             self.current_wat_buffer.append(f'    (local.get {temp_list_ptr})')
-            self.current_wat_buffer.append(f'    (i32.const {12 + i * elem_size})')
-            self.current_wat_buffer.append(f'    (i32.add)')
-            self._ensure_f64_on_stack(elem_type)
-            self.current_wat_buffer.append(f'    (f64.store)')
+            self.current_wat_buffer.append(f'    (local.get {temp_elem})')
+            self.current_wat_buffer.append(
+                f'    ({elem_wat_type}.store offset={self.LIST_HEADER_SIZE + i * elem_size})')
 
         self.current_wat_buffer.append(f'    (local.get {temp_list_ptr})')
 
-    def exitIdentifierExpression(self, ctx: ListLangParser.IdentifierExpressionContext):
-        var_name = ctx.IDENTIFIER().getText()
-        access_op, _ = self._resolve_variable_access(var_name)
+    def exitIdentifierExpression(self, node: ast.IdentifierExpression):
+        counter = self._loop_counter(node.name)
+        if counter:
+            self.current_wat_buffer.append(f'    (local.get ${counter})')
+            if node.node_id not in self.i32_value_ids:
+                self.current_wat_buffer.append('    (f64.convert_i32_s)')
+            return
+        access_op, storage_type = self._resolve_variable_access(node.name)
         self.current_wat_buffer.append(f'    ({access_op})')
+        expr_wat_type = self.get_wat_type(self.semantic_analyzer.get_expression_type(node))
+        self._convert_wat_value(storage_type, expr_wat_type)
 
-    def exitUnaryMinus(self, ctx: ListLangParser.UnaryMinusContext):
-        expr_type = self.semantic_analyzer.get_expression_type(ctx.expression())
+    def exitUnaryMinus(self, node: ast.UnaryMinus):
+        if node.node_id in self.i32_value_ids:
+            self.current_wat_buffer.append('    (i32.const -1)')
+            self.current_wat_buffer.append('    (i32.mul)')
+            return
+        expr_type = self.semantic_analyzer.get_expression_type(node.operand)
         self._ensure_f64_on_stack(expr_type)
         self.current_wat_buffer.append('    (f64.neg)')
 
-    def exitUnaryNot(self, ctx: ListLangParser.UnaryNotContext):
-        expr_type = self.semantic_analyzer.get_expression_type(ctx.expression())
-        self._ensure_f64_on_stack(expr_type)
-        self.current_wat_buffer.append('    (f64.const 0.0)')
-        self.current_wat_buffer.append('    (f64.eq)')
-        self.current_wat_buffer.append('    (f64.convert_i32_u)')
+    def enterUnaryNot(self, node: ast.UnaryNot):
+        self._mark_i32_condition(node.operand)
 
-    def _compile_binary_op(self, ctx, op_wat_f64=None, custom_call=None):
-        left_type = self.semantic_analyzer.get_expression_type(ctx.expression(0))
-        right_type = self.semantic_analyzer.get_expression_type(ctx.expression(1))
+    def exitUnaryNot(self, node: ast.UnaryNot):
+        self._emit_condition_test(node.operand)
+        self.current_wat_buffer.append('    (i32.eqz)')
+        self._widen_bool(node)
+
+    def _compile_binary_op(self, node: ast.BinaryExpr, op_wat_f64=None, custom_call=None):
+        if node.node_id in self.i32_value_ids:
+            # Оба операнда уже i32: f64.add -> i32.add и т.д.
+            self.current_wat_buffer.append(f'    (i32.{op_wat_f64.split(".", 1)[1]})')
+            return
+        left_type = self.semantic_analyzer.get_expression_type(node.left)
+        right_type = self.semantic_analyzer.get_expression_type(node.right)
         if custom_call:
-            self._ensure_f64_on_stack(left_type)
-            self._ensure_f64_on_stack(right_type)
-            self.current_wat_buffer.append(f'    (call {custom_call})')
+            self._ensure_operands_f64(left_type, right_type)
+            self._emit_call_releasing(custom_call, [(node.left, "f64"), (node.right, "f64")])
         elif op_wat_f64:
-            self._ensure_f64_on_stack(left_type)
-            self._ensure_f64_on_stack(right_type)
+            self._ensure_operands_f64(left_type, right_type)
             self.current_wat_buffer.append(f'    ({op_wat_f64})')
         else:
             raise Exception("Compiler Error: Unsupported binary op")
 
-    def exitMultiplyExpr(self, ctx: ListLangParser.MultiplyExprContext):
-        left_type = self.semantic_analyzer.get_expression_type(ctx.expression(0))
-        right_type = self.semantic_analyzer.get_expression_type(ctx.expression(1))
+    def exitMultiplyExpr(self, node: ast.MultiplyExpr):
+        left_type = self.semantic_analyzer.get_expression_type(node.left)
+        right_type = self.semantic_analyzer.get_expression_type(node.right)
         if left_type == Type.STRING and right_type in (Type.NUMBER, Type.BOOL):
-            self.current_wat_buffer.append('    (i32.trunc_f64_s)')
-            self.current_wat_buffer.append('    (call $string_repeat)')
+            self._ensure_f64_on_stack(right_type)
+            self._emit_call_releasing("$string_repeat", [(node.left, "i32"), (node.right, "f64")])
         else:
-            self._compile_binary_op(ctx, "f64.mul")
+            self._compile_binary_op(node, "f64.mul")
 
-    def exitDivideExpr(self, ctx: ListLangParser.DivideExprContext):
-        self._compile_binary_op(ctx, "f64.div")
+    def exitDivideExpr(self, node: ast.DivideExpr):
+        self._compile_binary_op(node, "f64.div")
 
-    def exitPlusExpr(self, ctx: ListLangParser.PlusExprContext):
-        left_type = self.semantic_analyzer.get_expression_type(ctx.expression(0))
-        right_type = self.semantic_analyzer.get_expression_type(ctx.expression(1))
+    def exitPlusExpr(self, node: ast.PlusExpr):
+        left_type = self.semantic_analyzer.get_expression_type(node.left)
+        right_type = self.semantic_analyzer.get_expression_type(node.right)
         if left_type == Type.STRING or right_type == Type.STRING:
-            self._compile_binary_op(ctx, custom_call="$string_concat")
+            self._compile_binary_op(node, custom_call="$string_concat")
         else:
-            self._compile_binary_op(ctx, "f64.add")
-
-    def exitMinusExpr(self, ctx: ListLangParser.MinusExprContext):
-        self._compile_binary_op(ctx, "f64.sub")
-
-    def exitAppendExpr(self, ctx: ListLangParser.AppendExprContext):
-        list_type = self.semantic_analyzer.get_expression_type(ctx.expression(0))
-        self._ensure_i32_ptr_on_stack(list_type)
+            self._compile_binary_op(node, "f64.add")
+
+    def exitMinusExpr(self, node: ast.MinusExpr):
+        self._compile_binary_op(node, "f64.sub")
+
+    def exitAppendExpr(self, node: ast.AppendExpr):
+        list_type = self.semantic_analyzer.get_expression_type(node.left)
+        # На стеке [список][значение]: значение приводится к f64, указатель под ним - к i32
+        self._ensure_f64_on_stack(self.semantic_analyzer.get_expression_type(node.right))
+        if self.get_wat_type(list_type) == "f64":
+            temp_value = self._get_generic_temp("f64", 1)
+            self.current_wat_buffer.append(f'    (local.set {temp_value})')
+            self.current_wat_buffer.append('    (i32.trunc_f64_u)')
+            self.current_wat_buffer.append(f'    (local.get {temp_value})')
         self.current_wat_buffer.append('    (call $list_append)')
+        # `x << v` изменяет список x на месте: $list_append мог перенести буфер,
+        # поэтому переменная сразу получает новый указатель
+        target = node.left
+        while isinstance(target, ast.ParenExpression):
+            target = target.inner
+        if isinstance(target, ast.IdentifierExpression):
+            self._emit_store_to_variable(target.name, "i32",
+                                         keep=node.node_id not in self.statement_expression_ids)
+
+    def _emit_store_to_variable(self, var_name: str, value_wat_type: str, keep: bool):
+        """Сохраняет значение с вершины стека в переменную; при keep=True значение остается на стеке."""
+        assign_op, storage_type = self._resolve_variable_assignment(var_name)
+        self._convert_wat_value(value_wat_type, storage_type)
+        if keep and assign_op.startswith("local"):
+            self.current_wat_buffer.append(f'    (local.tee ${var_name})')
+        else:
+            self.current_wat_buffer.append(f'    ({assign_op})')
+            if keep:
+                self.current_wat_buffer.append(f'    (global.get ${var_name})')
+        if keep:
+            self._convert_wat_value(storage_type, value_wat_type)
 
-    def exitComparisonExpr(self, ctx: ListLangParser.ComparisonExprContext):
-        op_token_type = ctx.getChild(1).getSymbol().type
-        left_type = self.semantic_analyzer.get_expression_type(ctx.expression(0))
-        right_type = self.semantic_analyzer.get_expression_type(ctx.expression(1))
+    def exitComparisonExpr(self, node: ast.ComparisonExpr):
+        op_token_type = node.op
+        left_type = self.semantic_analyzer.get_expression_type(node.left)
+        right_type = self.semantic_analyzer.get_expression_type(node.right)
 
         if left_type == Type.STRING and right_type == Type.STRING and op_token_type in (
         ListLangParser.EQ, ListLangParser.NE):
-            self.current_wat_buffer.append('    (i32.trunc_f64_s)')
-            self.current_wat_buffer.append('    (i32.trunc_f64_s)')
-            self.current_wat_buffer.append('    (call $string_compare)')
-            if op_token_type == ListLangParser.EQ:
-                self.current_wat_buffer.append('    (f64.convert_i32_u)')
-            else:
-                self.current_wat_buffer.append('    (i32.const 0)')
-                self.current_wat_buffer.append('    (i32.eq)')
-                self.current_wat_buffer.append('    (f64.convert_i32_u)')
+            self._emit_call_releasing("$string_compare", [(node.left, "i32"), (node.right, "i32")])
+            if op_token_type == ListLangParser.NE:
+                self.current_wat_buffer.append('    (i32.eqz)')
+            self._widen_bool(node)
             return
 
-        self._ensure_f64_on_stack(left_type)
-        self._ensure_f64_on_stack(right_type)
+        self._ensure_operands_f64(left_type, right_type)
         if op_token_type == ListLangParser.LT:
             op = "f64.lt"
         elif op_token_type == ListLangParser.LE:
@@ -698,294 +1575,779 @@ class WatCompiler(ListLangListener):
         else:
             op = "f64.ne"
         self.current_wat_buffer.append(f'    ({op})')
-        self.current_wat_buffer.append('    (f64.convert_i32_u)')
+        self._widen_bool(node)
 
-    def exitLogicalExpr(self, ctx: ListLangParser.LogicalExprContext):
-        op_token_type = ctx.getChild(1).getSymbol().type
-        left_type = self.semantic_analyzer.get_expression_type(ctx.expression(0))
-        right_type = self.semantic_analyzer.get_expression_type(ctx.expression(1))
-        self._ensure_f64_on_stack(left_type)
-        self.current_wat_buffer.append('    (f64.const 0.0)')
-        self.current_wat_buffer.append('    (f64.ne)')
-        self._ensure_f64_on_stack(right_type)
-        self.current_wat_buffer.append('    (f64.const 0.0)')
-        self.current_wat_buffer.append('    (f64.ne)')
-        if op_token_type == ListLangParser.AND:
-            self.current_wat_buffer.append('    (i32.and)')
+    def enterLogicalExpr(self, node: ast.LogicalExpr):
+        self._mark_i32_condition(node.left)
+        self._mark_i32_condition(node.right)
+
+    def _is_cheap_operand(self, node: ast.Node) -> bool:
+        """
+        Числовое выражение без вызовов и побочных эффектов: переменные, литералы, арифметика
+        и сравнения над ними. Такой правый операнд and/or дешевле вычислить всегда, чем ветвиться.
+        """
+        if self.semantic_analyzer.get_expression_type(node) not in (Type.NUMBER, Type.BOOL):
+            return False
+        if isinstance(node, (ast.IdentifierExpression, ast.NumberLiteral)):
+            return True
+        if isinstance(node, ast.ParenExpression):
+            return self._is_cheap_operand(node.inner)
+        if isinstance(node, ast.UnaryMinus):  # В том числе not
+            return self._is_cheap_operand(node.operand)
+        if isinstance(node, (ast.PlusExpr, ast.MinusExpr, ast.MultiplyExpr, ast.DivideExpr,
+                             ast.ComparisonExpr)):
+            return self._is_cheap_operand(node.left) and self._is_cheap_operand(node.right)
+        return False
+
+    def enterLogicalExprRight(self, node: ast.LogicalExpr):
+        # Левый операнд приводится к истинности i32, пока он на вершине стека
+        self._emit_condition_test(node.left)
+        if self._is_cheap_operand(node.right):
+            return  # Оба операнда вычисляются, результат - i32.and/i32.or без ветвления
+        # Сокращенное вычисление: правый операнд вычисляется в своем блоке, только если
+        # левого недостаточно (and - левый истинен, or - левый ложен)
+        self.current_wat_buffer.append('    (if (result i32)')
+        if node.op == ListLangParser.OR:
+            self.current_wat_buffer.append('      (then (i32.const 1))')
+            self.current_wat_buffer.append('      (else')
         else:
-            self.current_wat_buffer.append('    (i32.or)')
-        self.current_wat_buffer.append('    (f64.convert_i32_u)')
+            self.current_wat_buffer.append('      (then')
+
+    def exitLogicalExpr(self, node: ast.LogicalExpr):
+        self._emit_condition_test(node.right)
+        if self._is_cheap_operand(node.right):
+            self.current_wat_buffer.append('    (i32.and)' if node.op == ListLangParser.AND else '    (i32.or)')
+        elif node.op == ListLangParser.OR:
+            self.current_wat_buffer.append('      )')
+            self.current_wat_buffer.append('    )')
+        else:
+            self.current_wat_buffer.append('      )')
+            self.current_wat_buffer.append('      (else (i32.const 0))')
+            self.current_wat_buffer.append('    )')
+        self._widen_bool(node)
 
-    def exitListAccessExpr(self, ctx: ListLangParser.ListAccessExprContext):
-        list_expr_ctx = ctx.expression(0)
-        index_expr_ctx = ctx.expression(1)
-        element_type = self.semantic_analyzer.expression_types.get(ctx, Type.UNKNOWN)
-        list_base_type = self.semantic_analyzer.get_expression_type(list_expr_ctx)
+    def exitListAccessExpr(self, node: ast.ListAccessExpr):
+        element_type = self.semantic_analyzer.get_expression_type(node)
+        list_base_type = self.semantic_analyzer.get_expression_type(node.target)
+        result_wat_type = self.get_wat_type(element_type)
 
-        temp_idx = self._get_generic_temp("f64", 0)
+        temp_idx = self._get_generic_temp("i32", 1)
         temp_list_ptr = self._get_generic_temp("i32", 0)
 
-        self._ensure_f64_on_stack(self.semantic_analyzer.get_expression_type(index_expr_ctx))
+        self._ensure_i32_index_on_stack(node.index)
         self.current_wat_buffer.append(f'    (local.set {temp_idx})')
 
         if self.get_wat_type(list_base_type) == "f64":
             self.current_wat_buffer.append('    (i32.trunc_f64_s)')
         self.current_wat_buffer.append(f'    (local.set {temp_list_ptr})')
 
-        elem_size = self._get_element_wat_size(element_type)
-        self.current_wat_buffer.append(f'    (local.get {temp_list_ptr})')
-        self.current_wat_buffer.append('    (i32.const 12)')
-        self.current_wat_buffer.append('    (i32.add)')
-        self.current_wat_buffer.append(f'    (local.get {temp_idx})')
-        self.current_wat_buffer.append('    (i32.trunc_f64_s)')
-        self.current_wat_buffer.append(f'    (i32.const {elem_size})')
-        self.current_wat_buffer.append('    (i32.mul)')
-        self.current_wat_buffer.append('    (i32.add)')
-        self.current_wat_buffer.append('    (f64.load)')
+        elem_size = self._static_list_element_size(node)
+        if elem_size is not None:
+            self._emit_list_element_load(temp_list_ptr, temp_idx, elem_size, result_wat_type)
+            return
+        # Слой элементов неизвестен при компиляции: выбирается по elem_size в заголовке
+        self._emit_packed_list_check(temp_list_ptr)
+        self.current_wat_buffer.append(f'    (if (result {result_wat_type})')
+        self.current_wat_buffer.append('      (then')
+        self._emit_list_element_load(temp_list_ptr, temp_idx, 4, result_wat_type)
+        self.current_wat_buffer.append('      )')
+        self.current_wat_buffer.append('      (else')
+        self._emit_list_element_load(temp_list_ptr, temp_idx, 8, result_wat_type)
+        self.current_wat_buffer.append('      )')
+        self.current_wat_buffer.append('    )')
 
-    def exitStructFieldAccessExpr(self, ctx: ListLangParser.StructFieldAccessExprContext):
-        struct_type = self.semantic_analyzer.get_expression_type(ctx.IDENTIFIER(0))
-        self._ensure_f64_on_stack(struct_type)
-        self.current_wat_buffer.append('    (drop)')
-        self.current_wat_buffer.append('    (f64.const 0.0)')
+    def _ensure_i32_index_on_stack(self, index_node: ast.Node):
+        """Приводит индекс на вершине стека к i32."""
+        if index_node.node_id in self.i32_value_ids:
+            return  # Индекс вычислен в i32
+        if self.get_wat_type(self.semantic_analyzer.get_expression_type(index_node)) == "f64":
+            self.current_wat_buffer.append('    (i32.trunc_f64_s)')
 
-    def _handle_assignment_to_identifier(self, var_name: str, expr_ctx: ParserRuleContext):
-        assign_op = self._resolve_variable_assignment(var_name)
-        expr_type = self.semantic_analyzer.get_expression_type(expr_ctx)
+    def _emit_packed_list_check(self, list_ptr_local: str):
+        """Кладет на стек 1, если элементы списка - 4-байтовые указатели."""
+        self.current_wat_buffer.append(f'    (local.get {list_ptr_local})')
+        self.current_wat_buffer.append('    (i32.load offset=4)')
+        self.current_wat_buffer.append('    (i32.const 4)')
+        self.current_wat_buffer.append('    (i32.eq)')
+
+    def _emit_list_element_address(self, list_ptr_local: str, index_local: str, elem_size: int):
+        """Кладет на стек адрес слота (head + index) без смещения заголовка списка."""
+        self.current_wat_buffer.append(f'    (local.get {list_ptr_local})')
+        self.current_wat_buffer.append(f'    (local.get {list_ptr_local})')
+        self.current_wat_buffer.append('    (i32.load offset=12)')
+        self.current_wat_buffer.append(f'    (local.get {index_local})')
+        self.current_wat_buffer.append('    (i32.add)')
+        self.current_wat_buffer.append(f'    (i32.const {"2" if elem_size == 4 else "3"})')
+        self.current_wat_buffer.append('    (i32.shl)')
+        self.current_wat_buffer.append('    (i32.add)')
 
-        var_info = self._lookup_var_info_in_flat_table(var_name, self.current_function_name)
-        target_wat_type = self.get_wat_type(var_info.type) if var_info else self.get_wat_type(expr_type)
-        expr_wat_type = self.get_wat_type(expr_type)
+    def _emit_list_element_load(self, list_ptr_local: str, index_local: str, elem_size: int,
+                                result_wat_type: str):
+        elem_wat_type = "i32" if elem_size == 4 else "f64"
+        self._emit_list_element_address(list_ptr_local, index_local, elem_size)
+        self.current_wat_buffer.append(f'    ({elem_wat_type}.load offset={self.LIST_HEADER_SIZE})')
+        self._convert_wat_value(elem_wat_type, result_wat_type)
+
+    def _emit_list_element_store(self, list_ptr_local: str, index_local: str, elem_size: int,
+                                 value_local: str, value_wat_type: str):
+        elem_wat_type = "i32" if elem_size == 4 else "f64"
+        self._emit_list_element_address(list_ptr_local, index_local, elem_size)
+        self.current_wat_buffer.append(f'    (local.get {value_local})')
+        self._convert_wat_value(value_wat_type, elem_wat_type)
+        self.current_wat_buffer.append(f'    ({elem_wat_type}.store offset={self.LIST_HEADER_SIZE})')
+
+    def _emit_struct_pointer(self, struct_name: str):
+        """Кладет на стек указатель на структуру из переменной."""
+        access_op, storage_type = self._resolve_variable_access(struct_name)
+        self.current_wat_buffer.append(f'    ({access_op})')
+        self._convert_wat_value(storage_type, "i32")
+
+    def _struct_static_slot(self, node: ast.Node, field_name: str) -> Optional[Tuple[int, str]]:
+        """Смещение и тип WAT поля, если раскладка структуры в этом месте известна при компиляции."""
+        if node.node_id in self.struct_shapes.dynamic_sites:
+            return None
+        layout = self.struct_shapes.site_layouts.get(node.node_id)
+        if layout is None or field_name not in layout.offsets:
+            return None
+        return layout.offsets[field_name], layout.slot_types[field_name]
+
+    def exitStructFieldAccessExpr(self, node: ast.StructFieldAccessExpr):
+        expr_wat_type = self._storage_wat_type(self.semantic_analyzer.get_expression_type(node))
+        self._emit_struct_pointer(node.struct_name)
+        static_slot = self._struct_static_slot(node, node.field_name)
+        if static_slot is not None:
+            offset, slot_wat_type = static_slot
+            self.current_wat_buffer.append(f'    ({slot_wat_type}.load offset={offset})')
+            self._convert_wat_value(slot_wat_type, expr_wat_type)
+            return
+        temp_struct_ptr = self._get_generic_temp("i32", 0)
+        temp_slot = self._get_generic_temp("i32", 1)
+        self.current_wat_buffer.append(f'    (local.set {temp_struct_ptr})')
+        self._emit_struct_slot_lookup(node.field_name, "$struct_ic_miss")
+        self.current_wat_buffer.append('    (if (result f64)')
+        self.current_wat_buffer.append(
+            f'      (then (call $struct_slot_get (local.get {temp_struct_ptr}) (local.get {temp_slot})))')
+        self.current_wat_buffer.append(
+            f'      (else (f64.load (i32.add (local.get {temp_struct_ptr}) (local.get {temp_slot}))))')
+        self.current_wat_buffer.append('    )')
+        self._convert_wat_value("f64", expr_wat_type)
 
-        if target_wat_type == "f64" and expr_wat_type == "i32":
-            self.current_wat_buffer.append('    (f64.convert_i32_u)')
-        elif target_wat_type == "i32" and expr_wat_type == "f64":
-            self.current_wat_buffer.append('    (i32.trunc_f64_s)')
+    def _handle_assignment_to_identifier(self, var_name: str, expr_node: ast.Node):
+        assign_op, target_wat_type = self._resolve_variable_assignment(var_name)
+        expr_wat_type = self.get_wat_type(self.semantic_analyzer.get_expression_type(expr_node))
+        self._convert_wat_value(expr_wat_type, target_wat_type)
         self.current_wat_buffer.append(f'    ({assign_op})')
 
-    def exitIdentifierAssignExpression(self, ctx: ListLangParser.IdentifierAssignExpressionContext):
-        self._handle_assignment_to_identifier(ctx.IDENTIFIER().getText(), ctx.expression())
+    def exitIdentifierAssignExpression(self, node: ast.IdentifierAssignExpression):
+        self._handle_assignment_to_identifier(node.name, node.expression)
 
-    def exitExpressionRightAssignment(self, ctx: ListLangParser.ExpressionRightAssignmentContext):
-        self._handle_assignment_to_identifier(ctx.IDENTIFIER().getText(), ctx.expression())
+    def exitExpressionRightAssignment(self, node: ast.ExpressionRightAssignment):
+        self._handle_assignment_to_identifier(node.name, node.expression)
 
-    def exitIdentifierLeftAssignment(self, ctx: ListLangParser.IdentifierLeftAssignmentContext):
-        self._handle_assignment_to_identifier(ctx.IDENTIFIER().getText(), ctx.expression())
+    def exitIdentifierLeftAssignment(self, node: ast.IdentifierLeftAssignment):
+        self._handle_assignment_to_identifier(node.name, node.expression)
 
-    def exitListElementAssignment(self, ctx: ListLangParser.ListElementAssignmentContext):
-        list_expr_ctx = ctx.expression(0)
-        value_expr_ctx = ctx.expression(2)
+    def exitListElementAssignment(self, node: ast.ListElementAssignment):
+        value_type = self.semantic_analyzer.get_expression_type(node.value)
+        list_base_type = self.semantic_analyzer.get_expression_type(node.target)
+        value_wat_type = self._storage_wat_type(value_type)
 
-        temp_value = self._get_generic_temp("f64", 0)
-        temp_index = self._get_generic_temp("f64", 1)
+        temp_value = self._get_generic_temp(value_wat_type, 2 if value_wat_type == "i32" else 0)
+        temp_index = self._get_generic_temp("i32", 1)
         temp_list_ptr = self._get_generic_temp("i32", 0)
 
-        value_type = self.semantic_analyzer.get_expression_type(value_expr_ctx)
-        list_base_type = self.semantic_analyzer.get_expression_type(list_expr_ctx)
-
-        self._ensure_f64_on_stack(value_type)
         self.current_wat_buffer.append(f'    (local.set {temp_value})')
 
-        self._ensure_f64_on_stack(self.semantic_analyzer.get_expression_type(ctx.expression(1)))
+        self._ensure_i32_index_on_stack(node.index)
         self.current_wat_buffer.append(f'    (local.set {temp_index})')
 
         if self.get_wat_type(list_base_type) == "f64":
             self.current_wat_buffer.append('    (i32.trunc_f64_s)')
         self.current_wat_buffer.append(f'    (local.set {temp_list_ptr})')
 
-        elem_size = self._get_element_wat_size(Type.NUMBER)
-        self.current_wat_buffer.append(f'    (local.get {temp_list_ptr})')
-        self.current_wat_buffer.append('    (i32.const 12)')
-        self.current_wat_buffer.append('    (i32.add)')
-        self.current_wat_buffer.append(f'    (local.get {temp_index})')
-        self.current_wat_buffer.append('    (i32.trunc_f64_s)')
-        self.current_wat_buffer.append(f'    (i32.const {elem_size})')
-        self.current_wat_buffer.append('    (i32.mul)')
-        self.current_wat_buffer.append('    (i32.add)')
-        self.current_wat_buffer.append(f'    (local.get {temp_value})')
-        self.current_wat_buffer.append(f'    (f64.store)')
-
-    def exitListElementAssignExpression(self, ctx: ListLangParser.ListElementAssignExpressionContext):
-        self.exitListElementAssignment(ctx)
+        elem_size = self._static_list_element_size(node)
+        if elem_size is not None:
+            self._emit_list_element_store(temp_list_ptr, temp_index, elem_size, temp_value, value_wat_type)
+            return
+        self._emit_packed_list_check(temp_list_ptr)
+        self.current_wat_buffer.append('    (if')
+        self.current_wat_buffer.append('      (then')
+        self._emit_list_element_store(temp_list_ptr, temp_index, 4, temp_value, value_wat_type)
+        self.current_wat_buffer.append('      )')
+        self.current_wat_buffer.append('      (else')
+        self._emit_list_element_store(temp_list_ptr, temp_index, 8, temp_value, value_wat_type)
+        self.current_wat_buffer.append('      )')
+        self.current_wat_buffer.append('    )')
 
-    def exitStructFieldAssignment(self, ctx: ListLangParser.StructFieldAssignmentContext):
-        value_expr_ctx = ctx.expression()
-        temp_value = self._get_generic_temp("f64", 0)
-        temp_struct_ptr = self._get_generic_temp("i32", 0)
-        value_type = self.semantic_analyzer.get_expression_type(value_expr_ctx)
+    def exitListElementAssignExpression(self, node: ast.ListElementAssignExpression):
+        self.exitListElementAssignment(node)
 
-        self._ensure_f64_on_stack(value_type)
+    def exitStructFieldAssignment(self, node: ast.StructFieldAssignment):
+        value_wat_type = self._storage_wat_type(self.semantic_analyzer.get_expression_type(node.value))
+        static_slot = self._struct_static_slot(node, node.field_name)
+        slot_wat_type = static_slot[1] if static_slot is not None else "f64"
+        self._convert_wat_value(value_wat_type, slot_wat_type)
+        temp_value = self._get_generic_temp(slot_wat_type, 2 if slot_wat_type == "i32" else 0)
         self.current_wat_buffer.append(f'    (local.set {temp_value})')
 
-        var_info = self._lookup_var_info_in_flat_table(ctx.IDENTIFIER(0).getText(), self.current_function_name)
-        self._ensure_f64_on_stack(var_info.type if var_info else Type.UNKNOWN)
+        self._emit_struct_pointer(node.struct_name)
+        if static_slot is not None:
+            self.current_wat_buffer.append(f'    (local.get {temp_value})')
+            self.current_wat_buffer.append(f'    ({slot_wat_type}.store offset={static_slot[0]})')
+            return
+        temp_struct_ptr = self._get_generic_temp("i32", 0)
+        temp_slot = self._get_generic_temp("i32", 1)
         self.current_wat_buffer.append(f'    (local.set {temp_struct_ptr})')
+        self._emit_struct_slot_lookup(node.field_name, "$struct_ic_miss_set")
+        self.current_wat_buffer.append('    (if')
+        self.current_wat_buffer.append(f'      (then (call $struct_slot_set (local.get {temp_struct_ptr}) '
+                                       f'(local.get {temp_slot}) (local.get {temp_value})))')
+        self.current_wat_buffer.append(f'      (else (f64.store (i32.add (local.get {temp_struct_ptr}) '
+                                       f'(local.get {temp_slot})) (local.get {temp_value})))')
+        self.current_wat_buffer.append('    )')
 
-        self.current_wat_buffer.append(f'    (local.get {temp_struct_ptr})')
-        self.current_wat_buffer.append(f'    (i32.const 0)')
-        self.current_wat_buffer.append(f'    (i32.add)')
-        self.current_wat_buffer.append(f'    (local.get {temp_value})')
-        self.current_wat_buffer.append(f'    (f64.store)')
-
-    def exitStructFieldAssignExpression(self, ctx: ListLangParser.StructFieldAssignExpressionContext):
-        self.exitStructFieldAssignment(ctx)
+    def exitStructFieldAssignExpression(self, node: ast.StructFieldAssignExpression):
+        self.exitStructFieldAssignment(node)
 
-    def exitMultiAssignment(self, ctx: ListLangParser.MultiAssignmentContext):
-        identifiers = [id_token.getText() for id_token in ctx.identifierList().IDENTIFIER()]
-        expressions = ctx.expressionList().expression()
+    def exitMultiAssignment(self, node: ast.MultiAssignment):
+        identifiers = node.names
+        expressions = node.expressions
 
         temp_f64_idx = 0
         temp_i32_idx = 0
         temp_assignment_locals = []
 
-        for expr_ctx in expressions:
-            expr_type = self.semantic_analyzer.get_expression_type(expr_ctx)
+        for expr in expressions:
+            expr_type = self.semantic_analyzer.get_expression_type(expr)
             wat_type = self.get_wat_type(expr_type)
             if wat_type == "f64":
                 temp_name = self._get_generic_temp("f64", temp_f64_idx); temp_f64_idx += 1
             else:
                 temp_name = self._get_generic_temp("i32", temp_i32_idx); temp_i32_idx += 1
-            self.current_wat_buffer.append(f'    (local.set {temp_name})')
             temp_assignment_locals.append((temp_name, expr_type))
 
+        # Значения лежат на стеке в порядке выражений: снимаются с последнего
+        for temp_name, _ in reversed(temp_assignment_locals):
+            self.current_wat_buffer.append(f'    (local.set {temp_name})')
+
         for i, var_name in enumerate(identifiers):
             temp_name, expr_type_from_temp = temp_assignment_locals[i]
-            assign_op = self._resolve_variable_assignment(var_name)
+            assign_op, target_wat_type = self._resolve_variable_assignment(var_name)
             self.current_wat_buffer.append(f'    (local.get {temp_name})')
-
-            var_info = self._lookup_var_info_in_flat_table(var_name, self.current_function_name)
-            if not var_info:
-                raise Exception(f"Compiler Error: Variable '{var_name}' not found for multi-assignment.")
-            target_wat_type = self.get_wat_type(var_info.type)
-            expr_wat_type = self.get_wat_type(expr_type_from_temp)
-
-            if target_wat_type == "f64" and expr_wat_type == "i32":
-                self.current_wat_buffer.append('    (f64.convert_i32_u)')
-            elif target_wat_type == "i32" and expr_wat_type == "f64":
-                self.current_wat_buffer.append('    (i32.trunc_f64_s)')
+            self._convert_wat_value(self.get_wat_type(expr_type_from_temp), target_wat_type)
             self.current_wat_buffer.append(f'    ({assign_op})')
 
-    def exitIfStatement(self, ctx: ListLangParser.IfStatementContext):
-        cond_expr_type = self.semantic_analyzer.get_expression_type(ctx.expression())
-        self._ensure_f64_on_stack(cond_expr_type)
-        self.current_wat_buffer.append('    (f64.const 0.0)')
-        self.current_wat_buffer.append('    (f64.ne)')
+    def enterIfStatement(self, node: ast.IfStatement):
+        self._note_statement_positions(node.then_branch)
+        self._note_statement_positions(node.else_branch)
+        self._mark_i32_condition(node.condition)
+
+    def enterIfThenBranch(self, node: ast.IfStatement):
+        self._emit_condition_test(node.condition)
         self.current_wat_buffer.append('    (if')
         self.current_wat_buffer.append('      (then')
+
+    def enterIfElseBranch(self, node: ast.IfStatement):
         self.current_wat_buffer.append('      )')
-        if ctx.ELSE():
+        if node.else_branch is not None:
             self.current_wat_buffer.append('      (else')
+
+    def exitIfStatement(self, node: ast.IfStatement):
+        if node.else_branch is not None:
             self.current_wat_buffer.append('      )')
         self.current_wat_buffer.append('    )')
 
-    def enterWhileStatement(self, ctx: ListLangParser.WhileStatementContext):
+    def enterWhileStatement(self, node: ast.WhileStatement):
+        self._note_statement_positions(node.body)
         block_label = self._get_unique_label("while_block")
         loop_label = self._get_unique_label("while_loop")
         self.loop_stack.append({'block': block_label, 'loop': loop_label})
         self.current_wat_buffer.append(f'    (block {block_label}')
         self.current_wat_buffer.append(f'      (loop {loop_label}')
+        self._emit_gc_safepoint()
+        self._mark_i32_condition(node.condition)
 
-    def exitWhileStatement(self, ctx: ListLangParser.WhileStatementContext):
-        cond_expr_type = self.semantic_analyzer.get_expression_type(ctx.expression())
-        self._ensure_f64_on_stack(cond_expr_type)
-        self.current_wat_buffer.append('        (f64.const 0.0)')
-        self.current_wat_buffer.append('        (f64.eq)')
+    def enterWhileStatementBody(self, node: ast.WhileStatement):
+        # Условие проверяется в начале каждой итерации: сравнение и выход по br_if
+        self._emit_condition_test(node.condition)
+        self.current_wat_buffer.append('        (i32.eqz)')
         self.current_wat_buffer.append(f'        (br_if {self.loop_stack[-1]["block"]})')
+
+    def exitWhileStatement(self, node: ast.WhileStatement):
         self.current_wat_buffer.append(f'        (br {self.loop_stack[-1]["loop"]})')
         self.current_wat_buffer.append('      )')
         self.current_wat_buffer.append('    )')
         self.loop_stack.pop()
 
-    def enterDoUntilStatement(self, ctx: ListLangParser.DoUntilStatementContext):
+    def enterDoUntilStatement(self, node: ast.DoUntilStatement):
+        self._note_statement_positions(node.body)
         block_label = self._get_unique_label("dountil_block")
         loop_label = self._get_unique_label("dountil_loop")
         self.loop_stack.append({'block': block_label, 'loop': loop_label})
         self.current_wat_buffer.append(f'    (block {block_label}')
         self.current_wat_buffer.append(f'      (loop {loop_label}')
+        self._emit_gc_safepoint()
+        self._mark_i32_condition(node.condition)
 
-    def exitDoUntilStatement(self, ctx: ListLangParser.DoUntilStatementContext):
-        cond_expr_type = self.semantic_analyzer.get_expression_type(ctx.expression())
-        self._ensure_f64_on_stack(cond_expr_type)
-        self.current_wat_buffer.append('        (f64.const 0.0)')
-        self.current_wat_buffer.append('        (f64.ne)')
+    def exitDoUntilStatement(self, node: ast.DoUntilStatement):
+        self._emit_condition_test(node.condition)
         self.current_wat_buffer.append(f'        (br_if {self.loop_stack[-1]["block"]})')
         self.current_wat_buffer.append(f'        (br {self.loop_stack[-1]["loop"]})')
         self.current_wat_buffer.append('      )')
         self.current_wat_buffer.append('    )')
         self.loop_stack.pop()
 
-    def enterForStatement(self, ctx: ListLangParser.ForStatementContext):
-        loop_var_name = ctx.IDENTIFIER().getText()
+    def enterForStatement(self, node: ast.ForStatement):
+        self._note_statement_positions(node.body)
+        loop_var_name = node.var_name
         if self.current_function_name:
             if self.current_function_name not in self.function_all_locals:
                 self.function_all_locals[self.current_function_name] = {}
             self.function_all_locals[self.current_function_name][loop_var_name] = "f64"
 
-        temp_for_to = self._get_generic_temp("f64", 0)
         block_label = self._get_unique_label("for_block")
         loop_label = self._get_unique_label("for_loop")
-        self.loop_stack.append({'block': block_label, 'loop': loop_label})
-
-        self._ensure_f64_on_stack(self.semantic_analyzer.get_expression_type(ctx.expression(1)))
-        self.current_wat_buffer.append(f'    (local.set {temp_for_to})')
-        self._ensure_f64_on_stack(self.semantic_analyzer.get_expression_type(ctx.expression(0)))
-        self.current_wat_buffer.append(f'    (local.set ${loop_var_name})')
-        self.current_wat_buffer.append(f'    (block {block_label}')
-        self.current_wat_buffer.append(f'      (loop {loop_label}')
-        self.current_wat_buffer.append(f'        (local.get ${loop_var_name})')
-        self.current_wat_buffer.append(f'        (local.get {temp_for_to})')
-        self.current_wat_buffer.append(f'        (f64.gt)')
-        self.current_wat_buffer.append(f'        (br_if {block_label})')
-
-    def exitForStatement(self, ctx: ListLangParser.ForStatementContext):
-        loop_var_name = ctx.IDENTIFIER().getText()
-        self.current_wat_buffer.append(f'        (local.get ${loop_var_name})')
-        self.current_wat_buffer.append('        (f64.const 1.0)')
-        self.current_wat_buffer.append('        (f64.add)')
-        self.current_wat_buffer.append(f'        (local.set ${loop_var_name})')
+        continue_label = self._get_unique_label("for_continue")
+        loop_number = continue_label.rsplit('_', 1)[1]
+        # Верхняя граница хранится в собственной local: у вложенных циклов границы разные
+        end_local = f"for_end_{loop_number}"
+        counter_local = None
+        if self._has_integer_counter(node):
+            # Целый счетчик: переменная цикла и граница - i32, f64-значение переменной
+            # получается только там, где тело его использует
+            counter_local = f"for_counter_{loop_number}"
+            self.function_all_locals.setdefault(self.current_function_name, {})[counter_local] = "i32"
+            self._mark_i32_value(node.start)
+        self.function_all_locals.setdefault(self.current_function_name, {})[end_local] = \
+            "i32" if counter_local else "f64"
+        # Счетчик начинает заменять переменную только в теле: границы читают прежнее значение
+        self.loop_stack.append({'block': block_label, 'loop': loop_label, 'continue': continue_label,
+                                'end': end_local, 'var': loop_var_name, 'counter': None,
+                                'counter_local': counter_local})
+
+    def enterForStatementBody(self, node: ast.ForStatement):
+        # Границы уже вычислены: на стеке [начало][конец]
+        loop_var_name = node.var_name
+        labels = self.loop_stack[-1]
+        counter = labels["counter"] = labels["counter_local"]
+        self._ensure_f64_on_stack(self.semantic_analyzer.get_expression_type(node.end))
+        if counter:
+            # Цикл идет до floor(конец) включительно. Граница ограничена 2^31 - 2,
+            # чтобы увеличение счетчика после последней итерации не переполняло i32
+            self.current_wat_buffer.append('    (f64.floor)')
+            self.current_wat_buffer.append('    (f64.const 2147483646.0)')
+            self.current_wat_buffer.append('    (f64.min)')
+            self.current_wat_buffer.append('    (i32.trunc_sat_f64_s)')
+        self.current_wat_buffer.append(f'    (local.set ${labels["end"]})')
+        if counter:
+            # Начало уже вычислено в i32
+            self.current_wat_buffer.append(f'    (local.set ${counter})')
+        else:
+            self._ensure_f64_on_stack(self.semantic_analyzer.get_expression_type(node.start))
+            self.current_wat_buffer.append(f'    (local.set ${loop_var_name})')
+        self._emit_append_reserve_hints(node)
+        self.current_wat_buffer.append(f'    (block {labels["block"]}')
+        self.current_wat_buffer.append(f'      (loop {labels["loop"]}')
+        self._emit_gc_safepoint()
+        if counter:
+            self.current_wat_buffer.append(f'        (local.get ${counter})')
+            self.current_wat_buffer.append(f'        (local.get ${labels["end"]})')
+            self.current_wat_buffer.append(f'        (i32.gt_s)')
+        else:
+            self.current_wat_buffer.append(f'        (local.get ${loop_var_name})')
+            self.current_wat_buffer.append(f'        (local.get ${labels["end"]})')
+            self.current_wat_buffer.append(f'        (f64.gt)')
+        self.current_wat_buffer.append(f'        (br_if {labels["block"]})')
+        # continue переходит в конец тела, к увеличению переменной цикла
+        self.current_wat_buffer.append(f'        (block {labels["continue"]}')
+
+    def exitForStatement(self, node: ast.ForStatement):
+        loop_var_name = node.var_name
+        counter = self.loop_stack[-1]["counter"]
+        self.current_wat_buffer.append('        )')
+        if counter:
+            self.current_wat_buffer.append(f'        (local.get ${counter})')
+            self.current_wat_buffer.append('        (i32.const 1)')
+            self.current_wat_buffer.append('        (i32.add)')
+            self.current_wat_buffer.append(f'        (local.set ${counter})')
+        else:
+            self.current_wat_buffer.append(f'        (local.get ${loop_var_name})')
+            self.current_wat_buffer.append('        (f64.const 1.0)')
+            self.current_wat_buffer.append('        (f64.add)')
+            self.current_wat_buffer.append(f'        (local.set ${loop_var_name})')
         self.current_wat_buffer.append(f'        (br {self.loop_stack[-1]["loop"]})')
         self.current_wat_buffer.append('      )')
         self.current_wat_buffer.append('    )')
+        if counter:
+            # После цикла (и после break) переменная цикла хранит последнее значение счетчика
+            self.current_wat_buffer.append(f'    (local.get ${counter})')
+            self.current_wat_buffer.append('    (f64.convert_i32_s)')
+            self.current_wat_buffer.append(f'    (local.set ${loop_var_name})')
         self.loop_stack.pop()
 
-    def exitBreakStatement(self, ctx: ListLangParser.BreakStatementContext):
+    def _has_integer_counter(self, node: ast.ForStatement) -> bool:
+        """
+        Переменную цикла можно вести целым счетчиком i32: начало - целое выражение, вычислимое
+        в i32 (целые литералы, len, счетчики объемлющих циклов и арифметика над ними), а тело не присваивает переменной цикла, не объявляет цикл с той же переменной
+        и не содержит лямбд и функций (они могли бы захватить переменную).
+        """
+        if not self._emits_as_i32(node.start):
+            return False
+        pending = [node.body]
+        while pending:
+            current = pending.pop()
+            if isinstance(current, (ast.LambdaReturn, ast.FunctionDecl)):
+                return False
+            if isinstance(current, ast.ForStatement) and current.var_name == node.var_name:
+                return False
+            if isinstance(current, (ast.ExpressionRightAssignment, ast.IdentifierLeftAssignment,
+                                    ast.IdentifierAssignExpression)) and current.name == node.var_name:
+                return False
+            if isinstance(current, ast.MultiAssignment) and node.var_name in current.names:
+                return False
+            pending.extend(current.children())
+        return True
+
+    def _emits_as_i32(self, node: ast.Node) -> bool:
+        """
+        Выражение можно вычислить в i32 без потери точности для допустимых значений: целые
+        по выводу типов (Type.INT) литералы, len, +, -, * и счетчики объемлющих циклов.
+        Переполнение i32 возможно только для значений, которые не годятся ни в индекс списка,
+        ни в начало цикла со счетчиком i32.
+        """
+        if isinstance(node, ast.IdentifierExpression):
+            return self._loop_counter(node.name) is not None
+        if isinstance(node, ast.ParenExpression):
+            return self._emits_as_i32(node.inner)
+        if isinstance(node, ast.NumberLiteral):
+            return node.is_integer and node.value < 2 ** 31
+        if self.semantic_analyzer.get_numeric_subtype(node) == Type.INT and isinstance(node, ast.LenCall):
+            return True
+        if type(node) is ast.UnaryMinus:
+            return self._emits_as_i32(node.operand)
+        if isinstance(node, (ast.PlusExpr, ast.MinusExpr, ast.MultiplyExpr)):
+            return self.semantic_analyzer.get_expression_type(node) == Type.NUMBER and \
+                self._emits_as_i32(node.left) and self._emits_as_i32(node.right)
+        return False
+
+    def _mark_i32_value(self, node: ast.Node):
+        """Отмечает выражение и его подвыражения для вычисления в i32 (после проверки _emits_as_i32)."""
+        self.i32_value_ids.add(node.node_id)
+        if isinstance(node, ast.ParenExpression):
+            self._mark_i32_value(node.inner)
+        elif type(node) is ast.UnaryMinus:
+            self._mark_i32_value(node.operand)
+        elif isinstance(node, (ast.PlusExpr, ast.MinusExpr, ast.MultiplyExpr)):
+            self._mark_i32_value(node.left)
+            self._mark_i32_value(node.right)
+
+    @staticmethod
+    def _is_i32_condition(node: ast.Node) -> bool:
+        """Сравнения, and/or и not вычисляют логическое значение в i32 (0/1)."""
+        while isinstance(node, ast.ParenExpression):
+            node = node.inner
+        return isinstance(node, (ast.ComparisonExpr, ast.LogicalExpr, ast.UnaryNot))
+
+    def _mark_i32_condition(self, node: ast.Node):
+        """
+        Условие, которое сразу проверяется (if, while, do-until, операнды and/or/not), остается
+        на стеке в i32: до f64 логическое значение расширяется только при сохранении и выводе.
+        """
+        if not self._is_i32_condition(node):
+            return
+        while isinstance(node, ast.ParenExpression):
+            self.i32_value_ids.add(node.node_id)
+            node = node.inner
+        self.i32_value_ids.add(node.node_id)
+
+    def _emit_condition_test(self, node: ast.Node):
+        """Приводит вычисленное условие на вершине стека к истинности i32."""
+        if node.node_id in self.i32_value_ids:
+            return
+        self._ensure_f64_on_stack(self.semantic_analyzer.get_expression_type(node))
+        self.current_wat_buffer.append('    (f64.const 0.0)')
+        self.current_wat_buffer.append('    (f64.ne)')
+
+    def _widen_bool(self, node: ast.Node):
+        """Логическое значение i32 расширяется до f64 (0.0/1.0), если его ждут не как условие."""
+        if node.node_id not in self.i32_value_ids:
+            self.current_wat_buffer.append('    (f64.convert_i32_u)')
+
+    def _mark_i32_index(self, index_node: ast.Node):
+        if self._emits_as_i32(index_node):
+            self._mark_i32_value(index_node)
+
+    def enterListAccessExpr(self, node: ast.ListAccessExpr):
+        self._mark_i32_index(node.index)
+
+    def enterListElementAssignment(self, node: ast.ListElementAssignment):
+        self._mark_i32_index(node.index)
+
+    def enterListElementAssignExpression(self, node: ast.ListElementAssignExpression):
+        self._mark_i32_index(node.index)
+
+    def _loop_counter(self, var_name: str) -> Optional[str]:
+        """Local целого счетчика, если var_name - переменная объемлющего цикла for со счетчиком i32."""
+        for labels in reversed(self.loop_stack):
+            if labels.get('var') == var_name:
+                return labels['counter']
+        return None
+
+    def _collect_appended_lists(self, body: ast.Node) -> Dict[str, int]:
+        """
+        Имена переменных-списков, к которым тело цикла безусловно добавляет элементы (`x << v`
+        или `x = x << v` на верхнем уровне тела), и число таких добавлений за итерацию.
+        """
+        statements = body.statements if isinstance(body, ast.StatementBlock) else [body]
+        counts: Dict[str, int] = {}
+        for statement in statements:
+            expr = statement
+            if isinstance(expr, (ast.IdentifierLeftAssignment, ast.ExpressionRightAssignment)):
+                expr = expr.expression
+            while isinstance(expr, ast.ParenExpression):
+                expr = expr.inner
+            while isinstance(expr, ast.AppendExpr):
+                target = expr.left
+                while isinstance(target, ast.ParenExpression):
+                    target = target.inner
+                if isinstance(target, ast.IdentifierExpression) and \
+                        self.semantic_analyzer.get_expression_type(target) == Type.LIST:
+                    counts[target.name] = counts.get(target.name, 0) + 1
+                    break
+                expr = target  # (x << a) << b: добавления к одному списку
+        return counts
+
+    def _emit_append_reserve_hints(self, node: ast.ForStatement):
+        """
+        Подсказка предвыделения: если тело цикла for на каждой итерации добавляет элементы
+        в список, до входа в цикл емкость списка увеличивается на число итераций
+        (границы уже лежат в переменной цикла и local конца), и добавления в цикле
+        не перераспределяют буфер.
+        """
+        appended = self._collect_appended_lists(node.body)
+        if not appended:
+            return
+        end_local = self.loop_stack[-1]["end"]
+        counter = self.loop_stack[-1]["counter"]
+        for var_name, per_iteration in appended.items():
+            access_op, storage_type = self._resolve_variable_access(var_name)
+            self.current_wat_buffer.append(f'    ({access_op})')
+            self._convert_wat_value(storage_type, "i32")
+            # Число итераций: floor(конец - начало) + 1, не меньше 0
+            self.current_wat_buffer.append(f'    (local.get ${end_local})')
+            if counter:
+                self.current_wat_buffer.append('    (f64.convert_i32_s)')
+                self.current_wat_buffer.append(f'    (local.get ${counter})')
+                self.current_wat_buffer.append('    (f64.convert_i32_s)')
+                self.current_wat_buffer.append('    (f64.sub)')
+            else:
+                self.current_wat_buffer.append(f'    (local.get ${node.var_name})')
+                self.current_wat_buffer.append('    (f64.sub)')
+                self.current_wat_buffer.append('    (f64.floor)')
+            self.current_wat_buffer.append('    (f64.const 1.0)')
+            self.current_wat_buffer.append('    (f64.add)')
+            if per_iteration > 1:
+                self.current_wat_buffer.append(f'    (f64.const {float(per_iteration)})')
+                self.current_wat_buffer.append('    (f64.mul)')
+            self.current_wat_buffer.append('    (call $list_reserve)')
+            self._emit_store_to_variable(var_name, "i32", keep=False)
+
+    def _switch_case_constant(self, value_node: ast.Node) -> Optional[float]:
+        """Значение case, если это числовой литерал (возможно, со знаком минус и в скобках)."""
+        sign = 1.0
+        while True:
+            if isinstance(value_node, ast.ParenExpression):
+                value_node = value_node.inner
+            elif type(value_node) is ast.UnaryMinus:  # UnaryNot - подкласс UnaryMinus
+                sign = -sign
+                value_node = value_node.operand
+            else:
+                break
+        if isinstance(value_node, ast.NumberLiteral):
+            return sign * float(value_node.value)
+        return None
+
+    def enterSwitchStatement(self, node: ast.SwitchStatement):
+        for case in node.cases:
+            self._note_statement_positions(case.body)
+        self._note_statement_positions(node.default_branch)
+
+    def enterSwitchCases(self, node: ast.SwitchStatement):
+        # Значение switch уже на стеке: сохраняется в собственную local (switch могут быть вложенными)
+        subject_wat_type = self._storage_wat_type(self.semantic_analyzer.get_expression_type(node.subject))
+        end_label = self._get_unique_label("switch_end")
+        subject_local = f"switch_subject_{end_label.rsplit('_', 1)[1]}"
+        self.function_all_locals.setdefault(self.current_function_name, {})[subject_local] = subject_wat_type
+        self.current_wat_buffer.append(f'    (local.set ${subject_local})')
+
+        constants = [self._switch_case_constant(case.value) for case in node.cases]
+        state = {'end': end_label, 'subject': subject_local, 'subject_wat_type': subject_wat_type,
+                 'constant': subject_wat_type == "f64" and None not in constants}
+        self.switch_stack.append(state)
+        self.current_wat_buffer.append(f'    (block {end_label}')
+        if not state['constant']:
+            return
+
+        # Все case - числовые константы: ветвь выбирается сразу, без последовательных сравнений.
+        # Блоки ветвей вложены так, что конец блока $switch_case_i - начало тела case i
+        state['default'] = self._get_unique_label("switch_default")
+        state['cases'] = [self._get_unique_label("switch_case") for _ in node.cases]
+        self.current_wat_buffer.append(f'    (block {state["default"]}')
+        for case_label in reversed(state['cases']):
+            self.current_wat_buffer.append(f'    (block {case_label}')
+        # При повторе значения срабатывает первый case с ним
+        targets: Dict[float, str] = {}
+        for value, case_label in zip(constants, state['cases']):
+            targets.setdefault(value, case_label)
+        self._emit_switch_dispatch(subject_local, sorted(targets.items()), state['default'])
+        state['next_case'] = 0
+
+    def _emit_switch_dispatch(self, subject_local: str, targets: List[Tuple[float, str]], default_label: str):
+        """
+        Переход к ветви по значению switch. Плотные целые значения - таблица переходов br_table
+        (O(1)), остальные - сбалансированное дерево сравнений (O(log n)).
+        """
+        values = [value for value, _ in targets]
+        integral = all(value == int(value) for value in values)
+        span = int(values[-1] - values[0]) + 1 if integral else 0
+        if integral and len(values) >= self.SWITCH_TABLE_MIN_CASES and span <= 2 * len(values):
+            low, high = int(values[0]), int(values[-1])
+            # Нецелое значение (и NaN) или значение вне диапазона - ветвь default
+            self.current_wat_buffer.append(f'    (local.get ${subject_local})')
+            self.current_wat_buffer.append('    (f64.floor)')
+            self.current_wat_buffer.append(f'    (local.get ${subject_local})')
+            self.current_wat_buffer.append('    (f64.ne)')
+            self.current_wat_buffer.append(f'    (br_if {default_label})')
+            self.current_wat_buffer.append(f'    (local.get ${subject_local})')
+            self.current_wat_buffer.append(f'    (f64.const {low})')
+            self.current_wat_buffer.append('    (f64.lt)')
+            self.current_wat_buffer.append(f'    (br_if {default_label})')
+            self.current_wat_buffer.append(f'    (local.get ${subject_local})')
+            self.current_wat_buffer.append(f'    (f64.const {high})')
+            self.current_wat_buffer.append('    (f64.gt)')
+            self.current_wat_buffer.append(f'    (br_if {default_label})')
+            self.current_wat_buffer.append(f'    (local.get ${subject_local})')
+            if low != 0:
+                self.current_wat_buffer.append(f'    (f64.const {low})')
+                self.current_wat_buffer.append('    (f64.sub)')
+            self.current_wat_buffer.append('    (i32.trunc_f64_u)')
+            by_value = dict(targets)
+            table = [by_value.get(float(v), default_label) for v in range(low, high + 1)]
+            self.current_wat_buffer.append(f'    (br_table {" ".join(table)} {default_label})')
+            return
+        self._emit_switch_compare_tree(subject_local, targets, default_label)
+
+    def _emit_switch_compare_tree(self, subject_local: str, targets: List[Tuple[float, str]], default_label: str):
+        if len(targets) <= self.SWITCH_LINEAR_CASES:
+            for value, case_label in targets:
+                self.current_wat_buffer.append(f'    (local.get ${subject_local})')
+                self.current_wat_buffer.append(f'    (f64.const {value})')
+                self.current_wat_buffer.append('    (f64.eq)')
+                self.current_wat_buffer.append(f'    (br_if {case_label})')
+            self.current_wat_buffer.append(f'    (br {default_label})')
+            return
+        middle = len(targets) // 2
+        self.current_wat_buffer.append(f'    (local.get ${subject_local})')
+        self.current_wat_buffer.append(f'    (f64.const {targets[middle][0]})')
+        self.current_wat_buffer.append('    (f64.lt)')
+        self.current_wat_buffer.append('    (if')
+        self.current_wat_buffer.append('      (then')
+        self._emit_switch_compare_tree(subject_local, targets[:middle], default_label)
+        self.current_wat_buffer.append('      )')
+        self.current_wat_buffer.append('      (else')
+        self._emit_switch_compare_tree(subject_local, targets[middle:], default_label)
+        self.current_wat_buffer.append('      )')
+        self.current_wat_buffer.append('    )')
+        self.current_wat_buffer.append('    (unreachable)')
+
+    def enterCaseClause(self, node: ast.CaseClause):
+        state = self.switch_stack[-1]
+        # Код значения-константы не нужен: переход к ветви уже выбран
+        state['value_start'] = len(self.current_wat_buffer)
+        if not state['constant']:
+            state['next'] = self._get_unique_label("switch_next")
+            self.current_wat_buffer.append(f'    (block {state["next"]}')
+
+    def enterCaseClauseBody(self, node: ast.CaseClause):
+        state = self.switch_stack[-1]
+        if state['constant']:
+            del self.current_wat_buffer[state['value_start']:]
+            self.current_wat_buffer.append('    )')
+            return
+        # Значение case на стеке: сравнивается со значением switch, при несовпадении - следующий case
+        value_type = self.semantic_analyzer.get_expression_type(node.value)
+        if state['subject_wat_type'] == "i32" and self.get_wat_type(value_type) == "i32":
+            self.current_wat_buffer.append(f'    (local.get ${state["subject"]})')
+            self.current_wat_buffer.append('    (call $string_compare)')
+            self.current_wat_buffer.append('    (i32.eqz)')
+        else:
+            self._ensure_f64_on_stack(value_type)
+            self.current_wat_buffer.append(f'    (local.get ${state["subject"]})')
+            self._convert_wat_value(state['subject_wat_type'], "f64")
+            self.current_wat_buffer.append('    (f64.ne)')
+        self.current_wat_buffer.append(f'    (br_if {state["next"]})')
+
+    def exitCaseClause(self, node: ast.CaseClause):
+        state = self.switch_stack[-1]
+        self.current_wat_buffer.append(f'    (br {state["end"]})')
+        if not state['constant']:
+            self.current_wat_buffer.append('    )')
+
+    def enterSwitchDefault(self, node: ast.SwitchStatement):
+        if self.switch_stack[-1]['constant']:
+            self.current_wat_buffer.append('    )')
+
+    def exitSwitchStatement(self, node: ast.SwitchStatement):
+        self.current_wat_buffer.append('    )')
+        self.switch_stack.pop()
+
+    def exitBreakStatement(self, node: ast.BreakStatement):
         if self.loop_stack:
             self.current_wat_buffer.append(f'    (br {self.loop_stack[-1]["block"]})')
         else:
             raise Exception("Compiler Error: 'break' outside of loop.")
 
-    def exitContinueStatement(self, ctx: ListLangParser.ContinueStatementContext):
+    def exitContinueStatement(self, node: ast.ContinueStatement):
         if self.loop_stack:
-            self.current_wat_buffer.append(f'    (br {self.loop_stack[-1]["loop"]})')
+            labels = self.loop_stack[-1]
+            self.current_wat_buffer.append(f'    (br {labels.get("continue", labels["loop"])})')
         else:
             raise Exception("Compiler Error: 'continue' outside of loop.")
 
-    def exitReturnStatement(self, ctx: ListLangParser.ReturnStatementContext):
-        ret_type = Type.VOID
-        if ctx.expression():
-            ret_type = self.semantic_analyzer.get_expression_type(ctx.expression())
-            self._ensure_f64_on_stack(ret_type)
-        elif ctx.lambdaExpr():
-            ret_type = Type.LAMBDA
-            self.current_wat_buffer.append('    (f64.convert_i32_u)')
+    def exitReturnStatement(self, node: ast.ReturnStatement):
+        if node.value is not None:
+            ret_wat_type = self._storage_wat_type(self.semantic_analyzer.get_expression_type(node.value))
+            # Значение приводится к типу результата функции (указатели возвращаются как i32)
+            self._convert_wat_value(ret_wat_type, self.function_result_types.get(self.current_function_name) or "f64")
         self.current_wat_buffer.append('    (return)')
 
-    def exitWriteStatement(self, ctx: ListLangParser.WriteStatementContext):
-        if ctx.argumentList():
+    def exitWriteStatement(self, node: ast.WriteStatement):
+        if node.arguments:
             tmp_ptr = self._get_generic_temp("i32", 0)
             tmp_len = self._get_generic_temp("i32", 1)
-            for arg_ctx in ctx.argumentList().argument():
-                expr_type = self.semantic_analyzer.get_expression_type(arg_ctx.expression())
+            # Значения аргументов лежат на стеке в порядке вызова: сначала снимаются во временные
+            # locals (с последнего), затем выводятся по порядку
+            func_locals = self.function_all_locals.setdefault(self.current_function_name, {})
+            arg_locals = []
+            for i, arg in enumerate(node.arguments):
+                wat_type = self._storage_wat_type(self.semantic_analyzer.get_expression_type(arg))
+                arg_local = f"write_arg_{i}_{wat_type}"
+                func_locals.setdefault(arg_local, wat_type)
+                arg_locals.append(arg_local)
+            for arg_local in reversed(arg_locals):
+                self.current_wat_buffer.append(f'    (local.set ${arg_local})')
+
+            for arg, arg_local in zip(node.arguments, arg_locals):
+                self.current_wat_buffer.append(f'    (local.get ${arg_local})')
+                expr_type = self.semantic_analyzer.get_expression_type(arg)
                 if expr_type in (Type.NUMBER, Type.BOOL):
                     self._ensure_f64_on_stack(expr_type)
                     self.current_wat_buffer.append('    (call $write_num)')
                 elif expr_type == Type.STRING:
-                    self._ensure_f64_on_stack(expr_type)
-                    self.current_wat_buffer.append('    (i32.trunc_f64_s)')
                     self.current_wat_buffer.append(f'    (local.set {tmp_ptr})')
                     self.current_wat_buffer.append(
                         f'    (local.set {tmp_len} (call $string_len (local.get {tmp_ptr})))')
-                    counter = self._get_generic_temp("i32", 0)
+                    counter = self._get_generic_temp("i32", 2)
                     self.current_wat_buffer.append(f'    (local.set {counter} (i32.const 0))')
                     self.current_wat_buffer.append(f'    (loop $print_char_loop')
                     self.current_wat_buffer.append(f'      (local.get {counter}) (local.get {tmp_len}) (i32.lt_s)')
@@ -997,44 +2359,43 @@ class WatCompiler(ListLangListener):
                     self.current_wat_buffer.append('        (br $print_char_loop)')
                     self.current_wat_buffer.append('      ))')
                     self.current_wat_buffer.append('    )')
+                    if self._is_temporary_string(arg):
+                        self.current_wat_buffer.append(f'    (call $string_free (local.get {tmp_ptr}))')
                 else:
                     self.current_wat_buffer.append('    (drop)')
 
-    def exitReadCall(self, ctx: ListLangParser.ReadCallContext):
+    def exitReadCall(self, node: ast.ReadCall):
         self.current_wat_buffer.append('    (call $read_num)')
 
-    def exitLenCall(self, ctx: ListLangParser.LenCallContext):
-        arg_type = self.semantic_analyzer.get_expression_type(ctx.expression())
+    def exitLenCall(self, node: ast.LenCall):
+        arg_type = self.semantic_analyzer.get_expression_type(node.argument)
+        as_i32 = node.node_id in self.i32_value_ids
         if arg_type == Type.STRING:
-            self._ensure_f64_on_stack(arg_type)
-            self.current_wat_buffer.append('    (i32.trunc_f64_s)')
-            self.current_wat_buffer.append('    (call $string_len)')
-            self.current_wat_buffer.append('    (f64.convert_i32_u)')
+            self._emit_call_releasing("$string_len", [(node.argument, "i32")])
+            if not as_i32:
+                self.current_wat_buffer.append('    (f64.convert_i32_u)')
         else:
             self._ensure_f64_on_stack(arg_type)
             self.current_wat_buffer.append('    (i32.trunc_f64_s)')
-            self.current_wat_buffer.append('    (call $len_list)')
+            # Длина списка - первое поле заголовка
+            self.current_wat_buffer.append('    (i32.load)' if as_i32 else '    (call $len_list)')
 
-    def exitDequeueCall(self, ctx: ListLangParser.DequeueCallContext):
-        arg_type = self.semantic_analyzer.get_expression_type(ctx.expression())
+    def exitDequeueCall(self, node: ast.DequeueCall):
+        arg_type = self.semantic_analyzer.get_expression_type(node.argument)
         self._ensure_f64_on_stack(arg_type)
         self.current_wat_buffer.append('    (i32.trunc_f64_s)')
         self.current_wat_buffer.append('    (call $dequeue_op)')
 
-    def exitFunctionCall(self, ctx: ListLangParser.FunctionCallContext):
+    def exitFunctionCall(self, node: ast.FunctionCall):
         """
         Обработка вызова функции или переменной‑лямбды (включая параметры и блочные переменные в $main).
         """
-        func_name = ctx.IDENTIFIER().getText()
-
-        # Корректно извлекаем аргументы
-        arg_list_parent_ctx: Optional[ListLangParser.ArgumentListContext] = ctx.argumentList()
-        arg_ctx_list: List[
-            ListLangParser.ArgumentContext] = arg_list_parent_ctx.argument() if arg_list_parent_ctx else []
+        func_name = node.name
+        arguments = node.arguments
 
         # --- Встроенные ---
         if func_name == "read":
-            if arg_ctx_list:
+            if arguments:
                 raise Exception("Compiler Error: 'read' function does not take arguments.")
             self.current_wat_buffer.append('    (call $read_num)')
             return
@@ -1045,29 +2406,24 @@ class WatCompiler(ListLangListener):
             return
 
         # --- Пользовательская глобальная функция ---
-        func_info = self.flat_funcs.get(func_name)
+        # Версию перегрузки выбрал семантический анализ
+        func_info = self.semantic_analyzer.call_targets.get(node.node_id) or self.flat_funcs.get(func_name)
         if func_info:
             for i, param in enumerate(func_info.parameters):
-                if i < len(arg_ctx_list):
-                    arg_expr_type = self.semantic_analyzer.get_expression_type(arg_ctx_list[i].expression())
+                if i < len(arguments):
+                    arg_expr_type = self.semantic_analyzer.get_expression_type(arguments[i])
                     if self.get_wat_type(param.type) == "f64":
                         self._ensure_f64_on_stack(arg_expr_type)
                     else:
                         if self.get_wat_type(arg_expr_type) == "f64":
                             self.current_wat_buffer.append('    (i32.trunc_f64_s)')
-            self.current_wat_buffer.append(f'    (call ${func_name})')
+            self._emit_user_call(node, f'    (call ${self.function_wat_names.get(id(func_info), func_name)})')
             return
 
         # --- Переменная‑лямбда: локальная/параметр/глобальная/блочная ---
+        # (включая запасной поиск по любому ключу вида "<scope>::func_name")
         var_info = self._lookup_var_info_in_flat_table(func_name, self.current_function_name)
 
-        # Fallback: если не нашли по текущей функции/глобально, ищем любой квалифицированный ключ вида "<scope>::func_name"
-        if not var_info:
-            for qualified, info in self.flat_vars.items():
-                if qualified.endswith(f"::{func_name}"):
-                    var_info = info
-                    break
-
         # Если знаем, что это лямбда — готовим вызов по её сигнатуре
         if var_info and var_info.type == Type.LAMBDA:
             lambda_sig = var_info.lambda_signature
@@ -1075,16 +2431,16 @@ class WatCompiler(ListLangListener):
             # Подготовка аргументов
             if lambda_sig:
                 for i, param in enumerate(lambda_sig.params):
-                    if i < len(arg_ctx_list):
-                        arg_expr_type = self.semantic_analyzer.get_expression_type(arg_ctx_list[i].expression())
+                    if i < len(arguments):
+                        arg_expr_type = self.semantic_analyzer.get_expression_type(arguments[i])
                         if self.get_wat_type(param.type) == "f64":
                             self._ensure_f64_on_stack(arg_expr_type)
                         else:
                             if self.get_wat_type(arg_expr_type) == "f64":
                                 self.current_wat_buffer.append('    (i32.trunc_f64_s)')
             else:
-                for a in arg_ctx_list:
-                    arg_expr_type = self.semantic_analyzer.get_expression_type(a.expression())
+                for a in arguments:
+                    arg_expr_type = self.semantic_analyzer.get_expression_type(a)
                     self._ensure_f64_on_stack(arg_expr_type)
 
             # Индекс функции из переменной
@@ -1097,12 +2453,12 @@ class WatCompiler(ListLangListener):
             if lambda_sig:
                 param_types_wat = [self.get_wat_type(p.type) for p in lambda_sig.params]
                 result_type_wat = self.get_wat_type(lambda_sig.return_type)
-                type_key = hash(lambda_sig)
             else:
-                param_types_wat = ["f64"] * len(arg_ctx_list)
+                param_types_wat = ["f64"] * len(arguments)
                 result_type_wat = "f64"
-                type_key = 0
 
+            # Имя типа строится по WAT-сигнатуре (а не hash()), чтобы вывод не зависел от PYTHONHASHSEED
+            type_key = "_".join(param_types_wat + ["to", result_type_wat or "void"])
             func_type_name = f"$func_type_{type_key}"
             func_type_def = f'(type {func_type_name} (func {" ".join([f"(param {t})" for t in param_types_wat])}'
             if result_type_wat:
@@ -1110,14 +2466,14 @@ class WatCompiler(ListLangListener):
             func_type_def += '))'
             self.unique_lambda_types_wat.add(func_type_def)
 
-            self.current_wat_buffer.append(f'    (call_indirect (type {func_type_name}))')
+            self._emit_user_call(node, f'    (call_indirect (type {func_type_name}))')
             return
 
         # --- Последний безопасный fallback: трактуем идентификатор как переменную‑лямбду без сигнатуры ---
         # Это покрывает блочные переменные в $main, объявленные неявно (например, current_op).
         # 1) Приводим аргументы к f64
-        for a in arg_ctx_list:
-            arg_expr_type = self.semantic_analyzer.get_expression_type(a.expression())
+        for a in arguments:
+            arg_expr_type = self.semantic_analyzer.get_expression_type(a)
             self._ensure_f64_on_stack(arg_expr_type)
 
         # 2) Получаем значение переменной (создаст глобал, если не найдено ранее)
@@ -1127,27 +2483,29 @@ class WatCompiler(ListLangListener):
             self.current_wat_buffer.append('    (i32.trunc_f64_s)')
 
         # 3) Дефолтный тип: (param f64 ... ) (result f64)
-        param_types_wat = ["f64"] * len(arg_ctx_list)
+        param_types_wat = ["f64"] * len(arguments)
         result_type_wat = "f64"
-        func_type_name = f"$func_type_fallback_{len(arg_ctx_list)}"
+        func_type_name = f"$func_type_fallback_{len(arguments)}"
         func_type_def = f'(type {func_type_name} (func {" ".join([f"(param {t})" for t in param_types_wat])} (result {result_type_wat})))'
         self.unique_lambda_types_wat.add(func_type_def)
 
-        self.current_wat_buffer.append(f'    (call_indirect (type {func_type_name}))')
+        self._emit_user_call(node, f'    (call_indirect (type {func_type_name}))')
 
-    def enterLambdaReturn(self, ctx: ListLangParser.LambdaReturnContext):
-        self._enter_lambda_common(ctx)
+    def enterLambdaReturn(self, node: ast.LambdaReturn):
+        self._enter_lambda_common(node)
+        if self.gc_enabled and not isinstance(node, ast.LambdaBlock):
+            self._note_collectable_calls(node.body)
 
-    def exitLambdaReturn(self, ctx: ListLangParser.LambdaReturnContext):
-        expr_type = self.semantic_analyzer.get_expression_type(ctx.expression())
+    def exitLambdaReturn(self, node: ast.LambdaReturn):
+        expr_type = self.semantic_analyzer.get_expression_type(node.body)
         self._ensure_f64_on_stack(expr_type)
         self.current_wat_buffer.append('    (return)')
-        self._exit_lambda_common(ctx)
+        self._exit_lambda_common(node)
 
-    def enterLambdaBlock(self, ctx: ListLangParser.LambdaBlockContext):
-        self._enter_lambda_common(ctx)
+    def enterLambdaBlock(self, node: ast.LambdaBlock):
+        self._enter_lambda_common(node)
 
-    def exitLambdaBlock(self, ctx: ListLangParser.LambdaBlockContext):
+    def exitLambdaBlock(self, node: ast.LambdaBlock):
         current_lambda_sig = self.lambda_context_stack[-1]
         if current_lambda_sig and current_lambda_sig.return_type != Type.VOID:
             if current_lambda_sig.return_type in (Type.NUMBER, Type.BOOL):
@@ -1155,74 +2513,58 @@ class WatCompiler(ListLangListener):
             else:
                 self.current_wat_buffer.append('    (i32.const 0)')
         self.current_wat_buffer.append('    (return)')
-        self._exit_lambda_common(ctx)
+        self._exit_lambda_common(node)
 
-    def _enter_lambda_common(self, ctx: Any):
+    def _enter_lambda_common(self, node: ast.LambdaReturn):
         self.lambda_function_id_counter += 1
         lambda_id = self.lambda_function_id_counter
-        lambda_sig: Optional[LambdaSignature] = self.semantic_analyzer.lambda_signatures.get(ctx) or LambdaSignature([],
+        lambda_sig: Optional[LambdaSignature] = self.semantic_analyzer.get_lambda_signature(node) or LambdaSignature([],
                                                                                                                      Type.VOID)
         lambda_sig.id = lambda_id
 
-        self._previous_function_name = self.current_function_name
-        self._previous_wat_buffer = self.current_wat_buffer
-
         self.lambda_context_stack.append(lambda_sig)
-        self.current_function_name = f"lambda_{lambda_id}"
-        self.current_wat_buffer = self.wat_lambdas
-
-        params_wat = [f"(param ${p.name} {self.get_wat_type(p.type)})" for p in lambda_sig.params]
-
-        self.function_all_locals[self.current_function_name] = {}
-        locals_wat = []
-
-        lambda_scope = None
-        # Find the scope corresponding to this lambda to capture its locals
-        # This is a bit tricky because scopes are popped. A robust way is to match by name if possible.
-        # Let's assume the semantic analyzer assigns unique names or we rely on the stack order.
-        # A better approach would be for the semantic analyzer to pass scope info to the listener.
-        # For now, let's find the last lambda scope as a proxy.
-        for scope in reversed(self.semantic_analyzer.symbol_table.scopes):
-            if scope["type"].value == "lambda":
-                lambda_scope = scope
-                break
+        self.lambda_id_stack.append(lambda_id)
+        func_name = f"lambda_{lambda_id}"
+        self._begin_function_body(func_name)
+        self.function_result_types[func_name] = self.get_wat_type(lambda_sig.return_type)
 
-        if lambda_scope:
-            for var_name, var_info in lambda_scope["variables"].items():
-                if any(p.name == var_name for p in lambda_sig.params): continue
-                wat_type = self.get_wat_type(var_info.type)
-                locals_wat.append(f"(local ${var_name} {wat_type})")
-                self.function_all_locals[self.current_function_name][var_name] = wat_type
+        for p in lambda_sig.params:
+            self.function_all_locals[func_name][p.name] = self._storage_wat_type(p.type)
+        # Переменные тела лямбды (области лямбд к этому моменту уже сняты со стека таблицы символов)
+        self._collect_function_locals_and_params(func_name, lambda_sig.params, node.body)
 
-        for i in range(self.GENERIC_I32_TEMPS):
-            locals_wat.append(f"(local {self._get_generic_temp('i32', i)} i32)")
-        for i in range(self.GENERIC_F64_TEMPS):
-            locals_wat.append(f"(local {self._get_generic_temp('f64', i)} f64)")
-
-        result_wat = f"(result {self.get_wat_type(lambda_sig.return_type)})" if lambda_sig.return_type != Type.VOID else ""
-
-        self.current_wat_buffer.append(f'  (func $lambda_{lambda_id} {" ".join(params_wat)} {result_wat}')
-        for local_decl in locals_wat:
-            self.current_wat_buffer.append(f'    {local_decl}')
-
-    def _exit_lambda_common(self, ctx: Any):
+    def _exit_lambda_common(self, node: ast.LambdaReturn):
         current_lambda_sig = self.lambda_context_stack.pop()
-        self.current_wat_buffer.append('  )')
-        self.wat_lambdas.append(f'  (elem (global.get $next_table_idx) (ref.func $lambda_{current_lambda_sig.id}))')
-        self.wat_lambdas.append('  (global.set $next_table_idx (i32.add (global.get $next_table_idx) (i32.const 1)))')
+        lambda_name = self.current_function_name
 
-        self.current_function_name = self._previous_function_name
-        self.current_wat_buffer = self._previous_wat_buffer
+        params_wat = [f"(param ${p.name} {self._storage_wat_type(p.type)})" for p in current_lambda_sig.params]
+        result_wat = f"(result {self.get_wat_type(current_lambda_sig.return_type)})" if current_lambda_sig.return_type != Type.VOID else ""
+        header = f'  (func ${lambda_name} {" ".join(params_wat)} {result_wat}'
+        self._end_function_body(header, [p.name for p in current_lambda_sig.params], self.wat_lambdas)
 
-        self.current_wat_buffer.append(f'    (i32.const {current_lambda_sig.id})')
+        # Значение лямбды - ее номер, он же индекс в таблице функций
+        lambda_id = self.lambda_id_stack.pop()
+        self.wat_lambdas.append(f'  (elem (i32.const {lambda_id}) func ${lambda_name})')
+
+        self.current_wat_buffer.append(f'    (i32.const {lambda_id})')
         self.current_wat_buffer.append('    (f64.convert_i32_u)')
 
-    def enterStatementBlock(self, ctx: ListLangParser.StatementBlockContext):
-        pass
+    def enterStatementBlock(self, node: ast.StatementBlock):
+        self._note_statement_positions(node.statements)
+
+    def _note_statement_positions(self, statements):
+        """Запоминает выражения, использованные как операторы (узел или список узлов)."""
+        if statements is None:
+            return
+        for statement in statements if isinstance(statements, list) else (statements,):
+            if not isinstance(statement, ast.StatementBlock):
+                self.statement_expression_ids.add(statement.node_id)
+            if self.gc_enabled:
+                self._note_collectable_calls(statement)
 
 
-def compile_listlang_to_wat(parse_tree, parser, semantic_analyzer, filename):
-    compiler = WatCompiler(parser, semantic_analyzer)
-    walker = ParseTreeWalker()
-    walker.walk(compiler, parse_tree)
+def compile_listlang_to_wat(program, parser, semantic_analyzer, filename, initial_memory_pages=1, gc_enabled=False):
+    compiler = WatCompiler(parser, semantic_analyzer, initial_memory_pages, gc_enabled)
+    walker = AstWalker()
+    walker.walk(compiler, program)
     return getattr(compiler, 'final_wat_code', '')